@@ -50,6 +50,7 @@ def main():
     args.add("--acwt", abbr="-a", dtype=float, default=0.083333, discription="Acoustic model weight.")
     args.add("--parallel", abbr="-p", dtype=int, default=4, minV=1, maxV=10, discription="The number of parallel process to compute feature of train dataset.")
     args.add("--skipTrain", abbr="-s", dtype=bool, default=False, discription="If True, skip training. Do decoding only.")
+    args.add("--skipDecode", dtype=bool, default=False, discription="If True, skip decoding. Do training only.")
     # 3. Then start to parse arguments. 
     args.parse()
     # 4. Take a backup of arguments
@@ -96,7 +97,7 @@ def main():
         print(f"Transform the alignment")
         newAli = exkaldi.hmm.convert_alignment(
                                         ali=ali,
-                                        originHmm=os.path.join("exp","train_mono","final.mdl"), 
+                                        originHmm=os.path.join(args.expDir,"train_mono","final.mdl"), 
                                         targetHmm=model, 
                                         tree=tree,
                                         outFile=os.path.join(args.expDir,"train_delta","initial.ali"),
@@ -121,7 +122,7 @@ def main():
         print("Train the triphone model")
         model.train(feat,
                     transcription, 
-                    os.path.join("exp","dict","L.fst"), 
+                    os.path.join(args.expDir,"dict","L.fst"), 
                     tree,
                     tempDir=os.path.join(args.expDir,"train_delta"),
                     initialAli=newAli,
@@ -143,6 +144,9 @@ def main():
         model = exkaldi.load_hmm( os.path.join(args.expDir,"train_delta","final.mdl") )
         tree = exkaldi.load_tree( os.path.join(args.expDir,"train_delta","tree") )
 
+    if args.skipDecode:
+        return
+
     # ------------- Compile WFST training ----------------------
     # Make a WFST decoding graph
     make_WFST_graph(
@@ -50,6 +50,7 @@ def main():
     args.add("--acwt", abbr="-a", dtype=float, default=0.083333, discription="Acoustic model weight.")
     args.add("--parallel", abbr="-p", dtype=int, default=4, minV=1, maxV=10, discription="The number of parallel process to compute feature of train dataset.")
     args.add("--skipTrain", abbr="-s", dtype=bool, default=False, discription="If True, skip training. Do decoding only.")
+    args.add("--skipDecode", dtype=bool, default=False, discription="If True, skip decoding. Do training only.")
     # 3. Then start to parse arguments. 
     args.parse()
     # 4. Take a backup of arguments
@@ -62,7 +63,7 @@ def main():
         print(f"Load MFCC+CMVN feature.")
         feat = exkaldi.load_index_table(os.path.join(args.expDir,"mfcc","train","mfcc_cmvn.ark"))
         print(f"Splice {args.splice} frames.")
-        originalFeat = exkaldi.splice_feature(feat,left=args.splice,right=args.splice,outFile=os.path.join(args.expDir,"train_delta","mfcc_cmvn_splice.ark"))
+        originalFeat = exkaldi.splice_feature(feat,left=args.splice,right=args.splice,outFile=os.path.join(args.expDir,"train_lda_mllt","mfcc_cmvn_splice.ark"))
         # 2. Load previous alignment and lexicons
         ali = exkaldi.load_index_table(os.path.join(args.expDir,"train_delta","*final.ali"),useSuffix="ark")
         lexicons = exkaldi.load_lex(os.path.join(args.expDir,"dict","lexicons.lex"))
@@ -100,7 +101,7 @@ def main():
                     numLeaves=2500,
                     tempDir=os.path.join(args.expDir,"train_lda_mllt"), 
                 )
-        tree.save(os.path.join(args.expDir,"train_delta","tree"))
+        tree.save(os.path.join(args.expDir,"train_lda_mllt","tree"))
         print(f"Build tree done.")
         del ldaFeat
 
@@ -119,7 +120,7 @@ def main():
         print(f"Transform the alignment")
         newAli = exkaldi.hmm.convert_alignment(
                                         ali=ali,
-                                        originHmm=os.path.join("exp","train_delta","final.mdl"), 
+                                        originHmm=os.path.join(args.expDir,"train_delta","final.mdl"), 
                                         targetHmm=model, 
                                         tree=tree,
                                         outFile=os.path.join(args.expDir,"train_lda_mllt","initial.ali"),
@@ -145,7 +146,7 @@ def main():
         model.train(
                     originalFeat,
                     transcription, 
-                    os.path.join("exp","dict","L.fst"), 
+                    os.path.join(args.expDir,"dict","L.fst"), 
                     tree,
                     tempDir=os.path.join(args.expDir,"train_lda_mllt"),
                     initialAli=newAli,
@@ -167,6 +168,9 @@ def main():
         model = exkaldi.load_hmm( os.path.join(args.expDir,"train_lda_mllt","final.mdl") )
         tree = exkaldi.load_tree( os.path.join(args.expDir,"train_lda_mllt","tree") )
 
+    if args.skipDecode:
+        return
+
     # ------------- Compile WFST training ----------------------
     # Make a WFST decoding graph
     make_WFST_graph(
@@ -50,6 +50,7 @@ def main():
     args.add("--acwt", abbr="-a", dtype=float, default=0.083333, discription="Acoustic model weight.")
     args.add("--parallel", abbr="-p", dtype=int, default=4, minV=1, maxV=10, discription="The number of parallel process to compute feature of train dataset.")
     args.add("--skipTrain", abbr="-s", dtype=bool, default=False, discription="If True, skip training. Do decoding only.")
+    args.add("--skipDecode", dtype=bool, default=False, discription="If True, skip decoding. Do training only.")
     # 3. Then start to parse arguments. 
     args.parse()
     # 4. Take a backup of arguments
@@ -62,7 +63,7 @@ def main():
         print(f"Load MFCC+CMVN feature.")
         feat = exkaldi.load_index_table(os.path.join(args.expDir,"mfcc","train","mfcc_cmvn.ark"))
         print(f"Splice {args.splice} frames.")
-        originalFeat = exkaldi.splice_feature(feat,left=args.splice,right=args.splice,outFile=os.path.join(args.expDir,"train_delta","mfcc_cmvn_splice.ark"))
+        originalFeat = exkaldi.splice_feature(feat,left=args.splice,right=args.splice,outFile=os.path.join(args.expDir,"train_sat","mfcc_cmvn_splice.ark"))
         print(f"Transform LDA feature")
         ldaFeat = exkaldi.transform_feat(
                                 feat=originalFeat, 
@@ -87,7 +88,7 @@ def main():
         fmllrFeat = exkaldi.use_fmllr(
                                 ldaFeat,
                                 fmllrTransMat,
-                                utt2spk=os.path.join("exp","data","train","utt2spk"),
+                                utt2spk=os.path.join(args.expDir,"data","train","utt2spk"),
                                 outFile=os.path.join(args.expDir,"train_sat","fmllr_feat.ark"),
                             )
 
@@ -179,6 +180,9 @@ def main():
         model = exkaldi.load_hmm( os.path.join(args.expDir,"train_sat","final.mdl") )
         tree = exkaldi.load_tree( os.path.join(args.expDir,"train_sat","tree") )
 
+    if args.skipDecode:
+        return
+
     # ------------- Compile WFST training ----------------------
     # Make a WFST decoding graph
     make_WFST_graph(
@@ -164,22 +164,17 @@ def process_feat_ali(training=True):
     pdfAli.rename("pdfID")
     phoneAli.rename("phoneID")
 
-    dataset = exkaldi.tuple_dataset([feat, pdfAli, phoneAli], frameLevel=True)
-    random.shuffle(dataset)
+    # Frames are packed in arrays instead of one Python object per frame.
+    dataset = exkaldi.frame_dataset([feat, pdfAli, phoneAli])
 
     return dataset
 
-def make_generator(dataset):
+def make_generator(dataset, batchSize):
 
-    dataIndex = 0
-    datasetSize = len(dataset)
     while True:
-        if dataIndex >= datasetSize:
-            random.shuffle(dataset)
-            dataIndex = 0
-        one = dataset[dataIndex]
-        dataIndex += 1
-        yield one.feat[0], {"pdfID":one.pdfID[0], "phoneID":one.phoneID[0]}
+        # Shuffle all frames every epoch.
+        for batch in dataset.batches(batchSize, shuffle=True, dropLast=True):
+            yield batch["feat"], {"pdfID":batch["pdfID"], "phoneID":batch["phoneID"]}
 
 def prepare_test_data(postProbDim):
 
@@ -382,21 +377,28 @@ def output_probability():
       print("Splice feature")
       feat = feat.splice(args.splice)
 
-    feat = feat.to_numpy()
+    normalize = None
     if args.normalizeFeat:
       print("Normalize")
-      feat = feat.normalize(std=True)
+      # Accumulate the statistics chunk by chunk, rather than converting the whole feature to NumPy.
+      count, total, square = 0, 0, 0
+      for chunk in feat.subset(chunks=10):
+        frames = np.row_stack(list(chunk.to_numpy().data.values()))
+        count += len(frames)
+        total += frames.sum(axis=0, dtype="float64")
+        square += (frames.astype("float64")**2).sum(axis=0)
+      mean = total/count
+      std = np.sqrt(square/count - mean**2)
+      normalize = lambda batch: dict( (utt, ((mat-mean)/(std+1e-8)).astype("float32")) for utt,mat in batch.items() )
+
+    def forward(frames):
+      predPdf, predPhone = model(frames, training=False)
+      return exkaldi.nn.log_softmax(predPdf.numpy(),axis=1)
 
-    outProb = {}
     print("Forward model...")
-    for utt,mat in feat.items():
-      predPdf, predPhone = model(mat, training=False)
-      outProb[utt] = exkaldi.nn.log_softmax(predPdf.numpy(),axis=1)
-    
-    #outProb = exkaldi.load_prob(outProb)
-    #outProb.save(f"{args.expDir}/train_dnn/prob/{Name}.npy")
-    outProb = exkaldi.load_prob(outProb).to_bytes()
-    outProb.save(f"{args.expDir}/train_dnn/prob/{Name}.ark") 
+    # Features are forwarded batch by batch and the probability is streamed to file.
+    outTable = exkaldi.nn.nn_forward(feat, forward, f"{args.expDir}/train_dnn/prob/{Name}.ark", maxFrames=20000, processFunc=normalize)
+    outTable.save(f"{args.expDir}/train_dnn/prob/{Name}.scp")
     print("Save done!")
 
 def main():
@@ -460,17 +462,17 @@ def main():
     trainDataset = process_feat_ali(training=True)
     traindataLen = len(trainDataset)
     train_gen = tf.data.Dataset.from_generator(
-                                        lambda: make_generator(trainDataset),
+                                        lambda: make_generator(trainDataset, args.batchSize),
                                         (tf.float32, {"pdfID":tf.int32,"phoneID":tf.int32})
-                                ).batch(args.batchSize).prefetch(3)
+                                ).prefetch(3)
     steps_per_epoch = traindataLen//args.batchSize
 
     devDataset = process_feat_ali(training=False)
     devdataLen = len(devDataset)
     dev_gen = tf.data.Dataset.from_generator(
-                                        lambda: make_generator(devDataset),
+                                        lambda: make_generator(devDataset, args.batchSize),
                                         (tf.float32, {"pdfID":tf.int32,"phoneID":tf.int32})
-                                ).batch(args.batchSize).prefetch(3)
+                                ).prefetch(3)
     validation_steps = devdataLen//args.batchSize
 
     print('Prepare test data')
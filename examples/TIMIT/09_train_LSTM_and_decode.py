@@ -244,58 +244,48 @@ class DataIterator:
 
   def __init__(self, batchSize, training=True):
     self.feat, self.pdfAli, self.phoneAli = process_feat_ali(training)
-    self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,100)
     self.batchSize = batchSize
     self.currentEpoch = 0
-    self.dataIndex = 0
-    self.datasetSize = len(self.dataset)
     self.isNewEpoch = False
     self.currentPosition = 0
-    self.epochSize = math.ceil(self.datasetSize/self.batchSize)
+    self.make_dataset(100)
 
-  def next(self):
-
-    batchFeat = []
-    batchPdfAli = []
-    batchPhoneAli = []
-
-    self.isNewEpoch = False
+  def make_dataset(self, cutLength):
+    self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,cutLength)
+    # Make batches of utterances with similar lengths so that less frames are padded.
+    lengths = dict( (one.key, len(one.feat)) for one in self.dataset )
+    self.sampler = exkaldi.nn.BucketSampler(lengths, batchSize=self.batchSize, buckets=20, shuffle=True)
+    self.make_batches()
 
-    for i in range(self.batchSize):
-      one = self.dataset[self.dataIndex]
-      self.dataIndex += 1
+  def make_batches(self):
+    batches = self.sampler.batches()
+    self.epochSize = len(batches)
+    self.batchIndex = 0
+    self.generator = self.sampler.padded_batches(self.dataset, fields=["feat","pdfID","phoneID"], batches=batches)
 
-      if self.dataIndex >= self.datasetSize:
+  def next(self):
 
-        self.currentEpoch += 1
-        self.isNewEpoch = True
+    batchFeat, batchPdfAli, batchPhoneAli, _ = next(self.generator)
+    self.batchIndex += 1
+    self.isNewEpoch = False
 
-        if self.currentEpoch < 5:
-          del self.dataset
-          if self.currentEpoch == 1:
-            self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,200)
-          elif self.currentEpoch == 2:
-            self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,400)
-          elif self.currentEpoch == 3:
-            self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,800)
-          elif self.currentEpoch == 4:
-            self.dataset = tuple_dataset(self.feat,self.pdfAli,self.phoneAli,1000)
+    if self.batchIndex >= self.epochSize:
 
-          self.datasetSize = len(self.dataset)
-          self.epochSize = math.ceil(self.datasetSize/self.batchSize)
-        
-        random.shuffle(self.dataset)
-        self.dataIndex = 0
+      self.currentEpoch += 1
+      self.isNewEpoch = True
 
-      batchFeat.append( one.feat )
-      batchPdfAli.append( one.pdfID )
-      batchPhoneAli.append( one.phoneID )
+      if self.currentEpoch < 5:
+        del self.dataset
+        cutLength = {1:200, 2:400, 3:800, 4:1000}[self.currentEpoch]
+        self.make_dataset(cutLength)
+      else:
+        self.make_batches()
 
     self.currentPosition += 1
 
-    return ( tf.convert_to_tensor(keras.preprocessing.sequence.pad_sequences(batchFeat, maxlen=None, dtype='float32', padding='post', value=0.0), tf.float32),
-            tf.convert_to_tensor(keras.preprocessing.sequence.pad_sequences(batchPdfAli, maxlen=None, dtype='int32', padding='post', value=0), tf.int32),
-            tf.convert_to_tensor(keras.preprocessing.sequence.pad_sequences(batchPhoneAli, maxlen=None, dtype='int32', padding='post', value=0), tf.int32),
+    return ( tf.convert_to_tensor(batchFeat, tf.float32),
+            tf.convert_to_tensor(batchPdfAli.astype("int32"), tf.int32),
+            tf.convert_to_tensor(batchPhoneAli.astype("int32"), tf.int32),
         )
 
 class EvaluateWER:
@@ -0,0 +1,178 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Jun, 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Timit HMM-GMM training recipe.
+
+Run parts 01 to 09 as a pipeline of stages.
+Every stage declares the files it reads and writes, so up-to-date stages are skipped,
+and independent stages run at the same time. For example, MFCC feature is computed while
+dictionaries and language model are made, and the test data is decoded while the next model is trained.
+
+'''
+import os
+import sys
+import subprocess
+
+import exkaldi
+from exkaldi import args
+from exkaldi.utils.pipeline import Pipeline
+
+recipeDir = os.path.dirname(os.path.abspath(__file__))
+
+def script_stage(pipeline, name, script, inputs, outputs, after=[], **options):
+    '''
+    Add a stage which runs a part of this recipe in a new process with given options.
+    The options are the parameters of stage, so the stage runs again if they are changed.
+    '''
+    scriptFile = os.path.join(recipeDir, script)
+    logFile = os.path.join(args.expDir, "log", f"{name}.log")
+    options["expDir"] = args.expDir
+
+    cmd = [sys.executable, scriptFile]
+    for key, value in options.items():
+        if isinstance(value, (list,tuple)):
+            value = "|".join(str(v) for v in value)
+        cmd.extend([f"--{key}", str(value)])
+
+    def run():
+        exkaldi.utils.make_dependent_dirs(logFile, pathIsFile=True)
+        with open(logFile, "w", encoding="utf-8") as fw:
+            cod = subprocess.call(cmd, stdout=fw, stderr=subprocess.STDOUT)
+        if cod != 0:
+            raise Exception(f"Failed to run {script}. Please look the log file: {logFile}.")
+
+    return pipeline.add(name, run, inputs=inputs+[scriptFile], outputs=outputs, params=options, after=after)
+
+def make_pipeline():
+
+    exp = lambda *path: os.path.join(args.expDir, *path)
+    datasets = ["train", "dev", "test"]
+    order = args.order
+
+    pipeline = Pipeline(exp("pipeline.json"), parallel=args.jobs)
+
+    # ------------- Part 1: prepare data -------------
+    script_stage(pipeline, "prepare_data", "01_prepare_data.py",
+                    inputs=[args.timitRoot],
+                    outputs=[exp("data",Name,fileName) for Name in datasets for fileName in ["wav.scp","utt2spk","spk2utt","text"]] +
+                            [exp("dict","phones.48_to_39.map")],
+                    timitRoot=args.timitRoot,
+                )
+
+    # ------------- Part 2: make dictionaries and language model -------------
+    script_stage(pipeline, "make_dict", "02_make_dict_and_LM.py",
+                    inputs=[exp("data","train","text")],
+                    outputs=[exp("dict",fileName) for fileName in ["pronunciation.txt","lexicons.lex","L.fst","L_disambig.fst","topo"]],
+                    part="dict",
+                )
+    script_stage(pipeline, "train_lm", "02_make_dict_and_LM.py",
+                    inputs=[exp("data","train","text"), exp("data","test","text"), exp("dict","lexicons.lex"), exp("dict","L_disambig.fst")],
+                    outputs=[exp("lm",f"{order}grams.arpa"), exp("lm",f"{order}grams.binary"), exp("lm",f"G.{order}.fst"), exp("lm",f"LG.{order}.fst")],
+                    part="lm", order=order,
+                )
+
+    # ------------- Part 3: compute MFCC feature -------------
+    script_stage(pipeline, "compute_mfcc", "03_compute_mfcc.py",
+                    inputs=[exp("data",Name,fileName) for Name in datasets for fileName in ["wav.scp","utt2spk","spk2utt"]],
+                    outputs=[exp("mfcc",Name,fileName) for Name in datasets for fileName in ["cmvn.ark","mfcc_cmvn.ark"]],
+                    parallel=args.parallel,
+                )
+
+    # ------------- Part 4 to 7: train GMM-HMM models and decode -------------
+    # Every part is split into a training stage and a decoding stage,
+    # so that the decoding stage can run together with the training stage of next part.
+    trainInputs = [exp("mfcc","train","mfcc_cmvn.ark"), exp("data","train","text"),
+                   exp("dict","lexicons.lex"), exp("dict","topo"), exp("dict","L.fst")]
+    decodeInputs = [exp("mfcc","test","mfcc_cmvn.ark"), exp("data","test","text"),
+                    exp("dict","lexicons.lex"), exp("dict","phones.48_to_39.map"),
+                    exp("lm",f"LG.{order}.fst"), os.path.join(recipeDir,"make_graph_and_decode.py")]
+    model = lambda Dir: [exp(Dir,"final.mdl"), exp(Dir,"tree"), exp(Dir,"*final.ali")]
+
+    parts = [
+        ("mono", "04_train_mono_and_decode.py", [], []),
+        ("delta", "05_train_delta_and_decode.py", model("train_mono"), []),
+        ("lda_mllt", "06_train_lda_mllt.py", model("train_delta"), [exp("train_lda_mllt","trans.mat")]),
+        ("sat", "07_train_sat.py", model("train_lda_mllt") + [exp("train_lda_mllt","trans.mat"), exp("data","train","spk2utt"), exp("data","train","utt2spk")], []),
+    ]
+    for Name, script, previous, extraOutputs in parts:
+        Dir = f"train_{Name}"
+        script_stage(pipeline, f"train_{Name}", script,
+                        inputs=trainInputs + previous,
+                        outputs=model(Dir) + extraOutputs,
+                        skipDecode=True, parallel=args.parallel,
+                    )
+        extraInputs = []
+        if Name in ["lda_mllt","sat"]:
+            extraInputs = [exp("train_lda_mllt","trans.mat"), exp("data","test","spk2utt"), exp("data","test","utt2spk")]
+        script_stage(pipeline, f"decode_{Name}", script,
+                        inputs=decodeInputs + extraInputs + [exp(Dir,"final.mdl"), exp(Dir,"tree")],
+                        outputs=[exp(Dir,"graph",f"HCLG.{order}.fst"), exp(Dir,f"decode_{order}grams")],
+                        skipTrain=True, order=order, parallel=args.parallel,
+                    )
+
+    # ------------- Part 8 and 9: train DNN and LSTM models with Tensorflow -------------
+    # They are not run defaultly. Add them to <targets> to run them.
+    script_stage(pipeline, "train_dnn", "08_train_DNN_and_decode.py",
+                    inputs=model("train_sat") + [exp("train_lda_mllt","trans.mat"), exp("dict","lexicons.lex"), exp("dict","L.fst")] +
+                           [exp("mfcc",Name,"mfcc_cmvn.ark") for Name in datasets],
+                    outputs=[exp("train_dnn","data","dims"), exp("train_dnn","out_*")],
+                    order=order,
+                )
+    # LSTM model needs the output probability of DNN model.
+    script_stage(pipeline, "train_lstm", "09_train_LSTM_and_decode.py",
+                    inputs=[exp("train_dnn","prob")] + model("train_sat") + [exp("train_lda_mllt","trans.mat")] +
+                           [exp("mfcc",Name,"mfcc_cmvn.ark") for Name in datasets],
+                    outputs=[exp("train_lstm","data","dims"), exp("train_lstm","out_*")],
+                    after=["train_dnn"],
+                    order=order,
+                )
+
+    return pipeline
+
+def main():
+
+    # ------------- Parse arguments from command line ----------------------
+    # 1. Add a discription of this program
+    args.discribe("This program is used to run TIMIT recipe as a pipeline.")
+    # 2. Add options
+    args.add("--timitRoot", abbr="-t", dtype=str, default="/Corpus/TIMIT", discription="The root path of timit dataset.")
+    args.add("--expDir", abbr="-e", dtype=str, default="exp", discription="The data and output path of current experiment.")
+    args.add("--order", abbr="-o", dtype=int, default=6, minV=1, maxV=6, discription="The order of N-grams language model.")
+    args.add("--parallel", abbr="-p", dtype=int, default=4, minV=1, maxV=10, discription="The number of parallel process in one stage.")
+    args.add("--jobs", abbr="-j", dtype=int, default=2, minV=1, maxV=10, discription="The number of stages running at the same time.")
+    args.add("--targets", dtype=str, default="all", discription="Stages to run (and stages they depend on) such as: decode_mono|decode_delta. If 'all', run all GMM-HMM stages.")
+    args.add("--force", abbr="-f", dtype=bool, default=False, discription="If True, run stages even if they are up to date.")
+    # 3. Then start to parse arguments. 
+    args.parse()
+    # 4. Take a backup of arguments
+    args.print_args()
+    args.save( os.path.join(args.expDir,"conf","run_pipeline.args") )
+
+    pipeline = make_pipeline()
+
+    targets = args.targets if isinstance(args.targets, list) else [args.targets,]
+    if targets == ["all"]:
+        targets = ["decode_mono", "decode_delta", "decode_lda_mllt", "decode_sat"]
+
+    print("Stages to run:", " -> ".join(pipeline.plan(targets)))
+    results = pipeline.run(targets, force=args.force)
+    for result in results:
+        print(f"{result.name:<20} {result.state:<10} {result.duration:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,49 @@
 from __future__ import absolute_import
 
+import importlib
+
 from exkaldi import version
 from exkaldi.version import info
 
-from exkaldi.utils import *
-from exkaldi.core import *
-from exkaldi.decode import *
-from exkaldi.hmm import *
-from exkaldi.lm import *
-from exkaldi.nn import *
\ No newline at end of file
+# Subpackages are imported when they are used firstly.
+_SUBPACKAGES = ("utils","core","decode","hmm","lm","nn","benchmark")
+
+_EXPORTS = {
+	"argparse":"utils","args":"utils","backend":"utils","cache":"utils","check_config":"utils",
+	"declare":"utils","load_args":"utils","telemetry":"utils","trace":"utils","memory":"utils","pipeline":"utils",
+
+	"archive":"core","common":"core","feature":"core","load":"core","shared":"core",
+	"ListTable":"core","ArkIndexTable":"core","Transcription":"core","Metric":"core","WavSegment":"core",
+	"BytesFeature":"core","BytesCMVNStatistics":"core","BytesProbability":"core","BytesAlignmentTrans":"core","BytesFmllrMatrix":"core",
+	"NumpyFeature":"core","NumpyCMVNStatistics":"core","NumpyProbability":"core","NumpyAlignment":"core","NumpyAlignmentTrans":"core",
+	"NumpyAlignmentPhone":"core","NumpyAlignmentPdf":"core","NumpyFmllrMatrix":"core",
+	"load_ali":"core","load_feat":"core","load_cmvn":"core","load_prob":"core","load_transcription":"core",
+	"load_list_table":"core","load_index_table":"core","load_feat_async":"core","load_prob_async":"core",
+	"compute_mfcc":"core","compute_fbank":"core","compute_plp":"core","compute_spectrogram":"core",
+	"transform_feat":"core","use_fmllr":"core","use_cmvn":"core","compute_cmvn_stats":"core","use_cmvn_sliding":"core",
+	"decompress_feat":"core","add_delta":"core","splice_feature":"core",
+	"tuple_dataset":"core","frame_dataset":"core","FrameDataset":"core","join_archives":"core","JoinedDataset":"core","match_utterances":"core","merge_archives":"core",
+	"utt_to_spk":"core","spk_to_utt":"core","spk2utt_to_utt2spk":"core","utt2spk_to_spk2utt":"core",
+	"SharedArchive":"core","to_shared":"core","attach_shared":"core",
+
+	"graph":"decode","score":"decode","e2e":"decode","wfst":"decode","load_lex":"decode","load_lat":"decode",
+
+	"load_hmm":"hmm","load_tree":"hmm","load_mat":"hmm",
+
+	"load_ngrams":"lm",
+}
+
+__all__ = ["version","info"] + list(_SUBPACKAGES) + list(_EXPORTS.keys())
+
+def __getattr__(name):
+	if name in _SUBPACKAGES:
+		obj = importlib.import_module(f"exkaldi.{name}")
+	elif name in _EXPORTS:
+		obj = getattr(importlib.import_module(f"exkaldi.{_EXPORTS[name]}"),name)
+	else:
+		raise AttributeError(f"module 'exkaldi' has no attribute '{name}'")
+	globals()[name] = obj
+	return obj
+
+def __dir__():
+	return sorted( set(globals().keys()) | set(__all__) )
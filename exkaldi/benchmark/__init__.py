@@ -0,0 +1,8 @@
+from __future__ import absolute_import
+
+from exkaldi.benchmark import synthetic
+from exkaldi.benchmark.runner import run_benchmarks
+from exkaldi.benchmark.runner import save_results
+from exkaldi.benchmark.runner import load_results
+from exkaldi.benchmark.runner import compare_results
+from exkaldi.benchmark.runner import print_comparisons
@@ -0,0 +1,57 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Run the benchmarks from command line,for example:
+	python -m exkaldi.benchmark --scale 1000 --resultDir .benchmarks
+	python -m exkaldi.benchmark --compare .benchmarks/abc1234_scale1000.json
+'''
+
+import sys
+import argparse
+
+from exkaldi.benchmark.runner import run_benchmarks,save_results,load_results,compare_results,print_comparisons
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m exkaldi.benchmark",description="Run exkaldi benchmarks on synthetic data.")
+	parser.add_argument("--scale",type=int,default=1000,help="The number of utterances.")
+	parser.add_argument("--repeat",type=int,default=5,help="How many times to time each benchmark.")
+	parser.add_argument("--number",type=int,default=1,help="How many calls in one timing.")
+	parser.add_argument("--pattern",type=str,default=None,help="Only run benchmarks whose name includes it.")
+	parser.add_argument("--resultDir",type=str,default=".benchmarks",help="The directory to save results.")
+	parser.add_argument("--commit",type=str,default=None,help="The name of result file. Default is the current git commit.")
+	parser.add_argument("--compare",type=str,default=None,help="A result file to compare with.")
+	parser.add_argument("--threshold",type=float,default=1.1,help="The ratio to report regressions and improvements.")
+	args = parser.parse_args(argv)
+
+	results = run_benchmarks(scale=args.scale,repeat=args.repeat,number=args.number,pattern=args.pattern,verbose=True)
+	fileName = save_results(results,args.resultDir,args.scale,args.commit)
+	print(f"Results have been saved to: {fileName}")
+
+	if args.compare is not None:
+		_,before = load_results(args.compare)
+		if args.pattern is not None:
+			before = [ r for r in before if args.pattern in r.name ]
+		comparisons = compare_results(before,results,args.threshold)
+		print_comparisons(comparisons)
+		if any( c.state == "regression" for c in comparisons ):
+			return 1
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,51 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.benchmark'''
+
+import numpy as np
+from exkaldi.benchmark import synthetic
+from exkaldi.benchmark.runner import run_benchmarks,save_results,load_results,compare_results
+
+def test_synthetic_data_is_deterministic():
+
+  featA = synthetic.make_feat(5,dim=3,minFrames=2,maxFrames=8,seed=1)
+  featB = synthetic.make_feat(5,dim=3,minFrames=2,maxFrames=8,seed=1)
+  ali = synthetic.make_ali(5,minFrames=2,maxFrames=8,seed=1)
+  assert featA.utts == featB.utts == ali.utts
+  for utt in featA.utts:
+    assert np.array_equal(featA.data[utt],featB.data[utt])
+    assert featA.data[utt].shape[0] == ali.data[utt].shape[0]
+
+  ref = synthetic.make_transcription(5)
+  assert synthetic.perturb_transcription(ref,errorRate=0.5) == synthetic.perturb_transcription(ref,errorRate=0.5)
+
+def test_run_save_and_compare(tmpdir):
+
+  results = run_benchmarks(scale=4,repeat=1)
+  assert len(results) > 0
+  assert all( r.min >= 0 for r in results )
+
+  fileName = save_results(results,str(tmpdir),scale=4,commit="base")
+  info,loaded = load_results(fileName)
+  assert info["commit"] == "base"
+  assert loaded == results
+
+  slower = [ r._replace(min=r.min*2+1) for r in results[1:] ]
+  comparisons = { c.name:c.state for c in compare_results(fileName,slower) }
+  assert comparisons[results[0].name] == "removed"
+  assert comparisons[results[1].name] == "regression"
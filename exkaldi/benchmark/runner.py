@@ -0,0 +1,215 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Run benchmark suites,store the results and compare them across commits.'''
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import statistics
+import numpy as np
+from collections import namedtuple
+
+from exkaldi.version import info as ExkaldiInfo
+from exkaldi.version import WrongPath
+from exkaldi.utils import declare
+
+BenchmarkResult = namedtuple("BenchmarkResult",["name","min","median","repeat","number"])
+Comparison = namedtuple("Comparison",["name","before","after","ratio","state"])
+
+def git_commit(path=None):
+	'''
+	Get the current git commit of the source tree.
+
+	Args:
+		<path>: None or a directory in the git tree. If None,use the directory of exkaldi package.
+
+	Return:
+		a string. "unknown" if it is not in a git tree. The suffix "-dirty" is added if there are uncommitted changes.
+	'''
+	if path is None:
+		path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	try:
+		commit = subprocess.check_output(["git","rev-parse","--short","HEAD"],cwd=path,stderr=subprocess.DEVNULL).decode().strip()
+		changes = subprocess.check_output(["git","status","--porcelain","--untracked-files=no"],cwd=path,stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError,subprocess.CalledProcessError):
+		return "unknown"
+	return commit + ("-dirty" if len(changes) > 0 else "")
+
+def run_benchmarks(suites=None,scale=1000,repeat=5,number=1,pattern=None,verbose=False):
+	'''
+	Run benchmarks.
+
+	Args:
+		<suites>: None or a list of suite classes. If None,run all suites of exkaldi.benchmark.suites.
+		<scale>: the number of utterances of the synthetic data.
+		<repeat>: how many times to time each benchmark.
+		<number>: how many times to call each benchmark in one timing.
+		<pattern>: None or a string. If not None,only run the benchmarks whose full name includes it.
+		<verbose>: If True,print the result of each benchmark.
+
+	Return:
+		a list of BenchmarkResult objects. Times are the seconds of one call.
+	'''
+	declare.is_positive_int("scale",scale)
+	declare.is_positive_int("repeat",repeat)
+	declare.is_positive_int("number",number)
+	if suites is None:
+		from exkaldi.benchmark.suites import ALL_SUITES
+		suites = ALL_SUITES
+
+	results = []
+	for suiteClass in suites:
+		names = sorted( n for n in dir(suiteClass) if n.startswith("time_") )
+		names = [ n for n in names if pattern is None or pattern in f"{suiteClass.__name__}.{n}" ]
+		if len(names) == 0:
+			continue
+		suite = suiteClass()
+		if hasattr(suite,"setup"):
+			suite.setup(scale)
+		try:
+			for name in names:
+				func = getattr(suite,name)
+				# Warm up.
+				func()
+				timings = []
+				for _ in range(repeat):
+					startTime = time.perf_counter()
+					for _ in range(number):
+						func()
+					timings.append( (time.perf_counter()-startTime)/number )
+				result = BenchmarkResult(f"{suiteClass.__name__}.{name}",min(timings),statistics.median(timings),repeat,number)
+				if verbose:
+					print(f"{result.name:<50} {result.min:>12.6f} {result.median:>12.6f}")
+				results.append(result)
+		finally:
+			if hasattr(suite,"teardown"):
+				suite.teardown()
+
+	return results
+
+def save_results(results,resultDir,scale,commit=None):
+	'''
+	Save benchmark results to a JSON file named by the commit.
+
+	Args:
+		<results>: a list of BenchmarkResult objects.
+		<resultDir>: the directory to store result files.
+		<scale>: the scale used to run the benchmarks.
+		<commit>: None or a string. If None,use the current git commit.
+
+	Return:
+		the file name.
+	'''
+	declare.is_valid_string("resultDir",resultDir)
+	if os.path.isfile(resultDir):
+		raise WrongPath(f"<resultDir> has existed as a file: {resultDir}.")
+	os.makedirs(resultDir,exist_ok=True)
+	if commit is None:
+		commit = git_commit()
+
+	content = {
+		"commit":commit,
+		"date":time.strftime("%Y-%m-%d %H:%M:%S"),
+		"scale":scale,
+		"machine":platform.node(),
+		"python":platform.python_version(),
+		"numpy":np.__version__,
+		"exkaldi":ExkaldiInfo.version,
+		"results":{ r.name:r._asdict() for r in results },
+	}
+	fileName = os.path.join(resultDir,f"{commit}_scale{scale}.json")
+	with open(fileName,"w",encoding="utf-8") as fw:
+		json.dump(content,fw,indent=1)
+
+	return fileName
+
+def load_results(fileName):
+	'''
+	Load benchmark results from file.
+
+	Args:
+		<fileName>: a JSON file saved by save_results().
+
+	Return:
+		a two-tuple: (a dict of information,a list of BenchmarkResult objects).
+	'''
+	declare.is_file("fileName",fileName)
+	with open(fileName,"r",encoding="utf-8") as fr:
+		content = json.load(fr)
+	results = [ BenchmarkResult(**r) for r in content.pop("results").values() ]
+
+	return content,results
+
+def compare_results(before,after,threshold=1.1):
+	'''
+	Compare two groups of benchmark results by the minimum time.
+
+	Args:
+		<before>: a list of BenchmarkResult objects or a result file name.
+		<after>: a list of BenchmarkResult objects or a result file name.
+		<threshold>: a ratio. If the time increases more than it,it is a regression. If it decreases more than it,it is an improvement.
+
+	Return:
+		a list of Comparison objects. Their state is one of "regression","improvement","same","added" and "removed".
+	'''
+	declare.greater("threshold",threshold,None,1)
+	if isinstance(before,str):
+		before = load_results(before)[1]
+	if isinstance(after,str):
+		after = load_results(after)[1]
+
+	before = { r.name:r.min for r in before }
+	after = { r.name:r.min for r in after }
+
+	comparisons = []
+	for name in sorted( set(before.keys()) | set(after.keys()) ):
+		if name not in after:
+			comparisons.append( Comparison(name,before[name],None,None,"removed") )
+		elif name not in before:
+			comparisons.append( Comparison(name,None,after[name],None,"added") )
+		else:
+			ratio = after[name]/before[name] if before[name] > 0 else float("inf")
+			if ratio > threshold:
+				state = "regression"
+			elif ratio < 1/threshold:
+				state = "improvement"
+			else:
+				state = "same"
+			comparisons.append( Comparison(name,before[name],after[name],ratio,state) )
+
+	return comparisons
+
+def print_comparisons(comparisons,fileName=None):
+	'''
+	Print a comparison table.
+
+	Args:
+		<comparisons>: a list of Comparison objects.
+		<fileName>: None or a file handle. If None,print to standard output.
+	'''
+	fw = sys.stdout if fileName is None else fileName
+	width = max([ len(c.name) for c in comparisons ] + [9])
+	print(f"{'benchmark':<{width}}  {'before(s)':>12}  {'after(s)':>12}  {'ratio':>7}  state",file=fw)
+	for c in comparisons:
+		before = "-" if c.before is None else f"{c.before:.6f}"
+		after = "-" if c.after is None else f"{c.after:.6f}"
+		ratio = "-" if c.ratio is None else f"{c.ratio:.2f}"
+		print(f"{c.name:<{width}}  {before:>12}  {after:>12}  {ratio:>7}  {c.state}",file=fw)
@@ -0,0 +1,194 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Benchmark suites.
+Like asv,every suite is a class. Its setup(scale) method is called once before timing,
+and every method whose name starts with "time_" is a benchmark.
+None of them needs Kaldi.
+'''
+
+import shutil
+import tempfile
+import numpy as np
+
+from exkaldi.benchmark import synthetic
+from exkaldi.core.archive import BytesFeature,BytesAlignmentTrans
+from exkaldi.core.common import tuple_dataset,frame_dataset,join_archives
+from exkaldi.core.load import load_index_table,load_transcription,load_list_table
+from exkaldi.decode.score import edit_distance
+from exkaldi.nn.nn import pad_sequence,pad_packed,log_softmax,ProbPostProcessor
+
+class ArchiveParsing:
+	'''
+	Parse bytes archives and transform between bytes and NumPy format.
+	'''
+	def setup(self,scale):
+		self.numpyFeat = synthetic.make_feat(scale)
+		self.numpyAli = synthetic.make_ali(scale)
+		self.bytesFeat = self.numpyFeat.to_bytes()
+		self.bytesAli = self.numpyAli.to_bytes()
+
+	def time_build_feat_index(self):
+		BytesFeature(self.bytesFeat.data)
+
+	def time_build_ali_index(self):
+		BytesAlignmentTrans(self.bytesAli.data)
+
+	def time_feat_to_numpy(self):
+		self.bytesFeat.to_numpy()
+
+	def time_feat_to_bytes(self):
+		self.numpyFeat.to_bytes()
+
+	def time_ali_to_numpy(self):
+		self.bytesAli.to_numpy()
+
+	def time_ali_to_bytes(self):
+		self.numpyAli.to_bytes()
+
+class ArchiveOperations:
+	'''
+	Subset,sort and add archives.
+	'''
+	def setup(self,scale):
+		self.numpyFeat = synthetic.make_feat(scale)
+		self.bytesFeat = self.numpyFeat.to_bytes()
+		keys = self.numpyFeat.utts
+		self.keys = keys[0:len(keys)//2]
+		self.numpyFeatA = self.numpyFeat.subset(keys=keys[0:len(keys)//2])
+		self.numpyFeatB = self.numpyFeat.subset(keys=keys[len(keys)//2:])
+		self.bytesFeatA = self.numpyFeatA.to_bytes()
+		self.bytesFeatB = self.numpyFeatB.to_bytes()
+
+	def time_bytes_subset_keys(self):
+		self.bytesFeat.subset(keys=self.keys)
+
+	def time_bytes_subset_chunks(self):
+		self.bytesFeat.subset(chunks=4)
+
+	def time_numpy_subset_keys(self):
+		self.numpyFeat.subset(keys=self.keys)
+
+	def time_numpy_subset_random(self):
+		self.numpyFeat.subset(nRandom=len(self.keys))
+
+	def time_bytes_sort_frame(self):
+		self.bytesFeat.sort(by="frame")
+
+	def time_numpy_sort_frame(self):
+		self.numpyFeat.sort(by="frame")
+
+	def time_bytes_add(self):
+		self.bytesFeatA + self.bytesFeatB
+
+	def time_numpy_add(self):
+		self.numpyFeatA + self.numpyFeatB
+
+class Dataset:
+	'''
+	Tuple archives and pad sequences.
+	'''
+	def setup(self,scale):
+		self.feat = synthetic.make_feat(scale,maxFrames=300)
+		self.ali = synthetic.make_ali(scale,maxFrames=300)
+		self.bytesFeat = self.feat.to_bytes()
+		self.bytesAli = self.ali.to_bytes()
+		self.sequences = list(self.feat.values())
+		self.packed = np.concatenate(self.sequences,axis=0)
+		self.lengths = [ len(v) for v in self.sequences ]
+		self.buffer = np.zeros([len(self.sequences),max(self.lengths),self.packed.shape[1]],dtype="float32")
+
+	def time_tuple_dataset(self):
+		tuple_dataset([self.feat,self.ali])
+
+	def time_tuple_dataset_frame_level(self):
+		tuple_dataset([self.feat,self.ali],frameLevel=True)
+
+	def time_frame_dataset(self):
+		frame_dataset([self.feat,self.ali])
+
+	def time_tuple_dataset_bytes(self):
+		tuple_dataset([self.bytesFeat,self.bytesAli])
+
+	def time_join_archives_bytes(self):
+		for one in join_archives([self.bytesFeat,self.bytesAli]):
+			pass
+
+	def time_pad_sequence(self):
+		pad_sequence(self.sequences)
+
+	def time_pad_sequence_buffer(self):
+		pad_sequence(self.sequences,out=self.buffer,mask=True)
+
+	def time_pad_packed(self):
+		pad_packed(self.packed,self.lengths,out=self.buffer,mask=True)
+
+class PostProcessing:
+	'''
+	Post-process NN outputs before decoding.
+	'''
+	def setup(self,scale):
+		self.prob = synthetic.make_prob(max(scale//10,1),dim=2000,maxFrames=300)
+		self.packed = np.concatenate(list(self.prob.values()),axis=0)
+		self.prior = np.log(np.full([2000,],1/2000,dtype="float32"))
+		self.post = ProbPostProcessor("log_softmax",prior=self.prior)
+
+	def time_log_softmax_prior(self):
+		log_softmax(self.packed) - self.prior
+
+	def time_fused_post_process(self):
+		self.post(self.packed)
+
+	def time_fused_post_process_archive(self):
+		self.post(self.prob)
+
+class Scoring:
+	'''
+	Compute edit distance of transcriptions.
+	'''
+	def setup(self,scale):
+		self.ref = synthetic.make_transcription(scale)
+		self.hyp = synthetic.perturb_transcription(self.ref,errorRate=0.2)
+
+	def time_edit_distance(self):
+		edit_distance(self.ref,self.hyp)
+
+class TableLoading:
+	'''
+	Load index tables and text tables from files.
+	'''
+	def setup(self,scale):
+		self.tempDir = tempfile.mkdtemp(prefix="exkaldi_benchmark_")
+		self.files = synthetic.write_dataset(self.tempDir,scale,maxFrames=300)
+
+	def teardown(self):
+		shutil.rmtree(self.tempDir,ignore_errors=True)
+
+	def time_load_index_table_ark(self):
+		load_index_table(self.files["feats.ark"])
+
+	def time_load_index_table_scp(self):
+		load_index_table(self.files["feats.scp"])
+
+	def time_load_transcription(self):
+		load_transcription(self.files["text"])
+
+	def time_load_list_table(self):
+		load_list_table(self.files["utt2spk"])
+
+ALL_SUITES = [ArchiveParsing,ArchiveOperations,Dataset,PostProcessing,Scoring,TableLoading]
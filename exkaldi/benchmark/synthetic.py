@@ -0,0 +1,244 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Generate deterministic synthetic Kaldi data. Kaldi is not necessary.'''
+
+import os
+import numpy as np
+
+from exkaldi.utils import declare
+from exkaldi.core.archive import NumpyFeature,NumpyProbability,NumpyAlignmentTrans,Transcription,ListTable
+
+def make_utt_ids(utts,speakers=10):
+	'''
+	Make utterance IDs which are prefixed with speaker IDs.
+
+	Args:
+		<utts>: the number of utterances.
+		<speakers>: the number of speakers.
+
+	Return:
+		a list of strings.
+	'''
+	declare.is_positive_int("utts",utts)
+	declare.is_positive_int("speakers",speakers)
+
+	return [ f"spk{i%speakers:04d}_utt{i:07d}" for i in range(utts) ]
+
+def make_lengths(utts,minFrames=100,maxFrames=1000,seed=0):
+	'''
+	Make the frame numbers of utterances.
+
+	Args:
+		<utts>: the number of utterances.
+		<minFrames>: the minimum frames.
+		<maxFrames>: the maximum frames.
+		<seed>: the random seed.
+
+	Return:
+		a NumPy array of int.
+	'''
+	declare.is_positive_int("utts",utts)
+	declare.is_positive_int("minFrames",minFrames)
+	declare.greater_equal("maxFrames",maxFrames,"minFrames",minFrames)
+
+	return np.random.RandomState(seed).randint(minFrames,maxFrames+1,size=utts)
+
+def make_feat(utts=100,dim=40,minFrames=100,maxFrames=1000,seed=0,name="feat"):
+	'''
+	Make a synthetic feature archive.
+
+	Args:
+		<utts>: the number of utterances.
+		<dim>: the feature dimension.
+		<minFrames>: the minimum frames of an utterance.
+		<maxFrames>: the maximum frames of an utterance.
+		<seed>: the random seed. The same arguments always generate the same data.
+		<name>: the name of archive.
+
+	Return:
+		an exkaldi NumpyFeature object.
+	'''
+	declare.is_positive_int("dim",dim)
+
+	lengths = make_lengths(utts,minFrames,maxFrames,seed)
+	rand = np.random.RandomState(seed+1)
+	data = {}
+	for utt,frames in zip(make_utt_ids(utts),lengths):
+		data[utt] = rand.standard_normal((frames,dim)).astype("float32")
+
+	return NumpyFeature(data,name=name)
+
+def make_prob(utts=100,dim=2000,minFrames=100,maxFrames=1000,seed=0,name="prob"):
+	'''
+	Make a synthetic log-probability archive. Each row is a normalized log distribution.
+
+	Args:
+		<utts>: the number of utterances.
+		<dim>: the number of classes.
+		<minFrames>: the minimum frames of an utterance.
+		<maxFrames>: the maximum frames of an utterance.
+		<seed>: the random seed.
+		<name>: the name of archive.
+
+	Return:
+		an exkaldi NumpyProbability object.
+	'''
+	declare.is_positive_int("dim",dim)
+
+	lengths = make_lengths(utts,minFrames,maxFrames,seed)
+	rand = np.random.RandomState(seed+2)
+	data = {}
+	for utt,frames in zip(make_utt_ids(utts),lengths):
+		logits = rand.standard_normal((frames,dim)).astype("float32")
+		logits -= logits.max(axis=1,keepdims=True)
+		data[utt] = logits - np.log(np.exp(logits).sum(axis=1,keepdims=True))
+
+	return NumpyProbability(data,name=name)
+
+def make_ali(utts=100,pdfs=2000,minFrames=100,maxFrames=1000,seed=0,name="ali"):
+	'''
+	Make a synthetic transition-ID alignment archive.
+	Its frames match the feature archive generated with the same <utts>,<minFrames>,<maxFrames> and <seed>.
+
+	Args:
+		<utts>: the number of utterances.
+		<pdfs>: the maximum ID.
+		<minFrames>: the minimum frames of an utterance.
+		<maxFrames>: the maximum frames of an utterance.
+		<seed>: the random seed.
+		<name>: the name of archive.
+
+	Return:
+		an exkaldi NumpyAlignmentTrans object.
+	'''
+	declare.is_positive_int("pdfs",pdfs)
+
+	lengths = make_lengths(utts,minFrames,maxFrames,seed)
+	rand = np.random.RandomState(seed+3)
+	data = {}
+	for utt,frames in zip(make_utt_ids(utts),lengths):
+		# Alignment IDs are repeated in segments like a real alignment.
+		segments = rand.randint(1,pdfs+1,size=frames//3+1)
+		data[utt] = np.repeat(segments,3)[0:frames].astype("int32")
+
+	return NumpyAlignmentTrans(data,name=name)
+
+def make_transcription(utts=100,vocabSize=1000,minWords=5,maxWords=30,seed=0,name="transcription"):
+	'''
+	Make a synthetic transcription.
+
+	Args:
+		<utts>: the number of utterances.
+		<vocabSize>: the size of vocabulary. Words are "w0","w1",... .
+		<minWords>: the minimum words of an utterance.
+		<maxWords>: the maximum words of an utterance.
+		<seed>: the random seed.
+		<name>: the name of transcription.
+
+	Return:
+		an exkaldi Transcription object.
+	'''
+	declare.is_positive_int("vocabSize",vocabSize)
+
+	lengths = make_lengths(utts,minWords,maxWords,seed)
+	rand = np.random.RandomState(seed+4)
+	result = Transcription(name=name)
+	for utt,words in zip(make_utt_ids(utts),lengths):
+		result[utt] = " ".join( f"w{i}" for i in rand.randint(0,vocabSize,size=words) )
+
+	return result
+
+def perturb_transcription(transcription,errorRate=0.1,vocabSize=1000,seed=0,name="hypothesis"):
+	'''
+	Make a hypothesis from a transcription by substituting,deleting and inserting words randomly.
+
+	Args:
+		<transcription>: an exkaldi Transcription object.
+		<errorRate>: the probability of an error at each word.
+		<vocabSize>: the size of vocabulary to sample new words.
+		<seed>: the random seed.
+		<name>: the name of new transcription.
+
+	Return:
+		an exkaldi Transcription object.
+	'''
+	declare.is_classes("transcription",transcription,Transcription)
+	declare.in_boundary("errorRate",errorRate,0.0,1.0)
+
+	rand = np.random.RandomState(seed+5)
+	result = Transcription(name=name)
+	for utt in sorted(transcription.keys()):
+		words = []
+		for word in transcription[utt].split():
+			if rand.random_sample() >= errorRate:
+				words.append(word)
+				continue
+			operation = rand.randint(3)
+			if operation == 0:
+				words.append( f"w{rand.randint(vocabSize)}" )
+			elif operation == 2:
+				words.extend( [word,f"w{rand.randint(vocabSize)}"] )
+		result[utt] = " ".join(words) if len(words) > 0 else "<unk>"
+
+	return result
+
+def make_utt2spk(utts=100,speakers=10,name="utt2spk"):
+	'''
+	Make a synthetic utt2spk table.
+
+	Args:
+		<utts>: the number of utterances.
+		<speakers>: the number of speakers.
+		<name>: the name of table.
+
+	Return:
+		an exkaldi ListTable object.
+	'''
+	result = ListTable(name=name)
+	for utt in make_utt_ids(utts,speakers):
+		result[utt] = utt.split("_")[0]
+
+	return result
+
+def write_dataset(outDir,utts=100,dim=40,pdfs=2000,minFrames=100,maxFrames=1000,seed=0):
+	'''
+	Write a synthetic dataset to a directory: feats.ark,feats.scp,ali.ark,text and utt2spk.
+
+	Args:
+		<outDir>: the output directory.
+		<utts>,<dim>,<pdfs>,<minFrames>,<maxFrames>,<seed>: the same as make_feat() and make_ali().
+
+	Return:
+		a dict of file names.
+	'''
+	declare.is_valid_string("outDir",outDir)
+	os.makedirs(outDir,exist_ok=True)
+
+	files = {}
+	feat = make_feat(utts,dim,minFrames,maxFrames,seed).to_bytes()
+	indexTable = feat.save(os.path.join(outDir,"feats.ark"),returnIndexTable=True)
+	files["feats.ark"] = os.path.join(outDir,"feats.ark")
+	files["feats.scp"] = indexTable.save(os.path.join(outDir,"feats.scp"))
+
+	ali = make_ali(utts,pdfs,minFrames,maxFrames,seed).to_bytes()
+	files["ali.ark"] = ali.save(os.path.join(outDir,"ali.ark"))
+
+	files["text"] = make_transcription(utts,seed=seed).save(os.path.join(outDir,"text"))
+	files["utt2spk"] = make_utt2spk(utts).save(os.path.join(outDir,"utt2spk"))
+
+	return files
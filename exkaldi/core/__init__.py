@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 
+import importlib
+
 from exkaldi.core.archive import ListTable
 from exkaldi.core.archive import ArkIndexTable
 from exkaldi.core.archive import Transcription
@@ -28,6 +30,8 @@ from exkaldi.core.load import load_prob
 from exkaldi.core.load import load_transcription
 from exkaldi.core.load import load_list_table
 from exkaldi.core.load import load_index_table
+from exkaldi.core.load import load_feat_async
+from exkaldi.core.load import load_prob_async
 
 from exkaldi.core.feature import compute_mfcc
 from exkaldi.core.feature import compute_fbank
@@ -43,6 +47,10 @@ from exkaldi.core.feature import add_delta
 from exkaldi.core.feature import splice_feature
 
 from exkaldi.core.common import tuple_dataset
+from exkaldi.core.common import frame_dataset
+from exkaldi.core.common import FrameDataset
+from exkaldi.core.common import join_archives
+from exkaldi.core.common import JoinedDataset
 from exkaldi.core.common import match_utterances
 from exkaldi.core.common import merge_archives
 from exkaldi.core.common import utt_to_spk
@@ -50,3 +58,12 @@ from exkaldi.core.common import spk_to_utt
 from exkaldi.core.common import spk2utt_to_utt2spk
 from exkaldi.core.common import utt2spk_to_spk2utt
 
+# exkaldi.core.shared needs multiprocessing.shared_memory (Python 3.8+),so import it when it is used firstly.
+_SHARED_NAMES = ("shared","SharedArchive","to_shared","attach_shared")
+
+def __getattr__(name):
+	if name in _SHARED_NAMES:
+		shared = importlib.import_module("exkaldi.core.shared")
+		return shared if name == "shared" else getattr(shared,name)
+	raise AttributeError(f"module 'exkaldi.core' has no attribute '{name}'")
+
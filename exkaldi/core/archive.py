@@ -29,6 +29,7 @@ from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,Unsupported
 from exkaldi.utils.utils import type_name,run_shell_command,make_dependent_dirs,list_files
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import memory
 
 ''' ListTable class group''' 
 
@@ -41,6 +42,12 @@ class ListTable(dict):
 		super().__init__(data)
 		declare.is_valid_string("name",name)
 		self.__name = name
+		memory.track(self)
+
+	def __setstate__(self,state):
+		# Objects copied or unpickled are also tracked.
+		self.__dict__.update(state)
+		memory.track(self)
 		
 	@property
 	def is_void(self):
@@ -69,6 +76,16 @@ class ListTable(dict):
 		'''
 		return dict(self)
 
+	@property
+	def nbytes(self):
+		'''
+		Estimate the memory size in bytes,including the hash table,keys and values.
+
+		Return:
+			an int value.
+		'''
+		return sys.getsizeof(self) + sum( sys.getsizeof(k) + sys.getsizeof(v) for k,v in self.items() )
+
 	def rename(self,name):
 		'''
 		Rename.
@@ -92,6 +109,7 @@ class ListTable(dict):
 			newData = dict(data) #try to check it
 			self.clear()
 			self.update(data)
+		memory.update(self)
 
 	def record(self,key,value):
 		'''
@@ -1124,6 +1142,10 @@ class WavSegment(ListTable):
 		'''
 		return list(self.keys())
 
+# Index information of one archive record. Build the class only one time since it is used in every record.
+IndexInfo = namedtuple("IndexInfo",["frames","startIndex","dataSize","filePath"])
+IndexInfo.__new__.__defaults__ = (None,)
+
 class ArkIndexTable(ListTable):
 	'''
 	For accelerate to find utterance and reduce memory cost of intermidiate operation.
@@ -1140,11 +1162,12 @@ class ArkIndexTable(ListTable):
 
 	def __setitem__(self,key,value):
 		'''Overlap this method to avoid the wrong assignment.'''
-		if isinstance(value,(list,tuple)):
+		if isinstance(value,IndexInfo):
+			# IndexInfo objects are generated by exkaldi,so trust them.
+			super().__setitem__(key,value)
+		elif isinstance(value,(list,tuple)):
 			assert len(value) in [3,4],f"Expected (frames,start index,data size[,file path]) but {value} does not match."
 			self.record(key,*value)
-		elif isinstance(value,IndexInfo):
-			super().__setitem__(key,value)
 		else:
 			raise UnsupportedType(f"The value of index table shou be list, tuple or IndexInfo object but got: {type_name(value)}.")
 
@@ -1164,7 +1187,7 @@ class ArkIndexTable(ListTable):
 
 		super().update(other)
 
-	def record(self,key,frames=None,startIndex=None,dataSize=None,filePath=None):
+	def record(self,key,frames=None,startIndex=None,dataSize=None,filePath=None,trusted=False):
 		'''
 		Add or modify a record.
 		
@@ -1174,7 +1197,12 @@ class ArkIndexTable(ListTable):
 			<startIndex>: an int value. The start index of an archive record. Including the size of utterance ID.
 			<dataSize>: an int value. The total size of an archive record. Including the size of utterance ID.
 			<filePath>: a string. The total size of an archive record.
+			<trusted>: If True,do not check these values. Only use it for the data generated by exkaldi or Kaldi.
 		'''
+		if trusted and not self.key_existed(key):
+			super().__setitem__(key,IndexInfo(frames,startIndex,dataSize,filePath))
+			return
+
 		declare.is_valid_string("key",key)
 
 		if self.key_existed(key):
@@ -1202,6 +1230,35 @@ class ArkIndexTable(ListTable):
 
 		super().__setitem__(key,value)
 
+	def batch_record(self,keys,frames,startIndexes,dataSizes,filePaths=None,trusted=False):
+		'''
+		Add or modify multiple records. The values are checked column by column at one time,
+		which is much faster than calling .record() one by one.
+
+		Args:
+			<keys>: a list of utterance IDs.
+			<frames>: a list or array of int values.
+			<startIndexes>: a list or array of int values.
+			<dataSizes>: a list or array of int values.
+			<filePaths>: None,a string or a list of strings.
+			<trusted>: If True,do not check these values. Only use it for the data generated by exkaldi or Kaldi.
+		'''
+		nums = len(keys)
+		if filePaths is None or isinstance(filePaths,str):
+			filePaths = [ filePaths for i in range(nums) ]
+
+		if not trusted:
+			declare.members_are_valid_strings("keys",keys)
+			declare.members_are_positive_ints("frames",frames)
+			declare.members_are_non_negative_ints("startIndexes",startIndexes)
+			declare.members_are_positive_ints("dataSizes",dataSizes)
+			for name,column in zip(["frames","startIndexes","dataSizes","filePaths"],[frames,startIndexes,dataSizes,filePaths]):
+				declare.equal("the number of keys",nums,f"the number of {name}",len(column))
+			declare.members_are_files("filePaths",[ f for f in filePaths if f is not None ])
+
+		for key,f,s,d,p in zip(keys,frames,startIndexes,dataSizes,filePaths):
+			super().__setitem__(key,IndexInfo(int(f),int(s),int(d),p))
+
 	@property
 	def spec(self):
 		'''
@@ -1210,9 +1267,24 @@ class ArkIndexTable(ListTable):
 		Return:
 			a namedtuple class.
 		'''
-		spec = namedtuple("IndexInfo",["frames","startIndex","dataSize","filePath"])
-		spec.__new__.__defaults__ = (None,)
-		return spec
+		return IndexInfo
+
+	@property
+	def nbytes(self):
+		'''
+		Estimate the memory size in bytes,including the index tuples and their fields.
+		File paths shared by many records are counted once.
+
+		Return:
+			an int value.
+		'''
+		size = super().nbytes
+		filePaths = {}
+		for info in self.values():
+			size += sys.getsizeof(info.frames) + sys.getsizeof(info.startIndex) + sys.getsizeof(info.dataSize)
+			if info.filePath is not None:
+				filePaths[id(info.filePath)] = sys.getsizeof(info.filePath)
+		return size + sum(filePaths.values())
 
 	def sort(self,by="utt",reverse=False):
 		'''
@@ -1320,12 +1392,14 @@ class ArkIndexTable(ListTable):
 
 		return super().save(fileName,chunks,concat)
 	
-	def fetch(self,arkType="mat",keys=None):
+	def fetch(self,arkType="mat",keys=None,trusted=False):
 		"""
 		Fetch records from file.
 
 		Args:
 			<keys>: utterance ID or a list of utterance IDs.
+			<trusted>: If True,only check the utterance ID of each record instead of checking the format of whole data.
+					   Use it when the index table was generated by exkaldi from Kaldi archive files.
 			<arkType>: If None,return BytesMatrix or BytesVector object.
 					   If "feat",return BytesFeature object.
 					   If "cmvn",return BytesFeature object.
@@ -1385,6 +1459,8 @@ class ArkIndexTable(ListTable):
 						
 					fr.seek(indexInfo.startIndex)
 					buf = fr.read(indexInfo.dataSize)
+					if not buf.startswith(k.encode()+b" "):
+						raise WrongDataFormat(f"The index information of {k} does not match the archive file: {indexInfo.filePath}.")
 					newTable[k] = newTable.spec( indexInfo.frames,startIndex,indexInfo.dataSize,None )
 					startIndex += indexInfo.dataSize
 					datas.append(buf)
@@ -1414,7 +1490,8 @@ class ArkIndexTable(ListTable):
 			else:
 				result = BytesFmllrMatrix( b"".join(datas),name=self.name,indexTable=newTable )
 			
-			result.check_format()
+			if not trusted:
+				result.check_format()
 
 			return result
 
@@ -1450,6 +1527,13 @@ class BytesArchive:
 		else:
 			declare.is_valid_string("name",name)
 			self.__name = name
+
+		memory.track(self)
+
+	def __setstate__(self,state):
+		# Objects copied or unpickled are also tracked.
+		self.__dict__.update(state)
+		memory.track(self)
 	
 	@property
 	def data(self):
@@ -1457,6 +1541,16 @@ class BytesArchive:
 		Get the inner data.
 		'''
 		return self.__data
+
+	@property
+	def nbytes(self):
+		'''
+		Get the memory size in bytes of the data.
+
+		Return:
+			an int value.
+		'''
+		return 0 if self.__data is None else len(self.__data)
 	
 	def reset_data(self,data=None):
 		'''
@@ -1469,6 +1563,7 @@ class BytesArchive:
 			declare.is_classes("data",data,bytes)
 		del self.__data
 		self.__data = data
+		memory.update(self)
 
 	@property
 	def is_void(self):
@@ -1521,7 +1616,7 @@ class BytesMatrix(BytesArchive):
 			needIndexTableFlag = False
 		
 		elif isinstance(data ,ArkIndexTable):
-			data = data.fetch(arkType="mat",name=name)
+			data = data.fetch(arkType="mat")
 			self.__dataIndex = data.indexTable
 			data = data.data
 			needIndexTableFlag = False
@@ -1540,6 +1635,9 @@ class BytesMatrix(BytesArchive):
 			else:
 				declare.is_classes("indexTable",indexTable,ArkIndexTable)
 				self.__verify_index_table(indexTable)
+
+		# Measure it again with the index table.
+		memory.update(self)
 	
 	def __verify_index_table(self,indexTable):
 		'''
@@ -1633,6 +1731,21 @@ class BytesMatrix(BytesArchive):
 		# Return a dict object.
 		return copy.deepcopy(self.__dataIndex)
 
+	@property
+	def nbytes(self):
+		'''
+		Estimate the memory size in bytes,including the data and the index table.
+
+		Return:
+			an int value.
+		'''
+		try:
+			indexTable = self.__dataIndex
+		except AttributeError:
+			# It is void or is being initialized.
+			return super().nbytes
+		return super().nbytes + indexTable.nbytes
+
 	@property
 	def dtype(self):
 		'''
@@ -2845,7 +2958,7 @@ class BytesVector(BytesArchive):
 			needIndexTableFlag = False
 		
 		elif isinstance(data ,ArkIndexTable):
-			data = data.fetch(arkType="vec",name=name)
+			data = data.fetch(arkType="vec")
 			self.__dataIndex = data.indexTable
 			data = data.data
 			needIndexTableFlag = False
@@ -2861,6 +2974,9 @@ class BytesVector(BytesArchive):
 			else:
 				declare.is_classes("indexTable",indexTable,ArkIndexTable)
 				self.__verify_index_table(indexTable)
+
+		# Measure it again with the index table.
+		memory.update(self)
 	
 	def __verify_index_table(self,indexTable):
 		'''
@@ -2945,6 +3061,21 @@ class BytesVector(BytesArchive):
 		# Return deepcopied dict object.
 		return copy.deepcopy(self.__dataIndex)
 
+	@property
+	def nbytes(self):
+		'''
+		Estimate the memory size in bytes,including the data and the index table.
+
+		Return:
+			an int value.
+		'''
+		try:
+			indexTable = self.__dataIndex
+		except AttributeError:
+			# It is void or is being initialized.
+			return super().nbytes
+		return super().nbytes + indexTable.nbytes
+
 	def keys(self):
 		'''
 		Get all keys.
@@ -3544,6 +3675,13 @@ class NumpyArchive:
 			declare.is_valid_string("name",name)
 			self.__name = name	
 
+		memory.track(self)
+
+	def __setstate__(self,state):
+		# Objects copied or unpickled are also tracked.
+		self.__dict__.update(state)
+		memory.track(self)
+
 	@property
 	def is_void(self):
 		'''
@@ -3567,6 +3705,19 @@ class NumpyArchive:
 		'''
 		return self.__data.copy()
 
+	@property
+	def nbytes(self):
+		'''
+		Estimate the memory size in bytes,including the arrays and the dict holding them.
+		Arrays which are views of other buffers are counted by their own sizes.
+
+		Return:
+			an int value.
+		'''
+		if self.__data is None:
+			return 0
+		return sys.getsizeof(self.__data) + sum( sys.getsizeof(k) + v.nbytes for k,v in self.__data.items() )
+
 	def reset_data(self,data=None):
 		'''
 		Reset the data.
@@ -3578,6 +3729,7 @@ class NumpyArchive:
 			declare.is_classes("data",data,dict)
 		del self.__data
 		self.__data = data
+		memory.update(self)
 
 	@property
 	def name(self):
@@ -3639,9 +3791,9 @@ class NumpyMatrix(NumpyArchive):
 		declare.belong_classes("data",data,[BytesMatrix,NumpyMatrix,ArkIndexTable,dict])
 
 		if isinstance(data,BytesMatrix):
-			data = data.to_Numpy().data
+			data = data.to_numpy().data
 		elif isinstance(data,ArkIndexTable):
-			data = data.fetch(arkType="mat").to_Numpy().data
+			data = data.fetch(arkType="mat").to_numpy().data
 		elif isinstance(data,NumpyMatrix):
 			data = data.data
 
@@ -3697,8 +3849,9 @@ class NumpyMatrix(NumpyArchive):
 			newData = copy.deepcopy(self.data)
 		else:
 			newData = {}
-			for key in self.keys():
-				newData[key] = np.array(self.data[key],dtype=dtype)
+			# .data returns a copy of the dict,so do not call it in the loop.
+			for key,value in self.items():
+				newData[key] = np.array(value,dtype=dtype)
 		
 		return NumpyMatrix(newData,name=self.name)
 	
@@ -3714,11 +3867,11 @@ class NumpyMatrix(NumpyArchive):
 			return False
 
 		_dim = 'unknown'
-		for utt in self.keys():
+		for utt,matrix in self.items():
 
 			declare.is_valid_string("key",utt)
-			declare.is_classes("value",self.data[utt],np.ndarray)
-			matrixShape = self.data[utt].shape
+			declare.is_classes("value",matrix,np.ndarray)
+			matrixShape = matrix.shape
 
 			if len(matrixShape) > 2:
 				raise WrongDataFormat(f'Expected the shape of matrix is like [ frame length,dimension ] but got {matrixShape}.')
@@ -3827,7 +3980,7 @@ class NumpyMatrix(NumpyArchive):
 			other = other.to_numpy()
 		elif isinstance(other,ArkIndexTable):
 			keys = [ utt for utt in other.keys() if utt not in self.keys() ]
-			other = other.fecth(arkType="mat",keys=keys).to_numpy()
+			other = other.fetch(arkType="mat",keys=keys).to_numpy()
 		
 		newName = f"plus({self.name},{other.name})"
 		if self.is_void:
@@ -3842,7 +3995,7 @@ class NumpyMatrix(NumpyArchive):
 			raise WrongOperation(f"Data dimensions does not match: {self.dim}!={other.dim}.")
 
 		temp = self.data.copy()
-		for utt in other.keys:
+		for utt in other.keys():
 			try:
 				temp[utt]
 			except KeyError:
@@ -3923,7 +4076,7 @@ class NumpyMatrix(NumpyArchive):
 
 		elif nRandom > 0:
 			declare.is_positive_int("nRandom",nRandom)
-			newDict = dict(random.choices(self.items,k=nRandom))
+			newDict = dict(random.choices(list(self.items()),k=nRandom))
 			newName = f"subset({self.name},tail {nRandom})"
 			return NumpyMatrix(newDict,newName)
 
@@ -4373,7 +4526,7 @@ class NumpyFeature(NumpyMatrix):
 			dim = self.dim
 			
 			for index,other in enumerate(others,start=1):
-				if utt in other.keys:
+				if utt in other.data:
 					if other.data[utt].shape[0] != frames:
 						raise WrongDataFormat(f"Data frames {frames}!={other[utt].shape[0]} at utterance ID {utt}.")
 					newMat.append(other.data[utt])
@@ -4822,9 +4975,9 @@ class NumpyVector(NumpyMatrix):
 		declare.belong_classes("data",data,[BytesVector,NumpyVector,ArkIndexTable,dict])
 
 		if isinstance(data,BytesVector):
-			data = data.to_Numpy().data
+			data = data.to_numpy().data
 		elif isinstance(data,ArkIndexTable):
-			data = data.fetch(arkType="vec").to_Numpy().data
+			data = data.fetch(arkType="vec").to_numpy().data
 		elif isinstance(data,NumpyMatrix):
 			data = data.data
 
@@ -4876,8 +5029,8 @@ class NumpyVector(NumpyMatrix):
 			newData = copy.deepcopy(self.data)
 		else:
 			newData = {}
-			for utt in self.keys():
-				newData[utt] = np.array(self.data[utt],dtype=dtype)
+			for utt,value in self.items():
+				newData[utt] = np.array(value,dtype=dtype)
 		
 		return NumpyVector(data=newData,name=self.name)
 
@@ -4891,10 +5044,9 @@ class NumpyVector(NumpyMatrix):
 		'''
 		if not self.is_void:
 
-			for key in self.keys():
+			for key,vector in self.items():
 				declare.is_valid_string("key",key)
-				declare.is_classes("value",self.data[key],np.ndarray)
-				vector = self.data[key]
+				declare.is_classes("value",vector,np.ndarray)
 				assert len(vector.shape) == 1,f"Vector should be 1-dim data but got {vector.shape}."
 				assert vector.dtype in ["int16","int32","int64"],f"Only support int 16/32/64 data format but got {vector.dtype}."
 
@@ -4921,7 +5073,7 @@ class NumpyVector(NumpyMatrix):
 			oneRecord = []
 			oneRecord.append( ( utt + ' ' + '\0B' + '\4' ).encode() )
 			oneRecord.append( struct.pack(np.dtype('int32').char,vector.shape[0]) ) 
-			for f,v in vector:
+			for v in vector:
 				oneRecord.append( '\4'.encode() + struct.pack(np.dtype('int32').char,v) )
 			oneRecord = b"".join(oneRecord)
 			newData.append( oneRecord )
@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.core.archive'''
+
+import pytest
+from exkaldi.version import WrongDataFormat
+from exkaldi.core.archive import ArkIndexTable,BytesMatrix
+from exkaldi.core.load import load_index_table
+from exkaldi.benchmark import synthetic
+
+def test_index_table_record(tmpdir):
+
+  arkFile = str(tmpdir.join("feats.ark"))
+  with open(arkFile,"wb") as fw:
+    fw.write(b"")
+
+  table = ArkIndexTable()
+  # Values are not checked if it is trusted.
+  table.record("utt0",0,-1,0,"no_such_file.ark",trusted=True)
+  assert table["utt0"] == table.spec(0,-1,0,"no_such_file.ark")
+  with pytest.raises(AssertionError):
+    ArkIndexTable().record("utt0",0,-1,0)
+  # A trusted record can still modify an existing record with checks.
+  table.record("utt0",frames=5,startIndex=0,dataSize=10,filePath=arkFile,trusted=True)
+  assert table["utt0"] == table.spec(5,0,10,arkFile)
+
+def test_index_table_batch_record(tmpdir):
+
+  arkFile = str(tmpdir.join("feats.ark"))
+  with open(arkFile,"wb") as fw:
+    fw.write(b"")
+
+  keys = [ f"utt{i}" for i in range(5) ]
+  frames = [ 10+i for i in range(5) ]
+  starts = [ 100*i for i in range(5) ]
+  sizes = [ 100 for i in range(5) ]
+
+  expected = ArkIndexTable()
+  for i,key in enumerate(keys):
+    expected.record(key,frames[i],starts[i],sizes[i],arkFile)
+
+  for trusted in [False,True]:
+    table = ArkIndexTable()
+    table.batch_record(keys,frames,starts,sizes,arkFile,trusted=trusted)
+    assert list(table.items()) == list(expected.items())
+
+  table = ArkIndexTable()
+  table.batch_record(keys,frames,starts,sizes,[arkFile,None,arkFile,None,arkFile])
+  assert table["utt1"].filePath is None and table["utt2"].filePath == arkFile
+
+  with pytest.raises(AssertionError):
+    ArkIndexTable().batch_record(keys,[0,]+frames[1:],starts,sizes)
+  with pytest.raises(AssertionError):
+    ArkIndexTable().batch_record(keys,frames[1:],starts[1:],sizes[1:])
+
+def test_index_table_fetch_trusted(tmpdir,monkeypatch):
+
+  feat = synthetic.make_feat(utts=5,dim=4,minFrames=5,maxFrames=10).to_bytes()
+  arkFile = feat.save(str(tmpdir.join("feats.ark")))
+  table = load_index_table(arkFile)
+
+  expected = table.fetch(arkType="feat")
+  assert expected.data == feat.data
+
+  def broken(self):
+    raise WrongDataFormat("The whole data was checked.")
+  monkeypatch.setattr(BytesMatrix,"check_format",broken)
+
+  # The format of data is only checked if it is not trusted.
+  with pytest.raises(WrongDataFormat):
+    table.fetch(arkType="feat")
+  assert table.fetch(arkType="feat",trusted=True).data == expected.data
+
+  # But the utterance ID of each record is always checked.
+  keys = table.utts
+  table[keys[0]] = table[keys[0]]._replace(startIndex=table[keys[1]].startIndex)
+  with pytest.raises(WrongDataFormat):
+    table.fetch(arkType="feat",keys=keys[0],trusted=True)
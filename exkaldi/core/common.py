@@ -16,14 +16,17 @@
 # limitations under the License.
 
 import os
+import asyncio
 import numpy as np
 from collections import namedtuple
 
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import UnsupportedType,WrongOperation,KaldiProcessError,WrongDataFormat
-from exkaldi.utils.utils import run_shell_command,run_shell_command_parallel,type_name,list_files,make_dependent_dirs
+from exkaldi.utils.utils import run_shell_command,run_shell_command_parallel,run_shell_command_async,type_name,list_files,make_dependent_dirs,is_list_table
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import cache
+from exkaldi.utils import memory
 from exkaldi.core.archive import BytesArchive,BytesMatrix,BytesVector,BytesFeature,BytesCMVNStatistics,BytesFmllrMatrix,BytesAlignmentTrans
 from exkaldi.core.archive import NumpyMatrix,NumpyVector
 from exkaldi.core.archive import ListTable
@@ -39,6 +42,7 @@ def tuple_dataset(archives,frameLevel=False):
 
 	Return:
 		List of tupled data.
+		For frame level training with a large corpus,frame_dataset() costs much less memory.
 	'''
 	declare.is_classes("archives",archives,(tuple,list))
 	assert len(archives) > 1,"<archives> should has multiple items."
@@ -122,6 +126,378 @@ def tuple_dataset(archives,frameLevel=False):
 	
 	return result
 
+class FrameDataset:
+	'''
+	A frame level dataset in columnar format.
+	Every field is one packed NumPy array whose rows are the frames of all utterances,
+	and an offset table records where each utterance starts.
+	So its memory is proportional to the data,not to the number of frames.
+	'''
+	def __init__(self,fields,utts,offsets):
+		'''
+		Do not create it directly. Use frame_dataset() instead.
+
+		Args:
+			<fields>: a dict of field name and packed array.
+			<utts>: a list of utterance IDs.
+			<offsets>: an int64 array. The frames of the i-th utterance are [offsets[i],offsets[i+1]).
+		'''
+		self.__fields = fields
+		self.__utts = utts
+		self.__offsets = offsets
+		self.__uttIndex = dict( (utt,i) for i,utt in enumerate(utts) )
+		memory.track(self)
+
+	def __len__(self):
+		return int(self.__offsets[-1])
+
+	@property
+	def fields(self):
+		'''
+		The names of fields.
+		'''
+		return list(self.__fields.keys())
+
+	@property
+	def utts(self):
+		'''
+		The utterance IDs.
+		'''
+		return self.__utts[:]
+
+	@property
+	def offsets(self):
+		'''
+		The offset table. The frames of the i-th utterance are [offsets[i],offsets[i+1]).
+		'''
+		return self.__offsets
+
+	@property
+	def nbytes(self):
+		'''
+		The memory size of arrays in bytes.
+		'''
+		return sum( v.nbytes for v in self.__fields.values() ) + self.__offsets.nbytes
+
+	def __getitem__(self,name):
+		'''
+		Get the packed array of a field.
+		'''
+		return self.__fields[name]
+
+	def utterance(self,utt):
+		'''
+		Get the data of an utterance.
+
+		Args:
+			<utt>: utterance ID.
+
+		Return:
+			a dict of field name and array view.
+		'''
+		i = self.__uttIndex[utt]
+		start,end = self.__offsets[i],self.__offsets[i+1]
+		return dict( (name,value[start:end]) for name,value in self.__fields.items() )
+
+	def locate(self,indexes):
+		'''
+		Find the utterances and frame IDs of frames.
+
+		Args:
+			<indexes>: an int value or a sequence of int values.
+
+		Return:
+			a tuple of two int arrays: (utterance indexes,frame IDs in utterance).
+		'''
+		indexes = np.asarray(indexes,dtype=np.int64)
+		uttIndexes = np.searchsorted(self.__offsets,indexes,side="right") - 1
+		return uttIndexes,indexes-self.__offsets[uttIndexes]
+
+	def gather(self,indexes):
+		'''
+		Get a batch of frames.
+
+		Args:
+			<indexes>: a sequence of int values.
+
+		Return:
+			a dict of field name and array. The first dimension of arrays is the batch size.
+		'''
+		indexes = np.asarray(indexes,dtype=np.int64)
+		return dict( (name,value[indexes]) for name,value in self.__fields.items() )
+
+	def sample(self,batchSize,randomState=None):
+		'''
+		Sample a batch of frames randomly.
+
+		Args:
+			<batchSize>: an int value.
+			<randomState>: None or a NumPy RandomState object.
+
+		Return:
+			a dict of field name and array.
+		'''
+		declare.is_positive_int("batchSize",batchSize)
+		if randomState is None:
+			randomState = np.random
+		return self.gather( randomState.randint(0,len(self),size=batchSize) )
+
+	def batches(self,batchSize,shuffle=True,dropLast=False,randomState=None):
+		'''
+		Iterate all frames batch by batch once.
+
+		Args:
+			<batchSize>: an int value.
+			<shuffle>: If True,shuffle frames.
+			<dropLast>: If True,drop the last batch if it is smaller than <batchSize>.
+			<randomState>: None or a NumPy RandomState object.
+
+		Return:
+			a generator of dicts of field name and array.
+		'''
+		declare.is_positive_int("batchSize",batchSize)
+		declare.is_bool("shuffle",shuffle)
+		declare.is_bool("dropLast",dropLast)
+		if randomState is None:
+			randomState = np.random
+
+		N = len(self)
+		order = randomState.permutation(N) if shuffle else np.arange(N)
+		end = N - N%batchSize if dropLast else N
+		for i in range(0,end,batchSize):
+			yield self.gather(order[i:i+batchSize])
+
+def frame_dataset(archives):
+	'''
+	Tuple feature or alignment archives in frame level,in columnar format.
+	Unlike tuple_dataset(archives,frameLevel=True),it does not create any Python object for each frame.
+
+	Args:
+		<archives>: exkaldi feature or alignment objects. Their names are used as field names and should be different.
+
+	Return:
+		a FrameDataset object.
+	'''
+	declare.is_classes("archives",archives,(tuple,list))
+	assert len(archives) > 0,"<archives> should not be void."
+
+	return join_archives(archives,checkFrames=True).pack()
+
+class JoinedDataset:
+	'''
+	An utterance level join view of several archives.
+	It only holds the archives and the positions of shared utterances,so no data is copied.
+	Arrays of NumPy archives are returned directly,and arrays of bytes archives are views of their bytes data,which are read-only.
+	'''
+	def __init__(self,names,utts,lengths,fetchers):
+		'''
+		Do not create it directly. Use join_archives() instead.
+
+		Args:
+			<names>: a list of field names.
+			<utts>: a sorted NumPy array of utterance IDs.
+			<lengths>: an int64 array with a shape of (fields,utterances).
+			<fetchers>: a list of functions. Each of them takes the index of an utterance and returns the array of a field.
+		'''
+		self.__names = names
+		self.__utts = utts
+		self.__lengths = lengths
+		self.__fetchers = fetchers
+		# The namedtuple is made when it is used firstly,so .pack() works with any names.
+		self.__templet = None
+
+	def __len__(self):
+		return len(self.__utts)
+
+	@property
+	def fields(self):
+		'''
+		The names of fields.
+		'''
+		return self.__names[:]
+
+	@property
+	def utts(self):
+		'''
+		The utterance IDs sorted by key.
+		'''
+		return self.__utts.tolist()
+
+	@property
+	def lengths(self):
+		'''
+		The frames of utterances. An int64 array with a shape of (fields,utterances).
+		'''
+		return self.__lengths
+
+	def mismatched(self):
+		'''
+		Find the utterances whose frames are different among fields.
+
+		Return:
+			an int64 array of utterance indexes.
+		'''
+		return np.flatnonzero( np.any(self.__lengths != self.__lengths[0],axis=0) )
+
+	def index(self,utt):
+		'''
+		Get the index of an utterance.
+
+		Args:
+			<utt>: utterance ID.
+
+		Return:
+			an int value.
+		'''
+		i = int(np.searchsorted(self.__utts,utt))
+		if i == len(self.__utts) or self.__utts[i] != utt:
+			raise WrongOperation(f"No such utterance: {utt}.")
+		return i
+
+	def __getitem__(self,index):
+		'''
+		Get the data of an utterance.
+
+		Args:
+			<index>: an int index or an utterance ID.
+
+		Return:
+			a namedtuple: (key,field1,field2,...).
+		'''
+		if self.__templet is None:
+			for name in self.__names:
+				if not name.isidentifier():
+					raise WrongOperation(f"Names of archives are used as field names so they are expected Python valid identifiers but got: {name}. Please rename them.")
+			self.__templet = namedtuple("JoinedData",["key",]+self.__names)
+
+		if isinstance(index,str):
+			index = self.index(index)
+		elif index < 0:
+			index += len(self.__utts)
+		return self.__templet( str(self.__utts[index]),*[ fetch(index) for fetch in self.__fetchers ] )
+
+	def __iter__(self):
+		for i in range(len(self.__utts)):
+			yield self[i]
+
+	def pack(self):
+		'''
+		Pack all frames into a FrameDataset. Every field is copied only once.
+
+		Return:
+			a FrameDataset object.
+		'''
+		bad = self.mismatched()
+		if len(bad) > 0:
+			utt = self.__utts[bad[0]]
+			raise WrongOperation(f"Cannot tuple data with different frame length to frame level: {utt} {self.__lengths[:,bad[0]].tolist()}.")
+
+		offsets = np.zeros([len(self.__utts)+1,],dtype=np.int64)
+		np.cumsum(self.__lengths[0],out=offsets[1:])
+
+		fields = {}
+		for name,fetch in zip(self.__names,self.__fetchers):
+			fields[name] = np.concatenate([ fetch(i) for i in range(len(self.__utts)) ],axis=0)
+
+		return FrameDataset(fields,self.utts,offsets)
+
+def _bytes_matrix_view(buf,utt,start):
+	'''
+	Make an array view of a record of Kaldi binary matrix archive: "utt \0BFM \4rows\4cols" + data.
+	'''
+	offset = start + len(utt.encode()) + 1
+	dataType = buf[offset+2:offset+5]
+	if dataType == b"FM ":
+		dtype = np.float32
+	elif dataType == b"DM ":
+		dtype = np.float64
+	elif dataType == b"CM ":
+		raise UnsupportedType("This is compressed binary data. Use decompress_feat() function to decompress it firstly.")
+	else:
+		raise WrongDataFormat(f"Expected data type FM(float32),DM(float64) but got {dataType} at utterance {utt}.")
+	s1,rows,s2,cols = np.frombuffer(buf,dtype="int8,int32,int8,int32",count=1,offset=offset+5)[0]
+	return np.frombuffer(buf,dtype=dtype,count=int(rows)*int(cols),offset=offset+15).reshape(int(rows),int(cols))
+
+def _bytes_vector_view(buf,utt,start,frames):
+	'''
+	Make an array view of a record of Kaldi binary int vector archive: "utt \0B\4frames" + (\4 value) * frames.
+	'''
+	offset = start + len(utt.encode()) + 8
+	return np.frombuffer(buf,dtype=[("size","int8"),("value","int32")],count=frames,offset=offset)["value"]
+
+def _archive_column(ark):
+	'''
+	Get the keys,frames and a function to fetch the array of an archive.
+	'''
+	if isinstance(ark,(BytesMatrix,BytesVector)):
+		indexTable = ark.indexTable
+		keys = np.array(list(indexTable.keys()))
+		starts = np.array([ info.startIndex for info in indexTable.values() ],dtype=np.int64)
+		lengths = np.array([ info.frames for info in indexTable.values() ],dtype=np.int64)
+		buf = ark.data
+		if isinstance(ark,BytesMatrix):
+			fetch = lambda i: _bytes_matrix_view(buf,str(keys[i]),int(starts[i]))
+		else:
+			fetch = lambda i: _bytes_vector_view(buf,str(keys[i]),int(starts[i]),int(lengths[i]))
+	else:
+		# Read the data only once because the "data" attribute returns a new dict every time.
+		data = ark.data
+		keys = np.array(list(data.keys()))
+		values = list(data.values())
+		lengths = np.array([ len(v) for v in values ],dtype=np.int64)
+		fetch = lambda i: values[i]
+
+	return keys,lengths,fetch
+
+def join_archives(archives,checkFrames=True):
+	'''
+	Join feature or alignment archives in utterance level without copying their data.
+	Utterances are matched by a merge-join on sorted keys,and frames are checked with vectorized operations.
+	Unlike tuple_dataset(),bytes archives are not transformed to NumPy format.
+
+	Args:
+		<archives>: exkaldi feature or alignment objects. Their names are used as field names and should be different.
+		<checkFrames>: If True,raise an error if the frames of an utterance are different among archives.
+
+	Return:
+		a JoinedDataset object.
+	'''
+	declare.is_classes("archives",archives,(tuple,list))
+	assert len(archives) > 0,"<archives> should not be void."
+	declare.is_bool("checkFrames",checkFrames)
+
+	names = []
+	columns = []
+	for ark in archives:
+		declare.belong_classes("archives",ark,(BytesMatrix,BytesVector,NumpyMatrix,NumpyVector))
+		if ark.name in names:
+			raise WrongOperation(f"Archives should have different names but got duplicated: {ark.name}. Please rename them.")
+		names.append(ark.name)
+		columns.append( _archive_column(ark) )
+
+	# Merge-join on sorted keys.
+	orders = [ np.argsort(keys,kind="stable") for keys,_,_ in columns ]
+	shareKeys = columns[0][0][orders[0]]
+	for (keys,_,_),order in zip(columns[1:],orders[1:]):
+		shareKeys = np.intersect1d(shareKeys,keys[order],assume_unique=True)
+	if len(shareKeys) == 0:
+		raise WrongOperation("Utterance IDs completely missed. We don't think it is reasonable. Please check these archives.")
+
+	lengths = np.zeros([len(columns),len(shareKeys)],dtype=np.int64)
+	fetchers = []
+	for i,((keys,frames,fetch),order) in enumerate(zip(columns,orders)):
+		positions = order[ np.searchsorted(keys[order],shareKeys) ]
+		lengths[i] = frames[positions]
+		fetchers.append( lambda index,fetch=fetch,positions=positions: fetch(positions[index]) )
+
+	dataset = JoinedDataset(names,shareKeys,lengths,fetchers)
+	if checkFrames:
+		bad = dataset.mismatched()
+		if len(bad) > 0:
+			raise WrongOperation(f"{len(bad)} utterances have different frames among archives,such as {shareKeys[bad[0]]}: {lengths[:,bad[0]].tolist()}.")
+
+	return dataset
+
 def match_utterances(archives):
 	'''
 	Pick up utterances whose ID has existed in all provided archives.
@@ -227,31 +603,13 @@ def check_multiple_resources(*resources,outFile=None):
 
 	return resources
 
-def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=ExkaldiInfo.timeout,generateArchive=None,archiveNames=None):
+def __parse_command_pattern(resources,cmdPattern,generateArchive,archiveNames):
 	'''
-	Map resources to command pattern and run this command parallelly.
-
-	Args:
-		<resources>: a dict whose keys are the name of resource and values are lists of resources objects.
-					For example: {"feat": [BytesFeature01,BytesFeature02,... ],"outFile":{"newFeat01.ark","newFeat02.ark",...} }.
-					The "outFile" resource is necessary.
-					When there is only one process to run,"outFile" can be "-" which means the standard output stream.
+	Check the command pattern and pop the output files from resources.
 
-		<cmdPattern>: a string needed to map the resources.
-					For example: "copy-feat {feat} ark:{outFile}".
-	
 	Return:
-		a list of triples: (return code,error info,output file or buffer)
+		the count and prefix information of each resource,the output files and the archive names.
 	'''
-	declare.kaldi_existed()
-	declare.is_classes("resources",resources,dict)
-	declare.is_classes("cmdPattern",cmdPattern,str)
-	assert "outFile" in resources.keys(),"<outFile> key and value is necessary in recources."
-
-	declare.members_are_classes("the values of resources",resources.values(),[list,tuple])
-	if generateArchive is not None:
-		analyzeResult = True #forcely analyze the result
-
 	# check the format of cmomand pattern
 	nameIndexs = [ i for i,c in enumerate(cmdPattern) if c == "{" or c == "}" ]
 	assert len(nameIndexs)%2 == 0,f"The numbers of braces do not match in command pattern: '{cmdPattern}'. "
@@ -289,114 +647,185 @@ def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=
 		else:
 			raise UnsupportedType(f"<archiveNames> should be string or list or tuple but got: {type_name(archiveNames)}.")
 
+	return auxiliaryInfo,outFiles,archiveNames
+
+def __map_resources_to_command(resources,auxiliaryInfo,cmdPattern,index,outFile,fhm):
+	'''
+	Map the resources of one process to command pattern.
+	If there is not any PIPE in command pattern,a resource used only once is sent to the input stream.
+
+	Return:
+		the final command and the input buffer.
+	'''
+	newResources = {}
+	# Detect whether there is PIPE in command pattern.
+	testPlaceholder = dict( (key,value[index]) if isinstance(value[index],str) else (key,"placeholder") for key,value in resources.items() )
+	testPlaceholder["outFile"] = "placeholder"
+	testCmd = cmdPattern.format(**testPlaceholder)
+	if "|" in testCmd:
+		inputsBuffer = False
+	else:
+		inputsBuffer = True
+	del testPlaceholder
+	# regularate resources
+	for key,countPrefix in auxiliaryInfo.items():
+		count,prefix = countPrefix
+		target = resources[key][index]
+
+		# If target is a list-table,we can not automatically decide whether it is scp-format or ark-format.
+		# So you should appoint it in the command parttern.
+		if is_list_table(target) or type_name(target) == "Transcription":
+			if prefix not in [":","="]:
+				errMes = f"There might miss prefix such as 'ark:' or 'scp:' or '--option=' in command pattern before resource: {key}."
+				errMes += "Check the command line please. If you still think there dose not need the prefix,"
+				errMes += "save this ListTable or Transcription into file and instead it will this file name."
+				errMes += "In that case,we will skip checking the prefix."
+				raise WrongOperation(errMes)
+
+			target = target.sort()
+			if (inputsBuffer is True) and count == 1:
+				inputsBuffer = target.save()
+				newResources[key] = "-"
+			else:
+				targetTemp = fhm.create("w+",encoding="utf-8")
+				target.save(targetTemp)
+				newResources[key] = f"{targetTemp.name}"
+
+		# If target is an index-table,we automatically recognize it as scp-file,so you do not need appoint it.
+		elif type_name(target) == "ArkIndexTable":
+			if prefix != " ":
+				errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
+				errMes += f"Because we will decide the prefix depending on its data type."
+				raise WrongOperation(errMes)
+				
+			target = target.sort()
+			if (inputsBuffer is True) and count == 1:
+				inputsBuffer = target.save()
+				newResources[key] = "scp:-"
+			else:
+				targetTemp = fhm.create("w+",suffix=".scp",encoding="utf-8")
+				target.save(targetTemp)
+				newResources[key] = f"scp:{targetTemp.name}"
+		
+		elif isinstance(target,(str,int,float)):
+			# file or other value parameter
+			newResources[key] = f"{target}"
+	
+		elif isinstance(target,(BytesMatrix,BytesVector)):
+			if prefix != " ":
+				errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
+				errMes += f"Because we will decide the prefix depending on its data type."						
+				raise WrongOperation(errMes)
+
+			target = target.sort()
+			if (inputsBuffer is True) and count == 1:
+				inputsBuffer = target.data
+				newResources[key] = "ark:-"
+			else:					
+				targetTemp = fhm.create("wb+",suffix=".ark")
+				target.save(targetTemp)
+				newResources[key] = f"ark:{targetTemp.name}"		
+
+		elif isinstance(target,(NumpyMatrix,NumpyVector)):
+			if prefix != " ":
+				errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
+				errMes += f"Because we will decide the prefix depending on its data type."		
+				raise WrongOperation(errMes)
+
+			target = target.sort()
+			if (inputsBuffer is True) and count == 1:
+				inputsBuffer = target.to_bytes().data
+				newResources[key] = "ark:-"
+			else:
+				target = target.to_bytes()
+				targetTemp = fhm.create("wb+",suffix=".ark")
+				target.save(targetTemp)
+				newResources[key] = f"ark:{targetTemp.name}"	
+
+		elif isinstance(target,BytesArchive):
+			if (inputsBuffer is True) and count == 1:
+				inputsBuffer = target.data
+				newResources[key] = "-"
+			else:
+				targetTemp = fhm.create("wb+")
+				target.save(targetTemp)
+				newResources[key] = f"{targetTemp.name}"
+
+		else:
+			raise UnsupportedType(f"<target> should be ArkIndexTable,ListTable,file name,int or float value,or exkaldi achieve object but got: {type_name(target)}.")
+	
+	# Then,process output stream
+	newResources["outFile"] = outFile
+	inputsBuffer = None if isinstance(inputsBuffer,bool) else inputsBuffer
+
+	return cmdPattern.format(**newResources),inputsBuffer
+
+def __make_archive(data,archiveType,name):
+	'''
+	Make an archive object from bytes output.
+	'''
+	if archiveType == "feat":
+		return BytesFeature(data=data,name=name)
+	elif archiveType == "ali":
+		return BytesAlignmentTrans(data=data,name=name)
+	elif archiveType == "cmvn":
+		return BytesCMVNStatistics(data=data,name=name)
+	else:
+		return BytesFmllrMatrix(data=data,name=name)
+
+def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=ExkaldiInfo.timeout,generateArchive=None,archiveNames=None,useCache=False,backend=None):
+	'''
+	Map resources to command pattern and run this command parallelly.
+
+	Args:
+		<resources>: a dict whose keys are the name of resource and values are lists of resources objects.
+					For example: {"feat": [BytesFeature01,BytesFeature02,... ],"outFile":{"newFeat01.ark","newFeat02.ark",...} }.
+					The "outFile" resource is necessary.
+					When there is only one process to run,"outFile" can be "-" which means the standard output stream.
+
+		<cmdPattern>: a string needed to map the resources.
+					For example: "copy-feat {feat} ark:{outFile}".
+		<useCache>: If True and the global cache has been enabled by exkaldi.utils.cache.enable_cache(),
+					reuse the cached results of the commands whose inputs did not change.
+					Only the standard output and the "outFile" are cached,so do not use it if the command writes other files.
+		<backend>: None or an exkaldi backend object to run multiple processes. If None,use the global backend.
+	
+	Return:
+		a list of triples: (return code,error info,output file or buffer)
+	'''
+	declare.kaldi_existed()
+	declare.is_classes("resources",resources,dict)
+	declare.is_classes("cmdPattern",cmdPattern,str)
+	assert "outFile" in resources.keys(),"<outFile> key and value is necessary in recources."
+
+	declare.members_are_classes("the values of resources",resources.values(),[list,tuple])
+	declare.is_bool("useCache",useCache)
+	resultCache = cache.get_cache() if useCache else None
+	if generateArchive is not None:
+		analyzeResult = True #forcely analyze the result
+
+	auxiliaryInfo,outFiles,archiveNames = __parse_command_pattern(resources,cmdPattern,generateArchive,archiveNames)
+	parallel = len(outFiles)
+
 	# regulate resources and run
 	with FileHandleManager() as fhm:
 
 		newResources = {}
 		if parallel == 1:
-			# Detect whether there is PIPE in command pattern.
-			testPlaceholder = dict( (key,value[0]) if isinstance(value[0],str) else (key,"placeholder") for key,value in resources.items() )
-			testPlaceholder["outFile"] = "placeholder"
-			testCmd = cmdPattern.format(**testPlaceholder)
-			if "|" in testCmd:
-				inputsBuffer = False
+			outFile = outFiles[0]
+			finalCmd,inputsBuffer = __map_resources_to_command(resources,auxiliaryInfo,cmdPattern,0,outFile,fhm)
+			if resultCache is None:
+				out,err,cod = run_shell_command(finalCmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=inputsBuffer)
 			else:
-				inputsBuffer = True
-			del testPlaceholder
-			# regularate resources
-			for key,countPrefix in auxiliaryInfo.items():
-				count,prefix = countPrefix
-				target = resources[key][0]
-
-				# If target is a list-table,we can not automatically decide whether it is scp-format or ark-format.
-				# So you should appoint it in the command parttern.
-				if type_name(target) in ["ListTable","Transcription"]:
-					if prefix not in [":","="]:
-						errMes = f"There might miss prefix such as 'ark:' or 'scp:' or '--option=' in command pattern before resource: {key}."
-						errMes += "Check the command line please. If you still think there dose not need the prefix,"
-						errMes += "save this ListTable or Transcription into file and instead it will this file name."
-						errMes += "In that case,we will skip checking the prefix."
-						raise WrongOperation(errMes)
-
-					target = target.sort()
-					if (inputsBuffer is True) and count == 1:
-						inputsBuffer = target.save()
-						newResources[key] = "-"
-					else:
-						targetTemp = fhm.create("w+",encoding="utf-8")
-						target.save(targetTemp)
-						newResources[key] = f"{targetTemp.name}"
-
-				# If target is an index-table,we automatically recognize it as scp-file,so you do not need appoint it.
-				elif type_name(target) == "ArkIndexTable":
-					if prefix != " ":
-						errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
-						errMes += f"Because we will decide the prefix depending on its data type."
-						raise WrongOperation(errMes)
-						
-					target = target.sort()
-					if (inputsBuffer is True) and count == 1:
-						inputsBuffer = target.save()
-						newResources[key] = "scp:-"
-					else:
-						targetTemp = fhm.create("w+",suffix=".scp",encoding="utf-8")
-						target.save(targetTemp)
-						newResources[key] = f"scp:{targetTemp.name}"
-				
-				elif isinstance(target,(str,int,float)):
-					# file or other value parameter
-					newResources[key] = f"{target}"
-			
-				elif isinstance(target,(BytesMatrix,BytesVector)):
-					if prefix != " ":
-						errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
-						errMes += f"Because we will decide the prefix depending on its data type."						
-						raise WrongOperation(errMes)
-
-					target = target.sort()
-					if (inputsBuffer is True) and count == 1:
-						inputsBuffer = target.data
-						newResources[key] = "ark:-"
-					else:					
-						targetTemp = fhm.create("wb+",suffix=".ark")
-						target.save(targetTemp)
-						newResources[key] = f"ark:{targetTemp.name}"		
-
-				elif isinstance(target,(NumpyMatrix,NumpyVector)):
-					if prefix != " ":
-						errMes = f"Do not need prefix such as 'ark:' or 'scp:' in command pattern before: {key}."
-						errMes += f"Because we will decide the prefix depending on its data type."		
-						raise WrongOperation(errMes)
-
-					target = target.sort()
-					if (inputsBuffer is True) and count == 1:
-						inputsBuffer = target.to_bytes().data
-						newResources[key] = "ark:-"
-					else:
-						target = target.to_bytes()
-						targetTemp = fhm.create("wb+",suffix=".ark")
-						target.save(targetTemp)
-						newResources[key] = f"ark:{targetTemp.name}"	
-
-				elif isinstance(target,BytesArchive):
-					if (inputsBuffer is True) and count == 1:
-						inputsBuffer = target.data
-						newResources[key] = "-"
-					else:
-						targetTemp = fhm.create("wb+")
-						target.save(targetTemp)
-						newResources[key] = f"{targetTemp.name}"
-
+				cachedFile = None if outFile == "-" else outFile
+				key = resultCache.make_key(finalCmd,inputsBuffer,excludeFiles=[outFile])
+				result = resultCache.get(key,outFile=cachedFile)
+				if result is None:
+					out,err,cod = run_shell_command(finalCmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=inputsBuffer)
+					if cod == 0:
+						resultCache.put(key,out,err,outFile=cachedFile)
 				else:
-					raise UnsupportedType(f"<target> should be ArkIndexTable,ListTable,file name,int or float value,or exkaldi achieve object but got: {type_name(target)}.")
-			
-			# Then,process output stream
-			outFile = outFiles[0]
-			newResources["outFile"] = outFile
-			inputsBuffer = None if isinstance(inputsBuffer,bool) else inputsBuffer
-			# Then rum command
-			finalCmd = cmdPattern.format(**newResources)
-			out,err,cod = run_shell_command(finalCmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=inputsBuffer)
+					out,err,cod = result
 			
 			if analyzeResult:
 				if cod != 0:
@@ -406,15 +835,7 @@ def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=
 			
 			if outFile == "-":
 				if generateArchive is not None:
-					if generateArchive == "feat":
-						out = BytesFeature(data=out,name=archiveNames[0])
-					elif generateArchive == "ali":
-						out = BytesAlignmentTrans(data=out,name=archiveNames[0])
-					elif generateArchive == "cmvn":
-						out = BytesCMVNStatistics(data=out,name=archiveNames[0])
-					else:
-						out = BytesFmllrMatrix(data=out,name=archiveNames[0])
-					return out
+					return __make_archive(out,generateArchive,archiveNames[0])
 				else:
 					return (cod,err,out)
 			else:
@@ -432,7 +853,7 @@ def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=
 				for target in values:
 
 					# If target is scp resource
-					if type_name(target) in ["ListTable","Transcription"]:
+					if is_list_table(target) or type_name(target) == "Transcription":
 						if prefix not in [":","="]:
 							errMes = f"There might miss prefix such as 'ark:' or 'scp:' or '--option=' in command pattern before resource: {key}."
 							errMes += "Check the command line please. If you still think there dose not need the prefix,"
@@ -501,7 +922,26 @@ def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=
 					parallelResources[-1][key] = items[i]
 			cmds = [ cmdPattern.format(**re) for re in parallelResources ]
 			# run
-			flags = run_shell_command_parallel(cmds,timeout=timeout)
+			if resultCache is None:
+				flags = run_shell_command_parallel(cmds,timeout=timeout,backend=backend)
+			else:
+				# only run the commands whose results have not been cached
+				keys = [ resultCache.make_key(cmd,excludeFiles=[outFiles[i]]) for i,cmd in enumerate(cmds) ]
+				flags = []
+				missed = []
+				for i,key in enumerate(keys):
+					result = resultCache.get(key,outFile=outFiles[i])
+					if result is None:
+						flags.append(None)
+						missed.append(i)
+					else:
+						flags.append( (0,result[1]) )
+				if len(missed) > 0:
+					missedFlags = run_shell_command_parallel([ cmds[i] for i in missed ],timeout=timeout,backend=backend)
+					for i,info in zip(missed,missedFlags):
+						flags[i] = info
+						if info[0] == 0:
+							resultCache.put(keys[i],err=info[1],outFile=outFiles[i])
 
 			finalResult = []
 			done = True
@@ -523,6 +963,61 @@ def run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,timeout=
 
 			return finalResult
 
+async def run_kaldi_commands_async(resources,cmdPattern,analyzeResult=True,generateArchive=None,archiveNames=None):
+	'''
+	Map resources to command pattern and run these commands concurrently with asyncio.
+	Different from run_kaldi_commands_parallel(),every process can use the input and output streams,
+	and if the task is cancelled,all processes will be killed.
+
+	Args:
+		<resources>: a dict whose keys are the name of resource and values are lists of resources objects.
+					The "outFile" resource is necessary. "outFile" can be "-" which means the standard output stream.
+		<cmdPattern>: a string needed to map the resources.
+					For example: "copy-feat {feat} ark:{outFile}".
+	
+	Return:
+		the same as run_kaldi_commands_parallel().
+	'''
+	declare.kaldi_existed()
+	declare.is_classes("resources",resources,dict)
+	declare.is_classes("cmdPattern",cmdPattern,str)
+	assert "outFile" in resources.keys(),"<outFile> key and value is necessary in recources."
+
+	declare.members_are_classes("the values of resources",resources.values(),[list,tuple])
+	if generateArchive is not None:
+		analyzeResult = True #forcely analyze the result
+
+	auxiliaryInfo,outFiles,archiveNames = __parse_command_pattern(resources,cmdPattern,generateArchive,archiveNames)
+
+	with FileHandleManager() as fhm:
+		cmds = []
+		tasks = []
+		for index,outFile in enumerate(outFiles):
+			finalCmd,inputsBuffer = __map_resources_to_command(resources,auxiliaryInfo,cmdPattern,index,outFile,fhm)
+			cmds.append(finalCmd)
+			tasks.append( run_shell_command_async(finalCmd,inputs=inputsBuffer) )
+		results = await asyncio.gather(*tasks)
+
+	finalResult = []
+	for index,(out,err,cod) in enumerate(results):
+		if analyzeResult and cod != 0:
+			print(err.decode())
+			finalCmd = ",".join([cmd.strip().split(maxsplit=1)[0] for cmd in cmds[index].split("|")])
+			raise KaldiProcessError(f"Failed to run Kaldi command: {finalCmd}.")
+		outFile = outFiles[index]
+		if outFile == "-":
+			if generateArchive is not None:
+				finalResult.append( __make_archive(out,generateArchive,archiveNames[index]) )
+			else:
+				finalResult.append( (cod,err,out) )
+		else:
+			if generateArchive is not None:
+				finalResult.append( load_index_table(outFile,name=archiveNames[index],useSuffix="ark") )
+			else:
+				finalResult.append( (cod,err,outFile) )
+
+	return finalResult[0] if len(outFiles) == 1 else finalResult
+
 def utt2spk_to_spk2utt(utt2spk,outFile=None):
 	'''
 	Transform utt2spk to spk2utt.
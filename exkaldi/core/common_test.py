@@ -0,0 +1,116 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.core.common'''
+
+import numpy as np
+import pytest
+from exkaldi.version import WrongOperation
+from exkaldi.core import common
+from exkaldi.benchmark import synthetic
+
+def test_frame_dataset():
+
+  feat = synthetic.make_feat(utts=10,dim=4,minFrames=5,maxFrames=20)
+  ali = synthetic.make_ali(utts=10,minFrames=5,maxFrames=20).to_bytes()
+  dataset = common.frame_dataset([feat,ali])
+
+  frames = common.tuple_dataset([feat,ali],frameLevel=True)
+  assert len(dataset) == len(frames)
+  assert dataset.fields == ["feat","ali"]
+  assert dataset["feat"].shape == (len(frames),4)
+
+  indexes = np.random.RandomState(0).randint(0,len(dataset),size=16)
+  batch = dataset.gather(indexes)
+  uttIndexes,frameIDs = dataset.locate(indexes)
+  for i,index in enumerate(indexes):
+    one = frames[index]
+    assert dataset.utts[uttIndexes[i]] == one.key and frameIDs[i] == one.frameID
+    assert np.array_equal(batch["feat"][i],one.feat[0])
+    assert batch["ali"][i] == one.ali[0]
+
+  utt = dataset.utts[3]
+  assert np.array_equal(dataset.utterance(utt)["feat"],feat.data[utt])
+
+  batches = list(dataset.batches(7,shuffle=True,randomState=np.random.RandomState(1)))
+  assert sum( len(b["ali"]) for b in batches ) == len(dataset)
+  assert np.isclose(sum( b["feat"].sum() for b in batches ),dataset["feat"].sum())
+  assert all( len(b["ali"]) == 7 for b in dataset.batches(7,dropLast=True) )
+  assert dataset.sample(5)["feat"].shape == (5,4)
+
+def test_frame_dataset_mismatch():
+
+  feat = synthetic.make_feat(utts=3,minFrames=5,maxFrames=20)
+  with pytest.raises(WrongOperation):
+    common.frame_dataset([feat,synthetic.make_ali(utts=3,minFrames=5,maxFrames=20,seed=1)])
+  with pytest.raises(WrongOperation):
+    common.frame_dataset([feat,feat])
+
+def test_join_archives():
+
+  feat = synthetic.make_feat(utts=12,dim=4,minFrames=5,maxFrames=20)
+  ali = synthetic.make_ali(utts=12,minFrames=5,maxFrames=20)
+  bytesFeat = feat.to_bytes()
+  bytesFeat.rename("bytesFeat")
+  bytesAli = ali.subset(nHead=9).to_bytes()
+  bytesAli.rename("bytesAli")
+  tailFeat = feat.subset(nTail=10)
+  tailFeat.rename("feat")
+  dataset = common.join_archives([bytesFeat,ali,bytesAli,tailFeat])
+
+  assert len(dataset) == 7
+  assert dataset.fields == ["bytesFeat","ali","bytesAli","feat"]
+  assert dataset.utts == sorted(dataset.utts)
+  assert dataset.lengths.shape == (4,7) and len(dataset.mismatched()) == 0
+
+  featData = feat.data
+  aliData = ali.data
+  for one in dataset:
+    assert np.array_equal(one.bytesFeat,featData[one.key])
+    assert np.array_equal(one.bytesAli,aliData[one.key])
+    # No data is copied.
+    assert one.ali is aliData[one.key]
+    assert not one.bytesFeat.flags.owndata and not one.bytesFeat.flags.writeable
+  assert dataset[dataset.utts[-1]].key == dataset[-1].key
+
+  packed = dataset.pack()
+  frames = common.frame_dataset([feat,ali])
+  assert len(packed) == sum( len(featData[utt]) for utt in dataset.utts )
+  assert np.array_equal(packed.utterance(dataset.utts[2])["bytesFeat"],frames.utterance(dataset.utts[2])["feat"])
+
+def test_join_archives_names():
+
+  feat = synthetic.make_feat(utts=3,dim=4,minFrames=5,maxFrames=20,name="splice(feat)")
+  ali = synthetic.make_ali(utts=3,minFrames=5,maxFrames=20)
+  # Names are only used as dict keys when packing frames.
+  dataset = common.frame_dataset([feat,ali])
+  assert dataset.fields == ["splice(feat)","ali"]
+  with pytest.raises(WrongOperation):
+    common.join_archives([feat,ali])[0]
+
+def test_join_archives_mismatch():
+
+  feat = synthetic.make_feat(utts=5,minFrames=5,maxFrames=20)
+  ali = synthetic.make_ali(utts=5,minFrames=5,maxFrames=20,seed=1).to_bytes()
+  with pytest.raises(WrongOperation):
+    common.join_archives([feat,ali])
+  dataset = common.join_archives([feat,ali],checkFrames=False)
+  assert len(dataset.mismatched()) > 0
+  with pytest.raises(WrongOperation):
+    dataset.pack()
+  with pytest.raises(WrongOperation):
+    dataset["none"]
@@ -27,6 +27,7 @@ from exkaldi.version import WrongPath,UnsupportedType,KaldiProcessError,WrongOpe
 from exkaldi.utils.utils import type_name,make_dependent_dirs,list_files,check_config
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import trace
 from exkaldi.core.archive import BytesFeature,BytesCMVNStatistics,ListTable,ArkIndexTable
 from exkaldi.core.load import load_list_table,load_index_table
 from exkaldi.core.common import check_multiple_resources,run_kaldi_commands_parallel
@@ -109,6 +110,7 @@ def __compute_feature(target,kaldiTool,useSuffix=None,name="feat",outFile=None):
 	# Run
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="feat",archiveNames=names)
 
+@trace.traced()
 def compute_mfcc(target,rate=16000,frameWidth=25,frameShift=10,
 				melBins=23,featDim=13,windowType='povey',useSuffix=None,
 				config=None,name="mfcc",outFile=None):
@@ -172,6 +174,7 @@ def compute_mfcc(target,rate=16000,frameWidth=25,frameShift=10,
 	# run the common function
 	return __compute_feature(target,baseCmds,useSuffix,name,outFile)
 
+@trace.traced()
 def compute_fbank(target,rate=16000,frameWidth=25,frameShift=10,
 					melBins=23,windowType='povey',useSuffix=None,
 					config=None,name="fbank",outFile=None):
@@ -233,6 +236,7 @@ def compute_fbank(target,rate=16000,frameWidth=25,frameShift=10,
 	# run the common function
 	return __compute_feature(target,baseCmds,useSuffix,name,outFile)
 
+@trace.traced()
 def compute_plp(target,rate=16000,frameWidth=25,frameShift=10,
 				melBins=23,featDim=13,windowType='povey',useSuffix=None,
 				config=None,name="plp",outFile=None):
@@ -296,6 +300,7 @@ def compute_plp(target,rate=16000,frameWidth=25,frameShift=10,
 	# run the common function
 	return __compute_feature(target,baseCmds,useSuffix,name,outFile)
 	
+@trace.traced()
 def compute_spectrogram(target,rate=16000,frameWidth=25,frameShift=10,
 						windowType='povey',useSuffix=None,config=None,name="spectrogram",outFile=None):
 	'''
@@ -353,6 +358,7 @@ def compute_spectrogram(target,rate=16000,frameWidth=25,frameShift=10,
 	# run the common function
 	return __compute_feature(target,baseCmds,useSuffix,name,outFile)
 
+@trace.traced()
 def transform_feat(feat,matFile,outFile=None):
 	'''
 	Transform feat by a transform matrix. Typically,LDA,MLLT matrices.
@@ -382,6 +388,7 @@ def transform_feat(feat,matFile,outFile=None):
 
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="feat",archiveNames=names)
 
+@trace.traced()
 def use_fmllr(feat,fmllrMat,utt2spk,outFile=None):
 	'''
 	Transfrom to fmllr feature.
@@ -414,6 +421,7 @@ def use_fmllr(feat,fmllrMat,utt2spk,outFile=None):
 
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="feat",archiveNames=names)
 
+@trace.traced()
 def use_cmvn(feat,cmvn,utt2spk=None,std=False,outFile=None):
 	'''
 	Apply CMVN statistics to feature.
@@ -455,6 +463,7 @@ def use_cmvn(feat,cmvn,utt2spk=None,std=False,outFile=None):
 	
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="feat",archiveNames=names)
 
+@trace.traced()
 def compute_cmvn_stats(feat,spk2utt=None,name="cmvn",outFile=None):
 	'''
 	Compute CMVN statistics.
@@ -489,6 +498,7 @@ def compute_cmvn_stats(feat,spk2utt=None,name="cmvn",outFile=None):
 
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="cmvn",archiveNames=names)
 
+@trace.traced()
 def use_cmvn_sliding(feat,windowSize=None,std=False):
 	'''
 	Allpy sliding CMVN statistics.
@@ -525,6 +535,7 @@ def use_cmvn_sliding(feat,windowSize=None,std=False):
 	newName = f"cmvn({feat.name},{windowSize})"
 	return BytesFeature(out,name=newName,indexTable=None)
 
+@trace.traced()
 def add_delta(feat,order=2,outFile=None):
 	'''
 	Add n order delta to feature.
@@ -555,6 +566,7 @@ def add_delta(feat,order=2,outFile=None):
 	# run 
 	return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="feat",archiveNames=names)
 
+@trace.traced()
 def splice_feature(feat,left,right=None,outFile=None):
 	'''
 	Splice left-right N frames to generate new feature.
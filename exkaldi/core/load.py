@@ -20,11 +20,12 @@
 import numpy as np
 import copy
 import os
+import asyncio
 from io import BytesIO
 
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,UnsupportedType,ShellProcessError,KaldiProcessError
-from exkaldi.utils.utils import run_shell_command,type_name,list_files
+from exkaldi.utils.utils import run_shell_command,run_shell_command_async,type_name,list_files,is_list_table
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
 from exkaldi.core.archive import BytesArchive,BytesMatrix,BytesFeature,BytesCMVNStatistics,BytesProbability,BytesFmllrMatrix,BytesAlignmentTrans
@@ -46,7 +47,7 @@ def load_list_table(target,name="listTable"):
 	declare.is_classes("target",target,[dict,ListTable,str])
 
 	newTable = ListTable(name=name)
-	if type_name(target) in ["dict","ListTable"]:
+	if type_name(target) == "dict" or is_list_table(target):
 		newTable.update(target)
 		return newTable
 
@@ -195,7 +196,8 @@ def load_index_table(target,name="index",useSuffix=None):
 		for key,value in target.items():
 			if isinstance(value,(list,tuple)):
 				assert len(value) in [3,4],f"Expected (frames,start index,data size[,file path]) but {value} does not match."
-				newTable[key] = newTable.spec(*value)
+				# Values given by user should be checked.
+				newTable.record(key,*value)
 			elif type_name(value) == "Index":
 				newTable[key] = value
 			else:
@@ -326,7 +328,8 @@ def load_feat(target,name="feat",useSuffix=None):
 	'''
 	declare.is_valid_string("name",name)
 
-	if isinstance(target,dict):
+	# ArkIndexTable is also a dict,so check it firstly.
+	if isinstance(target,dict) and not isinstance(target,ArkIndexTable):
 		result = NumpyFeature(target,name)
 		result.check_format()
 		return result
@@ -351,7 +354,9 @@ def load_feat(target,name="feat",useSuffix=None):
 		return result
 
 	elif isinstance(target,ArkIndexTable):
-		return target.fetch(arkType="feat",name=name)
+		result = target.fetch(arkType="feat")
+		result.rename(name)
+		return result
 
 	else:
 		raise UnsupportedType(f"Expected Python dict,bytes object,exkaldi feature or indexTable object or file path but got{type_name(target)}.")
@@ -371,7 +376,7 @@ def load_cmvn(target,name="cmvn",useSuffix=None):
 	'''
 	declare.is_valid_string("name",name)
 
-	if isinstance(target,dict):
+	if isinstance(target,dict) and not isinstance(target,ArkIndexTable):
 		result = NumpyCMVNStatistics(target,name)
 		result.check_format()
 		return result
@@ -396,7 +401,9 @@ def load_cmvn(target,name="cmvn",useSuffix=None):
 		return result
 
 	elif isinstance(target,ArkIndexTable):
-		return target.fetch(arkType="cmvn",name=name)
+		result = target.fetch(arkType="cmvn")
+		result.rename(name)
+		return result
 
 	else:
 		raise UnsupportedType(f"Expected Python dict,bytes object,exkaldi feature or index table object or file path but got{type_name(target)}.")
@@ -416,7 +423,7 @@ def load_prob(target,name="prob",useSuffix=None):
 	'''
 	declare.is_valid_string("name",name)
 
-	if isinstance(target,dict):
+	if isinstance(target,dict) and not isinstance(target,ArkIndexTable):
 		result = NumpyProbability(target,name)
 		result.check_format()
 		return result
@@ -441,11 +448,90 @@ def load_prob(target,name="prob",useSuffix=None):
 		return result
 
 	elif isinstance(target,ArkIndexTable):
-		return target.fetch(arkType="prob",name=name)
+		result = target.fetch(arkType="prob")
+		result.rename(name)
+		return result
 
 	else:
 		raise UnsupportedType(f"Expected Python dict,bytes object,exkaldi feature object or file path but got{type_name(target)}.")
 
+async def __read_bytes_from_files_async(fileName,useSuffix=None):
+	'''
+	Read ark or scp files with asyncio subprocesses concurrently.
+
+	Return:
+		None if there is any npy file,or a bytes object.
+	'''
+	declare.kaldi_existed()
+
+	if useSuffix != None:
+		declare.is_valid_string("useSuffix",useSuffix)
+		useSuffix = useSuffix.strip().lower()[-3:]
+		declare.is_instances("useSuffix",useSuffix,["ark","scp","npy"])
+
+	allFiles = list_files(fileName)
+	cmds = []
+	for fileName in allFiles:
+		sfx = fileName.strip()[-3:].lower()
+		if sfx not in ["ark","scp","npy"]:
+			sfx = useSuffix
+		if sfx == "npy":
+			return None
+		elif sfx in ["ark","scp"]:
+			cmds.append( f"copy-feats {sfx}:{fileName} ark:-" )
+		else:
+			raise UnsupportedType('Unknown file suffix. You can appoint the <useSuffix> option with "scp","ark" or "npy".')
+
+	results = await asyncio.gather(*[ run_shell_command_async(cmd) for cmd in cmds ])
+	allData = []
+	for out,err,cod in results:
+		if cod != 0 or out == b'':
+			print(err.decode())
+			raise KaldiProcessError('Failed to read archive table.')
+		allData.append(out)
+
+	return b"".join(allData)
+
+async def load_feat_async(target,name="feat",useSuffix=None):
+	'''
+	Load feature data asynchronously. Ark and scp files are read by asyncio subprocesses,
+	and the other targets are loaded by load_feat().
+
+	Args:
+		<target>: Python dict object,bytes object,exkaldi feature object,.ark file,.scp file,.npy file.
+		<name>: a string.
+		<useSuffix>: "ark" or "scp" or "npy".
+
+	Return:
+		A BytesFeature or NumpyFeature object.
+	'''
+	if isinstance(target,str):
+		declare.is_valid_string("name",name)
+		data = await __read_bytes_from_files_async(target,useSuffix)
+		if data is not None:
+			return BytesFeature(data,name=name)
+	return load_feat(target,name,useSuffix)
+
+async def load_prob_async(target,name="prob",useSuffix=None):
+	'''
+	Load post probability data asynchronously. Ark and scp files are read by asyncio subprocesses,
+	and the other targets are loaded by load_prob().
+
+	Args:
+		<target>: Python dict object,bytes object,exkaldi probability object,.ark file,.scp file,.npy file.
+		<name>: a string.
+		<useSuffix>: "ark" or "scp" or "npy".
+
+	Return:
+		A BytesProbability or NumpyProbability object.
+	'''
+	if isinstance(target,str):
+		declare.is_valid_string("name",name)
+		data = await __read_bytes_from_files_async(target,useSuffix)
+		if data is not None:
+			return BytesProbability(data,name=name)
+	return load_prob(target,name,useSuffix)
+
 def load_fmllr(target,name="prob",useSuffix=None):
 	'''
 	Load fmllr transform matrix data.
@@ -461,7 +547,7 @@ def load_fmllr(target,name="prob",useSuffix=None):
 	'''
 	declare.is_valid_string("name",name)
 
-	if isinstance(target,dict):
+	if isinstance(target,dict) and not isinstance(target,ArkIndexTable):
 		result = NumpyFmllrMatrix(target,name)
 		result.check_format()
 		return result
@@ -486,7 +572,9 @@ def load_fmllr(target,name="prob",useSuffix=None):
 		return result
 
 	elif isinstance(target,ArkIndexTable):
-		return target.fetch(arkType="fmllrMat",name=name)
+		result = target.fetch(arkType="fmllrMat")
+		result.rename(name)
+		return result
 
 	else:
 		raise UnsupportedType(f"Expected Python dict,bytes object,exkaldi fmllr matrix object,index table object or file path but got{type_name(target)}.")
@@ -524,7 +612,7 @@ def load_ali(target,aliType="transitionID",name="ali",hmm=None):
 				result[utt] = matrix
 			return result
 
-	if isinstance(target,dict):
+	if isinstance(target,dict) and not isinstance(target,ArkIndexTable):
 		if aliType is None:
 			result = NumpyAlignment(target,name)
 		elif aliType == "transitionID":
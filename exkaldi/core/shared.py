@@ -0,0 +1,371 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Share NumPy archives between processes with multiprocessing.shared_memory.
+All arrays are packed in one shared block with their keys and offsets. Other processes attach it by name,
+and get the arrays of utterances as views without any copy.
+'''
+
+import os
+import json
+import mmap
+import struct
+import numpy as np
+from multiprocessing import shared_memory
+try:
+	import _posixshmem
+except ImportError:
+	_posixshmem = None
+
+from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat
+from exkaldi.utils.utils import type_name
+from exkaldi.utils import declare
+from exkaldi.utils import memory
+from exkaldi.core import archive as _archive
+
+_SHM_MAGIC = b"EXKALDI-SHM\x00"
+_SHM_VERSION = 1
+_SHM_HEAD = struct.Struct("<IQ")
+_DATA_ALIGNMENT = 64
+
+def _align(size,alignment):
+	return (size + alignment - 1)//alignment*alignment
+
+class _AttachedMemory:
+	'''
+	A POSIX shared memory block attached without registering it to the resource tracker.
+	It provides the parts of SharedMemory used by SharedArchive.
+	'''
+	def __init__(self,shmName):
+		self.__name = shmName
+		# Same as SharedMemory,the leading slash is added to the name of POSIX block.
+		fd = _posixshmem.shm_open("/" + shmName,os.O_RDWR,mode=0o600)
+		try:
+			self.__mmap = mmap.mmap(fd,os.fstat(fd).st_size)
+		finally:
+			os.close(fd)
+		self.__buf = memoryview(self.__mmap)
+
+	@property
+	def name(self):
+		return self.__name
+
+	@property
+	def size(self):
+		return len(self.__mmap)
+
+	@property
+	def buf(self):
+		return self.__buf
+
+	def close(self):
+		# Raise BufferError if the buffer is still exported,like SharedMemory.
+		self.__buf.release()
+		self.__mmap.close()
+
+def _open_shared_memory(shmName):
+	try:
+		# Since Python 3.13,processes which only attach the block don't need to track it.
+		return shared_memory.SharedMemory(name=shmName,track=False)
+	except TypeError:
+		pass
+	if _posixshmem is None:
+		# Shared memory is not tracked on Windows.
+		return shared_memory.SharedMemory(name=shmName)
+	# Before Python 3.13,SharedMemory always registers the block to the resource tracker of this process,
+	# which would unlink the block of the owner when an independent process exits.
+	# Unregistering it after attaching is not safe because the owner and its child processes share one tracker,
+	# so open the block directly instead.
+	return _AttachedMemory(shmName)
+
+class SharedArchive:
+	'''
+	A read-only archive in a shared memory block.
+	Use to_shared() to create it and attach_shared() to attach it in other processes.
+	It can also be passed to child processes directly,only the name of block is pickled.
+
+	The process which created it should call .unlink() to free the block when all processes have done.
+	Every process should call .close() when it does not use the archive anymore.
+	Used as a context manager,the block is closed (and unlinked by the owner) when exiting.
+	'''
+	def __init__(self,shm,owner):
+		'''
+		Do not create it directly. Use to_shared() or attach_shared() instead.
+		'''
+		self.__shm = shm
+		self.__owner = owner
+
+		buf = shm.buf
+		if bytes(buf[0:len(_SHM_MAGIC)]) != _SHM_MAGIC:
+			raise WrongDataFormat(f"Shared memory block is not an exkaldi archive: {shm.name}.")
+		version,headSize = _SHM_HEAD.unpack_from(buf,len(_SHM_MAGIC))
+		if version != _SHM_VERSION:
+			raise WrongDataFormat(f"Unknown shared archive version: {version}.")
+		start = len(_SHM_MAGIC) + _SHM_HEAD.size
+		header = json.loads( bytes(buf[start:start+headSize]).decode("utf-8") )
+
+		self.__kind = header["kind"]
+		self.__name = header["name"]
+		self.__keys = header["keys"]
+		self.__index = dict( (key,i) for i,key in enumerate(self.__keys) )
+		# Arrays made by np.frombuffer hold the buffer,so the block can not be closed while they are used.
+		self.__offsets = np.frombuffer(buf,dtype=np.int64,count=len(self.__keys)+1,offset=header["offsetsStart"])
+		self.__offsets.flags.writeable = False
+		dtype = np.dtype(header["dtype"])
+		tail = tuple(header["tail"])
+		count = int(self.__offsets[-1]) * int(np.prod(tail,dtype=np.int64))
+		self.__data = np.frombuffer(buf,dtype=dtype,count=count,offset=header["dataStart"]).reshape((-1,)+tail)
+		self.__data.flags.writeable = False
+		self.__shmClosed = False
+
+		if owner:
+			memory.track(self)
+
+	def __reduce__(self):
+		return (attach_shared,(self.shmName,))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,type,value,trace):
+		try:
+			self.close()
+		finally:
+			if self.__owner:
+				self.unlink()
+
+	def __check_open(self):
+		if self.__data is None:
+			raise WrongOperation("Shared archive has been closed.")
+
+	@property
+	def shmName(self):
+		'''
+		The name of shared memory block. Pass it to attach_shared() in other processes.
+		'''
+		return self.__shm.name
+
+	@property
+	def name(self):
+		'''
+		The name of archive.
+		'''
+		return self.__name
+
+	@property
+	def is_owner(self):
+		'''
+		Whether or not this object created the shared memory block.
+		'''
+		return self.__owner
+
+	@property
+	def is_closed(self):
+		return self.__data is None
+
+	@property
+	def nbytes(self):
+		'''
+		The size of shared memory block in bytes.
+		'''
+		return 0 if self.__data is None else self.__shm.size
+
+	@property
+	def utts(self):
+		'''
+		Get all utterance IDs.
+
+		Return:
+			a list of strings.
+		'''
+		return self.__keys[:]
+
+	@property
+	def lens(self):
+		'''
+		Get the frames of all utterances.
+
+		Return:
+			a tuple: (the number of utterances,a NumPy array of frames of each utterance).
+		'''
+		self.__check_open()
+		return len(self.__keys),np.diff(self.__offsets)
+
+	@property
+	def dtype(self):
+		self.__check_open()
+		return str(self.__data.dtype)
+
+	@property
+	def dim(self):
+		'''
+		Return:
+			0 for vector data,or an int value.
+		'''
+		self.__check_open()
+		return 0 if self.__data.ndim == 1 else self.__data.shape[1]
+
+	@property
+	def value(self):
+		'''
+		Get the packed data of all utterances.
+
+		Return:
+			a read-only NumPy array.
+		'''
+		self.__check_open()
+		return self.__data
+
+	def __len__(self):
+		return len(self.__keys)
+
+	def __contains__(self,key):
+		return key in self.__index
+
+	def __getitem__(self,key):
+		'''
+		Get the data of an utterance.
+
+		Return:
+			a read-only NumPy array which is a view of shared memory.
+		'''
+		self.__check_open()
+		i = self.__index[key]
+		return self.__data[self.__offsets[i]:self.__offsets[i+1]]
+
+	def keys(self):
+		return iter(self.__keys)
+
+	def values(self):
+		return ( self[key] for key in self.__keys )
+
+	def items(self):
+		return ( (key,self[key]) for key in self.__keys )
+
+	def to_numpy(self):
+		'''
+		Get an exkaldi NumPy archive whose arrays are views of shared memory.
+		The arrays are read-only. Please copy them before modifying.
+
+		Return:
+			an exkaldi NumPy archive object with the same type as the original archive.
+		'''
+		self.__check_open()
+		archiveClass = getattr(_archive,self.__kind)
+		return archiveClass(dict(self.items()),name=self.__name)
+
+	def close(self):
+		'''
+		Close the shared memory block in this process. 
+		All arrays got from this archive should have been deleted.
+		'''
+		if self.__shmClosed:
+			return
+		self.__data = None
+		self.__offsets = None
+		try:
+			self.__shm.close()
+		except BufferError:
+			raise WrongOperation("Some arrays got from the shared archive are still used. Delete them before closing it.")
+		self.__shmClosed = True
+
+	def unlink(self):
+		'''
+		Free the shared memory block. Only the owner should call it,after all processes have finished using it.
+		'''
+		if not self.__owner:
+			raise WrongOperation("Only the process which created the shared archive can unlink it.")
+		try:
+			self.__shm.unlink()
+		except FileNotFoundError:
+			pass
+
+def to_shared(archive,shmName=None):
+	'''
+	Copy an archive to a shared memory block.
+
+	Args:
+		<archive>: an exkaldi NumPy or bytes archive. All arrays should have the same data type and the same dimension.
+		<shmName>: None or a string,the name of shared memory block. If None,generate a unique name.
+
+	Return:
+		a SharedArchive object which owns the block.
+	'''
+	declare.belong_classes("archive",archive,[_archive.NumpyArchive,_archive.BytesArchive])
+	if isinstance(archive,_archive.BytesArchive):
+		archive = archive.to_numpy()
+	if shmName is not None:
+		declare.is_valid_string("shmName",shmName)
+
+	keys = list(archive.keys())
+	arrays = [ np.asarray(v) for v in archive.values() ]
+	if len(arrays) > 0:
+		dtype = arrays[0].dtype
+		tail = arrays[0].shape[1:]
+		for key,array in zip(keys,arrays):
+			if array.ndim == 0 or array.dtype != dtype or array.shape[1:] != tail:
+				raise WrongDataFormat(f"All arrays should have the same data type and dimension but {key} is different: {array.dtype} {array.shape}.")
+	else:
+		dtype = np.dtype("float32")
+		tail = ()
+
+	offsets = np.zeros([len(arrays)+1,],dtype=np.int64)
+	np.cumsum([ len(a) for a in arrays ],out=offsets[1:])
+
+	header = {"kind":type_name(archive),"name":archive.name,"dtype":dtype.str,"tail":list(tail),"keys":keys}
+	start = len(_SHM_MAGIC) + _SHM_HEAD.size
+	# The offsets of arrays depend on the size of header. Compute it with the placeholders which have the maximum digits.
+	headSize = len(json.dumps(dict(header,offsetsStart=2**63,dataStart=2**63)).encode("utf-8"))
+	header["offsetsStart"] = _align(start+headSize,8)
+	header["dataStart"] = _align(header["offsetsStart"]+offsets.nbytes,_DATA_ALIGNMENT)
+	dataSize = int(offsets[-1]) * dtype.itemsize * int(np.prod(tail,dtype=np.int64))
+	headBytes = json.dumps(header).encode("utf-8")
+
+	shm = shared_memory.SharedMemory(name=shmName,create=True,size=max(header["dataStart"]+dataSize,1))
+	try:
+		buf = shm.buf
+		buf[0:len(_SHM_MAGIC)] = _SHM_MAGIC
+		_SHM_HEAD.pack_into(buf,len(_SHM_MAGIC),_SHM_VERSION,len(headBytes))
+		buf[start:start+len(headBytes)] = headBytes
+		np.frombuffer(buf,dtype=np.int64,count=len(offsets),offset=header["offsetsStart"])[:] = offsets
+		data = np.frombuffer(buf,dtype=dtype,count=dataSize//dtype.itemsize,offset=header["dataStart"]).reshape((-1,)+tail)
+		for i,array in enumerate(arrays):
+			data[offsets[i]:offsets[i+1]] = array
+		del data,buf
+		return SharedArchive(shm,owner=True)
+	except Exception:
+		shm.close()
+		shm.unlink()
+		raise
+
+def attach_shared(shmName):
+	'''
+	Attach a shared archive created by another process.
+
+	Args:
+		<shmName>: the name of shared memory block.
+
+	Return:
+		a SharedArchive object.
+	'''
+	declare.is_valid_string("shmName",shmName)
+	try:
+		shm = _open_shared_memory(shmName)
+	except FileNotFoundError:
+		raise WrongPath(f"No such shared archive: {shmName}. It may have been unlinked.")
+	return SharedArchive(shm,owner=False)
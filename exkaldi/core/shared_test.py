@@ -0,0 +1,130 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.core.shared'''
+
+import os
+import sys
+import pickle
+import subprocess
+import multiprocessing
+import numpy as np
+import pytest
+from exkaldi.version import WrongPath,WrongOperation
+from exkaldi.core import shared
+from exkaldi.benchmark import synthetic
+
+def sum_utterance(args):
+  archive,utt = args
+  return float(archive[utt].sum())
+
+def test_shared_archive():
+
+  feat = synthetic.make_feat(utts=20,dim=5,minFrames=3,maxFrames=30)
+  with shared.to_shared(feat) as archive:
+    assert archive.is_owner
+    assert archive.utts == list(feat.keys())
+    assert archive.dim == 5 and archive.dtype == "float32"
+    assert archive.lens[1].sum() == len(archive.value)
+
+    # Arrays are views of the shared block.
+    attached = pickle.loads(pickle.dumps(archive))
+    assert not attached.is_owner and attached.shmName == archive.shmName
+    numpyFeat = attached.to_numpy()
+    assert type(numpyFeat).__name__ == "NumpyFeature" and numpyFeat.name == feat.name
+    for utt,value in feat.items():
+      assert np.array_equal(numpyFeat.data[utt],value)
+    with pytest.raises(ValueError):
+      attached[archive.utts[0]][0,0] = 1.0
+
+    # Arrays should be deleted before closing.
+    with pytest.raises(WrongOperation):
+      attached.close()
+    del numpyFeat
+    attached.close()
+    assert attached.is_closed
+
+    with multiprocessing.Pool(2) as pool:
+      sums = pool.map(sum_utterance,[ (archive,utt) for utt in archive.utts ])
+    assert np.allclose(sums,[ value.sum() for value in feat.values() ])
+
+  with pytest.raises(WrongPath):
+    shared.attach_shared(archive.shmName)
+
+def test_shared_alignment():
+
+  ali = synthetic.make_ali(utts=5,pdfs=10,minFrames=3,maxFrames=8)
+  archive = shared.to_shared(ali.to_bytes())
+  try:
+    assert archive.dim == 0
+    result = archive.to_numpy()
+    assert type(result).__name__ == "NumpyAlignmentTrans"
+    for utt,value in ali.items():
+      assert np.array_equal(result.data[utt],value)
+    del result
+  finally:
+    archive.close()
+    archive.unlink()
+
+ATTACH_SCRIPT = """
+import sys
+from exkaldi.core import shared
+archive = shared.attach_shared(sys.argv[1])
+print(float(archive[sys.argv[2]].sum()))
+archive.close()
+"""
+
+def test_attach_from_independent_process():
+
+  feat = synthetic.make_feat(utts=3,dim=5,minFrames=3,maxFrames=10)
+  utt = list(feat.keys())[0]
+  with shared.to_shared(feat) as archive:
+    env = dict(os.environ,PYTHONPATH=os.pathsep.join(sys.path))
+    for i in range(2):
+      out = subprocess.run([sys.executable,"-c",ATTACH_SCRIPT,archive.shmName,utt],env=env,
+                            stdout=subprocess.PIPE,stderr=subprocess.PIPE,check=True)
+      assert np.isclose(float(out.stdout),feat.data[utt].sum())
+      assert b"leaked" not in out.stderr
+    # The block is still available after the other process exited.
+    attached = shared.attach_shared(archive.shmName)
+    assert np.array_equal(attached[utt],feat.data[utt])
+    attached.close()
+
+def test_attach_is_not_tracked(monkeypatch):
+
+  from multiprocessing import resource_tracker
+  registered = []
+  feat = synthetic.make_feat(utts=3,dim=5,minFrames=3,maxFrames=10)
+  utt = list(feat.keys())[0]
+  with shared.to_shared(feat) as archive:
+    monkeypatch.setattr(resource_tracker,"register",lambda name,rtype: registered.append(name))
+    attached = shared.attach_shared(archive.shmName)
+    assert attached.shmName == archive.shmName
+    value = attached[utt]
+    assert np.array_equal(value,feat.data[utt])
+    with pytest.raises(WrongOperation):
+      attached.close()
+    del value
+    attached.close()
+  assert registered == []
+
+def test_core_without_shared_memory():
+
+  # exkaldi.core should be imported even if multiprocessing.shared_memory is not available (Python<3.8).
+  script = "import sys; sys.modules['multiprocessing.shared_memory'] = None; import exkaldi.core; exkaldi.core.load_feat"
+  env = dict(os.environ,PYTHONPATH=os.pathsep.join(sys.path))
+  subprocess.run([sys.executable,"-c",script],env=env,check=True)
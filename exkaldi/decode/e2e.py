@@ -25,7 +25,7 @@ from exkaldi.version import WrongPath, UnsupportedType, WrongDataFormat, WrongOp
 from exkaldi.utils.utils import run_shell_command, type_name
 from exkaldi.utils import declare
 from exkaldi.core.archive import Transcription, NumpyProbability
-from exkaldi.nn.nn import softmax
+from exkaldi.nn.nn import softmax, vocab_remap, ProbPostProcessor
 
 def convert_field(prob, originVocabs, targetVocabs, retainOOV=False):
     '''
@@ -39,54 +39,20 @@ def convert_field(prob, originVocabs, targetVocabs, retainOOV=False):
     Return:
         An new exkaldi probability object and a list of new target vocabulary.  
     '''	
-    declare.is_classes("originVocabs", originVocabs, list)
-    declare.is_classes("targetVocabs", targetVocabs, list)
-    assert len(targetVocabs) > 0, f"Target vocabulary is void."
-
     declare.is_probability("prob", prob)
     if type_name(prob) == "BytesProbability":
         prob = prob.to_numpy()
     elif type_name(prob) == "ArkIndexTable":
-        prob = prob.read_record("prob").to_numpy()
-    
-    probDim = prob.dim
-    declare.equal( "the dimension of probability", probdim, "the number of words", len(originVocabs))
+        prob = prob.fetch(arkType="prob").to_numpy()
 
-    origin_w2i = dict( (w,i) for i,w in enumerate(originVocabs) )
-    
-    retainIDs = []
-    newTargetVocabs = []
-    for w in targetVocabs:
-        try:
-            ID = origin_w2i[w]
-        except KeyError:
-            if retainOOV is True:
-                newTargetVocabs.append(w)
-                retainIDs.append(None)
-            else:
-                pass
-        else:
-            newTargetVocabs.append(w)
-            retainIDs.append(ID) 
+    declare.equal("the dimension of probability", prob.dim, "the number of words", len(originVocabs))
 
-    results = {}
-    for utt, pb in prob.items:
-        declare.is_classes("prob", prob, np.ndarray)
-        declare.is_classes("the rank of matrix shape", len(pb.shape), "expected rank", 2)
-        if retainOOV is True:
-            padding = np.min(pb, axis=1)
-        new = np.zeros(shape=(pb.shape[0], len(retainIDs)), dtype=np.float32)
-        for index, i in enumerate(retainIDs):
-            if i is None:
-                new[:, index] = padding
-            else:
-                new[:, index] = pb[:, i]
-            results[utt] = new
+    # Gather all target columns at once, rather than copying them one by one.
+    indexes, newTargetVocabs = vocab_remap(originVocabs, targetVocabs, retainOOV)
+    result = ProbPostProcessor(remap=indexes)(prob)
+    result.rename(f"convert({prob.name})")
 
-        results[utt] = new
-    
-    newName = f"convert({prob.name})"
-    return NumpyProbability(data=results, name=newName), newTargetVocabs
+    return result, newTargetVocabs
 
 def beam_search(prob, vocab, beam=5):
     '''
@@ -17,17 +17,233 @@
 
 """Make HCLG graph"""
 import os
+import json
+import types
+import struct
 import pickle
 import copy
+import numpy as np
 
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,KaldiProcessError,ShellProcessError,UnsupportedType
-from exkaldi.utils.utils import make_dependent_dirs,run_shell_command,type_name
+from exkaldi.utils.utils import make_dependent_dirs,run_shell_command,type_name,is_list_table
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import trace
 from exkaldi.core.archive import ListTable
 from exkaldi.core.load import load_list_table
 
+class _ReadOnlyListTable(ListTable):
+	'''
+	A memoized view of a lexicon held by LexiconBank. Copy it if you want to modify it.
+	'''
+	def __readonly(self,*args,**kwargs):
+		raise WrongOperation(f"Lexicon <{self.name}> is a read-only view. Please modify its copy instead.")
+
+	__setitem__ = __delitem__ = __ior__ = __readonly
+	clear = pop = popitem = setdefault = update = record = reset_data = rename = __readonly
+
+	def __reduce__(self):
+		# Copied or unpickled object is a normal ListTable.
+		return (ListTable,(dict(self),self.name))
+
+def _freeze(lexicon):
+	'''
+	Make a read-only view of int-format lexicon.
+	'''
+	if isinstance(lexicon,dict):
+		return types.MappingProxyType(lexicon)
+	elif isinstance(lexicon,list):
+		return tuple(lexicon)
+	else:
+		return lexicon
+
+## The compact format of LexiconBank file:
+## magic (12 bytes),version (uint32),header size (uint64),JSON header,and a payload of int arrays.
+## All strings are saved in one string table and lexicons refer to them by int IDs.
+_LEX_MAGIC = b"EXKALDI-LEX\x00"
+_LEX_VERSION = 1
+
+def _is_strings(items):
+	return all( isinstance(x,str) for x in items )
+
+def _is_groups(items):
+	return all( isinstance(x,(list,tuple)) and _is_strings(x) for x in items )
+
+class _LexiconPacker:
+	'''
+	Collect strings and int arrays when saving lexicons with compact format.
+	'''
+	def __init__(self):
+		self.strings = {}
+		self.arrays = []
+		self.size = 0
+
+	def add_ints(self,values):
+		values = np.array(values,dtype="int64")
+		# Use 32-bit integers if possible.
+		if len(values) == 0 or (values.min() >= -2**31 and values.max() < 2**31):
+			values = values.astype("int32")
+		return self.add_array(values)
+
+	def add_array(self,array):
+		array = np.ascontiguousarray(array)
+		desc = {"dtype":array.dtype.str,"offset":self.size,"count":len(array)}
+		self.arrays.append(array)
+		# Keep every array aligned to 8 bytes.
+		self.size += (array.nbytes + 7)//8*8
+		return desc
+
+	def add_strings(self,items):
+		strings = self.strings
+		ids = [ strings.setdefault(x,len(strings)) for x in items ]
+		return self.add_array(np.array(ids,dtype="int32"))
+
+	def add_groups(self,groups):
+		offsets = np.zeros(len(groups)+1,dtype="int64")
+		np.cumsum([ len(g) for g in groups ],out=offsets[1:])
+		return {"offsets":self.add_ints(offsets),"ids":self.add_strings( x for g in groups for x in g )}
+
+	def pack(self,lexicon):
+		'''
+		Pack a lexicon to a JSON-serializable descriptor.
+		'''
+		if isinstance(lexicon,str):
+			return {"kind":"string","value":lexicon}
+
+		elif isinstance(lexicon,(list,tuple)):
+			if _is_strings(lexicon):
+				return {"kind":"sequence","type":type(lexicon).__name__,"ids":self.add_strings(lexicon)}
+			elif _is_groups(lexicon):
+				return {"kind":"groups","type":type(lexicon).__name__,**self.add_groups(lexicon)}
+
+		elif isinstance(lexicon,dict):
+			keys = list(lexicon.keys())
+			values = list(lexicon.values())
+			if _is_strings(keys):
+				desc = {"kind":"table","keys":self.add_strings(keys),"flags":None}
+			elif all( isinstance(k,tuple) and len(k) == 2 and isinstance(k[0],str) and isinstance(k[1],int) for k in keys ):
+				desc = {"kind":"table","keys":self.add_strings( k[0] for k in keys ),"flags":self.add_ints([ k[1] for k in keys ])}
+			else:
+				desc = None
+
+			if desc is None:
+				pass
+			elif all( isinstance(v,int) and not isinstance(v,bool) for v in values ):
+				desc["values"] = {"kind":"ints","ids":self.add_ints(values)}
+				return desc
+			elif _is_strings(values):
+				desc["values"] = {"kind":"strings","ids":self.add_strings(values)}
+				return desc
+			elif _is_groups(values):
+				desc["values"] = {"kind":"groups",**self.add_groups(values)}
+				return desc
+			elif desc["flags"] is None:
+				return {"kind":"record","items":{ k:self.pack(v) for k,v in lexicon.items() }}
+
+		raise WrongDataFormat(f"Cannot save this lexicon with compact format: {type_name(lexicon)}.")
+
+	def write(self,fw,header):
+		'''
+		Write the string table,header and payload to a binary file handle.
+		'''
+		strings = list(self.strings.keys())
+		for x in strings:
+			if "\n" in x:
+				raise WrongDataFormat(f"Symbol in lexicon should not include line break: {repr(x)}.")
+		header["strings"] = self.add_array(np.frombuffer("\n".join(strings).encode("utf-8"),dtype="uint8"))
+		header["numStrings"] = len(strings)
+
+		header = json.dumps(header,ensure_ascii=False).encode("utf-8")
+		fw.write(_LEX_MAGIC)
+		fw.write(struct.pack("<IQ",_LEX_VERSION,len(header)))
+		fw.write(header)
+		for array in self.arrays:
+			fw.write(array.tobytes())
+			fw.write(b"\x00"*(-array.nbytes%8))
+
+class _LexiconUnpacker:
+	'''
+	Restore lexicons from the payload of a compact LexiconBank file.
+	'''
+	def __init__(self,payload,header):
+		self.payload = payload
+		blob = self.array(header["strings"]).tobytes().decode("utf-8")
+		self.strings = blob.split("\n") if header["numStrings"] > 0 else []
+
+	def array(self,desc):
+		return np.frombuffer(self.payload,dtype=np.dtype(desc["dtype"]),count=desc["count"],offset=desc["offset"])
+
+	def unpack_strings(self,desc):
+		strings = self.strings
+		return [ strings[i] for i in self.array(desc).tolist() ]
+
+	def unpack_groups(self,desc):
+		items = self.unpack_strings(desc["ids"])
+		offsets = self.array(desc["offsets"]).tolist()
+		return [ tuple(items[s:e]) for s,e in zip(offsets[:-1],offsets[1:]) ]
+
+	def unpack(self,desc):
+		kind = desc["kind"]
+		if kind == "string":
+			return desc["value"]
+		elif kind == "sequence":
+			result = self.unpack_strings(desc["ids"])
+			return tuple(result) if desc["type"] == "tuple" else result
+		elif kind == "groups":
+			result = self.unpack_groups(desc)
+			return tuple(result) if desc["type"] == "tuple" else result
+		elif kind == "record":
+			return { k:self.unpack(v) for k,v in desc["items"].items() }
+		elif kind == "table":
+			keys = self.unpack_strings(desc["keys"])
+			if desc["flags"] is not None:
+				keys = zip(keys,self.array(desc["flags"]).tolist())
+			values = desc["values"]
+			if values["kind"] == "ints":
+				values = self.array(values["ids"]).tolist()
+			elif values["kind"] == "strings":
+				values = self.unpack_strings(values["ids"])
+			else:
+				values = self.unpack_groups(values)
+			return dict(zip(keys,values))
+		else:
+			raise UnsupportedType(f"Unknown lexicon kind in compact file: {kind}.")
+
+class _PackedDictionaries(dict):
+	'''
+	Hold the lexicons loaded from a compact file. Every lexicon is unpacked when it is accessed firstly.
+	'''
+	def __init__(self,unpacker,descs):
+		super().__init__( (name,None) for name in descs.keys() )
+		self.__unpacker = unpacker
+		self.__descs = dict(descs)
+
+	def __getitem__(self,name):
+		desc = self.__descs.pop(name,None)
+		if desc is not None:
+			if desc["kind"] == "alias":
+				# Some lexicons share the same object.
+				value = self[desc["target"]]
+			else:
+				value = self.__unpacker.unpack(desc)
+			super().__setitem__(name,value)
+			if len(self.__descs) == 0:
+				self.__unpacker = None
+		return super().__getitem__(name)
+
+	def __setitem__(self,name,value):
+		self.__descs.pop(name,None)
+		super().__setitem__(name,value)
+
+	def __delitem__(self,name):
+		self.__descs.pop(name,None)
+		super().__delitem__(name)
+
+	def __reduce__(self):
+		# Unpack all lexicons when it is copied or pickled.
+		return (dict,([ (name,self[name]) for name in self.keys() ],))
+
 class LexiconBank:
 	'''
 	This class is designed to hold all lexicons which are going to be used when user want to make decoding graph.
@@ -94,8 +310,25 @@ class LexiconBank:
 		self.__validate_extraDisambigWords()
 		# Satrt to initialize all lexicons 
 		self.__dictionaries = {}
+		self.__views = {}
 		self.__initialize_dictionaries(pronFile)
 
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		# Memoized views are not saved.
+		state.pop("_LexiconBank__views",None)
+		return state
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		self.__views = {}
+
+	def __clear_views(self):
+		'''
+		Discard memoized views. It is called every time when lexicons are modified.
+		'''
+		self.__views = {}
+
 	def __validate_extraDisambigWords(self):
 		'''
 		This method is used to check whether extra disambiguation words provided have a right format.
@@ -342,8 +575,9 @@ class LexiconBank:
 		## Check if it is a disambiguated lexicon
 		if dictType != "lexicon":
 			cmd = f'grep "#1" -m 1 < {lexiconFile}'
-			out,err,cod = run_shell_command(cmd,stdout="PIPE")
-			if (isinstance(cod,int) and cod != 0):
+			out,err,cod = run_shell_command(cmd,stdout="PIPE",stderr="PIPE")
+			# grep exits with 1 if no line is selected.
+			if (isinstance(cod,int) and cod not in [0,1]):
 				print(err.decode())
 				raise ShellProcessError("Failed to vertify disambig symbol.")
 			elif len(out) > 0:
@@ -679,6 +913,7 @@ class LexiconBank:
 
 		tempDisambig = sorted(list(set(tempDisambig)))[-1]
 		self.__parameters["ndisambig"] = tempDisambig + self.__parameters["extraDisambigPhoneNumbers"]
+		self.__dictionaries["disambig"] = []
 		for i in range( self.__parameters["ndisambig"] + 1 ):
 			self.__dictionaries["disambig"].append("#%d"%i)
 		self.__dictionaries["disambig"].extend( self.__parameters["extraDisambigWords"] )
@@ -767,6 +1002,9 @@ class LexiconBank:
 
 			Some lexicons have not corresponding Int-ID table. So if you require them,a warning message will be printed and None will be returned.
 		
+			"words","phones" and int-format lexicons are memoized read-only views,which are rebuilt after lexicons are reset or updated.
+			Int-format lexicons are returned as read-only mapping or tuple objects.
+
 		Return:
 			dict,ListTable,list,tuple or str object depending on which lexicon you selected.
 		'''
@@ -778,96 +1016,117 @@ class LexiconBank:
 		except KeyError:
 			raise WrongOperation(f'No such lexicon: "{name}".')
 
+		key = (name,returnInt is not False)
+		try:
+			return self.__views[key]
+		except KeyError:
+			pass
+
 		if returnInt is False:
 			result = self.__dictionaries[name]
 			if name in ["words","phones"]:
-				result = ListTable(result,name=name)
+				result = _ReadOnlyListTable(result,name=name)
+				self.__views[key] = result
 			return result
 
 		else:
-			if name in ["lexiconp","lexiconp_disambig"]:
-				temp = {}
-				for word,pron in self.__dictionaries[name].items():
-					word = (str(self.__dictionaries["words"][word[0]]),word[1])
-					new = [pron[0]]
-					for phone in pron[1:]:
-						new.append(str(self.__dictionaries["phones"][phone]))
-					temp[word] = tuple(new)
-				return temp
-
-			elif name in ["lexiconp_silprob","lexiconp_silprob_disambig"]:
-				temp = {}
-				for word,pron in self.__dictionaries[name].items():
-					word = (str(self.__dictionaries["words"][word[0]]),word[1])
-					new = []
-					for phone in pron[4:]:
-						new.append(str(self.__dictionaries["phones"][phone]))
-					temp[word] = pron[0:4] + tuple(new)
-				return temp
-
-			elif name in ["phones","words","phone_map","silence_phone_map","nonsilence_phone_map","nonsilence_phones","silence_phones","silprob"]:
-				print('Warning: "{}" is unsupported to generate corresponding int table.'.format(name))
-				return None
-
-			elif name in ["align_lexicon"]:
-				temp = {}
-				for word,wordPron in self.__dictionaries[name].items():
-					word = (str(self.__dictionaries["words"][word[0]]),word[1])
-					new = [word[0],]
-					for phone in wordPron[1:]:
-						new.append( str(self.__dictionaries["phones"][phone]) )
-					temp[word] = tuple(new)
-				return temp
-
-			elif name in ["disambig","silence","nonsilence","wdisambig_phones","context_indep"]:
-				temp = []
-				for phone in self.__dictionaries[name]:
-					temp.append( str(self.__dictionaries["phones"][phone]) )
-				return temp
-
-			elif name in ["extra_questions","sets"]:
-				temp = []
-				for phones in self.__dictionaries[name]:
-					new = []
-					for phone in phones:
-						new.append( str(self.__dictionaries["phones"][phone]) )
-					temp.append(tuple(new))
-				return temp
-
-			elif name in ["wdisambig","wdisambig_words"]:
-				temp = []
-				for word in self.__dictionaries[name]:
-					temp.append( str(self.__dictionaries["words"][word]) )
-				return temp
-
-			elif name in ["word_boundary"]:
-				temp = {}
-				for phone,flg in self.__dictionaries[name].items():
-					phone = str(self.__dictionaries["phones"][phone])
-					temp[phone] = flg
-				return temp
-
-			elif name in ["oov"]:
-				return str(self.__dictionaries["words"][self.__dictionaries[name]])
-			
-			elif name in ["optional_silence"]:
-				return str(self.__dictionaries["phones"][self.__dictionaries[name]])
-
-			elif name in ["roots"]:
-				temp1 = []
-				temp2 = []
-				for phone in self.__dictionaries[name]["not-shared not-split"]:
-					temp1.append( str(self.__dictionaries["phones"][phone]) )
-				for sharedPhones in self.__dictionaries[name]["shared split"]:
-					new = []
-					for phone in sharedPhones:
-						new.append( str(self.__dictionaries["phones"][phone]) )
-					temp2.append(tuple(new))
-
-				return {"not-shared not-split": tuple(temp1),"shared split": tuple(temp2) }
-			
-			else:
-				raise WrongOperation(f'Failed to convert lexicon "{name}" to int-number format.')
+			result = self.__make_int_lexicon(name)
+			if result is not None:
+				result = _freeze(result)
+				self.__views[key] = result
+			return result
+
+	def __make_int_lexicon(self,name):
+		'''
+		Replace phones or words of a lexicon with ID number (but with str format).
+		'''
+		wordTable = self.__dictionaries["words"]
+		# Phones are much less than the items of lexicons,so convert their IDs to strings in advance.
+		phoneTable = dict( (phone,str(ID)) for phone,ID in self.__dictionaries["phones"].items() )
+
+		if name in ["lexiconp","lexiconp_disambig"]:
+			temp = {}
+			for word,pron in self.__dictionaries[name].items():
+				word = (str(wordTable[word[0]]),word[1])
+				new = [pron[0]]
+				for phone in pron[1:]:
+					new.append(phoneTable[phone])
+				temp[word] = tuple(new)
+			return temp
+
+		elif name in ["lexiconp_silprob","lexiconp_silprob_disambig"]:
+			temp = {}
+			for word,pron in self.__dictionaries[name].items():
+				word = (str(wordTable[word[0]]),word[1])
+				new = []
+				for phone in pron[4:]:
+					new.append(phoneTable[phone])
+				temp[word] = pron[0:4] + tuple(new)
+			return temp
+
+		elif name in ["phones","words","phone_map","silence_phone_map","nonsilence_phone_map","nonsilence_phones","silence_phones","silprob"]:
+			print('Warning: "{}" is unsupported to generate corresponding int table.'.format(name))
+			return None
+
+		elif name in ["align_lexicon"]:
+			temp = {}
+			for word,wordPron in self.__dictionaries[name].items():
+				word = (str(wordTable[word[0]]),word[1])
+				new = [word[0],]
+				for phone in wordPron[1:]:
+					new.append( phoneTable[phone] )
+				temp[word] = tuple(new)
+			return temp
+
+		elif name in ["disambig","silence","nonsilence","wdisambig_phones","context_indep"]:
+			temp = []
+			for phone in self.__dictionaries[name]:
+				temp.append( phoneTable[phone] )
+			return temp
+
+		elif name in ["extra_questions","sets"]:
+			temp = []
+			for phones in self.__dictionaries[name]:
+				new = []
+				for phone in phones:
+					new.append( phoneTable[phone] )
+				temp.append(tuple(new))
+			return temp
+
+		elif name in ["wdisambig","wdisambig_words"]:
+			temp = []
+			for word in self.__dictionaries[name]:
+				temp.append( str(wordTable[word]) )
+			return temp
+
+		elif name in ["word_boundary"]:
+			temp = {}
+			for phone,flg in self.__dictionaries[name].items():
+				phone = phoneTable[phone]
+				temp[phone] = flg
+			return temp
+
+		elif name in ["oov"]:
+			return str(wordTable[self.__dictionaries[name]])
+		
+		elif name in ["optional_silence"]:
+			return phoneTable[self.__dictionaries[name]]
+
+		elif name in ["roots"]:
+			temp1 = []
+			temp2 = []
+			for phone in self.__dictionaries[name]["not-shared not-split"]:
+				temp1.append( phoneTable[phone] )
+			for sharedPhones in self.__dictionaries[name]["shared split"]:
+				new = []
+				for phone in sharedPhones:
+					new.append( phoneTable[phone] )
+				temp2.append(tuple(new))
+
+			return {"not-shared not-split": tuple(temp1),"shared split": tuple(temp2) }
+		
+		else:
+			raise WrongOperation(f'Failed to convert lexicon "{name}" to int-number format.')
 
 	def dump_dict(self,name,fileName=None,dumpInt=False):
 		'''
@@ -994,27 +1253,71 @@ class LexiconBank:
 
 					self.dump_dict(name,fileName+".int",True)
 
-	def save(self,fileName):
+	def save(self,fileName,compact=True):
 		'''
 		Save LexiconBank object to a binary file.
 
 		Args:
 			<fileName>: file name with suffix .lex.
+			<compact>: If True,save with compact format: a string table and int arrays,which is loaded quickly and lazily.
+						If False,save the pickled object.
 
 		Return:
 			the saved file name.
 		'''
 		declare.is_valid_string("fileName",fileName)
+		declare.is_bool("compact",compact)
 		if not fileName.rstrip().endswith(".lex"):
 			fileName += ".lex"
 		declare.is_valid_file_name("fileName",fileName)
 		make_dependent_dirs(fileName,pathIsFile=True)
 
-		with open(fileName,"wb") as fw:
-			pickle.dump(self,fw)
+		if compact:
+			packer = _LexiconPacker()
+			descs = {}
+			for name in self.__dictionaries.keys():
+				lexicon = self.__dictionaries[name]
+				for other in descs.keys():
+					if isinstance(lexicon,(list,dict)) and self.__dictionaries[other] is lexicon:
+						descs[name] = {"kind":"alias","target":other}
+						break
+				else:
+					descs[name] = packer.pack(lexicon)
+			header = {
+				"parameters":self.__parameters,
+				"retainOriginalSilPron":self.__retain_original_sil_pron,
+				"retainOriginalUnkPron":self.__retain_original_unk_pron,
+				"lexicons":descs,
+			}
+			with open(fileName,"wb") as fw:
+				packer.write(fw,header)
+		else:
+			with open(fileName,"wb") as fw:
+				pickle.dump(self,fw)
 
 		return fileName
 
+	@classmethod
+	def _from_compact(cls,buffer):
+		'''
+		Restore a LexiconBank object from the content of a compact file.
+		'''
+		version,headerSize = struct.unpack_from("<IQ",buffer,len(_LEX_MAGIC))
+		if version > _LEX_VERSION:
+			raise UnsupportedType(f"Lexicon bank file version {version} is newer than supported version {_LEX_VERSION}. Please update exkaldi.")
+		start = len(_LEX_MAGIC) + struct.calcsize("<IQ")
+		header = json.loads(buffer[start:start+headerSize].decode("utf-8"))
+		payload = memoryview(buffer)[start+headerSize:]
+
+		obj = cls.__new__(cls)
+		obj.__parameters = header["parameters"]
+		obj.__retain_original_sil_pron = header["retainOriginalSilPron"]
+		obj.__retain_original_unk_pron = header["retainOriginalUnkPron"]
+		obj.__dictionaries = _PackedDictionaries(_LexiconUnpacker(payload,header),header["lexicons"])
+		obj.__views = {}
+		
+		return obj
+
 	#------------------------------------- Advance functions ------------------------------
 
 	def reset_phones(self,target):
@@ -1026,7 +1329,7 @@ class LexiconBank:
 		'''
 		if isinstance(target,str):
 			target = load_list_table(target)
-		elif type_name(target) not in ["dict","ListTable"]:
+		elif type_name(target) != "dict" and not is_list_table(target):
 			raise WrongOperation(f"<target> should be a file path,dict or ListTable object but got: {type_name(target)}.")
 		
 		phone2id = {}
@@ -1085,6 +1388,7 @@ class LexiconBank:
 
 		del self.__dictionaries["phones"]
 		self.__dictionaries["phones"] = phone2id
+		self.__clear_views()
 			
 	def reset_words(self,target):
 		'''
@@ -1095,7 +1399,7 @@ class LexiconBank:
 		'''
 		if isinstance(target,str):
 			target = load_list_table(target)
-		elif type_name(target) not in ["dict","ListTable"]:
+		elif type_name(target) != "dict" and not is_list_table(target):
 			raise WrongOperation(f"<target> should be a file path,dict or ListTable object but got: {type_name(target)}.")
 		
 		word2id = {}
@@ -1142,6 +1446,7 @@ class LexiconBank:
 		
 		del self.__dictionaries["words"]
 		self.__dictionaries["words"] = word2id
+		self.__clear_views()
 
 	def add_extra_question(self,question):
 		'''
@@ -1157,6 +1462,7 @@ class LexiconBank:
 			if not phone in self.__dictionaries["silence_phones"] + self.__dictionaries["nonsilence_phones"]:
 				raise WrongDataFormat('Phoneme "{}" in extra questions is not existed in "phones".'.format(phone))
 		self.__dictionaries["extra_questions"].append( tuple(question) )
+		self.__clear_views()
 
 	def update_prob(self,targetFile):
 		'''
@@ -1168,6 +1474,7 @@ class LexiconBank:
 		declare.is_file("target probability file",targetFile)
 		
 		dictType,dataList = self.__check_lexicon_type(targetFile)
+		self.__clear_views()
 
 		## If it is "lexiconp",update [lexiconp(_disambig)]. If [lexiconp_silprob(disambig)] are also existed,update them too.
 		if dictType == "lexiconp":
@@ -1420,7 +1727,7 @@ def lexicon_bank(pronFile,silWords=["<sil>"],unkSymbol="unk",optionalSilPhone="<
 
 def load_lex(target):
 	'''
-	Load LexiconBank object from file.
+	Load LexiconBank object from file. Both compact format and pickled object are supported.
 
 	Args:
 		<target>: file name.
@@ -1431,11 +1738,17 @@ def load_lex(target):
 	declare.is_file("target",target)
 	
 	with open(target,"rb") as fr:
-		obj = pickle.load(fr)
+		buffer = fr.read()
+	if buffer.startswith(_LEX_MAGIC):
+		obj = LexiconBank._from_compact(buffer)
+	else:
+		# The file saved by earlier exkaldi is a pickled object.
+		obj = pickle.loads(buffer)
 	declare.is_lexicon_bank("target",obj)
 
 	return obj
 
+@trace.traced()
 def make_L(lexicons,outFile,useSilprobLexicon=False,useSilprob=0.5,useDisambigLexicon=False):
 	'''
 	Generate L.fst(or L_disambig.fst) file
@@ -1539,6 +1852,7 @@ def make_L(lexicons,outFile,useSilprobLexicon=False,useSilprob=0.5,useDisambigLe
 		else:
 			return os.path.abspath(outFile)		
 
+@trace.traced()
 def make_G(lexicons,arpaFile,outFile,order=3):
 	'''
 	Transform ARPA format language model to FST format. 
@@ -1598,6 +1912,7 @@ def fst_is_stochastic(fstFile):
 	else:
 		return True
 
+@trace.traced()
 def compose_LG(LFile,GFile,outFile="LG.fst"):
 	'''
 	Compose L and G to LG
@@ -1629,6 +1944,7 @@ def compose_LG(LFile,GFile,outFile="LG.fst"):
 	else:
 		return os.path.abspath(outFile)
 
+@trace.traced()
 def compose_CLG(lexicons,tree,LGFile,outFile="CLG.fst"):
 	'''
 	Compose tree and LG to CLG file.
@@ -1682,6 +1998,7 @@ def compose_CLG(lexicons,tree,LGFile,outFile="CLG.fst"):
 		else:
 			return outFile,iLabelFile
 
+@trace.traced()
 def compose_HCLG(hmm,tree,CLGFile,iLabelFile,outFile="HCLG.fst",transScale=1.0,loopScale=0.1,removeOOVFile=None):	
 	'''
 	Compose HCLG file.
@@ -1765,6 +2082,7 @@ def compose_HCLG(hmm,tree,CLGFile,iLabelFile,outFile="HCLG.fst",transScale=1.0,l
 		else:
 			return outFile
 
+@trace.traced()
 def make_graph(lexicons,hmm,tree,tempDir,useSilprobLexicon=False,useSilprob=0.5,
 				useDisambigLexicon=False,useLFile=None,arpaFile=None,order=3,useGFile=None,outFile="HCLG.fst",
 				transScale=1.0,loopScale=0.1,removeOOVFile=None):
@@ -0,0 +1,112 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''Tests for exkaldi.decode.graph'''
+
+import copy
+import pickle
+import pytest
+from exkaldi.version import WrongOperation
+from exkaldi.core.archive import ListTable
+from exkaldi.utils import declare
+from exkaldi.utils.utils import FileHandleManager,type_name,is_list_table
+from exkaldi.decode import graph
+from exkaldi.decode import wfst
+
+LEXICON = """<sil> 1.0 <sil> #3
+unk 1.0 spn #4
+hello 1.0 h eh l ow
+world 1.0 w er l d
+hi 0.6 h ay #1
+hi 0.4 h iy #2
+"""
+
+@pytest.fixture
+def lexicons(tmp_path):
+  pronFile = tmp_path / "lexiconp_disambig.txt"
+  pronFile.write_text(LEXICON)
+  return graph.LexiconBank(str(pronFile),silWords=["<sil>"],unkSymbol=["unk"],positionDependent=True)
+
+def test_views_are_memoized_and_read_only(lexicons):
+  words = lexicons("words")
+  assert isinstance(words,ListTable)
+  assert lexicons("words") is words
+  assert lexicons("lexiconp",True) is lexicons("lexiconp",True)
+  with pytest.raises(WrongOperation):
+    words["new"] = 100
+  with pytest.raises(WrongOperation):
+    words.rename("new")
+  assert words.name == "words"
+  with pytest.raises(TypeError):
+    lexicons("lexiconp",True)[("1",0)] = ("1.0",)
+  # A copy is a normal table.
+  newWords = copy.deepcopy(words)
+  newWords["new"] = 100
+  assert "new" not in lexicons("words")
+
+def test_views_are_invalidated(lexicons,tmp_path):
+  words = lexicons("words")
+  intLexicon = lexicons("lexiconp",True)
+  newWords = dict( (w,i) for i,w in enumerate(sorted(words.keys(),reverse=True)) )
+  lexicons.reset_words(newWords)
+  assert lexicons("words") is not words
+  assert lexicons("words")["hello"] == newWords["hello"]
+  assert lexicons("lexiconp",True) is not intLexicon
+
+  probFile = tmp_path / "lexiconp.txt"
+  probFile.write_text("<sil> 1.0 <sil>_S\nunk 1.0 spn_S\nhello 1.0 h_B eh_I l_I ow_E\nworld 1.0 w_B er_I l_I d_E\nhi 0.3 h_B ay_E\nhi 0.7 h_B iy_E\n")
+  intLexicon = lexicons("lexiconp",True)
+  lexicons.update_prob(str(probFile))
+  assert lexicons("lexiconp",True) is not intLexicon
+  assert sorted( p[0] for w,p in lexicons("lexiconp").items() if w[0] == "hi" ) == ["0.3","0.7"]
+
+def test_compact_save_and_load(lexicons,tmp_path):
+  fileName = lexicons.save(str(tmp_path / "bank"))
+  assert fileName.endswith(".lex")
+  loaded = graph.load_lex(fileName)
+  assert loaded.view == lexicons.view
+  assert loaded.get_parameter() == lexicons.get_parameter()
+  for name in lexicons.view:
+    assert loaded(name) == lexicons(name)
+    if name not in ["phones","words","phone_map","silence_phone_map","nonsilence_phone_map","nonsilence_phones","silence_phones","silprob"]:
+      assert loaded(name,True) == lexicons(name,True)
+  # Lexicons which shared one object are still shared.
+  assert loaded("context_indep") is loaded("silence")
+  # A loaded object can be pickled and saved again.
+  again = pickle.loads(pickle.dumps(loaded))
+  assert again("lexiconp") == lexicons("lexiconp")
+  assert graph.load_lex(again.save(str(tmp_path / "again.lex")))("words") == lexicons("words")
+
+def test_load_pickled_file(lexicons,tmp_path):
+  fileName = lexicons.save(str(tmp_path / "bank.lex"),compact=False)
+  loaded = graph.load_lex(fileName)
+  assert loaded("align_lexicon") == lexicons("align_lexicon")
+  assert loaded("words") is loaded("words")
+
+def test_views_are_accepted_as_list_tables(lexicons):
+  words = lexicons("words")
+  assert type_name(words) != "ListTable" and is_list_table(words)
+  declare.is_list_table("words",words)
+  declare.is_potential_list_table("words",words)
+  declare.is_classes("words",words,"ListTable")
+  # The view is dumped as a symbol table file like a normal ListTable.
+  lattice = wfst.Lattice(name="lat")
+  with FileHandleManager() as fhm:
+    resources,_,_,_ = lattice._Lattice__prepare_1best(fhm,words,None,1,1.0,False,None)
+    with open(resources["words"][0],"r",encoding="utf-8") as fr:
+      assert len(fr.readlines()) == len(words)
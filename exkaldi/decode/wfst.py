@@ -22,11 +22,12 @@ import numpy as np
 
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,KaldiProcessError,UnsupportedType
-from exkaldi.utils.utils import run_shell_command,make_dependent_dirs,type_name,check_config,list_files
+from exkaldi.utils.utils import run_shell_command,make_dependent_dirs,type_name,check_config,list_files,is_list_table
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import trace
 from exkaldi.core.archive import BytesArchive,Transcription,ListTable,BytesAlignmentTrans,NumpyAlignmentTrans,Metric
-from exkaldi.core.common import check_multiple_resources,run_kaldi_commands_parallel 
+from exkaldi.core.common import check_multiple_resources,run_kaldi_commands_parallel,run_kaldi_commands_async
 from exkaldi.nn.nn import log_softmax
 from exkaldi.hmm.hmm import load_hmm
 from exkaldi.core.load import load_transcription
@@ -97,6 +98,7 @@ class Lattice(BytesArchive):
 			fileName.seek(0)
 			return fileName
 
+	@trace.traced()
 	def get_1best(self,symbolTable=None,hmm=None,lmwt=1,acwt=1.0,phoneLevel=False,outFile=None):
 		'''
 		Get 1 best result with text format.
@@ -119,88 +121,119 @@ class Lattice(BytesArchive):
 		declare.not_void(type_name(self),self)
 
 		with FileHandleManager() as fhm:
-			# check the format of word symbol table
-			if symbolTable is None:
-				assert self.symbolTable is not None,"<symbolTable> is necessary because no word symbol table is avaliable."
-				symbolTable = self.symbolTable
-			
-			if isinstance(symbolTable,str):
-				assert os.path.isfile(symbolTable),f"No such file: {symbolTable}."
-			elif type_name(symbolTable) == "LexiconBank":
-				symbolTableTemp = fhm.create("w+",encoding="utf-8")
-				if phoneLevel is True:
-					symbolTable.dump_dict("phones",symbolTableTemp,False)
-				else:
-					symbolTable.dump_dict("words",symbolTableTemp,False)
-				symbolTable = symbolTableTemp.name
-			elif type_name(symbolTable) == "ListTable":
-				symbolTableTemp = fhm.create("w+",encoding="utf-8")
-				symbolTable.save(symbolTableTemp)
-				symbolTable = symbolTableTemp.name
-			else:
-				raise UnsupportedType(f"<symbolTable> should be file name,exkaldi LexiconBank or ListTable object but got: {type_name(symbolTable)}.")
-			
+			resources,cmdPattern,outputName,outFiles = self.__prepare_1best(fhm,symbolTable,hmm,lmwt,acwt,phoneLevel,outFile)
+			results = run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True)
+			return self.__collect_1best(results,outFiles,outputName)
+
+	async def get_1best_async(self,symbolTable=None,hmm=None,lmwt=1,acwt=1.0,phoneLevel=False,outFile=None):
+		'''
+		The asyncio version of .get_1best(). If the task is cancelled,the Kaldi processes will be killed.
+
+		Args:
+			The same as .get_1best().
+
+		Return:
+			exkaldi Transcription object.
+		'''
+		declare.is_bool("phoneLevel",phoneLevel)
+		declare.kaldi_existed()
+		declare.not_void(type_name(self),self)
+
+		with FileHandleManager() as fhm:
+			resources,cmdPattern,outputName,outFiles = self.__prepare_1best(fhm,symbolTable,hmm,lmwt,acwt,phoneLevel,outFile)
+			results = await run_kaldi_commands_async(resources,cmdPattern,analyzeResult=True)
+			return self.__collect_1best(results,outFiles,outputName)
+
+	def __prepare_1best(self,fhm,symbolTable,hmm,lmwt,acwt,phoneLevel,outFile):
+		'''
+		Check the arguments of .get_1best() and make the resources and command pattern.
+		'''
+		# check the format of word symbol table
+		if symbolTable is None:
+			assert self.symbolTable is not None,"<symbolTable> is necessary because no word symbol table is avaliable."
+			symbolTable = self.symbolTable
+		
+		if isinstance(symbolTable,str):
+			assert os.path.isfile(symbolTable),f"No such file: {symbolTable}."
+		elif type_name(symbolTable) == "LexiconBank":
+			symbolTableTemp = fhm.create("w+",encoding="utf-8")
 			if phoneLevel is True:
-				# check the format of HMM
-				if hmm is None:
-					assert self.hmm is not None,"<hmm> is necessary because no HMM model is avaliable."
-					hmm = self.hmm
-				declare.is_potential_hmm("hmm",hmm)
-				if not isinstance(hmm,str):
-					hmmTemp = fhm.create("wb+",suffix=".mdl")
-					hmm.save(hmmTemp)
-					hmm = hmmTemp.name
+				symbolTable.dump_dict("phones",symbolTableTemp,False)
 			else:
-				hmm = "placeholder"
+				symbolTable.dump_dict("words",symbolTableTemp,False)
+			symbolTable = symbolTableTemp.name
+		elif is_list_table(symbolTable):
+			symbolTableTemp = fhm.create("w+",encoding="utf-8")
+			symbolTable.save(symbolTableTemp)
+			symbolTable = symbolTableTemp.name
+		else:
+			raise UnsupportedType(f"<symbolTable> should be file name,exkaldi LexiconBank or ListTable object but got: {type_name(symbolTable)}.")
+		
+		if phoneLevel is True:
+			# check the format of HMM
+			if hmm is None:
+				assert self.hmm is not None,"<hmm> is necessary because no HMM model is avaliable."
+				hmm = self.hmm
+			declare.is_potential_hmm("hmm",hmm)
+			if not isinstance(hmm,str):
+				hmmTemp = fhm.create("wb+",suffix=".mdl")
+				hmm.save(hmmTemp)
+				hmm = hmmTemp.name
+		else:
+			hmm = "placeholder"
 
-			symbolTables,hmms,lmwts,acwts,outFiles = check_multiple_resources(symbolTable,hmm,lmwt,acwt,outFile=outFile)
-			
-			if len(outFiles) > 1:
-				latTemp = fhm.create("wb+",suffix=".lat")
-				self.save(latTemp)
-				lat = latTemp.name
-			else:
-				lat = self
-			
-			lats = []
-			for lmwt,acwt in zip(lmwts,acwts):
-				declare.is_positive("lmwt",lmwt)
-				declare.is_positive("acwt",acwt)
-				lats.append(lat)
-
-			if phoneLevel:
-				cmdPattern = 'lattice-align-phones --replace-output-symbols=true {model} ark:{lat} ark:- | '
-				cmdPattern += "lattice-best-path --lm-scale={lmwt} --acoustic-scale={acwt} --word-symbol-table={words} ark:- ark,t:{outFile}"
-				outputName = '1-best-phone'
-			else:
-				cmdPattern = "lattice-best-path --lm-scale={lmwt} --acoustic-scale={acwt} --word-symbol-table={words} ark:{lat} ark,t:{outFile}"
-				outputName = '1-best-word'
+		symbolTables,hmms,lmwts,acwts,outFiles = check_multiple_resources(symbolTable,hmm,lmwt,acwt,outFile=outFile)
+		
+		if len(outFiles) > 1:
+			latTemp = fhm.create("wb+",suffix=".lat")
+			self.save(latTemp)
+			lat = latTemp.name
+		else:
+			lat = self
+		
+		lats = []
+		for lmwt,acwt in zip(lmwts,acwts):
+			declare.is_positive("lmwt",lmwt)
+			declare.is_positive("acwt",acwt)
+			lats.append(lat)
+
+		if phoneLevel:
+			cmdPattern = 'lattice-align-phones --replace-output-symbols=true {model} ark:{lat} ark:- | '
+			cmdPattern += "lattice-best-path --lm-scale={lmwt} --acoustic-scale={acwt} --word-symbol-table={words} ark:- ark,t:{outFile}"
+			outputName = '1-best-phone'
+		else:
+			cmdPattern = "lattice-best-path --lm-scale={lmwt} --acoustic-scale={acwt} --word-symbol-table={words} ark:{lat} ark,t:{outFile}"
+			outputName = '1-best-word'
 
-			resources = {"lat":lats,"words":symbolTables,"model":hmms,"lmwt":lmwts,"acwt":acwts,"outFile":outFiles}
+		resources = {"lat":lats,"words":symbolTables,"model":hmms,"lmwt":lmwts,"acwt":acwts,"outFile":outFiles}
 
-			results = run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True)
+		return resources,cmdPattern,outputName,outFiles
 
-			if len(outFiles) == 1:
-				outFile = outFiles[0]
-				if outFile == "-":
-					outbuffer = results[2].decode().strip().split("\n")
-					results = Transcription(name=outputName)
-					for line in outbuffer:
-						line = line.strip().split(maxsplit=1)
-						if len(line) == 0:
-							continue
-						elif len(line) == 1:
-							results[line[0]] = " "
-						else:
-							results[line[0]] = line[1]
-				else:
-					results = load_transcription(outFile,name=outputName)
+	def __collect_1best(self,results,outFiles,outputName):
+		'''
+		Make Transcription objects from the results.
+		'''
+		if len(outFiles) == 1:
+			outFile = outFiles[0]
+			if outFile == "-":
+				outbuffer = results[2].decode().strip().split("\n")
+				results = Transcription(name=outputName)
+				for line in outbuffer:
+					line = line.strip().split(maxsplit=1)
+					if len(line) == 0:
+						continue
+					elif len(line) == 1:
+						results[line[0]] = " "
+					else:
+						results[line[0]] = line[1]
 			else:
-				for i,fileName in enumerate(outFiles):
-					results[i] = load_transcription(fileName,name=outputName)
-			
-			return results
-	
+				results = load_transcription(outFile,name=outputName)
+		else:
+			for i,fileName in enumerate(outFiles):
+				results[i] = load_transcription(fileName,name=outputName)
+		
+		return results
+
 	def scale(self,acwt=1,invAcwt=1,ac2lm=0,lmwt=1,lm2ac=0):
 		'''
 		Scale lattice.
@@ -263,6 +296,7 @@ class Lattice(BytesArchive):
 			newName = f"add_penalty({self.name})"
 			return Lattice(data=out,symbolTable=self.symbolTable,hmm=self.hmm,name=newName)
 
+	@trace.traced()
 	def get_nbest(self,n,symbolTable=None,hmm=None,acwt=1,phoneLevel=False,requireAli=False,requireCost=False):
 		'''
 		Get N best result with text format.
@@ -298,7 +332,7 @@ class Lattice(BytesArchive):
 				else:
 					symbolTable.dump_dict("words",wordSymbolTemp)
 				symbolTable = wordSymbolTemp.name
-			elif type_name(symbolTable) == "ListTable":
+			elif is_list_table(symbolTable):
 				wordSymbolTemp = fhm.create('w+',suffix=".txt",encoding='utf-8')
 				symbolTable.save(wordSymbolTemp)
 				symbolTable = wordSymbolTemp.name
@@ -418,6 +452,7 @@ class Lattice(BytesArchive):
 
 			return finalResult
 
+	@trace.traced()
 	def determinize(self,acwt=1.0,beam=6):
 		'''
 		Determinize the lattice.
@@ -445,6 +480,7 @@ class Lattice(BytesArchive):
 			newName = f"determinize({self.name})"
 			return Lattice(data=out,symbolTable=self.symbolTable,hmm=self.hmm,name=newName)		
 
+	@trace.traced()
 	def am_rescore(self,hmm,feat):
 		'''
 		Replace the acoustic scores with new HMM-GMM model.
@@ -627,6 +663,98 @@ def load_lat(target,name="lat"):
 	else:
 		raise UnsupportedType(f"Expected bytes object or lattice file but got: {type_name(target)}.")
 
+def __prepare_nn_decode(fhm,prob,hmm,HCLGFile,symbolTable,beam,latBeam,acwt,
+				minActive,maxActive,maxMem,config,maxThreads,outFile):
+	'''
+	Check the arguments of nn_decode and make the resources and command pattern.
+	'''
+
+	# check hmm
+	declare.is_potential_hmm("hmm",hmm)
+	if not isinstance(hmm,str):
+		hmmTemp = fhm.create("wb+",suffix=".mdl")	
+		hmm.save(hmmTemp)
+		hmm = hmmTemp.name
+
+	# check HCLGFile
+	declare.is_file("HCLGFile",HCLGFile)
+
+	# check symbolTable
+	if isinstance(symbolTable,str):
+		assert os.path.isfile(symbolTable),f"No such file: {symbolTable}."
+	elif type_name(symbolTable) == "LexiconBank":
+		wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
+		symbolTable.dump_dict("words",wordsTemp)
+		symbolTable = wordsTemp.name
+	elif is_list_table(symbolTable):
+		wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
+		symbolTable.save(wordsTemp)
+		symbolTable = wordsTemp.name
+	else:
+		raise UnsupportedType(f"<symbolTable> should be file name,LexiconBank or ListTable object but got: {symbolTable}.")
+
+	parameters = check_multiple_resources(prob,hmm,HCLGFile,symbolTable,
+											beam,latBeam,acwt,minActive,maxActive,maxMem,
+											config,maxThreads,outFile=outFile,
+										)
+
+	baseCmds = []
+	outFiles = parameters[-1]
+
+	for prob,_,_,symbolTable,beam,latBeam,acwt,minActive,maxActive,maxMem,config,maxThreads in zip(*parameters[:-1]):
+		# check probability
+		declare.is_probability("prob",prob)
+		# check other parameters
+		declare.is_positive_int("maxThreads",maxThreads)
+		# build the base command
+		if maxThreads > 1:
+			kaldiTool = f"latgen-faster-mapped-parallel --num-threads={maxThreads} "
+		else:
+			kaldiTool = "latgen-faster-mapped "
+		kaldiTool += f'--allow-partial=true '
+		kaldiTool += f'--min-active={minActive} '
+		kaldiTool += f'--max-active={maxActive} '  
+		kaldiTool += f'--max_mem={maxMem} '
+		kaldiTool += f'--beam={beam} '
+		kaldiTool += f'--lattice-beam={latBeam} '
+		kaldiTool += f'--acoustic-scale={acwt} '
+		kaldiTool += f'--word-symbol-table={symbolTable} '
+		if config is not None:
+			if check_config(name='nn_decode',config=config):
+				for key,value in config.items():
+					if isinstance(value,bool):
+						if value is True:
+							kaldiTool += f"{key} "
+					else:
+						kaldiTool += f" {key}={value}"
+		baseCmds.append( kaldiTool )
+		
+	# define command pattern
+	cmdPattern = '{kaldiTool} {hmm} {HCLG} {prob} ark:{outFile}'
+	# define resources
+	resources = {"prob":parameters[0],"hmm":parameters[1],"HCLG":parameters[2],"kaldiTool":baseCmds,"outFile":outFiles}
+
+	return resources,cmdPattern,parameters[0],outFiles
+
+def __collect_lattices(results,outFiles,sources):
+	'''
+	Make Lattice objects from the results of decoding.
+	'''
+	if len(outFiles) == 1:
+		outFile = outFiles[0]
+		newName = f"lat({sources[0].name})"
+		if outFile == "-":
+			results = Lattice(data=results[2],name=newName)
+		else:
+			results = load_lat(outFile,name=newName)
+	else:
+		for i,fileName in enumerate(outFiles):
+			newName = f"lat({sources[i].name})"
+			results[i] = load_lat(fileName,name=newName)
+		
+	return results
+
+@trace.traced()
 def nn_decode(prob,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 				minActive=200,maxActive=7000,maxMem=50000000,config=None,maxThreads=1,outFile=None):
 	'''
@@ -652,6 +780,8 @@ def nn_decode(prob,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 		Some usual options can be assigned directly. If you want use more,set <config> = your-configure.
 		You can use .check_config('nn_decode') function to get the reference of extra configurations.
 		Also run shell command "latgen-faster-mapped" to look their usage.
+		When decoding with a large graph in parallel,use exkaldi.utils.backend.MemoryAwareBackend(memoryFiles=[HCLGFile,hmmFile])
+		to start jobs only when there is enough memory.
 	
 	Return:
 		exkaldi Lattice object.
@@ -660,86 +790,37 @@ def nn_decode(prob,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 
 	with FileHandleManager() as fhm:
 
-		# check hmm
-		declare.is_potential_hmm("hmm",hmm)
-		if not isinstance(hmm,str):
-			hmmTemp = fhm.create("wb+",suffix=".mdl")	
-			hmm.save(hmmTemp)
-			hmm = hmmTemp.name
+		resources,cmdPattern,probs,outFiles = __prepare_nn_decode(fhm,prob,hmm,HCLGFile,symbolTable,beam,latBeam,acwt,
+																		minActive,maxActive,maxMem,config,maxThreads,outFile)
+		# run
+		results = run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True)
 
-		# check HCLGFile
-		declare.is_file("HCLGFile",HCLGFile)
+		return __collect_lattices(results,outFiles,probs)
 
-		# check symbolTable
-		if isinstance(symbolTable,str):
-			assert os.path.isfile(symbolTable),f"No such file: {symbolTable}."
-		elif type_name(symbolTable) == "LexiconBank":
-			wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
-			symbolTable.dump_dict("words",wordsTemp)
-			symbolTable = wordsTemp.name
-		elif type_name(symbolTable) == "ListTable":
-			wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
-			symbolTable.save(wordsTemp)
-			symbolTable = wordsTemp.name
-		else:
-			raise UnsupportedType(f"<symbolTable> should be file name,LexiconBank or ListTable object but got: {symbolTable}.")
+async def nn_decode_async(prob,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
+				minActive=200,maxActive=7000,maxMem=50000000,config=None,maxThreads=1,outFile=None):
+	'''
+	The asyncio version of nn_decode(). Kaldi processes are run by asyncio subprocesses,
+	so many decoding requests can share one event loop. If the task is cancelled,the processes will be killed.
 
-		parameters = check_multiple_resources(prob,hmm,HCLGFile,symbolTable,
-												beam,latBeam,acwt,minActive,maxActive,maxMem,
-												config,maxThreads,outFile=outFile,
-											)
+	Args:
+		The same as nn_decode().
+	
+	Return:
+		exkaldi Lattice object.
+	'''
+	declare.kaldi_existed()
 
-		baseCmds = []
-		outFiles = parameters[-1]
+	with FileHandleManager() as fhm:
 
-		for prob,_,_,symbolTable,beam,latBeam,acwt,minActive,maxActive,maxMem,config,maxThreads in zip(*parameters[:-1]):
-			# check probability
-			declare.is_probability("prob",prob)
-			# check other parameters
-			declare.is_positive_int("maxThreads",maxThreads)
-			# build the base command
-			if maxThreads > 1:
-				kaldiTool = f"latgen-faster-mapped-parallel --num-threads={maxThreads} "
-			else:
-				kaldiTool = "latgen-faster-mapped "
-			kaldiTool += f'--allow-partial=true '
-			kaldiTool += f'--min-active={minActive} '
-			kaldiTool += f'--max-active={maxActive} '  
-			kaldiTool += f'--max_mem={maxMem} '
-			kaldiTool += f'--beam={beam} '
-			kaldiTool += f'--lattice-beam={latBeam} '
-			kaldiTool += f'--acoustic-scale={acwt} '
-			kaldiTool += f'--word-symbol-table={symbolTable} '
-			if config is not None:
-				if check_config(name='nn_decode',config=config):
-					for key,value in config.items():
-						if isinstance(value,bool):
-							if value is True:
-								kaldiTool += f"{key} "
-						else:
-							kaldiTool += f" {key}={value}"
-			baseCmds.append( kaldiTool )
-			
-		# define command pattern
-		cmdPattern = '{kaldiTool} {hmm} {HCLG} {prob} ark:{outFile}'
-		# define resources
-		resources = {"prob":parameters[0],"hmm":parameters[1],"HCLG":parameters[2],"kaldiTool":baseCmds,"outFile":outFiles}
+		resources,cmdPattern,probs,outFiles = __prepare_nn_decode(fhm,prob,hmm,HCLGFile,symbolTable,beam,latBeam,acwt,
+																		minActive,maxActive,maxMem,config,maxThreads,outFile)
 		# run
-		results = run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True)
-		if len(outFiles) == 1:
-			outFile = outFiles[0]
-			newName = f"lat({parameters[0][0].name})"
-			if outFile == "-":
-				results = Lattice(data=results[2],name=newName)
-			else:
-				results = load_lat(outFile,name=newName)
-		else:
-			for i,fileName in enumerate(outFiles):
-				newName = f"lat({parameters[0][i].name})"
-				results[i] = load_lat(fileName,name=newName)
-			
-		return results
+		results = await run_kaldi_commands_async(resources,cmdPattern,analyzeResult=True)
+
+		return __collect_lattices(results,outFiles,probs)
 
+@trace.traced()
 def gmm_decode(feat,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 				minActive=200,maxActive=7000,maxMem=50000000,config=None,maxThreads=1,outFile=None):
 	'''
@@ -765,6 +846,8 @@ def gmm_decode(feat,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 		Some usual options can be assigned directly. If you want use more,set <config> = your-configure.
 		You can use .check_config('gmm_decode') function to get the reference of extra configurations.
 		Also run shell command "gmm-latgen-faster" to look their usage.
+		When decoding with a large graph in parallel,use exkaldi.utils.backend.MemoryAwareBackend(memoryFiles=[HCLGFile,hmmFile])
+		to start jobs only when there is enough memory.
 	
 	Return:
 		exkaldi Lattice object.
@@ -790,7 +873,7 @@ def gmm_decode(feat,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 			wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
 			symbolTable.dump_dict("words",wordsTemp)
 			symbolTable = wordsTemp.name
-		elif type_name(symbolTable) == "ListTable":
+		elif is_list_table(symbolTable):
 			wordsTemp = fhm.create("w+",suffix=".words",encoding="utf-8")
 			symbolTable.save(wordsTemp)
 			symbolTable = wordsTemp.name
@@ -854,6 +937,7 @@ def gmm_decode(feat,hmm,HCLGFile,symbolTable,beam=10,latBeam=8,acwt=1,
 			
 		return results
 
+@trace.traced()
 def compile_align_graph(hmm,tree,transcription,LFile,outFile,lexicons=None):
 	'''
 	Compile graph for training or aligning.
@@ -890,6 +974,7 @@ def compile_align_graph(hmm,tree,transcription,LFile,outFile,lexicons=None):
 
 	return hmm.compile_train_graph(tree,transcription,LFile,outFile)
 
+@trace.traced()
 def nn_align(hmm,prob,alignGraphFile=None,tree=None,transcription=None,LFile=None,transitionScale=1.0,acousticScale=0.1,
 				selfloopScale=0.1,beam=10,retryBeam=40,lexicons=None,name="ali",outFile=None):
 	'''
@@ -997,6 +1082,7 @@ def nn_align(hmm,prob,alignGraphFile=None,tree=None,transcription=None,LFile=Non
 		# run
 		return run_kaldi_commands_parallel(resources,cmdPattern,generateArchive="ali",archiveNames=names)
 
+@trace.traced()
 def gmm_align(hmm,feat,alignGraphFile=None,tree=None,transcription=None,LFile=None,transitionScale=1.0,acousticScale=0.1,
 				selfloopScale=0.1,beam=10,retryBeam=40,boostSilence=1.0,careful=False,name="ali",lexicons=None,outFile=None):
 	'''
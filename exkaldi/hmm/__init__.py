@@ -3,4 +3,11 @@ from __future__ import absolute_import
 from exkaldi.hmm import hmm
 from exkaldi.hmm.hmm import load_hmm
 from exkaldi.hmm.hmm import load_tree
-from exkaldi.hmm.hmm import load_mat
\ No newline at end of file
+from exkaldi.hmm.hmm import load_mat
+
+def __getattr__(name):
+	# Keep all names of exkaldi.hmm.hmm reachable from exkaldi.hmm.
+	try:
+		return getattr(hmm,name)
+	except AttributeError:
+		raise AttributeError(f"module 'exkaldi.hmm' has no attribute '{name}'") from None
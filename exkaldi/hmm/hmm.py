@@ -19,7 +19,10 @@
 import os
 import glob
 import copy
+import json
+import shutil
 import time,datetime
+import struct
 from collections import namedtuple
 import numpy as np
 
@@ -32,6 +35,238 @@ from exkaldi.core.common import check_multiple_resources,run_kaldi_commands_para
 from exkaldi.utils.utils import run_shell_command,run_shell_command_parallel,check_config,make_dependent_dirs,type_name,list_files
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import trace
+
+TreeInfo = namedtuple("TreeInfo",["numPdfs","contextWidth","centralPosition"])
+GmmHmmInfo = namedtuple("GmmHmmInfo",["phones","pdfs","transitionIds","transitionStates","dimension","gaussians"])
+
+class _BinaryReader:
+	'''
+	Read the objects written by Kaldi in binary mode.
+	'''
+	def __init__(self,data):
+		self.__data = data
+		self.__pos = 0
+		if data[0:2] != b"\0B":
+			raise WrongDataFormat("It is not Kaldi binary data.")
+		self.__pos = 2
+
+	def token(self):
+		'''
+		Read a token which is ended with a space.
+		'''
+		while self.__data[self.__pos:self.__pos+1].isspace():
+			self.__pos += 1
+		end = self.__data.find(b" ",self.__pos)
+		if end < 0:
+			raise WrongDataFormat("Missing token.")
+		token = self.__data[self.__pos:end].decode()
+		self.__pos = end + 1
+		return token
+
+	def expect(self,token):
+		t = self.token()
+		if t != token:
+			raise WrongDataFormat(f"Expected token {token} but got {t}.")
+
+	def int32(self):
+		'''
+		Read a basic int32 value. It is prefixed with a size byte.
+		'''
+		size = self.__data[self.__pos]
+		if size not in (4,252): # 252 is -4 and means an unsigned value.
+			raise WrongDataFormat(f"Expected a 4-byte int value but the size byte is {size}.")
+		value = struct.unpack_from("<i" if size == 4 else "<I",self.__data,self.__pos+1)[0]
+		self.__pos += 5
+		return value
+
+	def float(self):
+		'''
+		Read a basic float value. It is prefixed with a size byte.
+		'''
+		size = self.__data[self.__pos]
+		if size not in (4,8):
+			raise WrongDataFormat(f"Expected a float value but the size byte is {size}.")
+		value = struct.unpack_from("<f" if size == 4 else "<d",self.__data,self.__pos+1)[0]
+		self.__pos += 1 + size
+		return value
+
+	def int_vector(self):
+		'''
+		Read an int32 vector. The elements are not prefixed with size bytes.
+		'''
+		if self.__data[self.__pos] != 4:
+			raise WrongDataFormat("Expected an int32 vector.")
+		count = struct.unpack_from("<i",self.__data,self.__pos+1)[0]
+		self.__pos += 5
+		vector = np.frombuffer(self.__data,dtype="<i4",count=count,offset=self.__pos)
+		self.__pos += 4 * count
+		return vector
+
+	def records(self,dtype,count):
+		'''
+		Read <count> records of a structured NumPy dtype.
+		'''
+		dtype = np.dtype(dtype)
+		records = np.frombuffer(self.__data,dtype=dtype,count=count,offset=self.__pos)
+		self.__pos += dtype.itemsize * count
+		return records
+
+	def skip_vector(self):
+		'''
+		Skip a float vector.
+
+		Return:
+			the dimension.
+		'''
+		token = self.token()
+		if token not in ("FV","DV"):
+			raise WrongDataFormat(f"Expected a vector but got token {token}.")
+		dim = self.int32()
+		self.__pos += dim * (4 if token == "FV" else 8)
+		return dim
+
+	def skip_matrix(self):
+		'''
+		Skip a float matrix.
+
+		Return:
+			the rows and columns.
+		'''
+		token = self.token()
+		if token not in ("FM","DM"):
+			raise WrongDataFormat(f"Expected a matrix but got token {token}.")
+		rows = self.int32()
+		cols = self.int32()
+		self.__pos += rows * cols * (4 if token == "FM" else 8)
+		return rows,cols
+
+# A tuple of transition model is four basic int32 values.
+_TUPLE_DTYPE = np.dtype([("s1","i1"),("phone","<i4"),("s2","i1"),("hmmState","<i4"),("s3","i1"),("forwardPdf","<i4"),("s4","i1"),("selfLoopPdf","<i4")])
+_TRIPLE_DTYPE = np.dtype([("s1","i1"),("phone","<i4"),("s2","i1"),("hmmState","<i4"),("s3","i1"),("forwardPdf","<i4")])
+
+def _parse_tree_info(data):
+	'''
+	Get the same information as "tree-info" from binary tree data.
+	'''
+	reader = _BinaryReader(data)
+	reader.expect("ContextDependency")
+	contextWidth = reader.int32()
+	centralPosition = reader.int32()
+	reader.expect("ToPdf")
+	# The event map is written in prefix order,so scan it flatly.
+	maxResult = -1
+	depth = 0
+	while True:
+		token = reader.token()
+		if token == "CE":
+			maxResult = max(maxResult,reader.int32())
+		elif token == "TE":
+			reader.int32()
+			reader.int32()
+			reader.expect("(")
+			depth += 1
+			continue
+		elif token == "SE":
+			reader.int32()
+			reader.int_vector()
+			reader.expect("{")
+			depth += 1
+			continue
+		elif token in (")","}"):
+			depth -= 1
+		elif token != "NULL":
+			raise WrongDataFormat(f"Unknown event map type: {token}.")
+		if depth == 0:
+			break
+	reader.expect("EndContextDependency")
+
+	return TreeInfo(maxResult+1,contextWidth,centralPosition)
+
+def _parse_gmm_hmm_info(data):
+	'''
+	Get the same information as "gmm-info" from binary GMM-HMM model data.
+	'''
+	reader = _BinaryReader(data)
+	reader.expect("<TransitionModel>")
+	# topology
+	reader.expect("<Topology>")
+	phones = reader.int_vector()
+	reader.int_vector()
+	numEntries = reader.int32()
+	isHmm = True
+	# -1 means the extended format which has self-loop pdf classes.
+	if numEntries == -1:
+		isHmm = False
+		numEntries = reader.int32()
+	for _ in range(numEntries):
+		for _ in range(reader.int32()):
+			reader.int32()
+			if not isHmm:
+				reader.int32()
+			for _ in range(reader.int32()):
+				reader.int32()
+				reader.float()
+	reader.expect("</Topology>")
+	# transition states
+	token = reader.token()
+	if token not in ("<Tuples>","<Triples>"):
+		raise WrongDataFormat(f"Expected transition tuples but got token {token}.")
+	numStates = reader.int32()
+	tuples = reader.records(_TUPLE_DTYPE if token == "<Tuples>" else _TRIPLE_DTYPE,numStates)
+	if numStates > 0:
+		pdfs = int(tuples["forwardPdf"].max()) + 1
+		if token == "<Tuples>":
+			pdfs = max(pdfs,int(tuples["selfLoopPdf"].max())+1)
+	else:
+		pdfs = 0
+	reader.token()
+	# The size of log probabilities is the number of transition IDs plus one.
+	reader.expect("<LogProbs>")
+	transitionIds = reader.skip_vector() - 1
+	reader.expect("</LogProbs>")
+	reader.expect("</TransitionModel>")
+	# GMM
+	reader.expect("<DIMENSION>")
+	dim = reader.int32()
+	reader.expect("<NUMPDFS>")
+	numPdfs = reader.int32()
+	gaussians = 0
+	for _ in range(numPdfs):
+		token = reader.token()
+		if token not in ("<DiagGMMBegin>","<DiagGMM>"):
+			raise WrongDataFormat(f"Only diagonal GMM is supported but got token {token}.")
+		token = reader.token()
+		if token == "<GCONSTS>":
+			reader.skip_vector()
+			token = reader.token()
+		if token != "<WEIGHTS>":
+			raise WrongDataFormat(f"Expected token <WEIGHTS> but got {token}.")
+		gaussians += reader.skip_vector()
+		reader.expect("<MEANS_INVVARS>")
+		reader.skip_matrix()
+		reader.expect("<INV_VARS>")
+		reader.skip_matrix()
+		reader.token()
+
+	return GmmHmmInfo(len(phones),pdfs,transitionIds,numStates,dim,gaussians)
+
+def _run_info_tool(tool,data,templet):
+	'''
+	Get the information by a Kaldi tool,when the data can not be parsed in Python.
+	'''
+	out,err,cod = run_shell_command(f"{tool} -",stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=data)
+	if isinstance(cod,int) and cod != 0:
+		print(err.decode())
+		raise WrongDataFormat("Failed to get the infomation of model.")
+	values = {}
+	for line in out.decode().strip().split("\n"):
+		line = line.strip().split()
+		name = line[-2].split("-")
+		for index,t in enumerate(name[1:],start=1):
+			name[index] = t[0].upper() + t[1:]
+		values["".join(name)] = int(line[-1])
+	return templet(**{ name:values[name] for name in templet._fields })
 
 class DecisionTree(BytesArchive):
 	'''
@@ -52,6 +287,7 @@ class DecisionTree(BytesArchive):
 
 		if isinstance(data,DecisionTree):
 			data = data.data
+		self.__info = None
 		super().__init__(data,name)
 		
 		declare.kaldi_existed()
@@ -97,6 +333,7 @@ class DecisionTree(BytesArchive):
 		'''
 		return self.__centralPosition
 
+	@trace.traced()
 	def accumulate_stats(self,feat,hmm,ali,outFile,lexicons=None):
 		'''
 		Accumulate statistics in order to compile questions.
@@ -158,6 +395,7 @@ class DecisionTree(BytesArchive):
 			else:
 				return outFiles
 		
+	@trace.traced()
 	def compile_questions(self,treeStatsFile,topoFile,outFile,lexicons=None):
 		'''
 		Compile questions.
@@ -213,6 +451,7 @@ class DecisionTree(BytesArchive):
 			
 			return outFile
 
+	@trace.traced()
 	def build(self,treeStatsFile,questionsFile,topoFile,numLeaves,clusterThresh=-1,lexicons=None):
 		'''
 		Build tree.
@@ -257,6 +496,7 @@ class DecisionTree(BytesArchive):
 				self.reset_data(out)
 				return self			
 
+	@trace.traced()
 	def train(self,feat,hmm,ali,topoFile,numLeaves,tempDir,clusterThresh=-1,lexicons=None):
 		'''
 		This is a hign-level API to build a decision tree.
@@ -331,27 +571,24 @@ class DecisionTree(BytesArchive):
 			A namedtuple.
 		'''
 		declare.not_void("hmm",self)
-		
-		cmd = f"tree-info -"
-		out,err,cod = run_shell_command(cmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=self.data)
-		if isinstance(cod,int) and cod != 0:
-			print(err.decode())
-			raise WrongDataFormat("Failed to get the infomation of model.")
-		else:
-			out = out.decode().strip().split("\n")
-			names = []
-			values = []
-			for t1 in out:
-				t1 = t1.strip().split()
-				value = int(t1[-1])
-				name = t1[-2].split("-")
-				for index,t2 in enumerate(name[1:],start=1):
-					name[index] = t2[0].upper() + t2[1:]
-				name = "".join(name)
-
-				names.append(name)
-				values.append(value)
-			return namedtuple("TreeInfo",names)(*values)
+
+		# The header is parsed in Python and cached until the data is reset.
+		if self.__info is None:
+			try:
+				self.__info = _parse_tree_info(self.data)
+			except (WrongDataFormat,IndexError,ValueError,struct.error):
+				self.__info = _run_info_tool("tree-info",self.data,TreeInfo)
+		return self.__info
+
+	def reset_data(self,data=None):
+		'''
+		Reset data.
+
+		Args:
+			<data>: bytes object.
+		'''
+		super().reset_data(data)
+		self.__info = None
 
 class BaseHMM(BytesArchive):
 	'''
@@ -371,6 +608,7 @@ class BaseHMM(BytesArchive):
 				lexicons = data.lex
 			data = data.data
 
+		self.__info = None
 		super().__init__(data,name)
 		
 		if not lexicons is None:
@@ -389,6 +627,7 @@ class BaseHMM(BytesArchive):
 		'''
 		return self.__lex
 	
+	@trace.traced()
 	def compile_train_graph(self,tree,transcription,LFile,outFile,lexicons=None):
 		'''
 		Compile training graph.
@@ -467,6 +706,7 @@ class BaseHMM(BytesArchive):
 			else:
 				return outFiles
 
+	@trace.traced()
 	def update(self,statsFile,numgauss,power=0.25,minGaussianOccupancy=10):
 		'''
 		Update the parameters of GMM-HMM model.
@@ -495,6 +735,7 @@ class BaseHMM(BytesArchive):
 			self.reset_data(out)
 			return self
 
+	@trace.traced()
 	def align(self,feat,trainGraphFile,transitionScale=1.0,acousticScale=0.1,
 									selfloopScale=0.1,beam=10,retryBeam=40,boostSilence=1.0,careful=False,
 									name="ali",lexicons=None,outFile=None):
@@ -567,6 +808,7 @@ class BaseHMM(BytesArchive):
 			# run
 			return run_kaldi_commands_parallel(resources,cmdPattern,analyzeResult=True,generateArchive="ali",archiveNames=names)
 	
+	@trace.traced()
 	def accumulate_stats(self,feat,ali,outFile):
 		'''
 		Accumulate GMM statistics in order to update GMM parameters.
@@ -610,6 +852,7 @@ class BaseHMM(BytesArchive):
 			else:
 				return outFiles
 
+	@trace.traced()
 	def align_equally(self,feat,trainGraphFile,name="equal_ali",outFile=None):
 		'''
 		Align feature averagely.
@@ -677,28 +920,26 @@ class BaseHMM(BytesArchive):
 			A namedtuple of GMM info.
 		'''
 		declare.not_void(type_name(self),self)
-		
-		cmd = f"gmm-info -"
-		out,err,cod = run_shell_command(cmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=self.data)
-		if isinstance(cod,int) and cod != 0:
-			print(err.decode())
-			raise WrongDataFormat("Failed to get the infomation of model.")
-		else:
-			out = out.decode().strip().split("\n")
-			names = []
-			values = []
-			for t1 in out:
-				t1 = t1.strip().split()
-				value = int(t1[-1])
-				name = t1[-2].split("-")
-				for index,t2 in enumerate(name[1:],start=1):
-					name[index] = t2[0].upper() + t2[1:]
-				name = "".join(name)
-
-				names.append(name)
-				values.append(value)
-			return namedtuple("GmmHmmInfo",names)(*values)
 
+		# The header is parsed in Python and cached until the data is reset.
+		if self.__info is None:
+			try:
+				self.__info = _parse_gmm_hmm_info(self.data)
+			except (WrongDataFormat,IndexError,ValueError,struct.error):
+				self.__info = _run_info_tool("gmm-info",self.data,GmmHmmInfo)
+		return self.__info
+
+	def reset_data(self,data=None):
+		'''
+		Reset data.
+
+		Args:
+			<data>: bytes object.
+		'''
+		super().reset_data(data)
+		self.__info = None
+
+	@trace.traced()
 	def transform_gmm_means(self,matrixFile):
 		'''
 		Transform GMM means.
@@ -718,6 +959,150 @@ class BaseHMM(BytesArchive):
 		else:
 			self.reset_data(out)
 
+_CHECKPOINT_VERSION = 1
+
+class _TrainCheckpoint:
+	'''
+	Save the state of GMM-HMM training in <tempDir>/checkpoint after every iteration,so that the training can be resumed.
+	The files of an iteration are written firstly,then the manifest is replaced atomically.
+	So the manifest always describes a completed iteration.
+	'''
+	def __init__(self,tempDir,config):
+		'''
+		Args:
+			<tempDir>: the temporary directory of training.
+			<config>: a JSON-serializable dict of the options which should not be changed when resuming.
+		'''
+		self.__dir = os.path.join(tempDir,"checkpoint")
+		self.__manifestFile = os.path.join(self.__dir,"manifest.json")
+		self.__config = json.loads(json.dumps(config))
+		self.__manifest = None
+
+	@property
+	def iteration(self):
+		'''
+		The last completed iteration or None.
+		'''
+		return None if self.__manifest is None else self.__manifest["iteration"]
+
+	@property
+	def state(self):
+		'''
+		The values saved with the last completed iteration,such as the number of gaussians.
+		'''
+		return None if self.__manifest is None else self.__manifest["state"]
+
+	def clear(self):
+		'''
+		Remove all saved iterations.
+		'''
+		if os.path.isdir(self.__dir):
+			shutil.rmtree(self.__dir)
+		self.__manifest = None
+
+	def load(self):
+		'''
+		Load the manifest of the last completed iteration.
+
+		Return:
+			True if there is a checkpoint,or False.
+		'''
+		if not os.path.isfile(self.__manifestFile):
+			return False
+		with open(self.__manifestFile,"r",encoding="utf-8") as fr:
+			manifest = json.load(fr)
+		if manifest.get("version",None) != _CHECKPOINT_VERSION:
+			raise WrongDataFormat(f"Unknown checkpoint version in file: {self.__manifestFile}.")
+		changed = [ key for key in sorted(set(manifest["config"])|set(self.__config)) if manifest["config"].get(key,None) != self.__config.get(key,None) ]
+		if len(changed) > 0:
+			raise WrongOperation(f"Can not resume training because these options are different from the checkpoint: {changed}. "+
+													f"Remove the directory to train from scratch: {self.__dir}.")
+		self.__manifest = manifest
+		return True
+
+	def model(self):
+		'''
+		Return:
+			the bytes data of the saved model.
+		'''
+		with open(os.path.join(self.__dir,self.__manifest["model"]),"rb") as fr:
+			return fr.read()
+
+	def alignment(self):
+		'''
+		Return:
+			an exkaldi BytesAlignmentTrans object or a list of them if parallel processes were used.
+		'''
+		alis = [ load_index_table(os.path.join(self.__dir,f),useSuffix="ark").fetch(arkType="ali") for f in self.__manifest["alignment"] ]
+		return alis[0] if len(alis) == 1 else alis
+
+	def file(self,key):
+		'''
+		Get the path of a saved file.
+
+		Args:
+			<key>: the key used when the file was saved.
+
+		Return:
+			None or a file path.
+		'''
+		if self.__manifest is None or key not in self.__manifest["files"]:
+			return None
+		return os.path.join(self.__dir,self.__manifest["files"][key])
+
+	def save(self,iteration,modelData,state,ali=None,files={}):
+		'''
+		Save an iteration.
+
+		Args:
+			<iteration>: the completed iteration.
+			<modelData>: the bytes data of model.
+			<state>: a JSON-serializable dict.
+			<ali>: None or the alignment (or list of alignments) used by this iteration. None means it is the same as the last iteration.
+			<files>: a dict of key and file path. Only files which have been changed in this iteration are necessary.
+		'''
+		os.makedirs(self.__dir,exist_ok=True)
+		if self.__manifest is None:
+			manifest = {"version":_CHECKPOINT_VERSION,"config":self.__config,"alignment":[],"files":{}}
+		else:
+			manifest = copy.deepcopy(self.__manifest)
+
+		manifest["iteration"] = iteration
+		manifest["state"] = state
+
+		manifest["model"] = f"{iteration}.mdl"
+		with open(os.path.join(self.__dir,manifest["model"]),"wb") as fw:
+			fw.write(modelData)
+
+		if ali is not None:
+			alis = ali if isinstance(ali,(list,tuple)) else [ali,]
+			manifest["alignment"] = []
+			for index,ali in enumerate(alis):
+				if type_name(ali) == "ArkIndexTable":
+					ali = ali.fetch(arkType="ali")
+				elif type_name(ali) == "NumpyAlignmentTrans":
+					ali = ali.to_bytes()
+				fileName = f"{iteration}.{index}.ali.ark"
+				ali.save(os.path.join(self.__dir,fileName))
+				manifest["alignment"].append(fileName)
+
+		for key,filePath in files.items():
+			fileName = f"{iteration}.{key}"
+			shutil.copyfile(filePath,os.path.join(self.__dir,fileName))
+			manifest["files"][key] = fileName
+
+		tempFile = self.__manifestFile + ".tmp"
+		with open(tempFile,"w",encoding="utf-8") as fw:
+			json.dump(manifest,fw,indent=1)
+		os.replace(tempFile,self.__manifestFile)
+		self.__manifest = manifest
+
+		# Remove the files of older iterations.
+		used = set([manifest["model"],]+manifest["alignment"]+list(manifest["files"].values()))
+		for fileName in os.listdir(self.__dir):
+			if fileName not in used and fileName != "manifest.json":
+				os.remove(os.path.join(self.__dir,fileName))
+
 class MonophoneHMM(BaseHMM):
 	'''
 	Monophone GMM-HMM model.
@@ -732,6 +1117,7 @@ class MonophoneHMM(BaseHMM):
 		
 		self.__tempTree = None
 
+	@trace.traced()
 	def initialize(self,feat,topoFile,lexicons=None):
 		'''
 		Initialize Monophone GMM-HMM model.
@@ -789,13 +1175,15 @@ class MonophoneHMM(BaseHMM):
 		'''
 		return copy.deepcopy(self.__tempTree)
 
+	@trace.traced()
 	def train(self,feat,transcription,LFile,tempDir,
 								numIters=40,maxIterInc=30,totgauss=1000,realignIter=None,
 								transitionScale=1.0,acousticScale=0.1,selfloopScale=0.1,
 								initialBeam=6,beam=10,retryBeam=40,
-								boostSilence=1.0,careful=False,power=0.25,minGaussianOccupancy=10,lexicons=None):
+								boostSilence=1.0,careful=False,power=0.25,minGaussianOccupancy=10,lexicons=None,resume=False):
 		'''
 		This is a high-level API to train the GMM-HMM model.
+		The model,alignment and gaussian schedule are saved in <tempDir>/checkpoint after every iteration.
 
 		Share Args:
 			<LFile>: Lexicon fst file path.
@@ -815,6 +1203,8 @@ class MonophoneHMM(BaseHMM):
 			<power>: a float value.
 			<minGaussianOccupancy>. minimum gaussian occupancy.
 			<lexicons>: an LexiconBank object.
+			<resume>: If True,continue from the last completed iteration saved in <tempDir>. 
+								The model should be initialized with the same arguments as the first training.
 		
 		Parallel Args:
 			<feat>: exkaldi feature or index table object.
@@ -824,6 +1214,7 @@ class MonophoneHMM(BaseHMM):
 			an index table object of final alignment.
 		'''
 		assert not self.is_void, f"Please initialize this model firstly by initialize() methods."
+		declare.is_bool("resume",resume)
 
 		exNumgauss = self.info.gaussians
 		declare.greater_equal("Total number of gaussian",totgauss,"current number",exNumgauss)
@@ -834,6 +1225,15 @@ class MonophoneHMM(BaseHMM):
 		print("Start to train monophone model.")
 		make_dependent_dirs(tempDir,pathIsFile=False)
 
+		checkpoint = _TrainCheckpoint(tempDir,{"model":"mono","numIters":numIters,"maxIterInc":maxIterInc,
+																						"totgauss":totgauss,"realignIter":realignIter})
+		if not resume:
+			checkpoint.clear()
+		elif checkpoint.load():
+			print(f"Resume from the iteration {checkpoint.iteration}.")
+		else:
+			print("No any checkpoint found. Train from the beginning.")
+
 		starttime = datetime.datetime.now().strftime("%Y/%m/%d-%H:%M:%S")
 		print(f"Start Time: {starttime}")
 
@@ -861,41 +1261,56 @@ class MonophoneHMM(BaseHMM):
 		declare.is_positive_int("maxIterInc",maxIterInc)
 		incgauss = (totgauss - exNumgauss)//maxIterInc
 		search_beam = initialBeam
+		startIter = 0
+
+		if checkpoint.iteration is not None:
+			self.reset_data(checkpoint.model())
+			ali = checkpoint.alignment()
+			exNumgauss = checkpoint.state["numgauss"]
+			incgauss = checkpoint.state["incgauss"]
+			search_beam = checkpoint.state["searchBeam"]
+			startIter = checkpoint.iteration + 1
 		
-		for i in range(0,numIters+1,1):
+		for i in range(startIter,numIters+1,1):
 			
-			print(f"Iter >> {i}")
-			iterStartTime = time.time()
-			# 1. align
-			if i == 0:
-				print('Aligning data equally')
-				ali = self.align_equally(feat,trainGraphFile,outFile=os.path.join(tempDir,"train.ali"))
-			elif (realignIter is None) or (i in realignIter):
-				print("Aligning data")
-				del ali
-				ali = self.align(feat,trainGraphFile,transitionScale,acousticScale,selfloopScale,
-									search_beam,retryBeam,boostSilence,careful,lexicons=lexicons,
-									outFile=os.path.join(tempDir,"train.ali"),
-								)
-			else:
-				print("Skip aligning")
+			with trace.span("iteration",iteration=i):
+				print(f"Iter >> {i}")
+				iterStartTime = time.time()
+				# 1. align
+				realigned = True
+				if i == 0:
+					print('Aligning data equally')
+					ali = self.align_equally(feat,trainGraphFile,outFile=os.path.join(tempDir,"train.ali"))
+				elif (realignIter is None) or (i in realignIter):
+					print("Aligning data")
+					del ali
+					ali = self.align(feat,trainGraphFile,transitionScale,acousticScale,selfloopScale,
+										search_beam,retryBeam,boostSilence,careful,lexicons=lexicons,
+										outFile=os.path.join(tempDir,"train.ali"),
+									)
+				else:
+					print("Skip aligning")
+					realigned = False
 
-			print("Accumulate GMM statistics")
-			statsFile = os.path.join(tempDir,"stats.acc")
-			_statsFiles = self.accumulate_stats(feat,ali=ali,outFile=statsFile)
-			if isinstance(_statsFiles,list):  # If parallel processes were used.
-				sum_gmm_stats(_statsFiles,statsFile)
+				print("Accumulate GMM statistics")
+				statsFile = os.path.join(tempDir,"stats.acc")
+				_statsFiles = self.accumulate_stats(feat,ali=ali,outFile=statsFile)
+				if isinstance(_statsFiles,list):  # If parallel processes were used.
+					sum_gmm_stats(_statsFiles,statsFile)
 
-			print("Update GMM parameters")
-			gaussianOccupancy = 3 if i == 0 else minGaussianOccupancy
-			self.update(statsFile,exNumgauss,power,gaussianOccupancy)
+				print("Update GMM parameters")
+				gaussianOccupancy = 3 if i == 0 else minGaussianOccupancy
+				self.update(statsFile,exNumgauss,power,gaussianOccupancy)
 
-			if i >= 1:
-				search_beam = beam
-				exNumgauss += incgauss
+				if i >= 1:
+					search_beam = beam
+					exNumgauss += incgauss
+
+				checkpoint.save(i,self.data,{"numgauss":exNumgauss,"incgauss":incgauss,"searchBeam":search_beam},
+												ali=ali if realigned else None)
 
-			iterTimeCost = time.time() - iterStartTime
-			print(f"Used time: {iterTimeCost:.4f} seconds")
+				iterTimeCost = time.time() - iterStartTime
+				print(f"Used time: {iterTimeCost:.4f} seconds")
 
 		modeLFile = os.path.join(tempDir,"final.mdl")
 		self.save(modeLFile)
@@ -938,6 +1353,7 @@ class TriphoneHMM(BaseHMM):
 
 		self.__tree = None
 
+	@trace.traced()
 	def initialize(self,tree,topoFile,feat=None,treeStatsFile=None):
 		'''
 		Initialize a Triphone Model.
@@ -1004,15 +1420,17 @@ class TriphoneHMM(BaseHMM):
 		'''
 		return self.__tree
 
+	@trace.traced()
 	def train(self,feat,transcription,LFile,tree,tempDir,initialAli=None,
 							ldaMatFile=None,fmllrTransMat=None,spk2utt=None,utt2spk=None,
 							numIters=40,maxIterInc=30,totgauss=1000,fmllrSilWt=0.0,
 							realignIter=None,mlltIter=None,fmllrIter=None,
 							transitionScale=1.0,acousticScale=0.1,selfloopScale=0.1,
 							beam=10,retryBeam=40,
-							boostSilence=1.0,careful=False,power=0.25,minGaussianOccupancy=10,lexicons=None):
+							boostSilence=1.0,careful=False,power=0.25,minGaussianOccupancy=10,lexicons=None,resume=False):
 		'''
 		This is a high-level API to train the HMM-GMM model.
+		The model,alignment,gaussian schedule and feature transform matrix are saved in <tempDir>/checkpoint after every iteration.
 		
 		Share Args:
 			<LFile>: Lexicon fst file path.
@@ -1038,6 +1456,8 @@ class TriphoneHMM(BaseHMM):
 			<power>: power.
 			<minGaussianOccupancy>: minimum gaussian occupancy.
 			<lexicons>: a LexiconBank object.
+			<resume>: If True,continue from the last completed iteration saved in <tempDir>. 
+								The model should be initialized with the same arguments as the first training.
 		
 		Parallel Args:
 			<feat>: exkaldi feature or index table object.
@@ -1046,6 +1466,7 @@ class TriphoneHMM(BaseHMM):
 
 		'''
 		declare.not_void(type_name(self),self)
+		declare.is_bool("resume",resume)
 		
 		if realignIter is not None:
 			declare.is_classes("realignIter",realignIter,(list,tuple) )
@@ -1060,24 +1481,43 @@ class TriphoneHMM(BaseHMM):
 		else:
 			declare.is_lexicon_bank("lexicons",lexicons)
 
+		exNumgauss = self.info.gaussians
+		declare.greater_equal("total number of gaussian",totgauss,"current number",exNumgauss)
+
+		make_dependent_dirs(tempDir,pathIsFile=False)
+
+		checkpoint = _TrainCheckpoint(tempDir,{"model":"tri","numIters":numIters,"maxIterInc":maxIterInc,"totgauss":totgauss,
+																						"realignIter":realignIter,"mlltIter":mlltIter,"fmllrIter":fmllrIter,
+																						"lda":ldaMatFile is not None,"sat":fmllrTransMat is not None})
+		if not resume:
+			checkpoint.clear()
+		elif checkpoint.load():
+			print(f"Resume from the iteration {checkpoint.iteration}.")
+		else:
+			print("No any checkpoint found. Train from the beginning.")
+
 		if ldaMatFile is not None:
 			declare.is_file("ldaMatFile",ldaMatFile)
 			print("Do LDA + MLLT training.")
 			assert fmllrTransMat is None,"SAT training is not expected now."
+			if checkpoint.file("trans.mat") is not None:
+				# Restore the transform matrix estimated before.
+				ldaMatFile = shutil.copyfile(checkpoint.file("trans.mat"),os.path.join(tempDir,"trans.mat"))
 			trainFeat = transform_feat(feat,ldaMatFile,outFile=os.path.join(tempDir,"lda_feat.ark"))
 		elif fmllrTransMat is not None:
 			print("Do SAT. Transform to fMLLR feature. <spk2utt> and <utt2spk> files are necessary in this case.")
 			declare.is_potential_list_table("spk2utt",spk2utt)
 			declare.is_potential_list_table("utt2spk",utt2spk)
+			if checkpoint.file("trans.ark") is not None:
+				# Restore the fMLLR matrix estimated before.
+				fmllrTransMat = load_index_table(checkpoint.file("trans.ark"),useSuffix="ark").fetch(arkType="fmllrMat")
+				if isinstance(feat,(list,tuple)):
+					fmllrTransMat = [ fmllrTransMat.subset(keys=utt_to_spk(subFeat.utts,utt2spk=utt2spk)) for subFeat in feat ]
 			trainFeat = use_fmllr(feat,fmllrTransMat,utt2spk,outFile=os.path.join(tempDir,"fmllr_feat.ark"))
 		else:
 			trainFeat = feat
 
-		exNumgauss = self.info.gaussians
-		declare.greater_equal("total number of gaussian",totgauss,"current number",exNumgauss)
-
 		print("Start to train triphone model.")
-		make_dependent_dirs(tempDir,pathIsFile=False)
 
 		starttime = datetime.datetime.now().strftime("%Y/%m/%d-%H:%M:%S")
 		print(f"Start Time: {starttime}")
@@ -1099,94 +1539,112 @@ class TriphoneHMM(BaseHMM):
 
 		declare.is_positive_int("maxIterInc",maxIterInc)
 		incgauss = (totgauss - exNumgauss)//maxIterInc
+		startIter = 1
+
+		if checkpoint.iteration is not None:
+			self.reset_data(checkpoint.model())
+			ali = checkpoint.alignment()
+			exNumgauss = checkpoint.state["numgauss"]
+			incgauss = checkpoint.state["incgauss"]
+			startIter = checkpoint.iteration + 1
 
 		statsFile = os.path.join(tempDir,"gmmStats.acc")
-		for i in range(1,numIters+1,1):
+		for i in range(startIter,numIters+1,1):
 			
-			print(f"Iter >> {i}")
-			iterStartTime = time.time()
-			# Align
-			if  i == 1:
-				if initialAli is None:
+			with trace.span("iteration",iteration=i):
+				print(f"Iter >> {i}")
+				iterStartTime = time.time()
+				# Files changed in this iteration
+				realigned = True
+				changedFiles = {}
+				# Align
+				if  i == 1:
+					if initialAli is None:
+						print("Aligning data")
+						ali = self.align(trainFeat,trainGraphFile,transitionScale,acousticScale,selfloopScale,
+											beam,retryBeam,boostSilence,careful,lexicons=lexicons,
+											outFile=os.path.join(tempDir,"train.ali"),
+										)
+					else:
+						print("Use the provided initial alignment")
+						ali = initialAli
+				elif (realignIter is None) or (i in realignIter):
 					print("Aligning data")
+					del ali
 					ali = self.align(trainFeat,trainGraphFile,transitionScale,acousticScale,selfloopScale,
-										beam,retryBeam,boostSilence,careful,lexicons=lexicons,
-										outFile=os.path.join(tempDir,"train.ali"),
-									)
+													beam,retryBeam,boostSilence,careful,lexicons=lexicons,
+													outFile=os.path.join(tempDir,"train.ali"),
+												)
 				else:
-					print("Use the provided initial alignment")
-					ali = initialAli
-			elif (realignIter is None) or (i in realignIter):
-				print("Aligning data")
-				del ali
-				ali = self.align(trainFeat,trainGraphFile,transitionScale,acousticScale,selfloopScale,
-												beam,retryBeam,boostSilence,careful,lexicons=lexicons,
-												outFile=os.path.join(tempDir,"train.ali"),
-											)
-			else:
-				print("Skip aligning")
+					print("Skip aligning")
+					realigned = False
 			
-			if ldaMatFile is not None:
-				if mlltIter is None or (i in mlltIter):
-					print("Accumulate MLLT statistics")
-					accFile = accumulate_MLLT_stats(ali,lexicons,self,trainFeat,outFile=os.path.join(tempDir,"mllt.acc"))
-					print("Estimate MLLT matrix")
-					matFile = estimate_MLLT_matrix(accFile,outFile=os.path.join(tempDir,"mllt.mat"))
-					print("Transform GMM means")
-					self.transform_gmm_means(matFile)
-					print("Compose new LDA-MLLT transform matrix")
-					newTransMat = compose_transform_matrixs(ldaMatFile,matFile,outFile=os.path.join(tempDir,"trans.mat"))
-					print("Transform feature")
-					trainFeat = transform_feat(feat,newTransMat,outFile=os.path.join(tempDir,"lda_feat.ark"))
-					ldaMatFile = newTransMat
-				else:
-					print("Skip tansform feature")
-			elif fmllrTransMat is not None:
-				if fmllrIter is None or (i in fmllrIter):
-					print("Estimate fMLLR matrix")
-					# If used parallel process,merge ali and feature.
-					if isinstance(ali,list):
-						tempAli = merge_archives(ali)
-						tempFeat = merge_archives(trainFeat)
-						parallel = len(ali)
+				if ldaMatFile is not None:
+					if mlltIter is None or (i in mlltIter):
+						print("Accumulate MLLT statistics")
+						accFile = accumulate_MLLT_stats(ali,lexicons,self,trainFeat,outFile=os.path.join(tempDir,"mllt.acc"))
+						print("Estimate MLLT matrix")
+						matFile = estimate_MLLT_matrix(accFile,outFile=os.path.join(tempDir,"mllt.mat"))
+						print("Transform GMM means")
+						self.transform_gmm_means(matFile)
+						print("Compose new LDA-MLLT transform matrix")
+						newTransMat = compose_transform_matrixs(ldaMatFile,matFile,outFile=os.path.join(tempDir,"trans.mat"))
+						print("Transform feature")
+						trainFeat = transform_feat(feat,newTransMat,outFile=os.path.join(tempDir,"lda_feat.ark"))
+						ldaMatFile = newTransMat
+						changedFiles["trans.mat"] = newTransMat
 					else:
-						tempAli = ali
-						tempFeat = trainFeat
-						parallel = 1
-					# Then, estimate the fmllr.
-					fmllrTransMat = estimate_fMLLR_matrix(
-														aliOrLat = tempAli,
-														lexicons = lexicons,
-														aliHmm = self,
-														feat = tempFeat,
-														spk2utt = spk2utt,
-														silenceWeight = fmllrSilWt,
-														outFile=os.path.join(tempDir,"trans.ark"),
-													)
-					# Then splice it.
-					if parallel > 1:
-						tempfmllrTrans = []
-						for i in feat:
-							spks = utt_to_spk(i.utts,utt2spk=utt2spk)
-							tempfmllrTrans.append( fmllrTransMat.subset(keys=spks) )
-						fmllrTransMat = tempfmllrTrans
-					print("Transform feature")
-					trainFeat = use_fmllr(feat,fmllrTransMat,utt2spk,outFile=os.path.join(tempDir,"fmllr_feat.ark"))
-				else:
-					print("Skip tansforming feature")
+						print("Skip tansform feature")
+				elif fmllrTransMat is not None:
+					if fmllrIter is None or (i in fmllrIter):
+						print("Estimate fMLLR matrix")
+						# If used parallel process,merge ali and feature.
+						if isinstance(ali,list):
+							tempAli = merge_archives(ali)
+							tempFeat = merge_archives(trainFeat)
+							parallel = len(ali)
+						else:
+							tempAli = ali
+							tempFeat = trainFeat
+							parallel = 1
+						# Then, estimate the fmllr.
+						fmllrTransMat = estimate_fMLLR_matrix(
+															aliOrLat = tempAli,
+															lexicons = lexicons,
+															aliHmm = self,
+															feat = tempFeat,
+															spk2utt = spk2utt,
+															silenceWeight = fmllrSilWt,
+															outFile=os.path.join(tempDir,"trans.ark"),
+														)
+						changedFiles["trans.ark"] = os.path.join(tempDir,"trans.ark")
+						# Then splice it.
+						if parallel > 1:
+							tempfmllrTrans = []
+							for subFeat in feat:
+								spks = utt_to_spk(subFeat.utts,utt2spk=utt2spk)
+								tempfmllrTrans.append( fmllrTransMat.subset(keys=spks) )
+							fmllrTransMat = tempfmllrTrans
+						print("Transform feature")
+						trainFeat = use_fmllr(feat,fmllrTransMat,utt2spk,outFile=os.path.join(tempDir,"fmllr_feat.ark"))
+					else:
+						print("Skip tansforming feature")
+
+				print("Accumulate GMM statistics")
+				_statsFiles = self.accumulate_stats(trainFeat,ali=ali,outFile=statsFile)
+				if isinstance(_statsFiles,list): # If parallel processes are used
+					sum_gmm_stats(_statsFiles,statsFile)
 
-			print("Accumulate GMM statistics")
-			_statsFiles = self.accumulate_stats(trainFeat,ali=ali,outFile=statsFile)
-			if isinstance(_statsFiles,list): # If parallel processes are used
-				sum_gmm_stats(_statsFiles,statsFile)
+				print("Update GMM parameters")
+				self.update(statsFile,exNumgauss,power,minGaussianOccupancy)
+				os.remove(statsFile)
 
-			print("Update GMM parameters")
-			self.update(statsFile,exNumgauss,power,minGaussianOccupancy)
-			os.remove(statsFile)
+				exNumgauss += incgauss
+				checkpoint.save(i,self.data,{"numgauss":exNumgauss,"incgauss":incgauss},
+												ali=ali if realigned else None,files=changedFiles)
 
-			exNumgauss += incgauss
-			iterTimeCost = time.time() - iterStartTime
-			print(f"Used time: {iterTimeCost:.4f} seconds")
+				iterTimeCost = time.time() - iterStartTime
+				print(f"Used time: {iterTimeCost:.4f} seconds")
 		
 		modeLFile = os.path.join(tempDir,"final.mdl")
 		self.save(modeLFile)
@@ -1209,7 +1667,7 @@ class TriphoneHMM(BaseHMM):
 		savedAlis = ",".join(list_files(os.path.join(tempDir,f"*final.ali")))
 		print(f"Saved Alignment: ",savedAlis)
 		if ldaMatFile is not None:
-			print(f"Saved Feature Transform Matrix: {newTransMat}")
+			print(f"Saved Feature Transform Matrix: {ldaMatFile}")
 		elif fmllrTransMat is not None:
 			savedFmllrs = ",".join(list_files(os.path.join(tempDir,f"*trans.ark")))
 			print(f"Saved Feature Transform Matrix: ",savedFmllrs)
@@ -1308,6 +1766,7 @@ def __sum_statistics_files(tool,statsFiles,outFile):
 	else:
 		return outFile
 
+@trace.traced()
 def sum_gmm_stats(statsFiles,outFile):
 	'''
 	Sum GMM statistics.
@@ -1323,6 +1782,7 @@ def sum_gmm_stats(statsFiles,outFile):
 
 	return __sum_statistics_files(tool,statsFiles,outFile)
 
+@trace.traced()
 def sum_tree_stats(statsFiles,outFile):
 	'''
 	Sum tree statistics.
@@ -1338,6 +1798,7 @@ def sum_tree_stats(statsFiles,outFile):
 
 	return __sum_statistics_files(tool,statsFiles,outFile)
 
+@trace.traced()
 def make_topology(lexicons,outFile,numNonsilStates=3,numSilStates=5):
 	'''
 	Make topology file.
@@ -1377,6 +1838,7 @@ def make_topology(lexicons,outFile,numNonsilStates=3,numSilStates=5):
 	else:
 		return outFile
 
+@trace.traced()
 def convert_alignment(ali,originHmm,targetHmm,tree,outFile=None):
 	'''
 	Convert alignment.
@@ -1566,6 +2028,7 @@ def __accumulate_LDA_MLLT_statistics(baseCmd,ali,lexicons,hmm,feat,outFile,silen
 		else:
 			return outFiles
 
+@trace.traced()
 def accumulate_LDA_stats(ali,lexicons,hmm,feat,outFile,silenceWeight=0.0,randPrune=4):
 	'''
 	Acumulate LDA statistics to estimate LDA tansform matrix.
@@ -1588,6 +2051,7 @@ def accumulate_LDA_stats(ali,lexicons,hmm,feat,outFile,silenceWeight=0.0,randPru
 
 	return __accumulate_LDA_MLLT_statistics(Kalditool,ali,lexicons,hmm,feat,outFile,silenceWeight,randPrune)
 
+@trace.traced()
 def accumulate_MLLT_stats(ali,lexicons,hmm,feat,outFile,silenceWeight=0.0,randPrune=4):
 	'''
 	Acumulate MLLT statistics to estimate LDA+MLLT tansform matrix.
@@ -1610,6 +2074,7 @@ def accumulate_MLLT_stats(ali,lexicons,hmm,feat,outFile,silenceWeight=0.0,randPr
 
 	return __accumulate_LDA_MLLT_statistics(Kalditool,ali,lexicons,hmm,feat,outFile,silenceWeight,randPrune)
 
+@trace.traced()
 def estimate_LDA_matrix(statsFiles,targetDim,outFile):
 	'''
 	Estimate the LDA transform matrix from LDA statistics.
@@ -1638,6 +2103,7 @@ def estimate_LDA_matrix(statsFiles,targetDim,outFile):
 	else:
 		return outFile
 
+@trace.traced()
 def estimate_MLLT_matrix(statsFiles,outFile):
 	'''
 	Estimate the MLLT transform matrix from MLLT statistics.
@@ -1664,6 +2130,7 @@ def estimate_MLLT_matrix(statsFiles,outFile):
 	else:
 		return outFile
 
+@trace.traced()
 def compose_transform_matrixs(matA,matB,bIsAffine=False,utt2spk=None,outFile=None):
 	'''
 	The dot operator between two matrixes.
@@ -1772,6 +2239,7 @@ def load_mat(matrixFile):
 			results.append( np.asarray(line.strip().split(),dtype="float32") )
 		return np.matrix(results).T
 
+@trace.traced()
 def estimate_fMLLR_matrix(aliOrLat,lexicons,aliHmm,feat,spk2utt,adaHmm=None,silenceWeight=0.0,acwt=1.0,name="fmllrMatrix",outFile=None):
 	'''
 	Estimate fMLLR transform matrix.
@@ -0,0 +1,129 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.hmm.hmm'''
+
+import os
+import struct
+import pytest
+from exkaldi.version import WrongOperation
+from exkaldi.utils import declare
+from exkaldi.hmm import hmm
+from exkaldi.benchmark import synthetic
+
+def token(t):
+  return t.encode() + b" "
+
+def i32(v):
+  return b"\x04" + struct.pack("<i",v)
+
+def f32(v):
+  return b"\x04" + struct.pack("<f",v)
+
+def int_vector(values):
+  return b"\x04" + struct.pack("<i",len(values)) + b"".join( struct.pack("<i",v) for v in values )
+
+def float_vector(dim):
+  return token("FV") + i32(dim) + b"\0" * (4 * dim)
+
+def float_matrix(rows,cols):
+  return token("FM") + i32(rows) + i32(cols) + b"\0" * (4 * rows * cols)
+
+def make_model():
+  # Two phones share one topology: 3 emitting states with 2 transitions and a final state.
+  data = b"\0B" + token("<TransitionModel>") + token("<Topology>")
+  data += int_vector([1,2]) + int_vector([-1,0,0]) + i32(1) + i32(4)
+  for state in range(3):
+    data += i32(state) + i32(2) + i32(state) + f32(0.75) + i32(state+1) + f32(0.25)
+  data += i32(-1) + i32(0) + token("</Topology>")
+  data += token("<Tuples>") + i32(6)
+  for pdf in range(6):
+    data += i32(pdf//3+1) + i32(pdf%3) + i32(pdf) + i32(pdf)
+  data += token("</Tuples>") + token("<LogProbs>") + float_vector(13) + token("</LogProbs>") + token("</TransitionModel>")
+  data += token("<DIMENSION>") + i32(3) + token("<NUMPDFS>") + i32(6)
+  for gaussians in [2,2,2,1,1,1]:
+    data += token("<DiagGMM>") + token("<GCONSTS>") + float_vector(gaussians) + token("<WEIGHTS>") + float_vector(gaussians)
+    data += token("<MEANS_INVVARS>") + float_matrix(gaussians,3) + token("<INV_VARS>") + float_matrix(gaussians,3) + token("</DiagGMM>")
+  return data
+
+def make_tree():
+  data = b"\0B" + token("ContextDependency") + i32(3) + i32(1) + token("ToPdf")
+  data += token("SE") + i32(1) + int_vector([1]) + token("{")
+  data += token("CE") + i32(0)
+  data += token("TE") + i32(0) + i32(2) + token("(") + token("NULL") + token("CE") + i32(5) + token(")")
+  data += token("}") + token("EndContextDependency")
+  return data
+
+def test_parse_model_info():
+
+  assert hmm._parse_gmm_hmm_info(make_model()) == hmm.GmmHmmInfo(2,6,12,6,3,9)
+  assert hmm._parse_tree_info(make_tree()) == hmm.TreeInfo(6,3,1)
+
+def test_info_is_cached(monkeypatch):
+
+  monkeypatch.setattr(declare,"kaldi_existed",lambda:None)
+  calls = []
+  def parse(data):
+    calls.append(data)
+    return hmm.GmmHmmInfo(2,6,12,6,3,len(calls))
+  monkeypatch.setattr(hmm,"_parse_gmm_hmm_info",parse)
+
+  model = hmm.BaseHMM(make_model())
+  assert model.info.gaussians == 1
+  assert model.info.gaussians == 1
+  model.reset_data(make_model())
+  assert model.info.gaussians == 2
+
+  tree = hmm.DecisionTree(make_tree())
+  assert (tree.contextWidth,tree.centralPosition) == (3,1)
+
+def test_checkpoint_resume(tmp_path):
+
+  config = {"model":"tri","numIters":3,"realignIter":(1,3)}
+  checkpoint = hmm._TrainCheckpoint(str(tmp_path),config)
+  assert checkpoint.load() is False
+
+  ali = synthetic.make_ali(utts=5,pdfs=10,minFrames=3,maxFrames=8)
+  matFile = tmp_path / "trans.mat"
+  matFile.write_bytes(b"mat1")
+  checkpoint.save(1,b"model1",{"numgauss":10},ali=ali,files={"trans.mat":str(matFile)})
+  matFile.write_bytes(b"mat2")
+  checkpoint.save(2,b"model2",{"numgauss":20},files={"trans.mat":str(matFile)})
+
+  # The alignment of iteration 1 is kept and the files of older iterations are removed.
+  assert sorted(os.listdir(tmp_path/"checkpoint")) == ["1.0.ali.ark","2.mdl","2.trans.mat","manifest.json"]
+
+  restored = hmm._TrainCheckpoint(str(tmp_path),{"model":"tri","numIters":3,"realignIter":[1,3]})
+  assert restored.load() is True
+  assert restored.iteration == 2
+  assert restored.state == {"numgauss":20}
+  assert restored.model() == b"model2"
+  assert open(restored.file("trans.mat"),"rb").read() == b"mat2"
+  assert restored.file("trans.ark") is None
+  alignment = restored.alignment().to_numpy()
+  for utt in ali.keys():
+    assert (alignment.data[utt] == ali.data[utt]).all()
+
+def test_checkpoint_options_changed(tmp_path):
+
+  checkpoint = hmm._TrainCheckpoint(str(tmp_path),{"numIters":40})
+  checkpoint.save(1,b"model",{},ali=synthetic.make_ali(utts=2,minFrames=3,maxFrames=5))
+  with pytest.raises(WrongOperation):
+    hmm._TrainCheckpoint(str(tmp_path),{"numIters":30}).load()
+
+  checkpoint.clear()
+  assert not os.path.exists(tmp_path/"checkpoint")
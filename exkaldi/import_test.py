@@ -0,0 +1,49 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Benchmark the import time of exkaldi'''
+
+import os
+import sys
+import json
+import subprocess
+
+def run_python(code):
+  rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  out = subprocess.check_output([sys.executable,"-c",code],cwd=rootDir,env=os.environ.copy())
+  return json.loads(out.decode().strip().split("\n")[-1])
+
+def test_import_is_lazy():
+
+  code = "import time;t=time.perf_counter();import exkaldi;t=time.perf_counter()-t;"
+  code += "import sys,json;print(json.dumps([t,sorted(m for m in sys.modules if m.startswith('exkaldi'))]))"
+
+  times = []
+  for i in range(3):
+    t,modules = run_python(code)
+    times.append(t)
+    # No subpackage should be imported and Kaldi should not be discovered.
+    assert modules == ["exkaldi","exkaldi.version"]
+
+  print(f"import exkaldi: {min(times)*1000:.1f} ms")
+  assert min(times) < 0.5
+
+def test_lazy_attributes():
+
+  code = "import exkaldi,json;"
+  code += "print(json.dumps([exkaldi.load_feat.__module__,exkaldi.hmm.TriphoneHMM.__module__,exkaldi.utils.make_dependent_dirs.__module__]))"
+  assert run_python(code) == ["exkaldi.core.load","exkaldi.hmm.hmm","exkaldi.utils.utils"]
@@ -1,4 +1,11 @@
 from __future__ import absolute_import
 
 from exkaldi.lm import lm
-from exkaldi.lm.lm import load_ngrams
\ No newline at end of file
+from exkaldi.lm.lm import load_ngrams
+
+def __getattr__(name):
+	# Keep all names of exkaldi.lm.lm reachable from exkaldi.lm.
+	try:
+		return getattr(lm,name)
+	except AttributeError:
+		raise AttributeError(f"module 'exkaldi.lm' has no attribute '{name}'") from None
@@ -26,10 +26,12 @@ from collections import namedtuple
 from exkaldi.utils.utils import check_config, make_dependent_dirs, type_name, run_shell_command
 from exkaldi.utils.utils import FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.utils import trace
 from exkaldi.core.archive import BytesArchive, Metric
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import WrongPath, KaldiProcessError, ShellProcessError, KenlmProcessError, UnsupportedType, WrongOperation, WrongDataFormat
 
+@trace.traced()
 def train_ngrams_srilm(lexicons, order, text, outFile, config=None):
 	'''
 	Train N-Grams language model with SriLM tookit.
@@ -125,6 +127,7 @@ def train_ngrams_srilm(lexicons, order, text, outFile, config=None):
 
 		return outFile
 
+@trace.traced()
 def train_ngrams_kenlm(lexicons, order, text, outFile, config=None):
 	'''
 	Train N-Grams language model with SriLM tookit.
@@ -214,6 +217,7 @@ def train_ngrams_kenlm(lexicons, order, text, outFile, config=None):
 
 		return outFile
 
+@trace.traced()
 def arpa_to_binary(arpaFile, outFile):
 	'''
 	Transform ARPA language model to KenLM binary format.
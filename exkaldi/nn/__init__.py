@@ -1,3 +1,10 @@
 from __future__ import absolute_import
 
-from exkaldi.nn import nn
\ No newline at end of file
+from exkaldi.nn import nn
+
+def __getattr__(name):
+	# Keep all names of exkaldi.nn.nn reachable from exkaldi.nn.
+	try:
+		return getattr(nn,name)
+	except AttributeError:
+		raise AttributeError(f"module 'exkaldi.nn' has no attribute '{name}'") from None
@@ -24,16 +24,20 @@ import subprocess
 import tempfile
 import numpy as np
 import threading
+import queue
 import math
 import time
 import shutil
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
 
-from exkaldi.version import WrongPath,WrongOperation,UnsupportedType,KaldiProcessError
-from exkaldi.utils.utils import make_dependent_dirs,type_name,run_shell_command,flatten
+from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,UnsupportedType,KaldiProcessError,ShellProcessError
+from exkaldi.utils.utils import make_dependent_dirs,type_name,run_shell_command,flatten,FileHandleManager
 from exkaldi.utils import declare
+from exkaldi.core.archive import ArkIndexTable,NumpyProbability
 from exkaldi.core.load import load_feat
-from collections import namedtuple,Iterable
+from collections import namedtuple,deque
+from collections.abc import Iterable
 
 class Supporter:
 	'''
@@ -341,21 +345,152 @@ class Supporter:
 		else:
 			return allData
 
-class DataIterator:
+def _check_dataset(dataset,batchSize):
+	assert isinstance(dataset,Iterable),"Process function should return an iterable objects."
+	dataset = [X for X in dataset]
 
-	def __init__(self,indexTable,processFunc,batchSize,chunks='auto',otherArgs=None,shuffle=False,retainData=0.0):
-		
+	if batchSize > len(dataset):
+		print(f"Warning: Batch Size <{batchSize}> is extremely large for this dataset,we hope you can use a more suitable value.")
+
+	return dataset
+
+def _pack_dataset(dataset):
+	'''
+	Pack a dataset to send it to another process quickly.
+	If its items are tuples (or namedtuples),the arrays of each field are concatenated into one array,
+	so that only a few large arrays need to be pickled instead of many small objects.
+	'''
+	if len(dataset) == 0 or not isinstance(dataset[0],tuple):
+		return ("list",dataset)
+
+	itemType = type(dataset[0])
+	width = len(dataset[0])
+	for item in dataset:
+		if type(item) is not itemType or len(item) != width:
+			return ("list",dataset)
+
+	columns = []
+	for j in range(width):
+		values = [ item[j] for item in dataset ]
+		first = values[0]
+		if isinstance(first,np.ndarray) and first.ndim > 0 and \
+			all( isinstance(v,np.ndarray) and v.dtype == first.dtype and v.shape[1:] == first.shape[1:] for v in values ):
+			offsets = np.zeros([len(values)+1,],dtype=np.int64)
+			np.cumsum([ len(v) for v in values ],out=offsets[1:])
+			columns.append( ("array",np.concatenate(values,axis=0),offsets) )
+		else:
+			columns.append( ("list",values) )
+
+	# Namedtuple classes made in functions can not be pickled,so only send their names and fields.
+	if hasattr(itemType,"_fields"):
+		itemType = (itemType.__name__,itemType._fields)
+	else:
+		itemType = None
+
+	return ("tuple",itemType,columns)
+
+_PACKED_TYPES = {}
+
+def _unpack_dataset(packed):
+	'''
+	Unpack a dataset packed by _pack_dataset(). Arrays of items are views of the packed arrays.
+	'''
+	if packed[0] == "list":
+		return packed[1]
+
+	_,itemType,columns = packed
+	if itemType is None:
+		makeItem = lambda *fields:tuple(fields)
+	else:
+		if itemType not in _PACKED_TYPES:
+			_PACKED_TYPES[itemType] = namedtuple(itemType[0],itemType[1])
+		makeItem = _PACKED_TYPES[itemType]
+
+	fields = []
+	for column in columns:
+		if column[0] == "array":
+			_,data,offsets = column
+			fields.append( [ data[offsets[i]:offsets[i+1]] for i in range(len(offsets)-1) ] )
+		else:
+			fields.append( column[1] )
+
+	return [ makeItem(*item) for item in zip(*fields) ]
+
+def _load_chunk(indexTable,processFunc,otherArgs,batchSize):
+	'''
+	Load and process a chunk in a worker process.
+	'''
+	chunkData = load_feat(indexTable)
+	if otherArgs is not None:
+		dataset = processFunc(None,chunkData,otherArgs)
+	else:
+		dataset = processFunc(None,chunkData)
+
+	return _pack_dataset( _check_dataset(dataset,batchSize) )
+
+class DataIterator:
+	'''
+	Split a large corpus into chunks,load and process them in background,and iterate the data batch by batch.
+	'''
+	def __init__(self,indexTable,processFunc,batchSize,chunks='auto',otherArgs=None,shuffle=False,retainData=0.0,prefetch=1,workers=0,shuffleBuffer=0,
+					rank=0,worldSize=1,seed=None):
+		'''
+		Args:
+			<indexTable>: an exkaldi ArkIndexTable object of feature.
+			<processFunc>: a function to process feature of a chunk to a dataset: processFunc(iterator,feat[,otherArgs]).
+							When <workers> > 0,it should be a picklable function defined in the top level of a module,
+							and the first argument is None because the iterator can not be sent to other processes.
+			<batchSize>: mini batch size.
+			<chunks>: an int value or "auto". How many chunks to split data.
+			<otherArgs>: other arguments sent to processFunc.
+			<shuffle>: If True,shuffle chunk data.
+			<retainData>: a float ratio in 0.0~0.9. Reserve part of data (for evaluation).
+			<prefetch>: the maximum number of chunks loaded (or being loaded) in advance.
+			<workers>: If 0,load chunks in a background thread. 
+						If > 0,load chunks in a pool of processes,so that processFunc does not block the training with the GIL.
+			<shuffleBuffer>: If > 0,keep a buffer of this number of items fed by the stream of chunks,and draw every batch uniformly from it,
+							so that items,such as frames,are mixed across chunks with a fixed memory cost.
+							It should be not smaller than <batchSize>. A size of several chunks gets close to a full shuffle.
+							Note that the items in buffer are carried over to the next epoch.
+			<rank>: the rank of current process in distributed training.
+			<worldSize>: the number of processes in distributed training. If > 1,every epoch,utterances are partitioned
+						into <worldSize> shards balanced by frames,and only the shard of <rank> is loaded.
+						All shards have the same number of utterances (a few utterances may be dropped in an epoch)
+						and the same number of chunks,so all processes switch chunks and epochs at the same steps.
+			<seed>: None or an int value. If not None,the split of retained data and the partition of every epoch are decided by it.
+					It should be the same in all processes. It is necessary when <worldSize> > 1.
+		'''
 		declare.is_index_table("indexTable",indexTable)
 		declare.is_callable("processFunc",processFunc)	
 		declare.is_positive_int("batchSize",batchSize)
 		declare.is_bool("shuffle",shuffle)
 		declare.in_boundary("retainData",retainData,minV=0.0,maxV=0.9)
+		declare.is_positive_int("prefetch",prefetch)
+		declare.is_non_negative_int("workers",workers)
+		declare.is_non_negative_int("shuffleBuffer",shuffleBuffer)
+		declare.is_positive_int("worldSize",worldSize)
+		declare.is_non_negative_int("rank",rank)
+		declare.less("rank",rank,"worldSize",worldSize)
+		if seed is not None:
+			declare.is_classes("seed",seed,int)
+		elif worldSize > 1:
+			raise WrongOperation("A shared <seed> is necessary to partition data when <worldSize> > 1.")
+		if shuffleBuffer > 0:
+			declare.greater_equal("shuffleBuffer",shuffleBuffer,"batchSize",batchSize)
 
 		self.processFunc = processFunc
 		self._batchSize = batchSize
 		self.otherArgs = otherArgs
 		self._shuffle = shuffle
 		self._chunks = chunks
+		self._prefetch = prefetch
+		self._workers = workers
+		self._shuffleBuffer = shuffleBuffer
+		self._rank = rank
+		self._worldSize = worldSize
+		self._seed = seed
+		self.__bagEpoch = 0
+		self.__buffer = []
 
 		if chunks != 'auto':
 			declare.is_positive_int("chunks",chunks)
@@ -363,26 +498,46 @@ class DataIterator:
 		totalDataNumber = len(indexTable)
 		trainDataNumber = int(  totalDataNumber * (1-retainData) )
 		evalDataNumber = totalDataNumber - trainDataNumber
-		scpTable = indexTable.shuffle()
+		if seed is None:
+			scpTable = indexTable.shuffle()
+		else:
+			keys = sorted(indexTable.keys())
+			random.Random(seed).shuffle(keys)
+			scpTable = ArkIndexTable( dict( (key,indexTable[key]) for key in keys ),name=indexTable.name )
 
 		self.trainTable = scpTable.subset(nHead=trainDataNumber)
-		self.evalTable = scpTable.subset(nTail=evalDataNumber)
+		if evalDataNumber > 0:
+			self.evalTable = scpTable.subset(nTail=evalDataNumber)
+		else:
+			self.evalTable = ArkIndexTable(name="retainedData")
 
 		if chunks == 'auto':
 			#Compute the chunks automatically
 			sampleTable = self.trainTable.subset(nHead=10)
-			meanSize = sum([ indexInfo.dataSize for indexInfo in sampleTable.values() ]) / 10
+			meanSize = sum([ indexInfo.dataSize for indexInfo in sampleTable.values() ]) / len(sampleTable)
 			autoChunkSize = math.ceil(104857600/meanSize)  # 100MB = 102400KB = 104857600 B
-			self._chunks = trainDataNumber//autoChunkSize
+			self._chunks = trainDataNumber//worldSize//autoChunkSize
 			if self._chunks == 0: 
 				self._chunks = 1
 
 		self.make_dataset_bag(shuffle=False)
 		self._epoch = 0
-		
-		self.load_dataset(0)
-		self.currentDataset = self.nextDataset
-		self.nextDataset = None
+
+		# Chunks being loaded in background,in the order they will be used.
+		self.__futures = deque()
+		self.__executor = None
+		self.__submitIndex = 0
+
+		if self._chunks == 1:
+			self.currentDataset = self.load_dataset(0)
+		else:
+			if workers > 0:
+				self.__executor = ProcessPoolExecutor(max_workers=workers)
+			else:
+				self.__executor = ThreadPoolExecutor(max_workers=1)
+			self.currentDataset = self.__take_next_chunk()
+		if shuffle:
+			random.shuffle(self.currentDataset)
 
 		self.epochSize = len(self.currentDataset)
 		self.countEpochSizeFlag = True
@@ -391,90 +546,201 @@ class DataIterator:
 		self.currentEpochPosition = 0
 		self._isNewEpoch = False
 		self._isNewChunk = False
-		self.datasetIndex = 0
+		self.datasetIndex = 0 if self._chunks == 1 else 1
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,type,value,trace):
+		self.close()
 
-		if self._chunks > 1:
-			self.datasetIndex = 1
-			self.loadDatasetThread = threading.Thread(target=self.load_dataset,args=(1,))
-			self.loadDatasetThread.start()
+	def __del__(self):
+		try:
+			self.close(wait=False)
+		except Exception:
+			pass
+
+	def close(self,wait=True):
+		'''
+		Stop loading chunks and shut down the background thread or processes.
+
+		Args:
+			<wait>: If True,wait until running tasks finish.
+		'''
+		# Cancel queued tasks here because "cancel_futures" of .shutdown() needs Python 3.9+.
+		futures = getattr(self,"_DataIterator__futures",None)
+		if futures is not None:
+			for future in futures:
+				future.cancel()
+			futures.clear()
+		executor = getattr(self,"_DataIterator__executor",None)
+		if executor is not None:
+			self.__executor = None
+			executor.shutdown(wait=wait)
+
+	def make_shard(self,epoch):
+		'''
+		Make the shard of current rank. All ranks make the same partition from the shared seed.
+		In every group of <worldSize> utterances,the longer utterance is given to the rank which has less frames,
+		so shards have the same number of utterances and similar numbers of frames.
+
+		Args:
+			<epoch>: the epoch ID.
+
+		Return:
+			an ArkIndexTable object.
+		'''
+		declare.is_non_negative_int("epoch",epoch)
+		items = list(self.trainTable.items())
+		random.Random(f"{self._seed}:{epoch}").shuffle(items)
+
+		loads = [0,]*self._worldSize
+		shard = []
+		for i in range(0,len(items)-len(items)%self._worldSize,self._worldSize):
+			group = sorted(items[i:i+self._worldSize],key=lambda x:x[1].frames,reverse=True)
+			ranks = sorted(range(self._worldSize),key=lambda r:loads[r])
+			for r,(key,indexInfo) in zip(ranks,group):
+				loads[r] += indexInfo.frames
+				if r == self._rank:
+					shard.append( (key,indexInfo) )
+
+		return ArkIndexTable(dict(shard),name=f"shard({self.trainTable.name},{self._rank}/{self._worldSize})")
 
 	def make_dataset_bag(self,shuffle=False):
-		if shuffle:
-			self.trainTable.shuffle()
-		self.datasetBag = self.trainTable.subset(chunks=self._chunks)
+		if self._worldSize > 1:
+			table = self.make_shard(self.__bagEpoch)
+			self.__bagEpoch += 1
+		else:
+			if shuffle:
+				self.trainTable = self.trainTable.shuffle()
+			table = self.trainTable
+		declare.not_void("the shard of training data",table)
+		if self._chunks == 1:
+			# subset() does not accept one chunk.
+			self.datasetBag = [table,]
+		else:
+			self.datasetBag = table.subset(chunks=self._chunks)
+			# There may be less chunks than expected if there are only a few utterances.
+			self._chunks = len(self.datasetBag)
 
 	def load_dataset(self,datasetIndex):
-		chunkData = load_feat(self.datasetBag[datasetIndex])
-		if self.otherArgs != None:
-			self.nextDataset = self.processFunc(self,chunkData,self.otherArgs)
-		else:
-			self.nextDataset = self.processFunc(self,chunkData)
+		'''
+		Load and process a chunk in current thread.
+
+		Args:
+			<datasetIndex>: the chunk ID.
 
-		assert isinstance(self.nextDataset,Iterable),"Process function should return an iterable objects."
-		self.nextDataset = [X for X in self.nextDataset]
+		Return:
+			a list of data.
+		'''
+		return self.__load(self.datasetBag[datasetIndex])
 
-		if self._batchSize > len(self.nextDataset):
-			print(f"Warning: Batch Size <{self._batchSize}> is extremely large for this dataset,we hope you can use a more suitable value.")
+	def __load(self,indexTable):
+		chunkData = load_feat(indexTable)
+		if self.otherArgs != None:
+			dataset = self.processFunc(self,chunkData,self.otherArgs)
+		else:
+			dataset = self.processFunc(self,chunkData)
 		
-	def next(self):
-		i = self.currentPosition
-		iEnd = i + self._batchSize
-		N = len(self.currentDataset)
+		return _check_dataset(dataset,self._batchSize)
+
+	def __submit_chunks(self):
+		# At most <prefetch> chunks are loaded in advance,so the memory is bounded even if the training is slower than loading.
+		while len(self.__futures) < self._prefetch:
+			indexTable = self.datasetBag[self.__submitIndex]
+			if self._workers > 0:
+				future = self.__executor.submit(_load_chunk,indexTable,self.processFunc,self.otherArgs,self._batchSize)
+			else:
+				future = self.__executor.submit(self.__load,indexTable)
+			self.__futures.append(future)
+
+			self.__submitIndex += 1
+			if self.__submitIndex == self._chunks:
+				# Reshuffle chunks for next epoch.
+				self.__submitIndex = 0
+				self.make_dataset_bag(shuffle=True)
+
+	def __take_next_chunk(self):
+		if self.__executor is None:
+			raise WrongOperation("Data iterator has been closed.")
+		self.__submit_chunks()
+		dataset = self.__futures.popleft().result()
+		self.__submit_chunks()
+		if self._workers > 0:
+			dataset = _unpack_dataset(dataset)
+		return dataset
+		
+	def __switch_chunk(self):
+		if self._chunks == 1:
+			if self._worldSize > 1:
+				# The shard changes every epoch.
+				self.make_dataset_bag()
+				self.currentDataset = self.load_dataset(0)
+			if self._shuffle:
+				random.shuffle(self.currentDataset)
+			self._epoch += 1
+			self._isNewEpoch = True
+		else:
+			self.currentDataset = self.__take_next_chunk()
+			if self._shuffle:
+				random.shuffle(self.currentDataset)
 
-		batch = self.currentDataset[i:iEnd]
+			if self.countEpochSizeFlag:
+				self.epochSize += len(self.currentDataset)
 
-		if self._chunks == 1:
-			if iEnd >= N:
-				rest = iEnd - N
-				if self._shuffle:
-					random.shuffle(self.currentDataset)
-				batch.extend(self.currentDataset[:rest])
-				self.currentPosition = rest
-				self.currentEpochPosition = self.currentPosition
+			self.datasetIndex = (self.datasetIndex+1)%self._chunks
+
+			if self.datasetIndex == 1:
 				self._epoch += 1
 				self._isNewEpoch = True
-				self._isNewChunk = True
-			else:
-				self.currentPosition = iEnd
-				self._isNewEpoch = False
-				self._isNewChunk = False
-		else:
-			if iEnd >= N:
-				rest = iEnd - N
-				if self.loadDatasetThread.is_alive():
-					self.loadDatasetThread.join()
-				if self._shuffle:
-					random.shuffle(self.nextDataset)
-				batch.extend(self.nextDataset[:rest])
-				self.currentPosition = rest
-				self.currentDataset = self.nextDataset
-				self._isNewChunk = True
-				
-				if self.countEpochSizeFlag:
-					self.epochSize += len(self.currentDataset)
-
-				self.datasetIndex = (self.datasetIndex+1)%self._chunks
-
-				if self.datasetIndex == 1:
-					self._epoch += 1
-					self._isNewEpoch = True
-
-				if self.datasetIndex == 0:
-					self.countEpochSizeFlag = False
-					del self.datasetBag
-					self.make_dataset_bag(shuffle=True)
-
-				self.loadDatasetThread = threading.Thread(target=self.load_dataset,args=(self.datasetIndex,))
-				self.loadDatasetThread.start()
 
+			if self.datasetIndex == 0:
+				self.countEpochSizeFlag = False
+
+		self._isNewChunk = True
+		self.currentPosition = 0
+		if self._isNewEpoch:
+			self.currentEpochPosition = 0
+
+	def __pull(self,n):
+		# Take <n> items from the stream of chunks. Switch to the next chunk as soon as current one is used up.
+		items = []
+		while len(items) < n:
+			i = self.currentPosition
+			iEnd = i + n - len(items)
+			newItems = self.currentDataset[i:iEnd]
+			items.extend(newItems)
+			self.currentEpochPosition += len(newItems)
+			if iEnd >= len(self.currentDataset):
+				self.__switch_chunk()
 			else:
-				self._isNewChunk = False
-				self._isNewEpoch = False
 				self.currentPosition = iEnd
+		return items
+
+	def __draw(self):
+		# Draw a batch uniformly from the shuffle buffer,and fill the vacant places with new items.
+		if len(self.__buffer) < self._shuffleBuffer:
+			self.__buffer.extend( self.__pull(self._shuffleBuffer-len(self.__buffer)) )
+		indexes = random.sample(range(len(self.__buffer)),self._batchSize)
+		batch = [ self.__buffer[j] for j in indexes ]
+		for j,item in zip(indexes,self.__pull(self._batchSize)):
+			self.__buffer[j] = item
+		return batch
+
+	def next(self):
+		'''
+		Get a mini batch.
 
-			self.currentEpochPosition = (self.currentEpochPosition + self._batchSize)%self.epochSize
+		Return:
+			a list of data.
+		'''
+		self._isNewEpoch = False
+		self._isNewChunk = False
 
-		return batch                            
+		if self._shuffleBuffer > 0:
+			return self.__draw()
+		else:
+			return self.__pull(self._batchSize)
 
 	@property
 	def batchSize(self):
@@ -517,9 +783,9 @@ class DataIterator:
 		else:
 			return round(self.currentPosition/len(self.currentDataset),2)
 
-	def get_retained_data(self,processFunc=None,batchSize=None,chunks='auto',otherArgs=None,shuffle=False,retainData=0.0):
+	def get_retained_data(self,processFunc=None,batchSize=None,chunks='auto',otherArgs=None,shuffle=False,retainData=0.0,prefetch=None,workers=None):
 
-		declare.non_void("retained data",self.evalTable)
+		declare.not_void("retained data",self.evalTable)
 
 		if processFunc is None:
 			processFunc = self.processFunc
@@ -533,11 +799,184 @@ class DataIterator:
 		if otherArgs is None:
 			otherArgs = self.otherArgs
 
-		reIterator = DataIterator(self.evalTable,processFunc,batchSize,chunks,otherArgs,shuffle,retainData)
+		if prefetch is None:
+			prefetch = self._prefetch
+
+		if workers is None:
+			workers = self._workers
+
+		reIterator = DataIterator(self.evalTable,processFunc,batchSize,chunks,otherArgs,shuffle,retainData,prefetch,workers)
 
 		return reIterator
 
-def pad_sequence(data,dim=0,maxLength=None,dtype='float32',padding='tail',truncating='tail',value=0.0):
+class BucketSampler:
+	'''
+	Group utterances with similar lengths into batches,so that sequence models waste less computation on padding.
+	Utterances are sorted by frames and split into buckets which have the same number of utterances.
+	Batches are made in each bucket,and then shuffled across buckets.
+
+	Usage:
+		sampler = BucketSampler(indexTable,maxFrames=20000,buckets=10)
+		for epoch in range(5):
+			for feat,ali,lengths in sampler.padded_batches(dataset,fields=["feat","ali"]):
+				...
+	'''
+	def __init__(self,lengths,batchSize=None,maxFrames=None,buckets=10,shuffle=True,seed=None):
+		'''
+		Args:
+			<lengths>: an exkaldi ArkIndexTable object whose "frames" column is used,or a dict: {key:frames}.
+			<batchSize>: None or an int value. The maximum number of utterances in a batch.
+			<maxFrames>: None or an int value. The maximum frames of a padded batch,that is,the number of utterances multiplied by the longest frames.
+						An utterance longer than it makes a batch alone.
+						At least one of <batchSize> and <maxFrames> should be given.
+			<buckets>: the number of buckets.
+			<shuffle>: If True,shuffle utterances in each bucket and shuffle batches across buckets every epoch.
+			<seed>: None or an int value. The random seed.
+		'''
+		declare.is_classes("lengths",lengths,[dict,ArkIndexTable])
+		declare.not_void("lengths",lengths)
+		if batchSize is None and maxFrames is None:
+			raise WrongOperation("At least one of <batchSize> and <maxFrames> is necessary.")
+		if batchSize is not None:
+			declare.is_positive_int("batchSize",batchSize)
+		if maxFrames is not None:
+			declare.is_positive_int("maxFrames",maxFrames)
+		declare.is_positive_int("buckets",buckets)
+		declare.is_bool("shuffle",shuffle)
+
+		if isinstance(lengths,ArkIndexTable):
+			lengths = dict( (key,info.frames) for key,info in lengths.items() )
+		for key,frames in lengths.items():
+			declare.is_positive_int(f"frames of {key}",frames)
+
+		keys = sorted(lengths.keys(),key=lambda k:lengths[k])
+		buckets = min(buckets,len(keys))
+		bounds = np.linspace(0,len(keys),buckets+1).astype("int64")
+		self.__buckets = [ keys[bounds[i]:bounds[i+1]] for i in range(buckets) ]
+		self.__lengths = lengths
+		self.__batchSize = batchSize
+		self.__maxFrames = maxFrames
+		self.__shuffle = shuffle
+		self.__random = random.Random(seed)
+		self.__epoch = 0
+
+	@property
+	def buckets(self):
+		'''
+		The (minimum frames,maximum frames,number of utterances) of each bucket.
+		'''
+		return [ (self.__lengths[b[0]],self.__lengths[b[-1]],len(b)) for b in self.__buckets ]
+
+	@property
+	def epoch(self):
+		'''
+		The number of epochs generated by .batches().
+		'''
+		return self.__epoch
+
+	def __split(self,keys):
+		batches = []
+		batch = []
+		longest = 0
+		for key in keys:
+			frames = self.__lengths[key]
+			newLongest = max(longest,frames)
+			if len(batch) > 0 and (
+					( self.__batchSize is not None and len(batch) >= self.__batchSize ) or
+					( self.__maxFrames is not None and (len(batch)+1)*newLongest > self.__maxFrames )
+				):
+				batches.append(batch)
+				batch = []
+				newLongest = frames
+			batch.append(key)
+			longest = newLongest
+		if len(batch) > 0:
+			batches.append(batch)
+		return batches
+
+	def batches(self):
+		'''
+		Make batches of a new epoch.
+
+		Return:
+			a list of batches. Each batch is a list of keys.
+		'''
+		result = []
+		for bucket in self.__buckets:
+			if self.__shuffle:
+				bucket = bucket[:]
+				self.__random.shuffle(bucket)
+			result.extend( self.__split(bucket) )
+		if self.__shuffle:
+			self.__random.shuffle(result)
+		self.__epoch += 1
+		return result
+
+	def __iter__(self):
+		return iter(self.batches())
+
+	def padded_batches(self,dataset,fields,batches=None,padding="tail",value=0):
+		'''
+		Pad batches with pad_sequence().
+
+		Args:
+			<dataset>: a dict {key:item},or a list of items which have the "key" attribute,such as the output of exkaldi.tuple_dataset().
+			<fields>: a list of field names of item to pad. The dtype of each field is retained.
+			<batches>: None or the batches made by .batches(). If None,make batches of a new epoch.
+			<padding>: padding position,"head","tail" or "random".
+			<value>: padding value.
+
+		Return:
+			a generator. Each item is a tuple: (padded array of each field ...,lengths).
+			<lengths> is an int array of the frames of the first field.
+		'''
+		declare.is_classes("fields",fields,(list,tuple))
+		declare.not_void("fields",fields)
+		if not isinstance(dataset,dict):
+			dataset = dict( (item.key,item) for item in dataset )
+
+		if batches is None:
+			batches = self.batches()
+
+		for batch in batches:
+			items = [ dataset[key] for key in batch ]
+			result = []
+			for name in fields:
+				values = [ getattr(item,name) for item in items ]
+				padded,_ = pad_sequence(values,dtype=values[0].dtype,padding=padding,value=value)
+				result.append(padded)
+			result.append( np.array([ len(getattr(item,fields[0])) for item in items ],dtype="int32") )
+			yield tuple(result)
+
+def _pad_buffer(out,shape,dtype,value):
+	'''
+	Get an array filled with the padding value,by allocating a new one or reusing <out>.
+	'''
+	if out is None:
+		return np.full(shape,value,dtype=dtype)
+
+	declare.is_classes("out",out,np.ndarray)
+	if out.dtype != np.dtype(dtype):
+		raise WrongDataFormat(f"The dtype of <out> should be {np.dtype(dtype)} but got: {out.dtype}.")
+	if out.ndim != len(shape) or out.shape[2:] != tuple(shape[2:]) or out.shape[0] < shape[0] or out.shape[1] < shape[1]:
+		raise WrongDataFormat(f"<out> is not large enough to hold the result: {out.shape} vs {tuple(shape)}.")
+	result = out[0:shape[0],0:shape[1]]
+	result.fill(value)
+	return result
+
+def _pad_starts(lengths,maxLength,padding):
+	if padding == "tail":
+		return np.zeros_like(lengths)
+	elif padding == "head":
+		return maxLength - lengths
+	else:
+		return np.array([ random.randint(0,maxLength-l) for l in lengths ],dtype=lengths.dtype)
+
+def _length_mask(starts,lengths,maxLength):
+	frames = np.arange(maxLength)
+	return (frames >= starts[:,None]) & (frames < (starts+lengths)[:,None])
+
+def pad_sequence(data,dim=0,maxLength=None,dtype='float32',padding='tail',truncating='tail',value=0.0,out=None,mask=False,sortByLength=False):
 	'''
 	Pad sequence.
 
@@ -549,85 +988,125 @@ def pad_sequence(data,dim=0,maxLength=None,dtype='float32',padding='tail',trunca
 		<padding>: padding position,"head","tail" or "random".
 		<truncating>: truncating position,"head","tail".
 		<value>: padding value.
+		<out>: None or a NumPy array to reuse as the output buffer,so that no memory is allocated in each training step.
+				Its shape is [N,T,...] where N and T are not smaller than the batch size and the max length,
+				and the other dimmensions are the same as the sequences (<dim> is moved to the front). A view of it is returned.
+		<mask>: If True,also return a bool array with shape [batch size,max length]. True means a real frame.
+		<sortByLength>: If True,sort the sequences by their lengths in descending order,and also return their original indexes.
 	
 	Return:
 		a two-tuple: (a Numpy array,a list of padding positions). 
+		If <mask> is True,the mask is appended. If <sortByLength> is True,an int array of the original indexes is appended.
 	'''
 	declare.is_classes("data",data,(list,tuple))
 	declare.is_non_negative_int("dim",dim)
 	declare.not_void("data",data)
 	declare.is_classes("value",value,(int,float))
 	declare.is_instances("padding",padding,["head","tail","random"])
-	declare.is_instances("truncating",padding,["head","tail"])
+	declare.is_instances("truncating",truncating,["head","tail"])
+	declare.is_bool("mask",mask)
+	declare.is_bool("sortByLength",sortByLength)
 	if maxLength is not None:
 		declare.is_positive_int("maxLength",maxLength)
 
-	lengths = []
+	lengths = np.zeros([len(data),],dtype=np.int64)
 	newData = []
 	exRank = None
 	exOtherDims = None
-	for i in data:
+	for index,i in enumerate(data):
 
 		# verify
 		declare.is_classes("data",i,np.ndarray)
-		shape = i.shape
 		if exRank is None:
-			exRank = len(shape)
+			exRank = i.ndim
 			assert dim < exRank,f"<dim> is out of range: {dim}>{exRank-1}."
 		else:
-			assert len(shape) == exRank,f"Arrays in <data> has different rank: {exRank}!={len(shape)}."
+			assert i.ndim == exRank,f"Arrays in <data> has different rank: {exRank}!={i.ndim}."
 
 		if dim != 0:
-			# transpose
-			rank = [r for r in range(exRank)]
-			rank[0] = dim
-			rank[dim] = 0
-			i = i.transpose(rank)
+			# a view,not a copy
+			i = i.swapaxes(0,dim)
 
 		if exOtherDims is None:
 			exOtherDims = i.shape[1:]
 		else:
 			assert exOtherDims == i.shape[1:],f"Expect for sequential dimmension,All arrays in <data> has same shape but got: {exOtherDims}!={i.shape[1:]}."
 
-		length = len(i)
-		if maxLength is not None and length > maxLength:
+		if maxLength is not None and len(i) > maxLength:
 			if truncating == "head":
-				i = i[maxLength:,...]
+				i = i[len(i)-maxLength:]
 			else:
-				i = i[0:maxLength:,...]
+				i = i[0:maxLength]
 
-		lengths.append(len(i))
+		lengths[index] = len(i)
 		newData.append(i)
 
-	maxLength = max(lengths)
-	batchSize = len(newData)
-
-	result = np.array(value,dtype=dtype) * np.ones([batchSize,maxLength,*exOtherDims],dtype=dtype)
-
-	pos = []
-	for i in range(batchSize):
-		length = lengths[i]
-		if padding == "tail":
-			result[i][0:length] = newData[i]
-			pos.append((0,length))
-		elif padding == "head":
-			start = maxLength - length
-			result[i][start:] = newData[i]
-			pos.append((start,maxLength))
-		else:
-			start = random.randint(0,maxLength-length)
-			end = start + length
-			result[i][start:end] = newData[i]
-			pos.append((start,end))
+	if sortByLength:
+		order = np.argsort(-lengths,kind="stable")
+		lengths = lengths[order]
+		newData = [ newData[o] for o in order ]
+
+	maxLength = int(lengths.max())
+	result = _pad_buffer(out,[len(newData),maxLength,*exOtherDims],dtype,value)
+
+	starts = _pad_starts(lengths,maxLength,padding)
+	for i,(start,length) in enumerate(zip(starts,lengths)):
+		result[i,start:start+length] = newData[i]
+	pos = [ (int(start),int(start+length)) for start,length in zip(starts,lengths) ]
 
 	if dim != 0:
-		exRank = len(result.shape)
-		rank = [r for r in range(exRank)]
-		rank[1] = dim+1
-		rank[dim+1] = 1
-		result = result.transpose(rank)
+		result = result.swapaxes(1,dim+1)
+
+	outputs = [result,pos]
+	if mask:
+		outputs.append( _length_mask(starts,lengths,maxLength) )
+	if sortByLength:
+		outputs.append( order )
 
-	return result,pos
+	return tuple(outputs)
+
+def pad_packed(data,lengths,dtype=None,padding='tail',value=0.0,out=None,mask=False):
+	'''
+	Pad sequences which are concatenated in one array,such as the packed columns of a dataset.
+	All frames are copied by one vectorized operation.
+
+	Args:
+		<data>: a NumPy array whose first dimmension is the total frames of all sequences.
+		<lengths>: a list or array of int values. The frames of each sequence.
+		<dtype>: None or target dtype. If None,use the dtype of <data>.
+		<padding>: padding position,"head","tail" or "random".
+		<value>: padding value.
+		<out>: None or a NumPy array to reuse as the output buffer. The same as pad_sequence().
+		<mask>: If True,also return a bool array with shape [batch size,max length]. True means a real frame.
+
+	Return:
+		a two-tuple: (a Numpy array,a list of padding positions). If <mask> is True,the mask is appended.
+	'''
+	declare.is_classes("data",data,np.ndarray)
+	declare.is_classes("value",value,(int,float))
+	declare.is_instances("padding",padding,["head","tail","random"])
+	declare.is_bool("mask",mask)
+	lengths = np.asarray(lengths,dtype=np.int64)
+	if lengths.ndim != 1 or len(lengths) == 0 or lengths.min() < 0:
+		raise WrongDataFormat("<lengths> should be a list of non-negative int values.")
+	if lengths.sum() != len(data):
+		raise WrongDataFormat(f"The total of <lengths> does not match the frames of <data>: {lengths.sum()}!={len(data)}.")
+	if dtype is None:
+		dtype = data.dtype
+
+	maxLength = int(lengths.max())
+	result = _pad_buffer(out,[len(lengths),maxLength,*data.shape[1:]],dtype,value)
+
+	starts = _pad_starts(lengths,maxLength,padding)
+	frameMask = _length_mask(starts,lengths,maxLength)
+	# Every sequence is contiguous in a row,so the frames selected by the mask follow the order of <data>.
+	result[frameMask] = data
+	pos = [ (int(start),int(start+length)) for start,length in zip(starts,lengths) ]
+
+	if mask:
+		return result,pos,frameMask
+	else:
+		return result,pos
 
 def softmax(data,axis=1):
 	'''
@@ -679,6 +1158,188 @@ def log_softmax(data,axis=1):
 	
 	return data - dataExpSumLog.reshape(dataShape)
 
+def vocab_remap(originVocabs,targetVocabs,retainOOV=False):
+	'''
+	Make the indexes to gather the dimensions of target vocabulary from original vocabulary.
+
+	Args:
+		<originVocabs>: a list of original vocabulary.
+		<targetVocabs>: a list of target vocabulary.
+		<retainOOV>: If True,target words which are not in original vocabulary are retained with index -1,or they are discarded.
+
+	Return:
+		a two-tuple: (an int NumPy array of indexes,a list of new target vocabulary).
+	'''
+	declare.is_classes("originVocabs",originVocabs,list)
+	declare.is_classes("targetVocabs",targetVocabs,list)
+	declare.not_void("targetVocabs",targetVocabs)
+
+	origin_w2i = dict( (w,i) for i,w in enumerate(originVocabs) )
+	indexes = []
+	newTargetVocabs = []
+	for w in targetVocabs:
+		if w in origin_w2i:
+			indexes.append(origin_w2i[w])
+		elif retainOOV:
+			indexes.append(-1)
+		else:
+			continue
+		newTargetVocabs.append(w)
+
+	return np.array(indexes,dtype=np.int64),newTargetVocabs
+
+class ProbPostProcessor:
+	'''
+	Post-process the output of NN acoustic model before decoding in one pass: 
+	activation (softmax or log-softmax) -> subtracting the log prior -> scaling -> gathering the dimensions of target vocabulary.
+	Frames are processed block by block in float32,so that no full-size temporary array is allocated.
+	An object can be called many times,for example,as the model function of nn_forward():
+		post = ProbPostProcessor("log_softmax",prior=compute_postprob_norm(ali,pdfs))
+		nn_forward(feat,lambda x:post(model(x),inplace=True),outFile)
+	'''
+	def __init__(self,activation=None,prior=None,scale=1.0,remap=None,blockSize=1024):
+		'''
+		Args:
+			<activation>: None,"softmax" or "log_softmax".
+			<prior>: None or a NumPy array of log prior probability,such as the output of compute_postprob_norm().
+					It is subtracted in log domain. If <activation> is "softmax",outputs are divided by the prior probability.
+			<scale>: a float value to multiply.
+			<remap>: None or an int array of the output indexes to gather,such as the output of vocab_remap().
+					Index -1 means a dimension not in original outputs. It is filled with the minimum value of each frame.
+			<blockSize>: the number of frames processed at one time.
+		'''
+		declare.is_instances("activation",activation,[None,"softmax","log_softmax"])
+		declare.is_classes("scale",scale,[int,float])
+		declare.is_positive_int("blockSize",blockSize)
+
+		if prior is not None:
+			prior = np.asarray(prior,dtype=np.float32).reshape(-1)
+			if activation == "softmax":
+				prior = np.exp(-prior)
+		if remap is not None:
+			remap = np.asarray(remap,dtype=np.int64).reshape(-1)
+			if len(remap) == 0 or remap.min() < -1:
+				raise WrongDataFormat("<remap> should be a non-empty list of indexes or -1.")
+
+		self.__activation = activation
+		self.__prior = prior
+		self.__scale = np.float32(scale)
+		self.__remap = remap
+		self.__oov = None if remap is None else np.flatnonzero(remap == -1)
+		self.__blockSize = blockSize
+
+	@property
+	def outDim(self):
+		'''
+		The output dimension,or None if it is the same as input.
+		'''
+		return None if self.__remap is None else len(self.__remap)
+
+	def __process_block(self,x,work):
+		if self.__activation is not None:
+			x -= x.max(axis=1,keepdims=True)
+			if self.__activation == "softmax":
+				np.exp(x,out=x)
+				x /= x.sum(axis=1,keepdims=True)
+			else:
+				np.exp(x,out=work)
+				x -= np.log(work.sum(axis=1,keepdims=True))
+		if self.__prior is not None:
+			if self.__activation == "softmax":
+				x *= self.__prior
+			else:
+				x -= self.__prior
+		if self.__scale != 1:
+			x *= self.__scale
+
+	def process_array(self,data,out=None,inplace=False):
+		'''
+		Process an array of frames,such as the outputs of a batch.
+
+		Args:
+			<data>: a 2-d NumPy array: [frames,dim].
+			<out>: None or a float32 array to write the result. Its shape should be [frames,output dim].
+			<inplace>: If True and possible,write the result to <data>. It works only when <data> is float32 and <remap> is None.
+
+		Return:
+			a float32 NumPy array.
+		'''
+		declare.is_classes("data",data,np.ndarray)
+		declare.is_bool("inplace",inplace)
+		if data.ndim != 2:
+			raise WrongDataFormat(f"Expected a 2-d array but got: {data.shape}.")
+		if self.__prior is not None and len(self.__prior) != data.shape[1]:
+			raise WrongDataFormat(f"The dimension of prior does not match the data: {len(self.__prior)}!={data.shape[1]}.")
+		if self.__remap is not None and len(self.__remap) > 0 and self.__remap.max() >= data.shape[1]:
+			raise WrongDataFormat(f"<remap> has an index out of the dimension of data: {self.__remap.max()}>={data.shape[1]}.")
+
+		outShape = (len(data),data.shape[1] if self.__remap is None else len(self.__remap))
+		if out is not None:
+			declare.is_classes("out",out,np.ndarray)
+			if out.dtype != np.float32 or out.shape != outShape:
+				raise WrongDataFormat(f"<out> should be a float32 array with shape {outShape} but got: {out.dtype} {out.shape}.")
+			result = out
+		elif inplace and self.__remap is None and data.dtype == np.float32:
+			result = data
+		else:
+			result = np.empty(outShape,dtype=np.float32)
+
+		# A reusable buffer of one block.
+		work = np.empty([min(self.__blockSize,len(data)),data.shape[1]],dtype=np.float32)
+		if self.__remap is not None:
+			block = np.empty_like(work)
+
+		for i in range(0,len(data),self.__blockSize):
+			source = data[i:i+self.__blockSize]
+			n = len(source)
+			if self.__remap is None:
+				x = result[i:i+n]
+			else:
+				x = block[0:n]
+			if result is not data:
+				x[...] = source
+			self.__process_block(x,work[0:n])
+			if self.__remap is not None:
+				target = result[i:i+n]
+				np.take(x,self.__remap,axis=1,out=target)
+				if len(self.__oov) > 0:
+					target[:,self.__oov] = x.min(axis=1,keepdims=True)
+
+		return result
+
+	def __call__(self,prob,out=None,inplace=False):
+		'''
+		Process an array or a probability archive.
+
+		Args:
+			<prob>: a 2-d NumPy array,or an exkaldi NumpyProbability,BytesProbability or ArkIndexTable object.
+			<out>: None or a float32 array. Only for array.
+			<inplace>: If True,write the result to the array. Only for array.
+
+		Return:
+			a float32 NumPy array or a new NumpyProbability object.
+			The matrices of utterances are views of one array.
+		'''
+		if isinstance(prob,np.ndarray):
+			return self.process_array(prob,out,inplace)
+
+		declare.is_probability("prob",prob)
+		if type_name(prob) == "BytesProbability":
+			prob = prob.to_numpy()
+		elif type_name(prob) == "ArkIndexTable":
+			prob = prob.fetch(arkType="prob").to_numpy()
+		declare.not_void("prob",prob)
+
+		# The "data" attribute returns a new dict every time,so read it only once.
+		data = prob.data
+		utts = list(data.keys())
+		values = list(data.values())
+		packed = np.concatenate(values,axis=0).astype(np.float32,copy=False)
+		result = self.process_array(packed,inplace=True)
+		offsets = np.cumsum([ len(v) for v in values ])[:-1]
+
+		return NumpyProbability( dict(zip(utts,np.split(result,offsets))),name=f"post({prob.name})" )
+
 def accuracy(ref,hyp,ignore=None,mode='all'):
 	'''
 	Score one-2-one matching score between two items.
@@ -778,35 +1439,326 @@ def pure_edit_distance(ref,hyp,ignore=None):
 				score,len(x)
 			)
 
-def compute_postprob_norm(ali,probDims):
+class AlignmentCounter:
+	'''
+	Count the IDs of alignment in order to normalize acoustic model posterior probability.
+	Alignments can be accumulated chunk by chunk,and counters of different shards can be merged.
+	It works like the Kaldi <analyze-counts> command but Kaldi is not necessary.
+	'''
+	def __init__(self,probDims):
+		'''
+		Args:
+			<probDims>: the dimensionality of posterior probability.
+		'''
+		declare.is_positive_int("probDims",probDims)
+		self.__counts = np.zeros([probDims,],dtype=np.float64)
+
+	@property
+	def probDims(self):
+		return len(self.__counts)
+
+	@property
+	def counts(self):
+		'''
+		A float64 NumPy array of counts.
+		'''
+		return self.__counts.copy()
+
+	@property
+	def total(self):
+		return float(self.__counts.sum())
+
+	def accumulate(self,ali,weights=None):
+		'''
+		Accumulate counts.
+
+		Args:
+			<ali>: exkaldi NumpyAlignmentTrans,NumpyAlignmentPhone or NumpyAlignmentPdf object,or a 1-d int NumPy array.
+			<weights>: None,or a dict: {utterance ID:weight},where weight is a float value of utterance or a NumPy array of frames.
+						If <ali> is an array,a float value or an array of frames.
+						Utterances which are not in <weights> have weight 1.0.
+
+		Return:
+			self.
+		'''
+		if isinstance(ali,np.ndarray):
+			ids = ali.reshape(-1)
+			if weights is not None:
+				weights = np.broadcast_to(np.asarray(weights,dtype=np.float64),ids.shape)
+		else:
+			declare.is_classes("ali",ali,["NumpyAlignmentTrans","NumpyAlignmentPhone","NumpyAlignmentPdf"])
+			# .data returns a copy of dict,so only get it once.
+			data = ali.data
+			if len(data) == 0:
+				return self
+			utts = list(data.keys())
+			values = list(data.values())
+			ids = np.concatenate(values,axis=0)
+			if weights is not None:
+				declare.is_classes("weights",weights,dict)
+				frameWeights = []
+				for utt,value in zip(utts,values):
+					weight = weights.get(utt,1.0)
+					if isinstance(weight,np.ndarray):
+						if weight.shape != value.shape:
+							raise WrongDataFormat(f"The frame weights of utterance {utt} do not match the alignment: {weight.shape}!={value.shape}.")
+						frameWeights.append(weight)
+					else:
+						frameWeights.append(np.full(value.shape,weight,dtype=np.float64))
+				weights = np.concatenate(frameWeights,axis=0)
+
+		if len(ids) == 0:
+			return self
+		if not np.issubdtype(ids.dtype,np.integer):
+			raise WrongDataFormat(f"Alignment should be int IDs but got: {ids.dtype}.")
+		if ids.min() < 0 or ids.max() >= len(self.__counts):
+			raise WrongDataFormat(f"Alignment IDs should be in 0~{len(self.__counts)-1} but got: {ids.min()}~{ids.max()}.")
+
+		self.__counts += np.bincount(ids,weights=weights,minlength=len(self.__counts))
+		return self
+
+	def merge(self,other):
+		'''
+		Add the counts of another counter,for example,of another shard.
+
+		Args:
+			<other>: an AlignmentCounter object.
+
+		Return:
+			self.
+		'''
+		declare.is_classes("other",other,AlignmentCounter)
+		declare.equal("probDims",self.probDims,"probDims of other counter",other.probDims)
+		self.__counts += other.counts
+		return self
+
+	def __add__(self,other):
+		return AlignmentCounter(self.probDims).merge(self).merge(other)
+
+	def log_prior(self,floor=0.0):
+		'''
+		Compute the log prior probability.
+
+		Args:
+			<floor>: a non-negative float value. Counts smaller than it are floored to it,
+					so that IDs which are never seen do not get infinite values.
+
+		Return:
+			a float32 NumPy array.
+		'''
+		declare.is_classes("floor",floor,[int,float])
+		declare.greater_equal("floor",floor,None,0)
+		counts = np.maximum(self.__counts,floor)
+		total = counts.sum()
+		if total <= 0:
+			raise WrongOperation("No count has been accumulated.")
+		with np.errstate(divide="ignore"):
+			return np.log(counts/total).astype(np.float32)
+
+def compute_postprob_norm(ali,probDims,weights=None,floor=0.0):
 	'''
 	Compute alignment counts in order to normalize acoustic model posterior probability.
-	For more help information,look at the Kaldi <analyze-counts> command.
+	For more help information,look at the Kaldi <analyze-counts> command. Kaldi is not necessary.
 
 	Args:
-		<ali>: exkaldi NumpyAlignmentTrans,NumpyAlignmentPhone or NumpyAlignmentPdf object.
+		<ali>: exkaldi NumpyAlignmentTrans,NumpyAlignmentPhone or NumpyAlignmentPdf object,or a list of them (shards).
 		<probDims>: the dimensionality of posterior probability.
+		<weights>: None or a dict: {utterance ID:weight}. Look at AlignmentCounter.accumulate().
+		<floor>: the minimum count. Look at AlignmentCounter.log_prior().
 		
 	Return:
 		A numpy array of the normalization.
 	''' 
-	declare.kaldi_existed()
-	declare.is_classes("ali",ali,["NumpyAlignmentTrans","NumpyAlignmentPhone","NumpyAlignmentPdf"])
-	declare.is_positive_int("probDims",probDims)
-
-	txt = []
-	for key,vlaue in ali.items():
-		value = " ".join(map(str,vlaue.tolist()))
-		txt.append( key+" "+value )
-	txt = "\n".join(txt)
-
-	cmd = f"analyze-counts --binary=false --counts-dim={probDims} ark:- -"
-	out,err,cod = run_shell_command(cmd,stdin="PIPE",stdout="PIPE",stderr="PIPE",inputs=txt)
-	if (isinstance(cod,int) and cod != 0) or out == b"":
-		print(err.decode())
-		raise KaldiProcessError('Analyze counts defailed.')
+	counter = AlignmentCounter(probDims)
+	for one in (ali if isinstance(ali,(list,tuple)) else [ali,]):
+		counter.accumulate(one,weights)
+
+	return counter.log_prior(floor)
+
+_END_OF_QUEUE = object()
+
+def _read_batch(feat,keys):
+	'''
+	Read the features of a batch as a NumPy feature.
+	'''
+	if isinstance(feat,ArkIndexTable):
+		return load_feat(feat.subset(keys=keys)).to_numpy()
+	elif type_name(feat) == "BytesFeature":
+		return feat.subset(keys=keys).to_numpy()
 	else:
-		out = out.decode().strip().strip("[]").strip().split()
-		counts = np.array(out,dtype=np.float32)
-		countBias = np.log(counts/np.sum(counts))
-		return countBias
\ No newline at end of file
+		return feat.subset(keys=keys)
+
+def _to_array(output):
+	# Tensors of deep learning frameworks usually have the .numpy() method.
+	if hasattr(output,"numpy"):
+		output = output.numpy()
+	output = np.asarray(output)
+	if output.dtype not in [np.float32,np.float64]:
+		output = output.astype("float32")
+	return output
+
+def nn_forward(feat,model,outFile=None,batchSize=None,maxFrames=10000,processFunc=None,padded=False,queueSize=4,pipeCmd=None):
+	'''
+	Compute the outputs of a NN acoustic model batch by batch,and stream them to an archive file,
+	so that the features and outputs of the whole dataset do not need to be held in memory.
+	Utterances are sorted by frames to make batches. Reading features,running the model and writing outputs
+	work at the same time in three threads. The model is called in current thread.
+
+	Args:
+		<feat>: an exkaldi ArkIndexTable (features are read from file batch by batch),BytesFeature or NumpyFeature object.
+		<model>: a callable object. If <padded> is False,it is called with a NumPy array of all frames of a batch: model(frames),
+				and it should return an array with the same frames. If <padded> is True,it is called with padded features and lengths:
+				model(padded,lengths),and it should return an array with shape [batch size,max length,dim].
+				Tensors which have the .numpy() method are also accepted.
+		<outFile>: None or an .ark file name to write outputs. 
+		<batchSize>: None or the maximum number of utterances of a batch.
+		<maxFrames>: None or the maximum frames of a batch. If <padded> is True,the frames are counted after padding.
+		<processFunc>: None or a function to process the features of a batch: processFunc(feat). 
+						<feat> is a NumpyFeature object,and it should return a NumpyFeature object or dict.
+		<padded>: If True,pad features of a batch,otherwise concatenate them.
+		<queueSize>: the maximum batches waiting between reading,forwarding and writing.
+		<pipeCmd>: None or a shell command to read the outputs from standard input,for example,
+				"latgen-faster-mapped --word-symbol-table=words.txt final.mdl HCLG.fst ark:- ark:lat.ark".
+				Only one of <outFile> and <pipeCmd> is expected.
+
+	Return:
+		an exkaldi ArkIndexTable object of outputs. If <outFile> is given,it can be saved as script file.
+	'''
+	declare.is_feature("feat",feat)
+	declare.not_void("feat",feat)
+	declare.is_callable("model",model)
+	if processFunc is not None:
+		declare.is_callable("processFunc",processFunc)
+	declare.is_bool("padded",padded)
+	declare.is_positive_int("queueSize",queueSize)
+	if (outFile is None) == (pipeCmd is None):
+		raise WrongOperation("Only one of <outFile> and <pipeCmd> is expected.")
+	if outFile is not None:
+		declare.is_valid_file_name("outFile",outFile)
+	else:
+		declare.is_valid_string("pipeCmd",pipeCmd)
+
+	if isinstance(feat,ArkIndexTable):
+		lengths = dict( (key,info.frames) for key,info in feat.items() )
+	else:
+		lengths = dict( (key,info.frames) for key,info in feat.indexTable.items() ) if type_name(feat) == "BytesFeature" \
+					else dict( (key,len(value)) for key,value in feat.items() )
+	batches = BucketSampler(lengths,batchSize=batchSize,maxFrames=maxFrames,buckets=1,shuffle=False).batches()
+
+	featQueue = queue.Queue(maxsize=queueSize)
+	outQueue = queue.Queue(maxsize=queueSize)
+	stop = threading.Event()
+	errors = []
+
+	def put(q,item):
+		# Give up if any other thread failed.
+		while not stop.is_set():
+			try:
+				q.put(item,timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def read():
+		try:
+			for keys in batches:
+				batchFeat = _read_batch(feat,keys)
+				if processFunc is not None:
+					batchFeat = processFunc(batchFeat)
+				if not isinstance(batchFeat,dict):
+					batchFeat = batchFeat.data
+				if not put(featQueue,(keys,[ batchFeat[key] for key in keys ])):
+					return
+		except Exception as e:
+			errors.append(e)
+			stop.set()
+		finally:
+			put(featQueue,_END_OF_QUEUE)
+
+	outTable = ArkIndexTable(name="prob")
+	if pipeCmd is None:
+		make_dependent_dirs(outFile,pathIsFile=True)
+
+	def write(fw):
+		try:
+			startIndex = 0
+			while True:
+				item = outQueue.get()
+				if item is _END_OF_QUEUE:
+					break
+				result = NumpyProbability(item,name="prob").to_bytes()
+				fw.write(result.data)
+				for key,info in result.indexTable.items():
+					outTable[key] = outTable.spec(info.frames,startIndex+info.startIndex,info.dataSize,outFile)
+				startIndex += len(result.data)
+		except Exception as e:
+			errors.append(e)
+			stop.set()
+			# Keep consuming so that the model thread is not blocked.
+			while outQueue.get() is not _END_OF_QUEUE:
+				pass
+
+	with FileHandleManager() as fhm:
+
+		if pipeCmd is None:
+			process = None
+			fw = open(outFile,"wb")
+		else:
+			errFile = fhm.create("wb+",suffix=".log")
+			process = subprocess.Popen(pipeCmd,shell=True,stdin=subprocess.PIPE,stdout=errFile,stderr=errFile)
+			fw = process.stdin
+
+		reader = threading.Thread(target=read,daemon=True)
+		writer = threading.Thread(target=write,args=(fw,),daemon=True)
+		reader.start()
+		writer.start()
+
+		try:
+			while not stop.is_set():
+				try:
+					item = featQueue.get(timeout=0.1)
+				except queue.Empty:
+					continue
+				if item is _END_OF_QUEUE:
+					break
+				keys,values = item
+				if padded:
+					inputs,_ = pad_sequence(values,dtype=values[0].dtype)
+					outputs = _to_array( model(inputs,np.array([ len(v) for v in values ],dtype="int32")) )
+					outputs = dict( (key,outputs[i,0:len(v)]) for i,(key,v) in enumerate(zip(keys,values)) )
+				else:
+					outputs = _to_array( model(np.concatenate(values,axis=0)) )
+					offsets = np.cumsum([ len(v) for v in values ])
+					if len(outputs) != offsets[-1]:
+						raise WrongDataFormat(f"The model should return {offsets[-1]} frames but got: {len(outputs)}.")
+					outputs = dict( zip(keys,np.split(outputs,offsets[:-1])) )
+				if not put(outQueue,outputs):
+					break
+		except BaseException:
+			stop.set()
+			raise
+		finally:
+			outQueue.put(_END_OF_QUEUE)
+			writer.join()
+			stop.set()
+			reader.join()
+			try:
+				fw.close()
+			except BrokenPipeError as e:
+				# The piped command exited early. Its log is reported below.
+				errors.append(e)
+			finally:
+				if process is not None:
+					process.wait()
+
+		# If the piped command failed,writing to it raises BrokenPipeError. Report the command's error instead.
+		if process is not None and (process.returncode != 0 or any( isinstance(e,BrokenPipeError) for e in errors )):
+			errFile.seek(0)
+			print(errFile.read().decode(errors="ignore"))
+			raise ShellProcessError(f"Failed to run command: {pipeCmd}.")
+
+		if len(errors) > 0:
+			raise errors[0]
+
+	return outTable
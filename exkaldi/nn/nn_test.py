@@ -0,0 +1,350 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.nn.nn'''
+
+import random
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
+from exkaldi.version import WrongOperation,WrongDataFormat,ShellProcessError
+from exkaldi.core.archive import NumpyFeature
+from exkaldi.core.load import load_index_table,load_feat,load_prob
+from exkaldi.core.common import tuple_dataset
+from exkaldi.nn import nn
+from exkaldi.benchmark import synthetic
+
+def process(iterator,feat,scale=1):
+  # Namedtuples made in a function can not be pickled directly.
+  feat = feat.to_numpy()
+  feat.rename("feat")
+  scaled = NumpyFeature( dict( (utt,value*scale) for utt,value in feat.items() ),name="scaled" )
+  return tuple_dataset([feat,scaled])
+
+def make_index_table(tmp_path):
+  files = synthetic.write_dataset(str(tmp_path),utts=40,dim=3,minFrames=2,maxFrames=6)
+  return load_index_table(files["feats.ark"])
+
+def run_epochs(iterator,epochs):
+  keys = []
+  while iterator.epoch < epochs:
+    for item in iterator.next():
+      assert np.array_equal(item.scaled,item.feat*2)
+      keys.append(item.key)
+  return keys
+
+@pytest.mark.parametrize("workers",[0,2])
+def test_data_iterator(tmp_path,workers):
+
+  indexTable = make_index_table(tmp_path)
+  with nn.DataIterator(indexTable,process,batchSize=4,chunks=4,otherArgs=2,shuffle=True,prefetch=3,workers=workers) as iterator:
+    keys = run_epochs(iterator,2)
+    # Every utterance is used twice in two epochs,except the extra utterances of the last batch.
+    assert set(keys) == set(indexTable.keys())
+    assert len(keys) >= 80 and len(keys) < 84
+
+  # No more chunks can be loaded after it is closed.
+  with pytest.raises(WrongOperation):
+    for i in range(10):
+      iterator.next()
+
+def test_data_iterator_close(tmp_path,monkeypatch):
+
+  # The executors of Python<3.9 have no "cancel_futures" argument.
+  for executor in [ThreadPoolExecutor,ProcessPoolExecutor]:
+    monkeypatch.setattr(executor,"shutdown",lambda self,wait=True,shutdown=executor.shutdown: shutdown(self,wait=wait))
+
+  indexTable = make_index_table(tmp_path)
+  for workers in [0,2]:
+    iterator = nn.DataIterator(indexTable,process,batchSize=4,chunks=4,otherArgs=2,prefetch=3,workers=workers)
+    iterator.next()
+    iterator.close()
+    with pytest.raises(WrongOperation):
+      for i in range(10):
+        iterator.next()
+
+def test_pack_dataset():
+
+  feat = synthetic.make_feat(utts=5,dim=3,minFrames=2,maxFrames=6)
+  feat.rename("feat")
+  dataset = tuple_dataset([feat,synthetic.make_ali(utts=5,minFrames=2,maxFrames=6)])
+  packed = nn._pack_dataset(dataset)
+  assert packed[0] == "tuple" and packed[1] == ("TupledData",("key","feat","ali"))
+  unpacked = nn._unpack_dataset(packed)
+  for a,b in zip(dataset,unpacked):
+    assert a.key == b.key and np.array_equal(a.feat,b.feat) and np.array_equal(a.ali,b.ali)
+    assert b._fields == ("key","feat","ali")
+
+  assert nn._unpack_dataset(nn._pack_dataset([1,2])) == [1,2]
+
+def padding_rate(batches,lengths):
+  padded = sum( len(b)*max(lengths[k] for k in b) for b in batches )
+  return 1 - sum(lengths.values())/padded
+
+def test_bucket_sampler(tmp_path):
+
+  files = synthetic.write_dataset(str(tmp_path),utts=200,dim=3,minFrames=10,maxFrames=500)
+  indexTable = load_index_table(files["feats.ark"])
+  lengths = dict( (key,info.frames) for key,info in indexTable.items() )
+
+  sampler = nn.BucketSampler(indexTable,batchSize=8,buckets=10,seed=1)
+  assert [ b[2] for b in sampler.buckets ] == [20,]*10
+  first = sampler.batches()
+  second = sampler.batches()
+  assert sampler.epoch == 2
+  for batches in [first,second]:
+    assert sorted( k for b in batches for k in b ) == sorted(lengths.keys())
+    assert max( len(b) for b in batches ) == 8
+  # Batches are reshuffled every epoch.
+  assert first != second
+  # Much less padding than random batches.
+  keys = sorted(lengths.keys())
+  randomBatches = [ keys[i:i+8] for i in range(0,len(keys),8) ]
+  assert padding_rate(first,lengths) < padding_rate(randomBatches,lengths) / 3
+
+  # Dynamic batch size bounded by frames.
+  sampler = nn.BucketSampler(lengths,maxFrames=1000,buckets=5,shuffle=False)
+  batches = sampler.batches()
+  assert sorted( k for b in batches for k in b ) == sorted(lengths.keys())
+  for b in batches:
+    assert len(b)*max(lengths[k] for k in b) <= 1000
+  assert len(batches[0]) > len(batches[-1])
+
+  with pytest.raises(WrongOperation):
+    nn.BucketSampler(lengths)
+
+def test_padded_batches():
+
+  feat = synthetic.make_feat(utts=20,dim=3,minFrames=2,maxFrames=9)
+  feat.rename("feat")
+  dataset = tuple_dataset([feat,synthetic.make_ali(utts=20,minFrames=2,maxFrames=9)])
+  lengths = dict( (one.key,len(one.feat)) for one in dataset )
+  sampler = nn.BucketSampler(lengths,batchSize=3,buckets=4,seed=0)
+  batches = sampler.batches()
+  items = dict( (one.key,one) for one in dataset )
+  for keys,(padFeat,padAli,lens) in zip(batches,sampler.padded_batches(dataset,["feat","ali"],batches=batches)):
+    assert padFeat.dtype == np.float32 and padAli.dtype == np.int32
+    assert padFeat.shape == (len(keys),max(lens),3)
+    for i,key in enumerate(keys):
+      assert lens[i] == lengths[key]
+      assert np.array_equal(padFeat[i,0:lens[i]],items[key].feat)
+      assert np.array_equal(padAli[i,0:lens[i]],items[key].ali)
+      assert np.all(padAli[i,lens[i]:] == 0)
+
+def test_pad_sequence():
+
+  data = [ np.arange(n*2,dtype="float32").reshape(n,2) for n in [3,5,1] ]
+  result,pos = nn.pad_sequence(data,value=-1)
+  assert result.shape == (3,5,2) and pos == [(0,3),(0,5),(0,1)]
+  assert np.array_equal(result[0,0:3],data[0]) and np.all(result[0,3:] == -1)
+
+  result,pos,mask,order = nn.pad_sequence(data,padding="head",mask=True,sortByLength=True)
+  assert order.tolist() == [1,0,2] and pos == [(0,5),(2,5),(4,5)]
+  assert mask.sum(axis=1).tolist() == [5,3,1] and mask[1].tolist() == [False,False,True,True,True]
+  assert np.array_equal(result[1][mask[1]],data[0])
+
+  # Truncate and pad along another dimmension.
+  result,pos = nn.pad_sequence([ d.T for d in data ],dim=1,maxLength=2,truncating="head")
+  assert result.shape == (3,2,2)
+  assert np.array_equal(result[1],data[1][3:5].T) and pos[2] == (0,1)
+
+  # Reuse a buffer.
+  buffer = np.ones([4,8,2],dtype="float32")
+  result,_ = nn.pad_sequence(data,out=buffer)
+  assert result.shape == (3,5,2) and np.shares_memory(result,buffer)
+  assert np.array_equal(result,nn.pad_sequence(data)[0])
+  with pytest.raises(WrongDataFormat):
+    nn.pad_sequence(data,out=np.zeros([2,8,2],dtype="float32"))
+
+def test_pad_packed():
+
+  data = [ np.arange(n*2).reshape(n,2) for n in [3,5,1] ]
+  for padding in ["tail","head"]:
+    expected = nn.pad_sequence(data,dtype="int64",padding=padding,value=-1,mask=True)
+    result = nn.pad_packed(np.concatenate(data),[3,5,1],padding=padding,value=-1,mask=True)
+    assert np.array_equal(result[0],expected[0]) and result[1] == expected[1]
+    assert np.array_equal(result[2],expected[2])
+
+  result,pos = nn.pad_packed(np.concatenate(data),[3,5,1],padding="random")
+  for i,(start,end) in enumerate(pos):
+    assert np.array_equal(result[i,start:end],data[i])
+
+  with pytest.raises(WrongDataFormat):
+    nn.pad_packed(np.concatenate(data),[3,5])
+
+def chunk_orders(iterator,items):
+  chunkOf = dict( (key,c) for c,table in enumerate(iterator.datasetBag) for key in table.keys() )
+  keys = []
+  while len(keys) < items:
+    keys.extend( item.key for item in iterator.next() )
+  return [ chunkOf[key] for key in keys[0:items] ]
+
+def test_shuffle_buffer(tmp_path):
+
+  indexTable = make_index_table(tmp_path)
+  random.seed(0)
+  # Without shuffle buffer,items come chunk by chunk.
+  with nn.DataIterator(indexTable,process,batchSize=4,chunks=4,otherArgs=2) as iterator:
+    orders = chunk_orders(iterator,40)
+    assert orders == sorted(orders)
+
+  with nn.DataIterator(indexTable,process,batchSize=4,chunks=4,otherArgs=2,shuffleBuffer=20) as iterator:
+    orders = chunk_orders(iterator,40)
+    assert orders != sorted(orders) and orders[0:8].count(0) < 8
+    # Every item is used about once per epoch.
+    keys = run_epochs(iterator,4)
+    counts = [ keys.count(key) for key in indexTable.keys() ]
+    assert min(counts) >= 1 and max(counts) <= 5 and sum(counts) == len(keys)
+
+  with pytest.raises(AssertionError):
+    nn.DataIterator(indexTable,process,batchSize=4,shuffleBuffer=2)
+
+def test_nn_forward(tmp_path):
+
+  files = synthetic.write_dataset(str(tmp_path),utts=30,dim=3,minFrames=2,maxFrames=20)
+  indexTable = load_index_table(files["feats.ark"])
+  feat = load_feat(indexTable).to_numpy().data
+  weight = np.arange(12,dtype="float32").reshape(3,4)
+
+  outTable = nn.nn_forward(indexTable,lambda x:x@weight,str(tmp_path/"prob.ark"),maxFrames=50,
+                            processFunc=lambda f:dict( (k,v*2) for k,v in f.items() ))
+  prob = load_prob(load_index_table(str(tmp_path/"prob.ark"))).to_numpy().data
+  assert sorted(prob.keys()) == sorted(feat.keys()) == sorted(outTable.keys())
+  for key in feat.keys():
+    assert np.allclose(prob[key],(feat[key]*2)@weight)
+  # The index table can be saved as a script file.
+  outTable.save(str(tmp_path/"prob.scp"))
+  assert np.allclose( load_prob(load_index_table(str(tmp_path/"prob.scp"))).to_numpy().data[key],prob[key] )
+
+  # Pad sequences and pipe outputs to a command.
+  def model(padded,lengths):
+    assert padded.ndim == 3 and padded.shape[0] <= 4
+    return padded@weight
+  nn.nn_forward(NumpyFeature(feat),model,batchSize=4,maxFrames=None,padded=True,pipeCmd=f"cat > {tmp_path/'piped.ark'}")
+  piped = load_prob(load_index_table(str(tmp_path/"piped.ark"))).to_numpy().data
+  for key in feat.keys():
+    assert np.allclose(piped[key],feat[key]@weight)
+
+  # Errors of the model are raised.
+  with pytest.raises(WrongDataFormat):
+    nn.nn_forward(indexTable,lambda x:x[0:1],str(tmp_path/"bad.ark"),maxFrames=50)
+  with pytest.raises(ShellProcessError):
+    nn.nn_forward(indexTable,lambda x:x,pipeCmd="cat > /dev/null; exit 1")
+
+def test_nn_forward_pipe_failure(capsys):
+
+  # The command exits without reading its input,so writing to it breaks the pipe.
+  feat = NumpyFeature( dict( (f"utt{i}",np.ones([2000,40],dtype="float32")) for i in range(20) ) )
+  with pytest.raises(ShellProcessError):
+    nn.nn_forward(feat,lambda x:x,batchSize=4,maxFrames=None,pipeCmd="echo 'ERROR: bad model' >&2; exit 3")
+  assert "ERROR: bad model" in capsys.readouterr().out
+
+def test_prob_post_processor():
+
+  rand = np.random.RandomState(0)
+  data = rand.standard_normal((50,6)).astype("float32")
+  prior = np.log(rand.dirichlet(np.ones(6)))
+
+  post = nn.ProbPostProcessor("log_softmax",prior=prior,scale=0.5,blockSize=7)
+  expected = (nn.log_softmax(data.astype("float64")) - prior) * 0.5
+  result = post(data)
+  assert result.dtype == np.float32 and np.allclose(result,expected,atol=1e-5)
+  # In place.
+  copied = data.copy()
+  assert post(copied,inplace=True) is copied and np.allclose(copied,expected,atol=1e-5)
+
+  post = nn.ProbPostProcessor("softmax",prior=prior,blockSize=16)
+  assert np.allclose(post(data),nn.softmax(data.astype("float64"))/np.exp(prior),atol=1e-5)
+
+  # Gather target vocabulary.
+  indexes,vocabs = nn.vocab_remap(["a","b","c","d","e","f"],["f","x","b","a"],retainOOV=True)
+  assert indexes.tolist() == [5,-1,1,0] and vocabs == ["f","x","b","a"]
+  out = np.zeros([50,4],dtype="float32")
+  result = nn.ProbPostProcessor(remap=indexes,blockSize=8)(data,out=out)
+  assert result is out
+  assert np.array_equal(result[:,[0,2,3]],data[:,[5,1,0]]) and np.array_equal(result[:,1],data.min(axis=1))
+
+  # Probability archive.
+  prob = synthetic.make_prob(utts=5,dim=6,minFrames=2,maxFrames=9)
+  result = nn.ProbPostProcessor(prior=prior)(prob.to_bytes())
+  for utt,value in prob.items():
+    assert np.allclose(result.data[utt],value-prior,atol=1e-6)
+
+  with pytest.raises(WrongDataFormat):
+    nn.ProbPostProcessor(prior=prior)(data[:,0:5])
+
+def test_alignment_counter():
+
+  ali = synthetic.make_ali(utts=20,pdfs=30,minFrames=5,maxFrames=20)
+  ids = np.concatenate(list(ali.values()))
+  expected = np.array([ (ids==i).sum() for i in range(31) ],dtype="float64")
+  with np.errstate(divide="ignore"):
+    assert np.allclose(nn.compute_postprob_norm(ali,31),np.log(expected/expected.sum()))
+
+  # Accumulate shards and merge them.
+  shards = ali.subset(chunks=3)
+  counters = [ nn.AlignmentCounter(31).accumulate(shard) for shard in shards ]
+  merged = counters[0] + counters[1]
+  merged.merge(counters[2])
+  assert np.array_equal(merged.counts,expected) and merged.total == len(ids)
+  assert np.allclose(nn.compute_postprob_norm(shards,31,floor=1),np.log(np.maximum(expected,1)/np.maximum(expected,1).sum()))
+
+  # Weights of utterances and frames.
+  utt = list(ali.keys())[0]
+  weights = { utt:np.zeros(len(ali.data[utt])) }
+  for other in list(ali.keys())[1:]:
+    weights[other] = 2.0
+  counter = nn.AlignmentCounter(31).accumulate(ali,weights)
+  assert counter.total == 2*(len(ids)-len(ali.data[utt]))
+
+  with pytest.raises(WrongDataFormat):
+    nn.AlignmentCounter(10).accumulate(ali)
+
+@pytest.mark.parametrize("chunks",[1,2])
+def test_data_iterator_shards(tmp_path,chunks):
+
+  files = synthetic.write_dataset(str(tmp_path),utts=41,dim=3,minFrames=2,maxFrames=30)
+  indexTable = load_index_table(files["feats.ark"])
+  iterators = [ nn.DataIterator(indexTable,process,batchSize=4,chunks=chunks,otherArgs=2,retainData=0.1,rank=r,worldSize=3,seed=7) for r in range(3) ]
+  try:
+    # The same data is retained in all ranks.
+    assert all( sorted(it.evalTable.keys()) == sorted(iterators[0].evalTable.keys()) for it in iterators )
+    trainKeys = set(iterators[0].trainTable.keys())
+
+    for epoch in range(2):
+      shards = [ it.make_shard(epoch) for it in iterators ]
+      keys = [ set(shard.keys()) for shard in shards ]
+      # Disjoint shards of the same size,with only the remainder dropped.
+      assert len(keys[0]|keys[1]|keys[2]) == 3*len(keys[0]) == len(trainKeys) - len(trainKeys)%3
+      frames = [ sum(info.frames for info in shard.values()) for shard in shards ]
+      assert max(frames) - min(frames) <= 30
+    assert iterators[0].make_shard(0).keys() != iterators[0].make_shard(1).keys()
+
+    # All ranks switch chunks at the same steps,and use their own shard in every epoch.
+    used = [ [] for it in iterators ]
+    for step in range(20):
+      for it,keys in zip(iterators,used):
+        keys.extend( item.key for item in it.next() )
+      assert len(set( (it.isNewChunk,it.isNewEpoch,it.epoch) for it in iterators )) == 1
+    for it,keys in zip(iterators,used):
+      assert set(keys[0:12]) == set(it.make_shard(0).keys())
+  finally:
+    for it in iterators:
+      it.close()
+
+  with pytest.raises(WrongOperation):
+    nn.DataIterator(indexTable,process,batchSize=4,rank=0,worldSize=2)
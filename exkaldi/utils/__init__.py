@@ -2,6 +2,19 @@ from __future__ import absolute_import
 
 from exkaldi.utils import utils
 from exkaldi.utils import declare
+from exkaldi.utils import cache
+from exkaldi.utils import backend
+from exkaldi.utils import telemetry
+from exkaldi.utils import trace
+from exkaldi.utils import memory
+from exkaldi.utils import pipeline
 from exkaldi.utils.utils import check_config
 from exkaldi.utils.argparse import args
-from exkaldi.utils.argparse import load_args
\ No newline at end of file
+from exkaldi.utils.argparse import load_args
+
+def __getattr__(name):
+	# Keep all names of exkaldi.utils.utils reachable from exkaldi.utils.
+	try:
+		return getattr(utils,name)
+	except AttributeError:
+		raise AttributeError(f"module 'exkaldi.utils' has no attribute '{name}'") from None
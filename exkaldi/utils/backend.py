@@ -0,0 +1,486 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Job backends to run a group of shell commands as a job array.'''
+
+import os
+import abc
+import time
+import shlex
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from exkaldi.version import info as ExkaldiInfo
+from exkaldi.version import WrongOperation
+from exkaldi.utils import declare
+from exkaldi.utils import telemetry
+
+_TIMEOUT_MESSAGE = b"Time Out Error: Process was killed! If you are exactly running the right program,"
+_TIMEOUT_MESSAGE += b"you can set a greater timeout value by exkaldi.info.set_timeout()."
+
+class BaseBackend(abc.ABC):
+	'''
+	The base class of job backends.
+	A backend runs N commands as a job array whose job IDs are 1,2,...,N,
+	and collects the return code and log of each job.
+	'''
+	def __init__(self,logDir=None):
+		'''
+		Args:
+			<logDir>: None or a directory. If not None,the log of the Nth job will be kept in "<logDir>/job.N.log".
+		'''
+		if logDir is not None:
+			declare.is_valid_string("logDir",logDir)
+			logDir = os.path.abspath(logDir)
+			os.makedirs(logDir,exist_ok=True)
+		self.__logDir = logDir
+
+	@property
+	def logDir(self):
+		return self.__logDir
+
+	def run(self,cmds,env=None,timeout=None):
+		'''
+		Run commands as a job array.
+
+		Args:
+			<cmds>: a list of strings. Each string should be a command and its options.
+			<env>: If None,use exkaldi.version.ENV defaultly.
+			<timeout>: None or an int value. The total timeout value of the job array.
+
+		Return:
+			a list of pairs: return code and error information (log).
+		'''
+		declare.is_classes("cmds",cmds,[tuple,list])
+		if len(cmds) == 0:
+			raise WrongOperation("<cmds> has not any command to run.")
+		declare.members_are_valid_strings("cmds",cmds)
+		if timeout is not None:
+			declare.is_positive_int("timeout",timeout)
+		if env is None:
+			env = ExkaldiInfo.ENV
+
+		results = self._run_array(list(cmds),env,timeout)
+
+		if self.__logDir is not None:
+			for jobID,(_,err) in enumerate(results,start=1):
+				with open(os.path.join(self.__logDir,f"job.{jobID}.log"),"wb") as fw:
+					fw.write(b"" if err is None else err)
+
+		return results
+
+	@abc.abstractmethod
+	def _run_array(self,cmds,env,timeout):
+		'''
+		Run commands as a job array. Subclasses must implement it.
+
+		Return:
+			a list of pairs: return code and error information (log).
+		'''
+
+class LocalBackend(BaseBackend):
+	'''
+	Run jobs with a local process pool.
+	'''
+	def __init__(self,maxJobs=None,logDir=None):
+		'''
+		Args:
+			<maxJobs>: None or a positive int value. The maximum number of jobs running at the same time.
+						If None,run all jobs at the same time.
+			<logDir>: None or a directory to keep logs.
+		'''
+		super().__init__(logDir)
+		if maxJobs is not None:
+			declare.is_positive_int("maxJobs",maxJobs)
+		self.__maxJobs = maxJobs
+
+	@property
+	def maxJobs(self):
+		return self.__maxJobs
+
+	def _run_job(self,jobID,cmd,env,timeout):
+		'''
+		Run one job and wait for it.
+
+		Return:
+			a pair: return code and error information.
+		'''
+		startTime = time.time()
+		p = telemetry.popen(cmd,shell=True,stderr=subprocess.PIPE,env=env)
+		try:
+			_,err = p.communicate(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			p.kill()
+			p.communicate()
+			return (-9,_TIMEOUT_MESSAGE)
+		else:
+			telemetry.record(cmd,p,startTime)
+			return (p.returncode,err)
+
+	def _run_array(self,cmds,env,timeout):
+
+		deadline = None if timeout is None else time.time() + timeout
+
+		def run_one(jobID,cmd):
+			remaining = None if deadline is None else max(deadline-time.time(),1)
+			return self._run_job(jobID,cmd,env,remaining)
+
+		maxJobs = len(cmds) if self.__maxJobs is None else min(self.__maxJobs,len(cmds))
+		with ThreadPoolExecutor(max_workers=maxJobs) as executor:
+			futures = [ executor.submit(run_one,jobID,cmd) for jobID,cmd in enumerate(cmds,start=1) ]
+			return [ f.result() for f in futures ]
+
+class SSHBackend(LocalBackend):
+	'''
+	Run jobs on a list of remote hosts by SSH. We assume that the hosts share the file system with local machine,
+	including the temporary directory (set TMPDIR environment variable to a shared directory).
+	A host can appear several times in the list to run more than one job on it at the same time.
+	'''
+	def __init__(self,hosts,sshCmd="ssh -o BatchMode=yes",logDir=None):
+		'''
+		Args:
+			<hosts>: a list of host names.
+			<sshCmd>: the SSH command and its options.
+			<logDir>: None or a directory to keep logs.
+		'''
+		declare.is_classes("hosts",hosts,[list,tuple])
+		assert len(hosts) > 0,"<hosts> is void."
+		declare.members_are_valid_strings("hosts",hosts)
+		declare.is_valid_string("sshCmd",sshCmd)
+		super().__init__(maxJobs=len(hosts),logDir=logDir)
+		self.__hosts = list(hosts)
+		self.__sshCmd = sshCmd
+		self.__freeHosts = []
+		self.__lock = threading.Lock()
+
+	@property
+	def hosts(self):
+		return self.__hosts[:]
+
+	def _run_array(self,cmds,env,timeout):
+		self.__freeHosts = self.__hosts[:]
+		return super()._run_array(cmds,env,timeout)
+
+	def _run_job(self,jobID,cmd,env,timeout):
+		# The pool size is the same as the number of hosts, so a free host is always available here.
+		with self.__lock:
+			host = self.__freeHosts.pop(0)
+		try:
+			remoteCmd = f"cd {shlex.quote(os.getcwd())} && export PATH={shlex.quote(env['PATH'])} && {cmd}"
+			return super()._run_job(jobID,f"{self.__sshCmd} {host} {shlex.quote(remoteCmd)}",env,timeout)
+		finally:
+			with self.__lock:
+				self.__freeHosts.append(host)
+
+class MemoryAwareBackend(LocalBackend):
+	'''
+	Run jobs with a local process pool, but only start a new job when there is enough free memory.
+	The memory of one job is estimated from the sizes of files it will load (for example,HCLG graph and model),
+	or probed from the peak RSS of the first job. Live RSS of running jobs is watched through /proc.
+	If /proc is not available,it works as a LocalBackend.
+	'''
+	def __init__(self,maxJobs=None,jobMemory=None,memoryFiles=None,headroom=0.1,probeTime=10,pinCores=False,logDir=None):
+		'''
+		Args:
+			<maxJobs>: None or a positive int value. The maximum number of jobs running at the same time.
+			<jobMemory>: None or a positive int value. The estimated memory in bytes of one job.
+			<memoryFiles>: None or a list of file names. If <jobMemory> is None,use their total size as the estimated memory.
+			<headroom>: a float value in [0,1). The proportion of total memory which should be kept free.
+			<probeTime>: If the estimated memory is unknown,run the first job alone for at most this seconds and use its peak RSS.
+			<pinCores>: If True,pin each job to a different CPU core.
+			<logDir>: None or a directory to keep logs.
+		'''
+		super().__init__(maxJobs=maxJobs,logDir=logDir)
+		if jobMemory is not None:
+			declare.is_positive_int("jobMemory",jobMemory)
+		elif memoryFiles is not None:
+			if isinstance(memoryFiles,str):
+				memoryFiles = [memoryFiles,]
+			declare.is_classes("memoryFiles",memoryFiles,[list,tuple])
+			jobMemory = 0
+			for fileName in memoryFiles:
+				declare.is_file("memoryFiles",fileName)
+				jobMemory += os.path.getsize(fileName)
+		declare.in_boundary("headroom",headroom,minV=0.0,maxV=0.99)
+		declare.is_positive("probeTime",probeTime)
+		declare.is_bool("pinCores",pinCores)
+
+		self.__jobMemory = jobMemory
+		self.__headroom = headroom
+		self.__probeTime = probeTime
+		self.__pinCores = pinCores
+
+	@property
+	def jobMemory(self):
+		'''
+		Get the estimated memory of one job. It will be updated with the peak RSS observed.
+		'''
+		return self.__jobMemory
+
+	def _run_array(self,cmds,env,timeout):
+
+		deadline = None if timeout is None else time.time() + timeout
+		maxJobs = len(cmds) if self.maxJobs is None else min(self.maxJobs,len(cmds))
+		freeCores = sorted(os.sched_getaffinity(0)) if (self.__pinCores and hasattr(os,"sched_getaffinity")) else []
+		if self.__pinCores:
+			maxJobs = min(maxJobs,max(len(freeCores),1))
+
+		results = [ None for i in range(len(cmds)) ]
+		waiting = list(range(len(cmds)))
+		running = {} # index -> [process,errorFile,peakRSS,startTime,core]
+
+		# If a job finished before its memory was measured,the estimation falls back to the available memory.
+		unmeasured = False
+
+		try:
+			while len(waiting) > 0 or len(running) > 0:
+				# scan the process tree once in each round
+				children = _process_children()
+				# collect finished jobs
+				for index in list(running.keys()):
+					p,errFile,peak,startTime,core = running[index]
+					rss = _process_tree_rss(p.pid,children)
+					running[index][2] = peak = max(peak,rss)
+					if p.poll() is not None:
+						telemetry.record(cmds[index],p,startTime)
+						errFile.seek(0)
+						results[index] = (p.returncode,errFile.read())
+						errFile.close()
+						if core is not None:
+							freeCores.append(core)
+						# a job may exit before it is sampled,so also use the peak RSS reported when it was reaped
+						peak = max(peak,telemetry.peak_rss(p) or 0)
+						if peak > 0:
+							self.__jobMemory = peak if self.__jobMemory is None else max(self.__jobMemory,peak)
+						else:
+							unmeasured = True
+						del running[index]
+					elif self.__jobMemory is None and time.time() - startTime >= self.__probeTime and peak > 0:
+						# finish probing
+						self.__jobMemory = peak
+
+				if deadline is not None and time.time() > deadline:
+					break
+				# start new jobs if there is headroom
+				while len(waiting) > 0 and len(running) < maxJobs and self.__admit(running,children,unmeasured):
+					index = waiting.pop(0)
+					core = freeCores.pop(0) if len(freeCores) > 0 else None
+					errFile = tempfile.TemporaryFile(prefix="exkaldi_")
+					preexec = None if core is None else (lambda core=core: os.sched_setaffinity(0,{core}))
+					p = telemetry.popen(cmds[index],keepUsage=True,shell=True,stderr=errFile,env=env,preexec_fn=preexec)
+					running[index] = [p,errFile,0,time.time(),core]
+				time.sleep(0.1)
+
+		finally:
+			# kill the jobs which are time out
+			for index,(p,errFile,_,_,_) in running.items():
+				p.kill()
+				p.wait()
+				errFile.close()
+				results[index] = (-9,_TIMEOUT_MESSAGE)
+			for index in waiting:
+				results[index] = (-9,_TIMEOUT_MESSAGE)
+
+		return results
+
+	def __admit(self,running,children,unmeasured):
+		'''
+		Decide whether or not a new job can be started now.
+
+		Args:
+			<running>: the running jobs.
+			<children>: the process tree made by _process_children().
+			<unmeasured>: If True,a job has finished without any memory measured,so do not wait for probing anymore.
+		'''
+		# At least one job should run to make progress.
+		if len(running) == 0:
+			return True
+		jobMemory = self.__jobMemory
+		if jobMemory is None:
+			# Still probing the memory of the first job.
+			if not unmeasured:
+				return False
+			jobMemory = 0
+		total,available = _read_meminfo()
+		if total is None:
+			return True
+		# the running jobs may still grow up to the estimated memory
+		reserved = sum( max(jobMemory - _process_tree_rss(job[0].pid,children),0) for job in running.values() )
+		return available - reserved - self.__headroom*total >= jobMemory
+
+def _read_meminfo():
+	'''
+	Read the total and available memory in bytes from /proc/meminfo.
+	'''
+	total = available = None
+	try:
+		with open("/proc/meminfo","r") as fr:
+			for line in fr:
+				if line.startswith("MemTotal:"):
+					total = int(line.split()[1])*1024
+				elif line.startswith("MemAvailable:"):
+					available = int(line.split()[1])*1024
+	except OSError:
+		return None,None
+	if total is None or available is None:
+		return None,None
+	return total,available
+
+def _process_children():
+	'''
+	Map the ID of each process to the IDs of its children through /proc.
+
+	Return:
+		a dict or None if /proc is not available.
+	'''
+	if not os.path.isdir("/proc"):
+		return None
+	children = {}
+	for name in os.listdir("/proc"):
+		if not name.isdigit():
+			continue
+		try:
+			with open(f"/proc/{name}/stat","r") as fr:
+				# the command name may contain spaces, so split after the last ")"
+				ppid = int(fr.read().rsplit(")",1)[1].split()[1])
+		except (OSError,IndexError,ValueError):
+			continue
+		children.setdefault(ppid,[]).append(int(name))
+	return children
+
+def _process_tree_rss(pid,children):
+	'''
+	Compute the total RSS in bytes of a process and all of its descendants through /proc.
+
+	Args:
+		<pid>: the process ID.
+		<children>: the process tree made by _process_children().
+	'''
+	if children is None:
+		return 0
+
+	rss = 0
+	stack = [pid]
+	while len(stack) > 0:
+		p = stack.pop()
+		try:
+			with open(f"/proc/{p}/statm","r") as fr:
+				rss += int(fr.read().split()[1])*os.sysconf("SC_PAGE_SIZE")
+		except (OSError,IndexError,ValueError):
+			pass
+		stack.extend(children.get(p,[]))
+	return rss
+
+class TemplateBackend(BaseBackend):
+	'''
+	Submit jobs as a job array by a command template, such as Kaldi "queue.pl" or "slurm.pl".
+	The template should contain three placeholders:
+		{N}: the number of jobs.
+		{log}: the log file name including the string "JOB".
+		{cmd}: the command including the string "JOB".
+	The submitter should replace "JOB" with the job ID from 1 to N, run the jobs and wait for them.
+	For example: "queue.pl --mem 4G JOB=1:{N} {log} {cmd}".
+	Temporary files are generated in the system temporary directory,
+	so please set TMPDIR environment variable to a shared directory before importing exkaldi.
+	'''
+	def __init__(self,template="queue.pl JOB=1:{N} {log} {cmd}",logDir=None):
+		'''
+		Args:
+			<template>: the command template.
+			<logDir>: None or a directory to keep logs.
+		'''
+		super().__init__(logDir)
+		declare.is_valid_string("template",template)
+		for name in ["{N}","{log}","{cmd}"]:
+			assert name in template,f"<template> should contain placeholder: {name}."
+		self.__template = template
+
+	@property
+	def template(self):
+		return self.__template
+
+	def _run_array(self,cmds,env,timeout):
+		# The scripts must be visible from the computing nodes, so do not use the system temporary directory.
+		workDir = tempfile.mkdtemp(prefix="exkaldi_jobs_",dir=os.getcwd() if self.logDir is None else self.logDir)
+		try:
+			for jobID,cmd in enumerate(cmds,start=1):
+				with open(os.path.join(workDir,f"job.{jobID}.sh"),"w",encoding="utf-8") as fw:
+					fw.write("#!/bin/bash\n")
+					fw.write(f"cd {shlex.quote(os.getcwd())}\n")
+					fw.write(f"export PATH={shlex.quote(env['PATH'])}\n")
+					fw.write(f"( {cmd} )\n")
+					fw.write("code=$?\n")
+					fw.write(f"echo $code > {shlex.quote(os.path.join(workDir,f'job.{jobID}.code'))}\n")
+					fw.write("exit $code\n")
+
+			submitCmd = self.__template.format(
+										N=len(cmds),
+										log=shlex.quote(os.path.join(workDir,"job.JOB.log")),
+										cmd="bash " + shlex.quote(os.path.join(workDir,"job.JOB.sh")),
+									)
+			p = subprocess.Popen(submitCmd,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=env)
+			try:
+				_,submitErr = p.communicate(timeout=timeout)
+			except subprocess.TimeoutExpired:
+				p.kill()
+				p.communicate()
+				submitErr = _TIMEOUT_MESSAGE
+
+			results = []
+			for jobID in range(1,len(cmds)+1):
+				codeFile = os.path.join(workDir,f"job.{jobID}.code")
+				logFile = os.path.join(workDir,f"job.{jobID}.log")
+				log = b""
+				if os.path.isfile(logFile):
+					with open(logFile,"rb") as fr:
+						log = fr.read()
+				if os.path.isfile(codeFile):
+					with open(codeFile,"r") as fr:
+						results.append( (int(fr.read().strip()),log) )
+				else:
+					# The job did not finish, report the error of the submitter.
+					results.append( (-9 if submitErr is _TIMEOUT_MESSAGE else 1,log+submitErr) )
+			return results
+
+		finally:
+			shutil.rmtree(workDir,ignore_errors=True)
+
+_BACKEND = None
+
+def set_backend(backend):
+	'''
+	Set the global job backend used by parallel functions.
+
+	Args:
+		<backend>: None or an exkaldi backend object. If None,run all jobs locally at the same time.
+	'''
+	global _BACKEND
+	if backend is not None:
+		declare.belong_classes("backend",backend,BaseBackend)
+	_BACKEND = backend
+
+def get_backend():
+	'''
+	Get the global job backend.
+
+	Return:
+		None or an exkaldi backend object.
+	'''
+	return _BACKEND
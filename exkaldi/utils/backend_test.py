@@ -0,0 +1,82 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.backend'''
+
+import os
+import time
+import pytest
+from exkaldi.utils import backend
+from exkaldi.utils.utils import run_shell_command_parallel
+
+# A local stand-in of Kaldi "run.pl": submit.sh JOB=1:N log command
+SUBMIT_SCRIPT = """#!/bin/bash
+range=${1#JOB=}; first=${range%:*}; last=${range#*:}; log=$2; shift 2
+code=0
+for ((j=first;j<=last;j++)); do
+  bash -c "${*//JOB/$j}" > "${log//JOB/$j}" 2>&1 || code=1
+done
+exit $code
+"""
+
+def check_array(jobBackend,outDir):
+  cmds = [ f"echo job{i} > {outDir}/out.{i}; echo log{i} 1>&2" for i in range(1,4) ]
+  cmds.append("echo failed 1>&2; exit 3")
+  results = run_shell_command_parallel(cmds,backend=jobBackend)
+
+  assert [ r[0] for r in results ] == [0,0,0,3]
+  for i in range(1,4):
+    assert results[i-1][1].strip().endswith(f"log{i}".encode())
+    with open(os.path.join(outDir,f"out.{i}")) as fr:
+      assert fr.read().strip() == f"job{i}"
+  assert b"failed" in results[3][1]
+
+def test_local_backend(tmpdir):
+  check_array(backend.LocalBackend(maxJobs=2,logDir=str(tmpdir.join("log"))),str(tmpdir))
+  assert os.path.isfile(str(tmpdir.join("log","job.4.log")))
+
+def test_template_backend(tmpdir):
+  submitScript = str(tmpdir.join("submit.sh"))
+  with open(submitScript,"w") as fw:
+    fw.write(SUBMIT_SCRIPT)
+  check_array(backend.TemplateBackend(f"bash {submitScript} JOB=1:{{N}} {{log}} {{cmd}}"),str(tmpdir))
+
+def test_memory_aware_backend(tmpdir):
+  check_array(backend.MemoryAwareBackend(maxJobs=2,jobMemory=1024,pinCores=True),str(tmpdir))
+  # probe the memory from the first job
+  jobBackend = backend.MemoryAwareBackend(probeTime=0.1)
+  results = run_shell_command_parallel(["sleep 0.5" for i in range(3)],backend=jobBackend)
+  assert [ r[0] for r in results ] == [0,0,0]
+  assert jobBackend.jobMemory > 0
+
+def test_memory_aware_backend_fast_jobs():
+  # The first job exits before its memory is sampled,so use the peak RSS reported when it is reaped.
+  jobBackend = backend.MemoryAwareBackend(maxJobs=3)
+  startTime = time.time()
+  results = run_shell_command_parallel(["true","sleep 0.5","sleep 0.5","sleep 0.5"],backend=jobBackend)
+  assert [ r[0] for r in results ] == [0,0,0,0]
+  assert jobBackend.jobMemory > 0
+  # Other jobs run at the same time rather than one by one.
+  assert time.time() - startTime < 1.2
+
+def test_incomplete_backend():
+
+  class IncompleteBackend(backend.BaseBackend):
+    pass
+
+  with pytest.raises(TypeError):
+    IncompleteBackend()
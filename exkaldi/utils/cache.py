@@ -0,0 +1,311 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''A content-addressed disk cache for the results of shell and Kaldi commands.'''
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+from collections import namedtuple
+
+from exkaldi.version import info as ExkaldiInfo
+from exkaldi.version import WrongPath
+from exkaldi.utils import declare
+
+_TOKEN_SPLITER = re.compile(r"(\s+|[:,=|<>;&'\"])")
+
+class ResultCache:
+	'''
+	Cache the outputs of commands on disk.
+	The key of an entry is computed from the expanded command, the fingerprints of input files and buffers,
+	and the Kaldi version. Entries are evicted in least-recently-used order when the total size exceeds the limit.
+	'''
+	def __init__(self,cacheDir,maxSize=10*1024**3):
+		'''
+		Args:
+			<cacheDir>: the root directory to store cached results.
+			<maxSize>: the maximum size in bytes of all cached results.
+		'''
+		declare.is_valid_string("cacheDir",cacheDir)
+		declare.is_positive_int("maxSize",maxSize)
+
+		cacheDir = os.path.abspath(cacheDir.strip())
+		if os.path.isfile(cacheDir):
+			raise WrongPath(f"<cacheDir> has existed as a file: {cacheDir}.")
+		os.makedirs(cacheDir,exist_ok=True)
+
+		self.__cacheDir = cacheDir
+		self.__maxSize = maxSize
+		self.__hits = 0
+		self.__misses = 0
+		self.__evictions = 0
+		self.__kaldiVersion = None
+
+	@property
+	def cacheDir(self):
+		return self.__cacheDir
+
+	@property
+	def maxSize(self):
+		return self.__maxSize
+
+	@property
+	def size(self):
+		'''
+		Get the total size in bytes of all cached results.
+		'''
+		return sum( s for _,s,_ in self.__list_entries() )
+
+	@property
+	def stats(self):
+		'''
+		Get the hit and miss statistics of this cache.
+
+		Return:
+			a namedtuple with fields: hits,misses,evictions,entries,size.
+		'''
+		entries = self.__list_entries()
+		return namedtuple("CacheStats",["hits","misses","evictions","entries","size"])(
+							self.__hits,self.__misses,self.__evictions,len(entries),sum(s for _,s,_ in entries)
+						)
+
+	def reset_stats(self):
+		'''
+		Reset the hit and miss statistics.
+		'''
+		self.__hits = 0
+		self.__misses = 0
+		self.__evictions = 0
+
+	def clear(self):
+		'''
+		Remove all cached results.
+		'''
+		for entryDir,_,_ in self.__list_entries():
+			shutil.rmtree(entryDir,ignore_errors=True)
+
+	def make_key(self,cmd,inputs=None,excludeFiles=None):
+		'''
+		Compute the key of a command.
+		Every token of the command which is an existing file is replaced with its fingerprint,
+		so commands that only differ in the names of temporary files get the same key.
+
+		Args:
+			<cmd>: a string,the expanded command.
+			<inputs>: None,a string or bytes object sent to the input stream.
+			<excludeFiles>: a list of file names which should not be fingerprinted,for example,output files.
+
+		Return:
+			a hexadecimal string.
+		'''
+		declare.is_valid_string("cmd",cmd)
+		if excludeFiles is None:
+			excludeFiles = []
+		excludeFiles = [ os.path.abspath(fileName) for fileName in excludeFiles if fileName != "-" ]
+
+		tokens = []
+		for token in _TOKEN_SPLITER.split(cmd):
+			if len(token) > 0 and (not token.isspace()) and os.path.isfile(token) and (os.path.abspath(token) not in excludeFiles):
+				token = f"<{file_fingerprint(token)}>"
+			tokens.append(token)
+
+		md5 = hashlib.md5()
+		md5.update(f"exkaldi={ExkaldiInfo.version};kaldi={self.__kaldi_version()};".encode())
+		md5.update("".join(tokens).encode())
+		if inputs is not None:
+			if isinstance(inputs,str):
+				inputs = inputs.encode()
+			md5.update(b";inputs=")
+			md5.update(hashlib.md5(inputs).digest())
+
+		return md5.hexdigest()
+
+	def get(self,key,outFile=None):
+		'''
+		Look up a cached result.
+
+		Args:
+			<key>: the key returned by .make_key().
+			<outFile>: If not None,restore the cached output file to this path.
+
+		Return:
+			None if missed,or a triple: (out,err,returnCode).
+		'''
+		entryDir = self.__entry_dir(key)
+		if not os.path.isdir(entryDir) or (outFile is not None and not os.path.isfile(os.path.join(entryDir,"outFile"))):
+			self.__misses += 1
+			return None
+
+		try:
+			with open(os.path.join(entryDir,"out"),"rb") as fr:
+				out = fr.read()
+			with open(os.path.join(entryDir,"err"),"rb") as fr:
+				err = fr.read()
+			if outFile is not None and outFile != "-":
+				shutil.copyfile(os.path.join(entryDir,"outFile"),outFile)
+		except FileNotFoundError:
+			# The entry was evicted by another process meanwhile.
+			self.__misses += 1
+			return None
+
+		# update the access time for LRU
+		os.utime(entryDir,None)
+		self.__hits += 1
+
+		return out,err,0
+
+	def put(self,key,out=None,err=None,outFile=None):
+		'''
+		Store a result. Only successful results should be stored.
+
+		Args:
+			<key>: the key returned by .make_key().
+			<out>: None or bytes object of the output stream.
+			<err>: None or bytes object of the error stream.
+			<outFile>: None or the output file name of the command.
+		'''
+		entryDir = self.__entry_dir(key)
+		if os.path.isdir(entryDir):
+			return
+
+		os.makedirs(os.path.dirname(entryDir),exist_ok=True)
+		# write to a temporary directory firstly,then rename it,to keep the entry complete.
+		tempDir = tempfile.mkdtemp(prefix=".pending_",dir=os.path.dirname(entryDir))
+		try:
+			with open(os.path.join(tempDir,"out"),"wb") as fw:
+				fw.write(b"" if out is None else out)
+			with open(os.path.join(tempDir,"err"),"wb") as fw:
+				fw.write(b"" if err is None else err)
+			if outFile is not None and outFile != "-":
+				shutil.copyfile(outFile,os.path.join(tempDir,"outFile"))
+			os.rename(tempDir,entryDir)
+		except OSError:
+			shutil.rmtree(tempDir,ignore_errors=True)
+			if not os.path.isdir(entryDir):
+				raise
+
+		self.evict()
+
+	def evict(self):
+		'''
+		Remove the least recently used results until the total size is not greater than the limit.
+		'''
+		entries = sorted(self.__list_entries(),key=lambda x:x[2])
+		totalSize = sum( s for _,s,_ in entries )
+		for entryDir,entrySize,_ in entries:
+			if totalSize <= self.__maxSize:
+				break
+			shutil.rmtree(entryDir,ignore_errors=True)
+			totalSize -= entrySize
+			self.__evictions += 1
+
+	def __entry_dir(self,key):
+		return os.path.join(self.__cacheDir,key[0:2],key)
+
+	def __list_entries(self):
+		entries = []
+		for subDir in os.listdir(self.__cacheDir):
+			subDir = os.path.join(self.__cacheDir,subDir)
+			if not os.path.isdir(subDir):
+				continue
+			for entryName in os.listdir(subDir):
+				if entryName.startswith("."):
+					continue
+				entryDir = os.path.join(subDir,entryName)
+				try:
+					entrySize = sum( os.path.getsize(os.path.join(entryDir,f)) for f in os.listdir(entryDir) )
+					lastAccess = os.path.getmtime(entryDir)
+				except FileNotFoundError:
+					continue
+				entries.append( (entryDir,entrySize,lastAccess) )
+		return entries
+
+	def __kaldi_version(self):
+		# Look up it only one time. If Kaldi is reset,enable a new cache.
+		if self.__kaldiVersion is None:
+			if ExkaldiInfo.KALDI_ROOT is None:
+				self.__kaldiVersion = "none"
+			else:
+				kaldi = ExkaldiInfo.KALDI
+				self.__kaldiVersion = kaldi if isinstance(kaldi,str) else kaldi.version
+		return self.__kaldiVersion
+
+def file_fingerprint(fileName):
+	'''
+	Compute the fingerprint of a file.
+	Temporary files generated by exkaldi are fingerprinted by their contents because their names are random,
+	and other files are fingerprinted by their path,size and modification time.
+
+	Args:
+		<fileName>: a file name.
+
+	Return:
+		a string.
+	'''
+	declare.is_file("fileName",fileName)
+
+	fileName = os.path.abspath(fileName)
+	if os.path.basename(fileName).startswith("exkaldi_") and os.path.dirname(fileName) == os.path.abspath(tempfile.gettempdir()):
+		md5 = hashlib.md5()
+		with open(fileName,"rb") as fr:
+			while True:
+				chunk = fr.read(1024*1024)
+				if not chunk:
+					break
+				md5.update(chunk)
+		return md5.hexdigest()
+	else:
+		st = os.stat(fileName)
+		return f"{fileName}:{st.st_size}:{st.st_mtime_ns}"
+
+_CACHE = None
+
+def enable_cache(cacheDir=None,maxSize=10*1024**3):
+	'''
+	Enable the global result cache. It is disabled defaultly.
+	When it is enabled,successful results of Kaldi commands run with useCache=True will be reused if the command and its inputs did not change.
+
+	Args:
+		<cacheDir>: the root directory. If None,use "~/.cache/exkaldi".
+		<maxSize>: the maximum size in bytes.
+
+	Return:
+		an exkaldi ResultCache object.
+	'''
+	global _CACHE
+	if cacheDir is None:
+		cacheDir = os.path.join(os.path.expanduser("~"),".cache","exkaldi")
+	_CACHE = ResultCache(cacheDir,maxSize)
+	return _CACHE
+
+def disable_cache():
+	'''
+	Disable the global result cache. The cached results will not be removed.
+	'''
+	global _CACHE
+	_CACHE = None
+
+def get_cache():
+	'''
+	Get the global result cache.
+
+	Return:
+		None if the cache is disabled,or an exkaldi ResultCache object.
+	'''
+	return _CACHE
@@ -0,0 +1,49 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.cache'''
+
+import os
+from exkaldi.utils import cache
+from exkaldi.utils.utils import run_shell_command
+
+def test_cache_hit_and_eviction(tmpdir):
+
+  resultCache = cache.enable_cache(str(tmpdir.join("cache")),maxSize=64)
+  try:
+    inFile = str(tmpdir.join("in.txt"))
+    with open(inFile,"w") as fw:
+      fw.write("hello\n")
+
+    out1,_,_ = run_shell_command(f"cat {inFile}; date +%N",stdout="PIPE",useCache=True)
+    out2,_,_ = run_shell_command(f"cat {inFile}; date +%N",stdout="PIPE",useCache=True)
+    assert out1 == out2
+    assert resultCache.stats.hits == 1 and resultCache.stats.misses == 1
+
+    # change the input file,then the key changes
+    with open(inFile,"w") as fw:
+      fw.write("hello world\n")
+    os.utime(inFile,ns=(0,0))
+    out3,_,_ = run_shell_command(f"cat {inFile}; date +%N",stdout="PIPE",useCache=True)
+    assert out3.startswith(b"hello world")
+
+    # a large result evicts the older ones
+    run_shell_command("head -c 100 /dev/zero",stdout="PIPE",useCache=True)
+    assert resultCache.size <= 64
+    assert resultCache.stats.evictions > 0
+  finally:
+    cache.disable_cache()
@@ -20,20 +20,25 @@
 import os
 from exkaldi.version import info as ExkaldiInfo
 from collections import Iterable
+from contextlib import contextmanager
+import threading
 import inspect
+import numpy as np
 
 class DeclareError(Exception):pass
 
 def declare_wrapper(func):
-	assert inspect.getfullargspec(func).defaults is None,f"Declare function {func.__name__} cannot has default value!"
+	argSpec = inspect.getfullargspec(func)
+	assert argSpec.defaults is None,f"Declare function {func.__name__} cannot has default value!"
+	# Inspect the arguments only one time because declare functions are called frequently.
+	argsNames = argSpec.args
+	needNums = len(argsNames)
 	def inner(*args,**kwargs):
 		if "debug" in kwargs.keys():
 			errMes = kwargs.pop("debug")
 		else:
 			errMes = None
 		# Allows missing "name" parameter.
-		argsNames = inspect.getfullargspec(func).args
-		needNums = len(argsNames)
 		if "name" in argsNames:
 			if len(args) + len(kwargs) == needNums - 1:
 				args = ("target",) + args
@@ -51,6 +56,48 @@ def declare_wrapper(func):
 def __type_name(obj):
 	return obj.__class__.__name__
 
+def __is_list_table(obj):
+	# import here because exkaldi.utils.utils depends on this module
+	from exkaldi.utils.utils import is_list_table
+	return is_list_table(obj)
+
+_STAT_CACHE = threading.local()
+
+@contextmanager
+def stat_cache():
+	'''
+	Cache the results of file and directory checks in this context,so a repeated path is only checked one time.
+	Usage:
+		with declare.stat_cache():
+			for filePath in filePaths:
+				declare.is_file("filePath",filePath)
+	'''
+	if getattr(_STAT_CACHE,"table",None) is not None:
+		yield
+	else:
+		_STAT_CACHE.table = {}
+		try:
+			yield
+		finally:
+			_STAT_CACHE.table = None
+
+def __path_state(path):
+	'''
+	Get "file","dir" or None. The result is cached in stat_cache context.
+	'''
+	table = getattr(_STAT_CACHE,"table",None)
+	if table is not None and path in table:
+		return table[path]
+	if os.path.isfile(path):
+		state = "file"
+	elif os.path.isdir(path):
+		state = "dir"
+	else:
+		state = None
+	if table is not None:
+		table[path] = state
+	return state
+
 @declare_wrapper
 def kaldi_existed():
 	'''
@@ -87,8 +134,9 @@ def is_file(name,filePath):
 	Verify whether or not this is a existed file.
 	'''
 	is_valid_string(f"File path: {name}",filePath)
-	assert not os.path.isdir(filePath),f"{name} is not a file but a directory: {filePath}."
-	assert os.path.isfile(filePath),f"No such file: {filePath}."
+	state = __path_state(filePath)
+	assert state != "dir",f"{name} is not a file but a directory: {filePath}."
+	assert state == "file",f"No such file: {filePath}."
 
 @declare_wrapper
 def is_dir(name,dirPath):
@@ -106,8 +154,10 @@ def members_are_files(name,filePaths):
 	'''
 	assert isinstance(filePaths,Iterable),f"{name} is not iterable: {__type_name(filePaths)}."
 
-	for filePath in filePaths:
-		is_file(name,filePath)
+	# Check every different path only one time.
+	with stat_cache():
+		for filePath in filePaths:
+			is_file(name,filePath)
 
 @declare_wrapper
 def is_classes(name,obj,targetClasses):
@@ -131,6 +181,8 @@ def is_classes(name,obj,targetClasses):
 			className.append( targetClasses.__name__ )
 	classNameCon = ",".join(className)
 	
+	if "ListTable" in className and __is_list_table(obj):
+		return
 	assert __type_name(obj) in className,f"{name} is not an instance included in [{classNameCon}] classes: {__type_name(obj)}"
 
 @declare_wrapper
@@ -356,6 +408,28 @@ def is_non_negative_int(name,value):
 	'''  
 	assert isinstance(value,int) and value >= 0,f"{name} should be a non-negative int value but got: {value}."
 
+@declare_wrapper
+def members_are_positive_ints(name,values):
+	'''
+	Verify whether or not these values are positive int values. They are checked as an array at one time.
+	'''
+	values = np.asarray(values)
+	assert values.ndim == 1,f"{name} should be a 1-d sequence of int values but got shape: {values.shape}."
+	if values.size > 0:
+		assert values.dtype.kind in "iu",f"{name} should be int values but got dtype: {values.dtype}."
+		assert values.min() > 0,f"{name} should be positive int values but got: {values.min()}."
+
+@declare_wrapper
+def members_are_non_negative_ints(name,values):
+	'''
+	Verify whether or not these values are non-negative int values. They are checked as an array at one time.
+	'''
+	values = np.asarray(values)
+	assert values.ndim == 1,f"{name} should be a 1-d sequence of int values but got shape: {values.shape}."
+	if values.size > 0:
+		assert values.dtype.kind in "iu",f"{name} should be int values but got dtype: {values.dtype}."
+		assert values.min() >= 0,f"{name} should be non-negative int values but got: {values.min()}."
+
 @declare_wrapper
 def is_non_negative_float(name,value):
 	'''
@@ -473,14 +547,14 @@ def is_potential_list_table(name,listTable):
 	if isinstance(listTable,str):
 		is_file(name,listTable)
 	else:
-		assert __type_name(listTable) == "ListTable",f"{name} is not a file name or exkaldi ListTable object: {__type_name(listTable)}."
+		assert __is_list_table(listTable),f"{name} is not a file name or exkaldi ListTable object: {__type_name(listTable)}."
 
 @declare_wrapper
 def is_list_table(name,listTable):
 	'''
 	Verify whether or not this is an exkaldi ListTable object.
 	'''	
-	assert __type_name(obj) == "ListTable",f"{name} should be an exkaldi ListTable object but got: {__type_name(obj)}."
+	assert __is_list_table(listTable),f"{name} should be an exkaldi ListTable object but got: {__type_name(listTable)}."
 
 @declare_wrapper
 def is_potential_hmm(name,hmm):
@@ -18,6 +18,7 @@
 
 '''Tests for exkaldi.utils.utils.declare'''
 
+import os
 from exkaldi.utils import declare
 
 def test_is_classes_and_belong_classes():
@@ -34,3 +35,32 @@ def test_is_classes_and_belong_classes():
 
   declare.is_classes("test object",b,B)
   declare.belong_classes("test object",b,A)
+
+def test_bulk_validators(tmpdir):
+
+  declare.members_are_positive_ints("frames",[1,2,3])
+  declare.members_are_non_negative_ints("startIndexes",[0,10,20])
+  for func,values in [(declare.members_are_positive_ints,[1,0]),
+                      (declare.members_are_non_negative_ints,[1.0,2.0]),
+                      (declare.members_are_positive_ints,[[1,2]])]:
+    try:
+      func("values",values)
+    except AssertionError:
+      pass
+    else:
+      raise Exception(f"Failed to detect wrong values: {values}.")
+
+  fileName = str(tmpdir.join("a.ark"))
+  with open(fileName,"w") as fw:
+    fw.write("a")
+  with declare.stat_cache():
+    declare.is_file("fileName",fileName)
+    os.remove(fileName)
+    # the result has been cached in this context
+    declare.is_file("fileName",fileName)
+  try:
+    declare.is_file("fileName",fileName)
+  except AssertionError:
+    pass
+  else:
+    raise Exception("The stat cache should not work out of the context.")
@@ -0,0 +1,237 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Account the memory held by exkaldi archive objects.'''
+
+import sys
+import weakref
+import threading
+from collections import namedtuple
+
+from exkaldi.utils import declare
+
+MemoryRecord = namedtuple("MemoryRecord",["type","name","nbytes"])
+
+class MemoryRegistry:
+	'''
+	Keep weak references of archive objects and account their sizes.
+	The size of an object is measured when it is created,when its data is reset and when .snapshot() is called.
+	Objects which are filled after they are created,such as tables,are measured accurately only by .snapshot().
+	'''
+	def __init__(self):
+		self.__refs = {}
+		self.__sizes = {}
+		self.__total = 0
+		self.__peak = 0
+		self.__lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.__refs)
+
+	@property
+	def total(self):
+		'''
+		The total size in bytes of live objects when they were measured last time.
+		'''
+		return self.__total
+
+	@property
+	def peak(self):
+		'''
+		The peak of the total size since this registry was created or the peak was reset.
+		'''
+		return self.__peak
+
+	def reset_peak(self):
+		'''
+		Reset the peak to current total size.
+		'''
+		with self.__lock:
+			self.__peak = self.__total
+
+	def track(self,obj):
+		'''
+		Start to track an object.
+
+		Args:
+			<obj>: an object which has the "nbytes" attribute.
+		'''
+		key = id(obj)
+		ref = weakref.ref(obj,lambda r,key=key:self.__forget(key))
+		size = _measure(obj)
+		with self.__lock:
+			if key in self.__refs:
+				self.__total -= self.__sizes[key]
+			self.__refs[key] = ref
+			self.__sizes[key] = size
+			self.__total += size
+			self.__peak = max(self.__peak,self.__total)
+
+	def update(self,obj):
+		'''
+		Measure a tracked object again.
+
+		Args:
+			<obj>: an object tracked before.
+		'''
+		key = id(obj)
+		if key not in self.__refs:
+			return
+		size = _measure(obj)
+		with self.__lock:
+			if key in self.__sizes:
+				self.__total += size - self.__sizes[key]
+				self.__sizes[key] = size
+				self.__peak = max(self.__peak,self.__total)
+
+	def __forget(self,key):
+		with self.__lock:
+			self.__refs.pop(key,None)
+			self.__total -= self.__sizes.pop(key,0)
+
+	def snapshot(self):
+		'''
+		Measure all live objects again.
+
+		Return:
+			a list of MemoryRecord objects sorted by size in descending order.
+		'''
+		with self.__lock:
+			refs = list(self.__refs.items())
+
+		records = []
+		sizes = {}
+		for key,ref in refs:
+			obj = ref()
+			if obj is None:
+				continue
+			sizes[key] = _measure(obj)
+			records.append( MemoryRecord(type(obj).__name__,getattr(obj,"name",None),sizes[key]) )
+
+		with self.__lock:
+			for key,size in sizes.items():
+				if key in self.__sizes:
+					self.__total += size - self.__sizes[key]
+					self.__sizes[key] = size
+			self.__peak = max(self.__peak,self.__total)
+
+		return sorted(records,key=lambda r:r.nbytes,reverse=True)
+
+	def totals(self,by="type"):
+		'''
+		Measure all live objects and group their sizes.
+
+		Args:
+			<by>: "type" or "name".
+
+		Return:
+			a list of tuples: (type or name,count,nbytes),sorted by size in descending order.
+		'''
+		declare.is_instances("by",by,["type","name"])
+
+		table = {}
+		for r in self.snapshot():
+			group = r.type if by == "type" else r.name
+			if group not in table:
+				table[group] = [group,0,0]
+			table[group][1] += 1
+			table[group][2] += r.nbytes
+		return sorted( [tuple(v) for v in table.values()],key=lambda x:x[2],reverse=True )
+
+	def print_summary(self,by="type",fileName=None):
+		'''
+		Print the total sizes.
+
+		Args:
+			<by>: "type" or "name".
+			<fileName>: None or a file handle. If None,print to standard output.
+		'''
+		rows = self.totals(by)
+		fw = sys.stdout if fileName is None else fileName
+		width = max([ len(str(r[0])) for r in rows ] + [4])
+		print(f"{by:<{width}}  {'count':>6}  {'size(MB)':>10}",file=fw)
+		for group,count,nbytes in rows:
+			print(f"{str(group):<{width}}  {count:>6}  {nbytes/1024/1024:>10.2f}",file=fw)
+		print(f"{'total':<{width}}  {len(self):>6}  {self.total/1024/1024:>10.2f}",file=fw)
+		print(f"{'peak':<{width}}  {'':>6}  {self.peak/1024/1024:>10.2f}",file=fw)
+
+def _measure(obj):
+	try:
+		return obj.nbytes
+	except Exception:
+		# The object may be partially initialized.
+		return 0
+
+_REGISTRY = None
+_LOCK = threading.Lock()
+
+def enable():
+	'''
+	Start to track archive objects created later. It is disabled defaultly.
+
+	Return:
+		the MemoryRegistry object.
+	'''
+	global _REGISTRY
+	with _LOCK:
+		if _REGISTRY is None:
+			_REGISTRY = MemoryRegistry()
+	return _REGISTRY
+
+def disable():
+	'''
+	Stop tracking.
+
+	Return:
+		None or the MemoryRegistry object.
+	'''
+	global _REGISTRY
+	with _LOCK:
+		registry = _REGISTRY
+		_REGISTRY = None
+	return registry
+
+def get_registry():
+	'''
+	Get the memory registry.
+
+	Return:
+		None or a MemoryRegistry object.
+	'''
+	return _REGISTRY
+
+def is_active():
+	'''
+	Whether or not the tracking is enabled.
+	'''
+	return _REGISTRY is not None
+
+def track(obj):
+	'''
+	Track an object if the registry is enabled. Archive objects call it when they are created.
+	'''
+	registry = _REGISTRY
+	if registry is not None:
+		registry.track(obj)
+
+def update(obj):
+	'''
+	Measure an object again if the registry is enabled. Archive objects call it when their data is reset.
+	'''
+	registry = _REGISTRY
+	if registry is not None:
+		registry.update(obj)
@@ -0,0 +1,64 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.memory'''
+
+import gc
+import copy
+import numpy as np
+from exkaldi.utils import memory
+from exkaldi.core.archive import NumpyFeature,ListTable
+
+def test_nbytes():
+
+  feat = NumpyFeature({"utt1":np.zeros([10,4],dtype="float32"),"utt2":np.zeros([5,4],dtype="float32")})
+  assert feat.nbytes > 15 * 4 * 4
+
+  bytesFeat = feat.to_bytes()
+  indexTable = bytesFeat.indexTable
+  assert indexTable.nbytes > 0
+  assert bytesFeat.nbytes == len(bytesFeat.data) + indexTable.nbytes
+
+  table = ListTable({"a":"b"})
+  assert table.nbytes > ListTable().nbytes
+
+def test_registry():
+
+  registry = memory.enable()
+  try:
+    feat = NumpyFeature({"utt1":np.zeros([100,4],dtype="float32")},name="big")
+    assert len(registry) == 1
+    assert registry.total == feat.nbytes
+
+    other = copy.deepcopy(feat)
+    assert len(registry) == 2
+    assert registry.totals(by="name") == [("big",2,feat.nbytes*2)]
+
+    del other
+    gc.collect()
+    assert len(registry) == 1
+    assert registry.total == feat.nbytes
+    assert registry.peak == feat.nbytes * 2
+
+    registry.reset_peak()
+    assert registry.peak == feat.nbytes
+  finally:
+    memory.disable()
+
+  # Nothing is tracked after disabled.
+  NumpyFeature({"utt1":np.zeros([100,4],dtype="float32")})
+  assert len(registry) == 1
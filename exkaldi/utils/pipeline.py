@@ -0,0 +1,404 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Run a recipe as a graph of stages.
+Every stage declares its input and output files. A stage depends on the stages which output its inputs.
+A stage is skipped if the fingerprint of its parameters,inputs and outputs is the same as the last successful run.
+Independent stages run in parallel.
+'''
+
+import os
+import glob
+import json
+import time
+import fnmatch
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor,FIRST_COMPLETED,wait
+
+from exkaldi.version import WrongPath,WrongOperation
+from exkaldi.utils import declare
+from exkaldi.utils import trace
+
+StageResult = namedtuple("StageResult",["name","state","duration"])
+
+def _normalize(path):
+	return os.path.normpath(os.path.abspath(path))
+
+def _expand(pattern):
+	'''
+	Get all files of a path,a glob pattern or a directory.
+	'''
+	files = []
+	for path in sorted(glob.glob(pattern)):
+		if os.path.isdir(path):
+			for root,dirs,names in os.walk(path):
+				dirs.sort()
+				files.extend( os.path.join(root,n) for n in sorted(names) )
+		else:
+			files.append(path)
+	return files
+
+def _overlap(outPath,inPath):
+	'''
+	Whether or not an input path may be generated by an output path. Both of them may be glob patterns or directories.
+	'''
+	if outPath == inPath:
+		return True
+	if inPath.startswith(outPath+os.sep) or outPath.startswith(inPath+os.sep):
+		return True
+	return fnmatch.fnmatchcase(outPath,inPath) or fnmatch.fnmatchcase(inPath,outPath)
+
+class Stage:
+	'''
+	A stage of pipeline.
+	'''
+	def __init__(self,name,func,inputs=[],outputs=[],params=None,after=[]):
+		'''
+		Args:
+			<name>: a unique name.
+			<func>: a callable object without any arguments.
+			<inputs>: a list of file names,directories or glob patterns that this stage reads.
+			<outputs>: a list of file names,directories or glob patterns that this stage writes.
+						Declare files rather than directories if other stages also write in the same directory.
+			<params>: None or a JSON-serializable object. The stage will run again if it is changed.
+			<after>: a list of stage names which should run before this stage,besides the dependencies found by files.
+		'''
+		declare.is_valid_string("name",name)
+		declare.is_callable("func",func)
+		declare.is_classes("inputs",inputs,[list,tuple])
+		declare.is_classes("outputs",outputs,[list,tuple])
+		declare.is_classes("after",after,[list,tuple])
+		for path in list(inputs) + list(outputs):
+			declare.is_valid_string("path",path)
+
+		self.__name = name
+		self.__func = func
+		self.__inputs = [ _normalize(p) for p in inputs ]
+		self.__outputs = [ _normalize(p) for p in outputs ]
+		self.__params = params
+		self.__after = list(after)
+
+	@property
+	def name(self):
+		return self.__name
+
+	@property
+	def func(self):
+		return self.__func
+
+	@property
+	def inputs(self):
+		return self.__inputs[:]
+
+	@property
+	def outputs(self):
+		return self.__outputs[:]
+
+	@property
+	def params(self):
+		return self.__params
+
+	@property
+	def after(self):
+		return self.__after[:]
+
+	def missing_inputs(self):
+		'''
+		Get the inputs which have not existed.
+
+		Return:
+			a list of paths.
+		'''
+		return [ p for p in self.__inputs if len(glob.glob(p)) == 0 ]
+
+	def fingerprint(self):
+		'''
+		Compute the fingerprint with the parameters and the size and modification time of input and output files.
+
+		Return:
+			a string or None if any output has not existed.
+		'''
+		outputs = []
+		for p in self.__outputs:
+			files = _expand(p)
+			if len(files) == 0:
+				return None
+			outputs.append(files)
+
+		def stat(files):
+			result = []
+			for f in files:
+				s = os.stat(f)
+				result.append( (f,s.st_size,s.st_mtime_ns) )
+			return result
+
+		content = {
+			"params":self.__params,
+			"inputs":[ stat(_expand(p)) for p in self.__inputs ],
+			"outputs":[ stat(files) for files in outputs ],
+		}
+		content = json.dumps(content,sort_keys=True,default=str)
+		return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+class Pipeline:
+	'''
+	A graph of stages.
+
+	Usage:
+		pipeline = Pipeline("exp/pipeline.json",parallel=2)
+		pipeline.add("lm",train_lm,inputs=["exp/data/train/text"],outputs=["exp/lm/3grams.arpa"],params={"order":3})
+		pipeline.add("graph",make_graph,inputs=["exp/lm/3grams.arpa"],outputs=["exp/graph/HCLG.fst"])
+		pipeline.run()
+	'''
+	def __init__(self,stateFile,parallel=1):
+		'''
+		Args:
+			<stateFile>: a JSON file to record the fingerprints of finished stages.
+			<parallel>: the maximum number of stages running at the same time.
+		'''
+		declare.is_valid_file_name("stateFile",stateFile)
+		declare.is_positive_int("parallel",parallel)
+
+		self.__stateFile = stateFile
+		self.__parallel = parallel
+		self.__stages = {}
+		self.__records = {}
+		self.__lock = threading.Lock()
+
+	@property
+	def stages(self):
+		'''
+		The names of all stages with the order they were added.
+		'''
+		return list(self.__stages.keys())
+
+	def __getitem__(self,name):
+		try:
+			return self.__stages[name]
+		except KeyError:
+			raise WrongOperation(f"No such stage: {name}.")
+
+	def add(self,name,func,inputs=[],outputs=[],params=None,after=[]):
+		'''
+		Add a stage.
+
+		Args:
+			The same as Stage.
+
+		Return:
+			the Stage object.
+		'''
+		if name in self.__stages:
+			raise WrongOperation(f"Stage has existed: {name}.")
+		stage = Stage(name,func,inputs,outputs,params,after)
+		self.__stages[name] = stage
+		return stage
+
+	def stage(self,name=None,inputs=[],outputs=[],params=None,after=[]):
+		'''
+		A decorator to add a function as a stage.
+
+		Args:
+			<name>: None or a string. If None,use the function name.
+			Others are the same as Stage.
+		'''
+		def decorator(func):
+			self.add(func.__name__ if name is None else name,func,inputs,outputs,params,after)
+			return func
+		return decorator
+
+	def dependencies(self,name):
+		'''
+		Get the stages that a stage depends on directly.
+
+		Args:
+			<name>: stage name.
+
+		Return:
+			a list of stage names.
+		'''
+		stage = self[name]
+		result = []
+		for other in self.__stages.values():
+			if other.name == name:
+				continue
+			if other.name in stage.after or any( _overlap(o,i) for o in other.outputs for i in stage.inputs ):
+				result.append(other.name)
+		for other in stage.after:
+			if other not in self.__stages:
+				raise WrongOperation(f"Stage <{name}> should run after an unknown stage: {other}.")
+		return result
+
+	def plan(self,targets=None):
+		'''
+		Sort stages in topological order.
+
+		Args:
+			<targets>: None or a list of stage names. If not None,only these stages and the stages they depend on are planned.
+
+		Return:
+			a list of stage names.
+		'''
+		if targets is None:
+			targets = self.stages
+		else:
+			declare.is_classes("targets",targets,[list,tuple])
+			for name in targets:
+				self[name]
+
+		deps = {}
+		stack = list(targets)
+		while len(stack) > 0:
+			name = stack.pop()
+			if name in deps:
+				continue
+			deps[name] = self.dependencies(name)
+			stack.extend(deps[name])
+
+		result = []
+		done = set()
+		# Keep the order that stages were added if possible.
+		remaining = [ n for n in self.stages if n in deps ]
+		while len(remaining) > 0:
+			for name in remaining:
+				if all( d in done for d in deps[name] ):
+					break
+			else:
+				raise WrongOperation(f"Stages have cyclic dependencies: {remaining}.")
+			remaining.remove(name)
+			done.add(name)
+			result.append(name)
+
+		return result
+
+	def __load_records(self):
+		if os.path.isfile(self.__stateFile):
+			with open(self.__stateFile,"r",encoding="utf-8") as fr:
+				self.__records = json.load(fr)
+		else:
+			self.__records = {}
+
+	def __save_record(self,name,fingerprint):
+		with self.__lock:
+			self.__records[name] = fingerprint
+			dirName = os.path.dirname(self.__stateFile)
+			if dirName != "":
+				os.makedirs(dirName,exist_ok=True)
+			# Replace the file atomically so that it is not broken if the pipeline is killed.
+			tempFile = self.__stateFile + ".tmp"
+			with open(tempFile,"w",encoding="utf-8") as fw:
+				json.dump(self.__records,fw,indent=1)
+			os.replace(tempFile,self.__stateFile)
+
+	def is_up_to_date(self,name):
+		'''
+		Whether or not a stage can be skipped now.
+
+		Args:
+			<name>: stage name.
+
+		Return:
+			True or False.
+		'''
+		stage = self[name]
+		self.__load_records()
+		fingerprint = stage.fingerprint()
+		return fingerprint is not None and self.__records.get(name,None) == fingerprint
+
+	def __run_stage(self,stage,force,verbose):
+		if not force:
+			fingerprint = stage.fingerprint()
+			if fingerprint is not None and self.__records.get(stage.name,None) == fingerprint:
+				if verbose:
+					print(f"Stage <{stage.name}> is up to date. Skip it.")
+				return StageResult(stage.name,"skipped",0.0)
+
+		missing = stage.missing_inputs()
+		if len(missing) > 0:
+			raise WrongPath(f"Missing inputs of stage <{stage.name}>: {missing}.")
+
+		if verbose:
+			print(f"Stage <{stage.name}> starts.")
+		startTime = time.time()
+		with trace.span(stage.name,category="stage"):
+			stage.func()
+		duration = time.time() - startTime
+
+		fingerprint = stage.fingerprint()
+		if fingerprint is None:
+			raise WrongOperation(f"Stage <{stage.name}> finished but some outputs have not been generated: {stage.outputs}.")
+		self.__save_record(stage.name,fingerprint)
+		if verbose:
+			print(f"Stage <{stage.name}> done in {duration:.2f}s.")
+		return StageResult(stage.name,"done",duration)
+
+	def run(self,targets=None,force=False,verbose=True):
+		'''
+		Run stages. Stages whose dependencies have finished are started as soon as possible.
+		If a stage failed,no more stages will be started,and an error will be raised after running stages finished.
+
+		Args:
+			<targets>: None or a list of stage names. If not None,only run these stages and the stages they depend on.
+			<force>: a bool value or a list of stage names. Run these stages even if they are up to date.
+			<verbose>: If True,print the progress.
+
+		Return:
+			a list of StageResult objects with the topological order.
+		'''
+		if isinstance(force,bool):
+			forced = set(self.stages) if force else set()
+		else:
+			declare.is_classes("force",force,[list,tuple])
+			forced = set(force)
+		declare.is_bool("verbose",verbose)
+
+		names = self.plan(targets)
+		deps = dict( (name,self.dependencies(name)) for name in names )
+		self.__load_records()
+
+		results = {}
+		pending = names[:]
+		running = {}
+		failure = None
+		with ThreadPoolExecutor(max_workers=self.__parallel) as pool:
+			while True:
+				if failure is None:
+					for name in pending[:]:
+						if all( d in results for d in deps[name] ):
+							pending.remove(name)
+							future = pool.submit(self.__run_stage,self.__stages[name],name in forced,verbose)
+							running[future] = name
+				if len(running) == 0:
+					break
+				finished,_ = wait(list(running.keys()),return_when=FIRST_COMPLETED)
+				for future in finished:
+					name = running.pop(future)
+					try:
+						results[name] = future.result()
+					except Exception as e:
+						if failure is None:
+							failure = (name,e)
+						results[name] = StageResult(name,"failed",0.0)
+
+		if failure is not None:
+			name,error = failure
+			raise WrongOperation(f"Stage <{name}> failed: {error}") from error
+
+		return [ results[name] for name in names ]
@@ -0,0 +1,110 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''Tests for exkaldi.utils.pipeline'''
+
+import os
+import threading
+import pytest
+from exkaldi.version import WrongOperation
+from exkaldi.utils import pipeline
+
+def make_pipeline(tmp_path,calls,parallel=1,order=3):
+  p = pipeline.Pipeline(str(tmp_path/"state.json"),parallel=parallel)
+  text = tmp_path/"text"
+  lexicon = tmp_path/"dict"/"lexicon"
+  arpa = tmp_path/"lm"/"arpa"
+  graph = tmp_path/"graph"/"HCLG.fst"
+
+  def writer(name,*outputs):
+    def func():
+      calls.append(name)
+      for o in outputs:
+        os.makedirs(os.path.dirname(o),exist_ok=True)
+        with open(o,"w") as fw:
+          fw.write(name)
+    return func
+
+  # Add stages out of order to test sorting.
+  p.add("graph",writer("graph",graph),inputs=[str(lexicon),str(tmp_path/"lm")],outputs=[str(graph)])
+  p.add("lm",writer("lm",arpa),inputs=[str(text)],outputs=[str(arpa)],params={"order":order})
+  p.add("dict",writer("dict",lexicon),inputs=[str(text)],outputs=[str(lexicon)])
+  if not text.exists():
+    text.write_text("a b c")
+  return p
+
+def test_plan(tmp_path):
+  p = make_pipeline(tmp_path,[])
+  assert sorted(p.dependencies("graph")) == ["dict","lm"]
+  assert p.plan() == ["lm","dict","graph"]
+  assert p.plan(targets=["dict"]) == ["dict"]
+
+def test_skip_and_rerun(tmp_path):
+  calls = []
+  p = make_pipeline(tmp_path,calls)
+  results = p.run(verbose=False)
+  assert [ r.state for r in results ] == ["done","done","done"]
+  assert p.is_up_to_date("graph")
+
+  calls.clear()
+  assert [ r.state for r in p.run(verbose=False) ] == ["skipped","skipped","skipped"]
+  assert calls == []
+
+  # Changed parameters and the downstream stage run again.
+  calls.clear()
+  p = make_pipeline(tmp_path,calls,order=4)
+  p.run(verbose=False)
+  assert calls == ["lm","graph"]
+
+  # Removed outputs are generated again.
+  calls.clear()
+  os.remove(tmp_path/"dict"/"lexicon")
+  p.run(verbose=False)
+  assert calls == ["dict","graph"]
+
+  calls.clear()
+  p.run(force=["dict"],verbose=False)
+  assert calls == ["dict","graph"]
+
+def test_parallel(tmp_path):
+  p = pipeline.Pipeline(str(tmp_path/"state.json"),parallel=2)
+  barrier = threading.Barrier(2,timeout=5)
+  for name in ["a","b"]:
+    out = tmp_path/name
+    def func(out=out):
+      # Both stages have to arrive here at the same time.
+      barrier.wait()
+      out.write_text("done")
+    p.add(name,func,outputs=[str(out)])
+  assert [ r.state for r in p.run(verbose=False) ] == ["done","done"]
+
+def test_failure(tmp_path):
+  calls = []
+  p = make_pipeline(tmp_path,calls)
+  def fail():
+    raise RuntimeError("broken")
+  p.add("bad",fail,inputs=[str(tmp_path/"text")],outputs=[str(tmp_path/"bad")])
+  p.add("after_bad",lambda:calls.append("after_bad"),inputs=[str(tmp_path/"bad")],outputs=[str(tmp_path/"never")])
+  with pytest.raises(WrongOperation):
+    p.run(verbose=False)
+  assert "after_bad" not in calls
+
+  p = pipeline.Pipeline(str(tmp_path/"other.json"))
+  p.add("lazy",lambda:None,outputs=[str(tmp_path/"nothing")])
+  with pytest.raises(WrongOperation):
+    p.run(verbose=False)
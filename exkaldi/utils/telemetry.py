@@ -0,0 +1,321 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Record the resource usage of shell commands run by exkaldi.'''
+
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import threading
+import subprocess
+from collections import namedtuple
+
+from exkaldi.utils import declare
+
+CommandRecord = namedtuple("CommandRecord",["tool","api","cmd","startTime","wallTime","userTime","sysTime",
+											"peakRSS","stdinBytes","stdoutBytes","returnCode"])
+
+# These modules only run commands for others. The API which issued a command is the first frame out of them.
+_RUNNER_MODULES = ["exkaldi.utils.utils","exkaldi.utils.telemetry","exkaldi.utils.backend","exkaldi.utils.trace","exkaldi.core.common",
+					"concurrent.futures.thread","threading","contextlib"]
+
+class MetricsRegistry:
+	'''
+	Hold command records in memory.
+	'''
+	def __init__(self):
+		self.__records = []
+		self.__lock = threading.Lock()
+
+	def __call__(self,record):
+		with self.__lock:
+			self.__records.append(record)
+
+	def __len__(self):
+		return len(self.__records)
+
+	def clear(self):
+		'''
+		Remove all records.
+		'''
+		with self.__lock:
+			self.__records = []
+
+	def query(self,tool=None,api=None):
+		'''
+		Get records.
+
+		Args:
+			<tool>: None or a Kaldi tool name. If not None,only return the records of commands including this tool.
+			<api>: None or a string. If not None,only return the records issued by APIs whose name includes this string.
+
+		Return:
+			a list of CommandRecord objects.
+		'''
+		with self.__lock:
+			records = self.__records[:]
+		if tool is not None:
+			records = [ r for r in records if tool in r.tool.split(",") ]
+		if api is not None:
+			records = [ r for r in records if api in r.api ]
+		return records
+
+	def summary(self):
+		'''
+		Aggregate the records by tool.
+
+		Return:
+			a list of tuples: (tool,count,wallTime,userTime,sysTime,peakRSS),sorted by wall time in descending order.
+		'''
+		table = {}
+		for r in self.query():
+			if r.tool not in table:
+				table[r.tool] = [r.tool,0,0.0,0.0,0.0,0]
+			table[r.tool][1] += 1
+			table[r.tool][2] += r.wallTime
+			table[r.tool][3] += (r.userTime or 0.0)
+			table[r.tool][4] += (r.sysTime or 0.0)
+			table[r.tool][5] = max(table[r.tool][5],(r.peakRSS or 0))
+		return sorted( [tuple(v) for v in table.values()],key=lambda x:x[2],reverse=True )
+
+	def print_summary(self,fileName=None):
+		'''
+		Print the summary table.
+
+		Args:
+			<fileName>: None or a file handle. If None,print to standard output.
+		'''
+		rows = self.summary()
+		if len(rows) == 0:
+			return
+		fw = sys.stdout if fileName is None else fileName
+		width = max(max(len(r[0]) for r in rows),4)
+		print(f"{'tool':<{width}}  {'count':>6}  {'wall(s)':>10}  {'user(s)':>10}  {'sys(s)':>10}  {'peakRSS(MB)':>12}",file=fw)
+		for tool,count,wallTime,userTime,sysTime,peakRSS in rows:
+			print(f"{tool:<{width}}  {count:>6}  {wallTime:>10.3f}  {userTime:>10.3f}  {sysTime:>10.3f}  {peakRSS/1024/1024:>12.1f}",file=fw)
+
+	def export_json(self,fileName):
+		'''
+		Export the records to a JSON file.
+
+		Args:
+			<fileName>: a file name.
+
+		Return:
+			the file name.
+		'''
+		declare.is_valid_string("fileName",fileName)
+		with open(fileName,"w",encoding="utf-8") as fw:
+			json.dump([ r._asdict() for r in self.query() ],fw,indent=1)
+		return fileName
+
+	def export_csv(self,fileName):
+		'''
+		Export the records to a CSV file.
+
+		Args:
+			<fileName>: a file name.
+
+		Return:
+			the file name.
+		'''
+		declare.is_valid_string("fileName",fileName)
+		with open(fileName,"w",encoding="utf-8",newline="") as fw:
+			writer = csv.writer(fw)
+			writer.writerow(CommandRecord._fields)
+			for r in self.query():
+				writer.writerow(r)
+		return fileName
+
+class _RusagePopen(subprocess.Popen):
+	'''
+	A Popen which keeps the resource usage and the exit time of the child process when it is reaped.
+	'''
+	rusage = None
+	endTime = None
+
+	def _try_wait(self,wait_flags):
+		try:
+			(pid,sts,rusage) = os.wait4(self.pid,wait_flags)
+		except ChildProcessError:
+			# This happens if SIGCLD is set to be ignored.
+			pid = self.pid
+			sts = 0
+		else:
+			if pid == self.pid:
+				self.rusage = rusage
+				self.endTime = time.time()
+		return (pid,sts)
+
+	def poll(self):
+		'''
+		Popen.poll() reaps the process with waitpid() and loses its resource usage,so reap it with wait4() here.
+		'''
+		if self.returncode is None and self._waitpid_lock.acquire(False):
+			try:
+				if self.returncode is None:
+					(pid,sts) = self._try_wait(os.WNOHANG)
+					if pid == self.pid:
+						self._handle_exitstatus(sts)
+			finally:
+				self._waitpid_lock.release()
+		return self.returncode
+
+_HOOKS = []
+_REGISTRY = None
+_LOCK = threading.Lock()
+
+def enable(summaryAtExit=True):
+	'''
+	Start to record the commands. It is disabled defaultly.
+
+	Args:
+		<summaryAtExit>: If True,print the summary table when Python exits.
+
+	Return:
+		the MetricsRegistry object.
+	'''
+	declare.is_bool("summaryAtExit",summaryAtExit)
+	global _REGISTRY
+	with _LOCK:
+		if _REGISTRY is None:
+			_REGISTRY = MetricsRegistry()
+			_HOOKS.append(_REGISTRY)
+			if summaryAtExit:
+				atexit.register(_print_summary_at_exit)
+	return _REGISTRY
+
+def disable():
+	'''
+	Stop recording by the registry. Other hooks are kept.
+	'''
+	global _REGISTRY
+	with _LOCK:
+		if _REGISTRY is not None:
+			_HOOKS.remove(_REGISTRY)
+			_REGISTRY = None
+
+def get_registry():
+	'''
+	Get the metrics registry.
+
+	Return:
+		None or a MetricsRegistry object.
+	'''
+	return _REGISTRY
+
+def add_hook(func):
+	'''
+	Add a hook function which will be called with a CommandRecord object after each command finished.
+
+	Args:
+		<func>: a callable object.
+	'''
+	declare.is_callable("func",func)
+	with _LOCK:
+		_HOOKS.append(func)
+
+def remove_hook(func):
+	'''
+	Remove a hook function.
+
+	Args:
+		<func>: a callable object added before.
+	'''
+	with _LOCK:
+		_HOOKS.remove(func)
+
+def is_active():
+	'''
+	Whether or not any hook has been added.
+	'''
+	return len(_HOOKS) > 0
+
+def popen(cmd,keepUsage=False,**kwargs):
+	'''
+	Create a subprocess. If any hook has been added or <keepUsage> is True,the process keeps its resource usage.
+	'''
+	if keepUsage or is_active():
+		return _RusagePopen(cmd,**kwargs)
+	else:
+		return subprocess.Popen(cmd,**kwargs)
+
+def peak_rss(p):
+	'''
+	Get the peak RSS in bytes of a finished process created by popen().
+
+	Return:
+		an int value or None if its resource usage is not kept.
+	'''
+	rusage = getattr(p,"rusage",None)
+	if rusage is None:
+		return None
+	# ru_maxrss is in kilobytes on Linux but in bytes on macOS
+	return rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+def record(cmd,p,startTime,stdinBytes=None,stdoutBytes=None):
+	'''
+	Make a record of a finished command and call the hooks.
+
+	Args:
+		<cmd>: the command.
+		<p>: the finished process created by popen().
+		<startTime>: the time when the process started.
+		<stdinBytes>: the size of input data.
+		<stdoutBytes>: the size of output data.
+	'''
+	if not is_active():
+		return
+	rusage = getattr(p,"rusage",None)
+	if rusage is None:
+		userTime = sysTime = peakRSS = None
+	else:
+		userTime = rusage.ru_utime
+		sysTime = rusage.ru_stime
+		peakRSS = peak_rss(p)
+
+	# Use the time when the process was reaped if it is known,because a record may be made long after that.
+	endTime = getattr(p,"endTime",None)
+	if endTime is None:
+		endTime = time.time()
+
+	tool = ",".join([ c.strip().split(maxsplit=1)[0] for c in cmd.split("|") if len(c.strip()) > 0 ])
+	r = CommandRecord(tool,_calling_api(),cmd,startTime,endTime-startTime,userTime,sysTime,
+						peakRSS,stdinBytes,stdoutBytes,p.returncode)
+	for hook in _HOOKS[:]:
+		hook(r)
+
+def _calling_api():
+	'''
+	Find the API which issued the command.
+	'''
+	frame = sys._getframe(1)
+	while frame is not None:
+		moduleName = frame.f_globals.get("__name__","")
+		if moduleName not in _RUNNER_MODULES:
+			funcName = getattr(frame.f_code,"co_qualname",frame.f_code.co_name)
+			return f"{moduleName}.{funcName}"
+		frame = frame.f_back
+	return "unknown"
+
+def _print_summary_at_exit():
+	if _REGISTRY is not None and len(_REGISTRY) > 0:
+		print("ExKaldi command summary:")
+		_REGISTRY.print_summary()
@@ -0,0 +1,76 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.telemetry'''
+
+import io
+import json
+from exkaldi.utils import telemetry
+from exkaldi.utils import backend
+from exkaldi.utils.utils import run_shell_command,run_shell_command_parallel
+
+def test_registry(tmpdir):
+
+  registry = telemetry.enable(summaryAtExit=False)
+  try:
+    run_shell_command("cat | wc -c",stdin="PIPE",stdout="PIPE",inputs=b"hello")
+    run_shell_command_parallel(["true","sleep 0.1"])
+
+    records = registry.query(tool="wc")
+    assert len(records) == 1
+    assert records[0].tool == "cat,wc"
+    assert records[0].api.endswith("test_registry")
+    assert records[0].stdinBytes == 5 and records[0].stdoutBytes > 0
+    assert records[0].peakRSS > 0 and records[0].userTime is not None
+    assert len(registry.query(tool="sleep")) == 1
+
+    fw = io.StringIO()
+    registry.print_summary(fw)
+    assert "sleep" in fw.getvalue()
+
+    with open(registry.export_json(str(tmpdir.join("m.json")))) as fr:
+      assert len(json.load(fr)) == 3
+    with open(registry.export_csv(str(tmpdir.join("m.csv")))) as fr:
+      assert len(fr.readlines()) == 4
+  finally:
+    telemetry.disable()
+
+def test_parallel_wall_time():
+
+  registry = telemetry.enable(summaryAtExit=False)
+  try:
+    # The short job finishes first though it is waited after the long one.
+    run_shell_command_parallel(["sleep 1","sleep 0.1"])
+    times = dict( (r.cmd,r.wallTime) for r in registry.query(tool="sleep") )
+    assert times["sleep 1"] >= 0.9
+    assert times["sleep 0.1"] < 0.5
+  finally:
+    telemetry.disable()
+
+def test_parallel_resource_usage():
+
+  registry = telemetry.enable(summaryAtExit=False)
+  try:
+    run_shell_command_parallel(["sleep 0.2","true"])
+    run_shell_command_parallel(["sleep 0.2","true"],backend=backend.MemoryAwareBackend(maxJobs=2,jobMemory=1024))
+    records = registry.query()
+    assert len(records) == 4
+    for r in records:
+      assert r.returnCode == 0
+      assert r.peakRSS is not None and r.userTime is not None and r.sysTime is not None
+  finally:
+    telemetry.disable()
@@ -0,0 +1,296 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Trace the timeline of exkaldi APIs and their inner stages.
+The trace can be exported to Chrome trace-event JSON format and opened with chrome://tracing or Perfetto.
+'''
+
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+from collections import namedtuple
+
+from exkaldi.version import WrongOperation
+from exkaldi.utils import declare
+from exkaldi.utils import telemetry
+
+Span = namedtuple("Span",["name","category","startTime","duration","pid","tid","depth","args"])
+
+# Commands running in parallel are put on virtual threads whose IDs start from this value.
+_COMMAND_TID_BASE = 1000000
+
+class Tracer:
+	'''
+	Hold spans in memory.
+	'''
+	def __init__(self):
+		self.__spans = []
+		self.__lock = threading.Lock()
+		self.__origin = time.time()
+		self.__local = threading.local()
+
+	def __len__(self):
+		return len(self.__spans)
+
+	@property
+	def origin(self):
+		'''
+		The time when this tracer was created.
+		'''
+		return self.__origin
+
+	def clear(self):
+		'''
+		Remove all spans.
+		'''
+		with self.__lock:
+			self.__spans = []
+
+	def add(self,span):
+		'''
+		Add a finished span.
+
+		Args:
+			<span>: a Span object.
+		'''
+		with self.__lock:
+			self.__spans.append(span)
+
+	def spans(self,name=None,category=None):
+		'''
+		Get spans.
+
+		Args:
+			<name>: None or a string. If not None,only return the spans whose name includes it.
+			<category>: None or a string. If not None,only return the spans of this category.
+
+		Return:
+			a list of Span objects sorted by start time.
+		'''
+		with self.__lock:
+			spans = self.__spans[:]
+		if name is not None:
+			spans = [ s for s in spans if name in s.name ]
+		if category is not None:
+			spans = [ s for s in spans if s.category == category ]
+		return sorted(spans,key=lambda s:s.startTime)
+
+	@contextlib.contextmanager
+	def span(self,name,category="api",**args):
+		'''
+		Record a span with a context manager.
+
+		Args:
+			<name>: the name of span.
+			<category>: the category of span.
+			<args>: extra information shown in the trace viewer.
+		'''
+		depth = getattr(self.__local,"depth",0)
+		self.__local.depth = depth + 1
+		startTime = time.time()
+		try:
+			yield
+		finally:
+			self.__local.depth = depth
+			self.add( Span(name,category,startTime,time.time()-startTime,os.getpid(),threading.get_ident(),depth,args) )
+
+	def __call__(self,record):
+		'''
+		As a hook of exkaldi.utils.telemetry,make a span of a finished command.
+		'''
+		self.add( Span(record.tool,"command",record.startTime,record.wallTime,os.getpid(),threading.get_ident(),
+									getattr(self.__local,"depth",0),
+									{"cmd":record.cmd,"api":record.api,"returnCode":record.returnCode,"peakRSS":record.peakRSS}
+								) )
+
+	def summary(self,category=None):
+		'''
+		Aggregate spans by name.
+
+		Args:
+			<category>: None or a category name.
+
+		Return:
+			a list of tuples: (name,count,totalTime,maxTime),sorted by total time in descending order.
+		'''
+		table = {}
+		for s in self.spans(category=category):
+			if s.name not in table:
+				table[s.name] = [s.name,0,0.0,0.0]
+			table[s.name][1] += 1
+			table[s.name][2] += s.duration
+			table[s.name][3] = max(table[s.name][3],s.duration)
+		return sorted( [tuple(v) for v in table.values()],key=lambda x:x[2],reverse=True )
+
+	def export_chrome_trace(self,fileName):
+		'''
+		Export spans to a Chrome trace-event JSON file.
+
+		Args:
+			<fileName>: a file name.
+
+		Return:
+			the file name.
+		'''
+		declare.is_valid_string("fileName",fileName)
+
+		events = []
+		threadNames = {}
+		# Commands may overlap with each other when they run in parallel,so assign them to virtual threads.
+		laneEnds = []
+		for s in self.spans():
+			tid = s.tid
+			if s.category == "command":
+				for lane,endTime in enumerate(laneEnds):
+					if endTime <= s.startTime:
+						break
+				else:
+					lane = len(laneEnds)
+					laneEnds.append(0)
+				laneEnds[lane] = s.startTime + s.duration
+				tid = _COMMAND_TID_BASE + lane
+				threadNames[(s.pid,tid)] = f"subprocess {lane}"
+			elif (s.pid,tid) not in threadNames:
+				threadNames[(s.pid,tid)] = f"thread {tid}"
+			events.append({
+				"name":s.name,
+				"cat":s.category,
+				"ph":"X",
+				"ts":(s.startTime-self.__origin)*1e6,
+				"dur":s.duration*1e6,
+				"pid":s.pid,
+				"tid":tid,
+				"args":s.args,
+			})
+
+		for (pid,tid),threadName in threadNames.items():
+			events.append( {"name":"thread_name","ph":"M","pid":pid,"tid":tid,"args":{"name":threadName}} )
+
+		with open(fileName,"w",encoding="utf-8") as fw:
+			json.dump({"traceEvents":events,"displayTimeUnit":"ms"},fw)
+
+		return fileName
+
+_TRACER = None
+_LOCK = threading.Lock()
+
+def enable(traceCommands=True):
+	'''
+	Start to trace. It is disabled defaultly.
+
+	Args:
+		<traceCommands>: If True,shell commands run by exkaldi are also traced.
+
+	Return:
+		the Tracer object.
+	'''
+	declare.is_bool("traceCommands",traceCommands)
+	global _TRACER
+	with _LOCK:
+		if _TRACER is None:
+			_TRACER = Tracer()
+			if traceCommands:
+				telemetry.add_hook(_TRACER)
+	return _TRACER
+
+def disable():
+	'''
+	Stop tracing.
+
+	Return:
+		None or the Tracer object holding recorded spans.
+	'''
+	global _TRACER
+	with _LOCK:
+		tracer = _TRACER
+		_TRACER = None
+	if tracer is not None:
+		try:
+			telemetry.remove_hook(tracer)
+		except ValueError:
+			pass
+	return tracer
+
+def get_tracer():
+	'''
+	Get the tracer.
+
+	Return:
+		None or a Tracer object.
+	'''
+	return _TRACER
+
+def is_active():
+	'''
+	Whether or not the tracing is enabled.
+	'''
+	return _TRACER is not None
+
+@contextlib.contextmanager
+def span(name,category="stage",**args):
+	'''
+	Record a span if tracing is enabled.
+
+	Args:
+		<name>: the name of span.
+		<category>: the category of span.
+		<args>: extra information shown in the trace viewer.
+	'''
+	tracer = _TRACER
+	if tracer is None:
+		yield
+	else:
+		with tracer.span(name,category,**args):
+			yield
+
+def traced(name=None,category="api"):
+	'''
+	A decorator to record a span every time the function is called,if tracing is enabled.
+
+	Args:
+		<name>: None or a string. If None,use the qualified name of the function.
+		<category>: the category of span.
+	'''
+	def decorator(func):
+		spanName = func.__qualname__ if name is None else name
+		@functools.wraps(func)
+		def inner(*args,**kwargs):
+			tracer = _TRACER
+			if tracer is None:
+				return func(*args,**kwargs)
+			with tracer.span(spanName,category):
+				return func(*args,**kwargs)
+		return inner
+	return decorator
+
+def export_chrome_trace(fileName):
+	'''
+	Export the spans recorded by current tracer to a Chrome trace-event JSON file.
+
+	Args:
+		<fileName>: a file name.
+
+	Return:
+		the file name.
+	'''
+	if _TRACER is None:
+		raise WrongOperation("Tracing is not enabled. Please call exkaldi.utils.trace.enable() firstly.")
+	return _TRACER.export_chrome_trace(fileName)
@@ -0,0 +1,55 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.trace'''
+
+import json
+from exkaldi.utils import trace
+from exkaldi.utils.utils import run_shell_command,run_shell_command_parallel
+
+@trace.traced()
+def align():
+  run_shell_command_parallel(["sleep 0.1","sleep 0.1"])
+
+def test_chrome_trace(tmpdir):
+
+  tracer = trace.enable()
+  try:
+    with trace.span("iteration",iteration=0):
+      align()
+      run_shell_command("true")
+
+    spans = tracer.spans()
+    assert [ s.name for s in tracer.spans(category="api") ] == ["align"]
+    assert tracer.spans(name="iteration")[0].args == {"iteration":0}
+    assert tracer.spans(name="iteration")[0].depth == 0
+    assert tracer.spans(name="align")[0].depth == 1
+    assert len(tracer.spans(category="command")) == 3
+    assert tracer.spans(name="sleep")[0].args["api"].endswith("align")
+
+    with open(trace.export_chrome_trace(str(tmpdir.join("trace.json")))) as fr:
+      events = json.load(fr)["traceEvents"]
+    complete = [ e for e in events if e["ph"] == "X" ]
+    assert len(complete) == len(spans)
+    # Parallel commands overlap so they are put on different virtual threads.
+    assert len(set( e["tid"] for e in complete if e["name"] == "sleep" )) == 2
+  finally:
+    trace.disable()
+
+  # Nothing is recorded after disabled.
+  align()
+  assert len(tracer) == len(spans)
@@ -18,6 +18,8 @@
 '''This package defined some utilities.'''
 
 import os
+import signal
+import asyncio
 import datetime
 import importlib
 import subprocess
@@ -31,6 +33,9 @@ import time
 from exkaldi.version import info as ExkaldiInfo
 from exkaldi.version import WrongPath,WrongOperation,WrongDataFormat,KaldiProcessError,ShellProcessError,UnsupportedType
 from exkaldi.utils import declare
+from exkaldi.utils import cache
+from exkaldi.utils import telemetry
+from exkaldi.utils.backend import get_backend
 
 def type_name(obj):
 	'''
@@ -44,7 +49,22 @@ def type_name(obj):
 	'''
 	return obj.__class__.__name__
 
-def run_shell_command(cmd,stdin=None,stdout=None,stderr=None,inputs=None,env=None):
+def is_list_table(obj):
+	'''
+	Whether or not the object is an exkaldi ListTable,including its read-only views such as the lexicons of LexiconBank.
+	Subclasses with their own format,such as Transcription and ArkIndexTable,are not included.
+
+	Args:
+		<obj>: a python object.
+	
+	Return:
+		True or False.
+	'''
+	# import here because exkaldi.core depends on this module
+	from exkaldi.core.archive import ListTable,Transcription,Metric,WavSegment,ArkIndexTable
+	return isinstance(obj,ListTable) and not isinstance(obj,(Transcription,Metric,WavSegment,ArkIndexTable))
+
+def run_shell_command(cmd,stdin=None,stdout=None,stderr=None,inputs=None,env=None,useCache=False):
 	'''
 	Run a shell command with Python subprocess.
 
@@ -53,6 +73,9 @@ def run_shell_command(cmd,stdin=None,stdout=None,stderr=None,inputs=None,env=Non
 		<stdin>,<stdout>,<stderr>: IO streams. If "PIPE",use subprocess.PIPE.
 		<inputs>: a string or bytes to send to input stream.
 		<env>: If None,use exkaldi.version.ENV defaultly.
+		<useCache>: If True and the global cache has been enabled by exkaldi.utils.cache.enable_cache(),
+					reuse the cached output. Only use it when the command writes its result to the output stream,
+					because the files written by the command are not cached.
 
 	Return:
 		out,err,returnCode
@@ -74,12 +97,136 @@ def run_shell_command(cmd,stdin=None,stdout=None,stderr=None,inputs=None,env=Non
 	if stderr == "PIPE":
 		stderr = subprocess.PIPE
 
-	p = subprocess.Popen(cmd,shell=True,stdin=stdin,stdout=stdout,stderr=stderr,env=env)
+	declare.is_bool("useCache",useCache)
+	resultCache = cache.get_cache() if (useCache and stdout == subprocess.PIPE) else None
+	if resultCache is not None:
+		key = resultCache.make_key(cmd,inputs)
+		result = resultCache.get(key)
+		if result is not None:
+			out,err,cod = result
+			return out,(err if stderr == subprocess.PIPE else None),cod
+
+	startTime = time.time()
+	p = telemetry.popen(cmd,shell=True,stdin=stdin,stdout=stdout,stderr=stderr,env=env)
 	(out,err) = p.communicate(input=inputs)
+	telemetry.record(cmd,p,startTime,
+						stdinBytes=None if inputs is None else len(inputs),
+						stdoutBytes=None if out is None else len(out))
+
+	if resultCache is not None and p.returncode == 0:
+		resultCache.put(key,out,err)
 
 	return out,err,p.returncode
 
-def run_shell_command_parallel(cmds,env=None,timeout=ExkaldiInfo.timeout):
+async def run_shell_command_async(cmd,inputs=None,env=None):
+	'''
+	Run a shell command with asyncio subprocess. The input,output and error streams are PIPEs.
+	If the task is cancelled,the process and all of its children will be killed.
+
+	Args:
+		<cmd>: a string including a shell command and its options.
+		<inputs>: None,a string or bytes object,or an async iterable object yielding bytes,to send to input stream.
+		<env>: If None,use exkaldi.version.ENV defaultly.
+
+	Return:
+		out,err,returnCode
+	'''
+	out = []
+	stream = ShellCommandStream(cmd,inputs=inputs,env=env,checkReturnCode=False)
+	async for chunk in stream:
+		out.append(chunk)
+	err,cod = stream.result
+	return b"".join(out),err,cod
+
+class ShellCommandStream:
+	'''
+	Run a shell command with asyncio subprocess and iterate its output stream chunk by chunk asynchronously.
+	If the iteration is cancelled,the process and all of its children will be killed.
+
+	Usage:
+		async for chunk in ShellCommandStream("copy-feats ark:a.ark ark:-"):
+			...
+	'''
+	def __init__(self,cmd,inputs=None,env=None,chunkSize=65536,checkReturnCode=True):
+		'''
+		Args:
+			<cmd>: a string including a shell command and its options.
+			<inputs>: None,a string or bytes object,or an async iterable object yielding bytes,to send to input stream.
+			<env>: If None,use exkaldi.version.ENV defaultly.
+			<chunkSize>: the maximum size of each chunk.
+			<checkReturnCode>: If True,raise ShellProcessError when the return code is not 0.
+		'''
+		declare.is_valid_string("cmd",cmd)
+		declare.is_positive_int("chunkSize",chunkSize)
+		declare.is_bool("checkReturnCode",checkReturnCode)
+		if isinstance(inputs,str):
+			inputs = inputs.encode()
+
+		self.__cmd = cmd
+		self.__inputs = inputs
+		self.__env = ExkaldiInfo.ENV if env is None else env
+		self.__chunkSize = chunkSize
+		self.__checkReturnCode = checkReturnCode
+		self.__result = None
+
+	@property
+	def result(self):
+		'''
+		Get the error information and return code after the iteration finished.
+		'''
+		return self.__result
+
+	async def __aiter__(self):
+		# Start a new session in order to kill all processes in the pipeline.
+		p = await asyncio.create_subprocess_exec("/bin/sh","-c",self.__cmd,
+													stdin=asyncio.subprocess.PIPE,
+													stdout=asyncio.subprocess.PIPE,
+													stderr=asyncio.subprocess.PIPE,
+													env=self.__env,
+													start_new_session=True
+												)
+		async def feed():
+			try:
+				if isinstance(self.__inputs,bytes):
+					p.stdin.write(self.__inputs)
+					await p.stdin.drain()
+				elif self.__inputs is not None:
+					async for chunk in self.__inputs:
+						p.stdin.write(chunk)
+						await p.stdin.drain()
+			except (BrokenPipeError,ConnectionResetError):
+				pass
+			finally:
+				p.stdin.close()
+
+		feeder = asyncio.ensure_future(feed())
+		errReader = asyncio.ensure_future(p.stderr.read())
+		try:
+			while True:
+				chunk = await p.stdout.read(self.__chunkSize)
+				if not chunk:
+					break
+				yield chunk
+			await feeder
+			err = await errReader
+			cod = await p.wait()
+		except BaseException:
+			feeder.cancel()
+			errReader.cancel()
+			if p.returncode is None:
+				try:
+					os.killpg(p.pid,signal.SIGKILL)
+				except ProcessLookupError:
+					pass
+				await asyncio.shield(p.wait())
+			raise
+
+		self.__result = (err,cod)
+		if self.__checkReturnCode and cod != 0:
+			print(err.decode())
+			raise ShellProcessError(f"Failed to run shell command: {self.__cmd}.")
+
+def run_shell_command_parallel(cmds,env=None,timeout=ExkaldiInfo.timeout,backend=None):
 	'''
 	Run shell commands with multiple processes.
 	In this mode,we don't allow the input and output streams are PIPEs.
@@ -90,6 +237,9 @@ def run_shell_command_parallel(cmds,env=None,timeout=ExkaldiInfo.timeout):
 		<cmds>: a list of strings. Each string should be a command and its options.
 		<env>: If None,use exkaldi.version.ENV defaultly.
 		<timeout>: a int value. Its the total timeout value of all processes.
+		<backend>: None or an exkaldi backend object,such as LocalBackend,TemplateBackend or SSHBackend.
+					If None,use the global backend set by exkaldi.utils.backend.set_backend().
+					If it is also None,run all commands locally at the same time.
 
 	Return:
 		a list of pairs: return code and error information.
@@ -100,28 +250,48 @@ def run_shell_command_parallel(cmds,env=None,timeout=ExkaldiInfo.timeout):
 	if env is None:
 		env = ExkaldiInfo.ENV
 
+	if backend is None:
+		backend = get_backend()
+	if backend is not None:
+		return backend.run(cmds,env=env,timeout=timeout)
+
+	if len(cmds) == 0:
+		raise WrongOperation("<cmds> has not any command to run.")
+
+	deadline = time.time() + timeout
+	# Write the error information to files so that no process is blocked by a full pipe while others are waited.
 	processManager = {}
 	for index,cmd in enumerate(cmds):
 		declare.is_valid_string("cmd",cmd)
-		processManager[index] = subprocess.Popen(cmd,shell=True,stderr=subprocess.PIPE,env=env)
+		errFile = tempfile.TemporaryFile(prefix="exkaldi_")
+		processManager[index] = (time.time(),telemetry.popen(cmd,shell=True,stderr=errFile,env=env),errFile)
 
-	runningProcess = len(processManager)
-	if runningProcess == 0:
-		raise WrongOperation("<cmds> has not any command to run.")
-	dtimeout = timeout//runningProcess
-	assert dtimeout >= 1,f"<timeout> is extremely short: {timeout}."
-	for ID,p in processManager.items():
-		try:
-			out,err = p.communicate(timeout=dtimeout)
-		except subprocess.TimeoutExpired:
+	# Reap processes in the order they finished,so that the time of each one is recorded rightly.
+	results = [ None for cmd in cmds ]
+	try:
+		while len(processManager) > 0:
+			for ID in list(processManager.keys()):
+				startTime,p,errFile = processManager[ID]
+				if p.poll() is not None:
+					telemetry.record(cmds[ID],p,startTime)
+					errFile.seek(0)
+					results[ID] = (p.returncode,errFile.read())
+					errFile.close()
+					del processManager[ID]
+			if len(processManager) > 0:
+				if time.time() > deadline:
+					break
+				time.sleep(0.01)
+	finally:
+		for ID,(_,p,errFile) in processManager.items():
 			p.kill()
+			p.wait()
+			errFile.close()
 			errMes = b"Time Out Error: Process was killed! If you are exactly running the right program,"
 			errMes += b"you can set a greater timeout value by exkaldi.info.set_timeout()."
-			processManager[ID] = (-9,errMes)
-		else:
-			processManager[ID] = (p.returncode,err)
+			results[ID] = (-9,errMes)
 
-	return list(processManager.values())
+	return results
 
 def make_dependent_dirs(path,pathIsFile=True):
 	'''
@@ -0,0 +1,74 @@
+# coding=utf-8
+#
+# Yu Wang (University of Yamanashi)
+# Oct,2020
+#
+# Licensed under the Apache License,Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for exkaldi.utils.utils'''
+
+import os
+import time
+import asyncio
+from exkaldi.utils.utils import run_shell_command_async,ShellCommandStream
+
+def test_run_shell_command_async():
+
+  async def chunks():
+    for i in range(3):
+      yield f"line{i}\n".encode()
+
+  async def main():
+    results = await asyncio.gather(
+                  run_shell_command_async("cat",inputs=b"hello"),
+                  run_shell_command_async("sort -r",inputs=chunks()),
+                  run_shell_command_async("echo error 1>&2; exit 2"),
+                )
+    out = []
+    async for chunk in ShellCommandStream("seq 1 10000",chunkSize=100):
+      assert len(chunk) <= 100
+      out.append(chunk)
+    return results,b"".join(out)
+
+  results,out = asyncio.run(main())
+  assert results[0] == (b"hello",b"",0)
+  assert results[1][0] == b"line2\nline1\nline0\n"
+  assert results[2][1:] == (b"error\n",2)
+  assert out.split() == [ str(i).encode() for i in range(1,10001) ]
+
+def test_cancel_kills_children(tmpdir):
+
+  pidFile = str(tmpdir.join("pid"))
+
+  async def main():
+    task = asyncio.ensure_future(run_shell_command_async(f"cat | (sleep 60 & echo $! > {pidFile}; wait)"))
+    while not os.path.isfile(pidFile) or os.path.getsize(pidFile) == 0:
+      await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+      await task
+    except asyncio.CancelledError:
+      pass
+
+  asyncio.run(main())
+  with open(pidFile) as fr:
+    pid = int(fr.read())
+  time.sleep(0.1)
+  # The grandchild process should have been killed.
+  try:
+    os.kill(pid,0)
+  except ProcessLookupError:
+    pass
+  else:
+    with open(f"/proc/{pid}/stat") as fr:
+      assert fr.read().split()[2] == "Z"
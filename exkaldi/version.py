@@ -50,14 +50,11 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 		Initialize.
 		'''
 		self.__KALDI_ROOT = None
+		self.__KALDI = None
 		self.__ENV = None
 		self.__LOG_DIR = None
-		
-		# Update the root path of Kaldi
-		_ = self.KALDI_ROOT
-		# If Kaldi existed, check it's version
-		if not self.__KALDI_ROOT is None:
-			_ = self.KALDI
+		# Kaldi will be discovered when it is used firstly, and the result is cached.
+		self.__DISCOVERED = False
 		
 		return self
 	
@@ -84,9 +81,11 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 			else:
 				return a named tuple of version number.
 		'''
-		if self.__KALDI_ROOT is None:
+		if self.KALDI_ROOT is None:
 			print("Warning: Kaldi toolkit was not found.")
 			return None
+		elif self.__KALDI is not None:
+			return self.__KALDI
 		else:
 			filePath = os.path.join(self.__KALDI_ROOT, "src", ".version")
 			if not os.path.isfile(filePath):
@@ -99,7 +98,8 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 				if v != _EXPECTED_KALDI_VERSION:
 					raise UnsupportedKaldiVersion(f"Current Exkaldi only supports Kaldi version=={_EXPECTED_KALDI_VERSION} but got {v}.")
 				else:
-					return namedtuple("Kaldi", ["version", "major", "minor"])(v, major, minor)
+					self.__KALDI = namedtuple("Kaldi", ["version", "major", "minor"])(v, major, minor)
+					return self.__KALDI
 
 	@property
 	def KALDI_ROOT(self):
@@ -110,7 +110,8 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 		Return:
 			None if Kaldi has not been found in system PATH, or a string.
 		'''
-		if self.__KALDI_ROOT is None:
+		if self.__KALDI_ROOT is None and not self.__DISCOVERED:
+			self.__DISCOVERED = True
 			cmd = "which copy-feats"
 			p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
 			out, err = p.communicate()
@@ -119,8 +120,9 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 				print("exkaldi.info.reset_kaldi_root( yourPath )")
 				print("If not, ERROR will occur when implementing some core functions.")
 			else:
-				self.__KALDI_ROOT = out.decode().strip()[0:-23]
-				self.reset_kaldi_root(self.__KALDI_ROOT)
+				self.reset_kaldi_root(out.decode().strip()[0:-23])
+				# check it's version
+				_ = self.KALDI
 
 		return self.__KALDI_ROOT
 	
@@ -134,6 +136,9 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 		'''
 		if self.__ENV is None:
 			self.__ENV = os.environ.copy()
+		# Kaldi paths are added to ENV when Kaldi is discovered.
+		if not self.__DISCOVERED:
+			_ = self.KALDI_ROOT
 
 		# ENV is a dict object, so deepcopy it.
 		return copy.deepcopy(self.__ENV)
@@ -160,6 +165,8 @@ class ExKaldiInfo( namedtuple("ExKaldiInfo",["version","major","minor","patch"])
 			raise WrongPath(f"{path} is not kaldi path avaliable.")
 		else:
 			self.__KALDI_ROOT = path
+			self.__KALDI = None
+			self.__DISCOVERED = True
 
 		oldENV = self.ENV['PATH'] #deepcopied dict object
 		systemPATH = []